@@ -0,0 +1,91 @@
+package xiaozhi.common.utils;
+
+import java.io.ByteArrayOutputStream;
+import java.nio.ByteBuffer;
+import java.nio.ByteOrder;
+import java.nio.charset.StandardCharsets;
+
+import io.github.jaredmdobson.concentus.OpusDecoder;
+import io.github.jaredmdobson.concentus.OpusException;
+import lombok.extern.slf4j.Slf4j;
+
+/**
+ * 音频格式转换
+ */
+@Slf4j
+public class AudioUtils {
+    /**
+     * Opus单帧最长120ms
+     */
+    private static final int MAX_FRAME_MS = 120;
+
+    /**
+     * 将按 2字节大端长度+帧数据 依次拼接的Opus帧解码为16位PCM的WAV
+     *
+     * @param packedFrames 拼接后的Opus帧
+     * @param format       音频格式：编码/采样率/声道数/帧长ms，例如 opus/16000/1/60
+     * @return WAV格式的音频数据，没有可解码的帧时返回null
+     */
+    public static byte[] opusFramesToWav(byte[] packedFrames, String format) throws OpusException {
+        String[] parts = format == null ? new String[0] : format.split("/");
+        if (parts.length < 3 || !"opus".equalsIgnoreCase(parts[0])) {
+            throw new IllegalArgumentException("不支持的音频格式: " + format);
+        }
+        int sampleRate = Integer.parseInt(parts[1]);
+        int channels = Integer.parseInt(parts[2]);
+        int maxFrameSize = sampleRate * MAX_FRAME_MS / 1000;
+
+        OpusDecoder decoder = new OpusDecoder(sampleRate, channels);
+        short[] pcm = new short[maxFrameSize * channels];
+        ByteBuffer frameBuffer = ByteBuffer.allocate(pcm.length * 2).order(ByteOrder.LITTLE_ENDIAN);
+        ByteArrayOutputStream pcmData = new ByteArrayOutputStream();
+        int offset = 0;
+        while (offset + 2 <= packedFrames.length) {
+            int length = ((packedFrames[offset] & 0xFF) << 8) | (packedFrames[offset + 1] & 0xFF);
+            offset += 2;
+            if (offset + length > packedFrames.length) {
+                log.warn("Opus帧数据不完整，已忽略剩余{}字节", packedFrames.length - offset);
+                break;
+            }
+            try {
+                int samples = decoder.decode(packedFrames, offset, length, pcm, 0, maxFrameSize, false);
+                frameBuffer.clear();
+                for (int i = 0; i < samples * channels; i++) {
+                    frameBuffer.putShort(pcm[i]);
+                }
+                pcmData.write(frameBuffer.array(), 0, frameBuffer.position());
+            } catch (OpusException e) {
+                // 与逐帧解码保持一致：坏帧跳过，不影响整段音频
+                log.warn("Opus帧解码失败: {}", e.getMessage());
+            }
+            offset += length;
+        }
+        if (pcmData.size() == 0) {
+            return null;
+        }
+        return pcmToWav(pcmData.toByteArray(), sampleRate, channels);
+    }
+
+    /**
+     * 为16位PCM数据加上WAV文件头
+     */
+    public static byte[] pcmToWav(byte[] pcm, int sampleRate, int channels) {
+        ByteBuffer wav = ByteBuffer.allocate(44 + pcm.length).order(ByteOrder.LITTLE_ENDIAN);
+        wav.put("RIFF".getBytes(StandardCharsets.US_ASCII));
+        wav.putInt(36 + pcm.length);
+        wav.put("WAVE".getBytes(StandardCharsets.US_ASCII));
+        wav.put("fmt ".getBytes(StandardCharsets.US_ASCII));
+        wav.putInt(16);
+        // PCM
+        wav.putShort((short) 1);
+        wav.putShort((short) channels);
+        wav.putInt(sampleRate);
+        wav.putInt(sampleRate * channels * 2);
+        wav.putShort((short) (channels * 2));
+        wav.putShort((short) 16);
+        wav.put("data".getBytes(StandardCharsets.US_ASCII));
+        wav.putInt(pcm.length);
+        wav.put(pcm);
+        return wav.array();
+    }
+}
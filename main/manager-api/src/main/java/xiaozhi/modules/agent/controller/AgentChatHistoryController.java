@@ -1,19 +1,36 @@
 package xiaozhi.modules.agent.controller;
 
+import java.io.ByteArrayInputStream;
+import java.io.IOException;
+import java.nio.ByteBuffer;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.List;
+import java.util.zip.GZIPInputStream;
+
+import org.springframework.http.HttpHeaders;
 import org.springframework.web.bind.annotation.PostMapping;
 import org.springframework.web.bind.annotation.RequestBody;
+import org.springframework.web.bind.annotation.RequestHeader;
 import org.springframework.web.bind.annotation.RequestMapping;
 import org.springframework.web.bind.annotation.RestController;
 
+import cn.hutool.core.io.IoUtil;
 import io.swagger.v3.oas.annotations.Operation;
 import io.swagger.v3.oas.annotations.tags.Tag;
 import jakarta.validation.Valid;
 import lombok.RequiredArgsConstructor;
+import lombok.extern.slf4j.Slf4j;
+import xiaozhi.common.exception.RenException;
+import xiaozhi.common.utils.JsonUtils;
 import xiaozhi.common.utils.Result;
+import xiaozhi.common.validator.ValidatorUtils;
 import xiaozhi.modules.agent.dto.AgentChatHistoryReportDTO;
 import xiaozhi.modules.agent.service.biz.AgentChatHistoryBizService;
 
 @Tag(name = "智能体聊天历史管理")
+@Slf4j
 @RequiredArgsConstructor
 @RestController
 @RequestMapping("/agent/chat-history")
@@ -33,4 +50,75 @@ public class AgentChatHistoryController {
         Boolean result = agentChatHistoryBizService.report(request);
         return new Result<Boolean>().ok(result);
     }
+
+    /**
+     * 小智服务聊天批量上报请求
+     * <p>
+     * 请求体为二进制，支持gzip压缩（Content-Encoding: gzip）：
+     * 4字节大端的元数据长度 + UTF-8编码的上报对象JSON数组 + 各条音频依次拼接。
+     * 每条音频为原始Opus帧（2字节大端帧长+帧数据），长度和格式见对象的audioLength、audioFormat，
+     * 保存时才解码为WAV。每条记录单独保存，某一条失败不影响其他记录。
+     *
+     * @param body            请求体
+     * @param contentEncoding 请求体压缩方式
+     * @return 保存失败、需要重新上报的记录下标
+     */
+    @Operation(summary = "小智服务聊天批量上报请求")
+    @PostMapping("/report/batch")
+    public Result<List<Integer>> uploadBatch(@RequestBody byte[] body,
+            @RequestHeader(value = HttpHeaders.CONTENT_ENCODING, required = false) String contentEncoding)
+            throws IOException {
+        if ("gzip".equalsIgnoreCase(contentEncoding)) {
+            body = IoUtil.readBytes(new GZIPInputStream(new ByteArrayInputStream(body)));
+        }
+        List<AgentChatHistoryReportDTO> requests = parseBatch(body);
+
+        List<Integer> failed = new ArrayList<>();
+        for (int i = 0; i < requests.size(); i++) {
+            AgentChatHistoryReportDTO request = requests.get(i);
+            try {
+                ValidatorUtils.validateEntity(request);
+            } catch (RenException e) {
+                // 数据不完整，重新上报也不会成功，直接跳过
+                log.warn("聊天批量上报第{}条数据无效: {}", i, e.getMsg());
+                continue;
+            }
+            try {
+                agentChatHistoryBizService.report(request);
+            } catch (Exception e) {
+                log.error("聊天批量上报第{}条保存失败", i, e);
+                failed.add(i);
+            }
+        }
+        return new Result<List<Integer>>().ok(failed);
+    }
+
+    /**
+     * 解析批量上报的请求体，按audioLength从音频区依次取出各条记录的Opus数据
+     */
+    private List<AgentChatHistoryReportDTO> parseBatch(byte[] body) {
+        if (body.length < 4) {
+            throw new RenException("批量上报数据格式错误");
+        }
+        int metaLength = ByteBuffer.wrap(body, 0, 4).getInt();
+        if (metaLength < 0 || 4L + metaLength > body.length) {
+            throw new RenException("批量上报数据格式错误");
+        }
+        List<AgentChatHistoryReportDTO> requests = JsonUtils.parseArray(
+                new String(body, 4, metaLength, StandardCharsets.UTF_8), AgentChatHistoryReportDTO.class);
+
+        int offset = 4 + metaLength;
+        for (AgentChatHistoryReportDTO request : requests) {
+            int audioLength = request.getAudioLength() == null ? 0 : request.getAudioLength();
+            if (audioLength <= 0) {
+                continue;
+            }
+            if ((long) offset + audioLength > body.length) {
+                throw new RenException("批量上报音频数据不完整");
+            }
+            request.setAudioOpus(Arrays.copyOfRange(body, offset, offset + audioLength));
+            offset += audioLength;
+        }
+        return requests;
+    }
 }
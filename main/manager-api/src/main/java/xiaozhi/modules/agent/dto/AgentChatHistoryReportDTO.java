@@ -1,5 +1,7 @@
 package xiaozhi.modules.agent.dto;
 
+import com.fasterxml.jackson.annotation.JsonIgnore;
+
 import io.swagger.v3.oas.annotations.media.Schema;
 import jakarta.validation.constraints.NotBlank;
 import jakarta.validation.constraints.NotNull;
@@ -28,6 +30,13 @@ public class AgentChatHistoryReportDTO {
     private String content;
     @Schema(description = "base64编码的opus音频数据", example = "")
     private String audioBase64;
+    @Schema(description = "批量上报时的音频格式：编码/采样率/声道数/帧长ms", example = "opus/16000/1/60")
+    private String audioFormat;
+    @Schema(description = "批量上报时音频在请求体音频区中的字节数", example = "0")
+    private Integer audioLength;
+    @Schema(hidden = true)
+    @JsonIgnore
+    private byte[] audioOpus;
     @Schema(description = "上报时间，十位时间戳，空时默认使用当前时间", example = "1745657732")
     private Long reportTime;
 }
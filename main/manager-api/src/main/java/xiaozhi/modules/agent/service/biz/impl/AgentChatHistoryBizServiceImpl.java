@@ -12,6 +12,7 @@ import lombok.extern.slf4j.Slf4j;
 import xiaozhi.common.constant.Constant;
 import xiaozhi.common.redis.RedisKeys;
 import xiaozhi.common.redis.RedisUtils;
+import xiaozhi.common.utils.AudioUtils;
 import xiaozhi.modules.agent.dto.AgentChatHistoryReportDTO;
 import xiaozhi.modules.agent.entity.AgentChatHistoryEntity;
 import xiaozhi.modules.agent.entity.AgentEntity;
@@ -84,14 +85,21 @@ public class AgentChatHistoryBizServiceImpl implements AgentChatHistoryBizServic
     }
 
     /**
-     * base64解码report.getOpusDataBase64(),存入ai_agent_chat_audio表
+     * 批量上报的Opus帧解码为WAV，逐条上报的base64解码，存入ai_agent_chat_audio表
      */
     private String saveChatAudio(AgentChatHistoryReportDTO report) {
         String audioId = null;
+        boolean hasOpus = report.getAudioOpus() != null && report.getAudioOpus().length > 0;
+        boolean hasBase64 = report.getAudioBase64() != null && !report.getAudioBase64().isEmpty();
 
-        if (report.getAudioBase64() != null && !report.getAudioBase64().isEmpty()) {
+        if (hasOpus || hasBase64) {
             try {
-                byte[] audioData = Base64.getDecoder().decode(report.getAudioBase64());
+                byte[] audioData = hasOpus
+                        ? AudioUtils.opusFramesToWav(report.getAudioOpus(), report.getAudioFormat())
+                        : Base64.getDecoder().decode(report.getAudioBase64());
+                if (audioData == null) {
+                    return null;
+                }
                 audioId = agentChatAudioService.saveAudio(audioData);
                 log.info("音频数据保存成功，audioId={}", audioId);
             } catch (Exception e) {
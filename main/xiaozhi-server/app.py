@@ -9,6 +9,15 @@ from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
+from core.utils.memory_summarizer import get_memory_summarizer
+from core.utils.cache.manager import cache_manager
+from core.handle.reportHandle import get_chat_reporter
+from core.utils.component_pool import get_component_pool
+from core.providers.tools.server_mcp import get_server_mcp_pool
+from core.providers.tools.server_plugins.plugin_runtime import get_plugin_runtime
+from plugins_func.http_client import get_plugin_http_client
+from plugins_func.hass_client import get_hass_manager
+from core.providers.tools.mcp_endpoint import get_mcp_endpoint_manager
 
 TAG = __name__
 logger = setup_logging()
@@ -45,6 +54,8 @@ async def monitor_stdin():
 async def main():
     check_ffmpeg_installed()
     config = load_config()
+    # 启用缓存持久化，重启后沿用IP、天气等查询结果
+    cache_manager.enable_persistence(config)
 
     # 默认使用manager-api的secret作为auth_key
     # 如果secret为空，则生成随机密钥
@@ -65,6 +76,9 @@ async def main():
     ota_task = asyncio.create_task(ota_server.start())
 
     read_config_from_api = config.get("read_config_from_api", False)
+    if read_config_from_api:
+        # 启动聊天记录上报器，同时补报上次退出时积压的条目
+        get_chat_reporter(config)
     port = int(config["server"].get("http_port", 8003))
     if not read_config_from_api:
         logger.bind(tag=TAG).info(
@@ -77,6 +91,12 @@ async def main():
         get_local_ip(),
         port,
     )
+    if config.get("metrics", {}).get("enabled", True):
+        logger.bind(tag=TAG).info(
+            "运行指标接口是\thttp://{}:{}/metrics",
+            get_local_ip(),
+            port,
+        )
     mcp_endpoint = config.get("mcp_endpoint", None)
     if mcp_endpoint is not None and "你" not in mcp_endpoint:
         # 校验MCP接入点格式
@@ -128,6 +148,17 @@ async def main():
             timeout=3.0,
             return_when=asyncio.ALL_COMPLETED,
         )
+        # 持久化尚未执行的记忆总结任务
+        get_memory_summarizer(config).shutdown()
+        cache_manager.close_persistence()
+        get_component_pool().shutdown()
+        await get_server_mcp_pool().shutdown()
+        get_plugin_runtime().shutdown()
+        await get_hass_manager().shutdown()
+        await get_mcp_endpoint_manager().shutdown()
+        await get_plugin_http_client().close()
+        if read_config_from_api:
+            get_chat_reporter(config).shutdown()
         print("服务器已关闭，程序退出。")
 
 
@@ -1,7 +1,13 @@
 import os
+import copy
 import yaml
 from collections.abc import Mapping
-from config.manage_api_client import init_service, get_server_config, get_agent_models
+from config.manage_api_client import (
+    init_service,
+    get_server_config,
+    get_agent_models,
+    get_agent_models_async,
+)
 
 
 def get_project_dir():
@@ -59,6 +65,26 @@ def get_config_from_api(config):
         "url": config["manager-api"].get("url", ""),
         "secret": config["manager-api"].get("secret", ""),
     }
+    # 设备配置缓存时间以本地为准
+    for key in ("config_cache_ttl", "config_cache_stale_ttl"):
+        if key in config["manager-api"]:
+            config_data["manager-api"][key] = config["manager-api"][key]
+    # 聊天记录上报的配置以本地为准
+    if config.get("chat_history_report"):
+        config_data["chat_history_report"] = config["chat_history_report"]
+    # 组件池、MCP会话池、插件运行时等进程级组件的配置以本地为准
+    for key in (
+        "component_pool",
+        "server_mcp_pool",
+        "plugin_runtime",
+        "plugin_http",
+        "hass_mirror",
+        "mcp_endpoint_pool",
+        "vision_service",
+        "metrics",
+    ):
+        if config.get(key):
+            config_data[key] = config[key]
     # server的配置以本地为准
     if config.get("server"):
         config_data["server"] = {
@@ -76,6 +102,17 @@ def get_private_config_from_api(config, device_id, client_id):
     return get_agent_models(device_id, client_id, config["selected_module"])
 
 
+async def get_private_config_from_api_async(config, device_id, client_id):
+    """异步获取私有配置，优先使用本地缓存，不阻塞事件循环"""
+    from config.private_config_cache import get_private_config_cache
+
+    selected_module = copy.deepcopy(config["selected_module"])
+    return await get_private_config_cache(config).get(
+        device_id,
+        lambda: get_agent_models_async(device_id, client_id, selected_module),
+    )
+
+
 def ensure_directories(config):
     """确保所有配置路径存在"""
     dirs_to_create = set()
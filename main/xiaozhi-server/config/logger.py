@@ -1,5 +1,7 @@
 import os
 import sys
+import time
+import threading
 from loguru import logger
 from config.config_loader import load_config
 from config.settings import check_config_file
@@ -7,6 +9,9 @@ from datetime import datetime
 
 SERVER_VERSION = "0.8.3"
 _logger_initialized = False
+_logger_lock = threading.Lock()
+# 达到该级别(WARNING)的日志不参与限流和抽样
+_THROTTLE_MAX_LEVEL = 30
 
 
 def get_module_abbreviation(module_name, module_dict):
@@ -35,8 +40,58 @@ def build_module_string(selected_module):
     )
 
 
+class LogThrottle:
+    """按标签对INFO及以下级别的日志抽样和限流
+
+    作为loguru的patcher使用，每条日志只判断一次，结果记录在extra中供所有输出共用，
+    被丢弃的日志不再写入控制台和文件
+    """
+
+    def __init__(self, rate_per_tag: int = 0, sample_tags: dict = None):
+        # 每个标签每秒最多输出的条数，0表示不限制
+        self.rate_per_tag = int(rate_per_tag or 0)
+        # 标签 -> 每N条输出1条
+        self.sample_tags = {
+            str(tag): max(1, int(every)) for tag, every in (sample_tags or {}).items()
+        }
+        self._lock = threading.Lock()
+        self._sample_counts = {}
+        # 标签 -> [当前秒, 已输出条数, 已丢弃条数]
+        self._windows = {}
+
+    def __call__(self, record):
+        if record["level"].no >= _THROTTLE_MAX_LEVEL:
+            return
+        tag = record["extra"].get("tag", record["name"])
+        with self._lock:
+            every = self.sample_tags.get(tag)
+            if every:
+                count = self._sample_counts.get(tag, 0)
+                self._sample_counts[tag] = count + 1
+                if count % every:
+                    record["extra"]["_dropped"] = True
+                    return
+            if not self.rate_per_tag:
+                return
+            second = int(time.monotonic())
+            window = self._windows.get(tag)
+            dropped = 0
+            if window is None or window[0] != second:
+                dropped = window[2] if window else 0
+                window = self._windows[tag] = [second, 0, 0]
+            if window[1] >= self.rate_per_tag:
+                window[2] += 1
+                record["extra"]["_dropped"] = True
+                return
+            window[1] += 1
+        if dropped:
+            record["message"] += f" (限流省略了此前的{dropped}条)"
+
+
 def formatter(record):
     """为没有 tag 的日志添加默认值，并处理动态模块字符串"""
+    if record["extra"].get("_dropped"):
+        return False
     record["extra"].setdefault("tag", record["name"])
     # 如果没有设置 selected_module，使用默认值
     record["extra"].setdefault("selected_module", "00000000000000")
@@ -46,19 +101,30 @@ def formatter(record):
 
 
 def setup_logging():
-    check_config_file()
-    """从配置文件中读取日志配置，并设置日志输出格式和级别"""
-    config = load_config()
-    log_config = config["log"]
+    """从配置文件中读取日志配置，并设置日志输出格式和级别
+
+    只在第一次调用时读取配置并添加输出，之后直接返回已配置的logger
+    """
     global _logger_initialized
+    if _logger_initialized:
+        return logger
+
+    with _logger_lock:
+        if _logger_initialized:
+            return logger
+        check_config_file()
+        config = load_config()
+        log_config = config["log"]
 
-    # 第一次初始化时配置日志
-    if not _logger_initialized:
-        # 使用默认的模块字符串进行初始化
+        # 使用默认的模块字符串进行初始化，并按标签限流和抽样
         logger.configure(
             extra={
                 "selected_module": log_config.get("selected_module", "00000000000000"),
-            }
+            },
+            patcher=LogThrottle(
+                log_config.get("rate_limit_per_tag", 0),
+                log_config.get("sample_tags") or {},
+            ),
         )
 
         log_format = log_config.get(
@@ -83,8 +149,14 @@ def setup_logging():
         # 配置日志输出
         logger.remove()
 
-        # 输出到控制台
-        logger.add(sys.stdout, format=log_format, level=log_level, filter=formatter)
+        # 输出到控制台，开启console_enqueue时由后台线程写入，终端或管道阻塞时不影响事件循环
+        logger.add(
+            sys.stdout,
+            format=log_format,
+            level=log_level,
+            filter=formatter,
+            enqueue=log_config.get("console_enqueue", True),
+        )
 
         # 输出到文件 - 统一目录，按大小轮转
         # 日志文件完整路径
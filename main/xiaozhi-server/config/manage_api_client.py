@@ -1,7 +1,8 @@
 import os
 import time
 import base64
-from typing import Optional, Dict
+import asyncio
+from typing import Optional, Dict, List
 
 import httpx
 
@@ -18,9 +19,14 @@ class DeviceBindException(Exception):
         super().__init__(f"设备绑定异常，绑定码: {bind_code}")
 
 
+class BatchReportUnsupported(Exception):
+    """智控台未提供批量上报接口"""
+
+
 class ManageApiClient:
     _instance = None
     _client = None
+    _async_client = None
     _secret = None
 
     def __new__(cls, config):
@@ -59,11 +65,33 @@ class ManageApiClient:
             timeout=cls.config.get("timeout", 30),  # 默认超时时间30秒
         )
 
+    @classmethod
+    def _get_async_client(cls) -> httpx.AsyncClient:
+        """异步连接池，在事件循环中首次使用时创建"""
+        if cls._async_client is None:
+            cls._async_client = httpx.AsyncClient(
+                base_url=cls.config.get("url"),
+                headers=cls._client.headers,
+                timeout=cls.config.get("timeout", 30),
+            )
+        return cls._async_client
+
     @classmethod
     def _request(cls, method: str, endpoint: str, **kwargs) -> Dict:
         """发送单次HTTP请求并处理响应"""
         endpoint = endpoint.lstrip("/")
         response = cls._client.request(method, endpoint, **kwargs)
+        return cls._parse_response(response)
+
+    @classmethod
+    async def _async_request(cls, method: str, endpoint: str, **kwargs) -> Dict:
+        """发送单次异步HTTP请求并处理响应"""
+        endpoint = endpoint.lstrip("/")
+        response = await cls._get_async_client().request(method, endpoint, **kwargs)
+        return cls._parse_response(response)
+
+    @classmethod
+    def _parse_response(cls, response: httpx.Response) -> Dict:
         response.raise_for_status()
 
         result = response.json()
@@ -117,6 +145,25 @@ class ManageApiClient:
                     # 不重试，直接抛出异常
                     raise
 
+    @classmethod
+    async def _async_execute_request(cls, method: str, endpoint: str, **kwargs) -> Dict:
+        """带重试机制的异步请求执行器，重试等待不会阻塞事件循环"""
+        retry_count = 0
+
+        while retry_count <= cls.max_retries:
+            try:
+                return await cls._async_request(method, endpoint, **kwargs)
+            except Exception as e:
+                if retry_count < cls.max_retries and cls._should_retry(e):
+                    retry_count += 1
+                    print(
+                        f"{method} {endpoint} 请求失败，将在 {cls.retry_delay:.1f} 秒后进行第 {retry_count} 次重试"
+                    )
+                    await asyncio.sleep(cls.retry_delay)
+                    continue
+                else:
+                    raise
+
     @classmethod
     def safe_close(cls):
         """安全关闭连接池"""
@@ -145,9 +192,29 @@ def get_agent_models(
     )
 
 
+async def get_agent_models_async(
+    mac_address: str, client_id: str, selected_module: Dict
+) -> Optional[Dict]:
+    """异步获取代理模型配置"""
+    return await ManageApiClient._instance._async_execute_request(
+        "POST",
+        "/config/agent-models",
+        json={
+            "macAddress": mac_address,
+            "clientId": client_id,
+            "selectedModule": selected_module,
+        },
+    )
+
+
 def save_mem_local_short(mac_address: str, short_momery: str) -> Optional[Dict]:
+    from config.private_config_cache import (
+        update_private_config,
+        invalidate_private_config,
+    )
+
     try:
-        return ManageApiClient._instance._execute_request(
+        result = ManageApiClient._instance._execute_request(
             "PUT",
             f"/agent/saveMemory/" + mac_address,
             json={
@@ -156,7 +223,30 @@ def save_mem_local_short(mac_address: str, short_momery: str) -> Optional[Dict]:
         )
     except Exception as e:
         print(f"存储短期记忆到服务器失败: {e}")
+        # 无法确定服务器上的记忆是否已更新，下次连接重新获取
+        invalidate_private_config(mac_address)
         return None
+    # 设备配置缓存中带有summaryMemory，同步更新，避免重连后用旧记忆覆盖新记忆
+    update_private_config(mac_address, "summaryMemory", short_momery)
+    return result
+
+
+def report_item(
+    mac_address: str, session_id: str, chat_type: int, content: str, audio, report_time
+) -> Optional[Dict]:
+    """上报单条聊天记录，失败时抛出异常，由调用方决定是否重试"""
+    return ManageApiClient._instance._execute_request(
+        "POST",
+        f"/agent/chat-history/report",
+        json={
+            "macAddress": mac_address,
+            "sessionId": session_id,
+            "chatType": chat_type,
+            "content": content,
+            "reportTime": report_time,
+            "audioBase64": (base64.b64encode(audio).decode("utf-8") if audio else None),
+        },
+    )
 
 
 def report(
@@ -166,25 +256,38 @@ def report(
     if not content or not ManageApiClient._instance:
         return None
     try:
-        return ManageApiClient._instance._execute_request(
-            "POST",
-            f"/agent/chat-history/report",
-            json={
-                "macAddress": mac_address,
-                "sessionId": session_id,
-                "chatType": chat_type,
-                "content": content,
-                "reportTime": report_time,
-                "audioBase64": (
-                    base64.b64encode(audio).decode("utf-8") if audio else None
-                ),
-            },
+        return report_item(
+            mac_address, session_id, chat_type, content, audio, report_time
         )
     except Exception as e:
         print(f"TTS上报失败: {e}")
         return None
 
 
+def report_batch(gzip_body: bytes) -> List[int]:
+    """批量上报聊天记录，请求体为gzip压缩的二进制(格式见reportHandle.encode_batch)，由调用方负责重试
+
+    Returns:
+        保存失败、需要重新上报的条目下标
+    """
+    if not ManageApiClient._instance:
+        return []
+    response = ManageApiClient._client.post(
+        "agent/chat-history/report/batch",
+        content=gzip_body,
+        headers={
+            "Content-Type": "application/octet-stream",
+            "Content-Encoding": "gzip",
+        },
+    )
+    if response.status_code in (404, 405):
+        raise BatchReportUnsupported()
+    # 旧版智控台没有放行批量接口时，鉴权过滤器以HTTP 200返回业务码401/404
+    if response.status_code == 200 and response.json().get("code") in (401, 404):
+        raise BatchReportUnsupported()
+    return ManageApiClient._parse_response(response) or []
+
+
 def init_service(config):
     ManageApiClient(config)
 
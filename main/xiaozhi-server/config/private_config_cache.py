@@ -0,0 +1,134 @@
+"""
+设备差异化配置（agent-models）的本地缓存：
+- 未过期时直接返回，设备重连无需请求智控台
+- 过期但仍在可用期内时先返回旧配置，同时在后台刷新
+- 同一设备的并发请求只发起一次接口调用
+- 本服务写回智控台的字段（如短期记忆）同步更新缓存，避免重连时读到旧值
+- 智控台下发 update_config 时清空全部缓存，其余修改在 ttl 内生效
+"""
+
+import time
+import copy
+import asyncio
+from typing import Dict, Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class PrivateConfigCache:
+    def __init__(self, ttl: float = 60, stale_ttl: float = 3600, max_size: int = 10000):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        # device_id -> (获取时间, 配置)
+        self._entries: Dict[str, tuple] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 每次写回或失效时递增，刷新期间发生过变更的结果不写入缓存
+        self._version = 0
+
+    async def get(self, device_id: str, fetch) -> Dict:
+        """获取设备配置，fetch为无参协程函数，负责请求智控台"""
+        entry = self._entries.get(device_id)
+        now = time.monotonic()
+        if entry is not None:
+            age = now - entry[0]
+            if age < self.ttl:
+                return copy.deepcopy(entry[1])
+            if age < self.stale_ttl:
+                # 先返回旧配置，后台刷新
+                if device_id not in self._inflight:
+                    asyncio.create_task(self._refresh_quietly(device_id, fetch))
+                return copy.deepcopy(entry[1])
+        return copy.deepcopy(await self._refresh(device_id, fetch))
+
+    async def _refresh(self, device_id: str, fetch) -> Dict:
+        future = self._inflight.get(device_id)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[device_id] = future
+        version = self._version
+        try:
+            config = await fetch()
+            if version == self._version:
+                self._store(device_id, config)
+            future.set_result(config)
+            return config
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 避免没有等待者时出现未获取异常的警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(device_id, None)
+
+    async def _refresh_quietly(self, device_id: str, fetch):
+        try:
+            await self._refresh(device_id, fetch)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"后台刷新设备 {device_id} 配置失败: {e}")
+
+    def _store(self, device_id: str, config: Optional[Dict]):
+        if config is None:
+            return
+        self._entries.pop(device_id, None)
+        self._entries[device_id] = (time.monotonic(), config)
+        while len(self._entries) > self.max_size:
+            # 字典按插入顺序排列，淘汰最早写入的设备
+            self._entries.pop(next(iter(self._entries)))
+
+    def update(self, device_id: str, key: str, value) -> bool:
+        """写回智控台成功后同步更新缓存中的字段，设备不在缓存中时返回False
+
+        会在记忆总结线程中调用，这里整体替换条目而不修改原字典
+        """
+        self._version += 1
+        entry = self._entries.get(device_id)
+        if entry is None:
+            return False
+        self._entries[device_id] = (entry[0], {**entry[1], key: value})
+        return True
+
+    def invalidate(self, device_id: Optional[str] = None) -> int:
+        """失效指定设备的缓存，device_id为空时清空全部，返回失效的条数"""
+        self._version += 1
+        if device_id is None:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+        return 1 if self._entries.pop(device_id, None) is not None else 0
+
+
+_cache: Optional[PrivateConfigCache] = None
+
+
+def get_private_config_cache(config: Optional[Dict] = None) -> PrivateConfigCache:
+    """获取进程内共享的设备配置缓存，首次调用时按 manager-api 配置创建"""
+    global _cache
+    if _cache is None:
+        api_config = (config or {}).get("manager-api", {}) or {}
+        _cache = PrivateConfigCache(
+            ttl=float(api_config.get("config_cache_ttl", 60)),
+            stale_ttl=float(api_config.get("config_cache_stale_ttl", 3600)),
+        )
+    return _cache
+
+
+def update_private_config(device_id: str, key: str, value):
+    """写回智控台成功后调用，未启用缓存时什么都不做"""
+    if _cache is not None:
+        _cache.update(device_id, key, value)
+
+
+def invalidate_private_config(device_id: Optional[str] = None) -> int:
+    """智控台下发配置更新，或写回智控台失败时调用"""
+    if _cache is None:
+        return 0
+    count = _cache.invalidate(device_id)
+    logger.bind(tag=TAG).info(f"设备配置缓存已失效: {device_id or '全部'}，共{count}条")
+    return count
@@ -0,0 +1,32 @@
+import json
+import hmac
+from aiohttp import web
+from core.api.base_handler import BaseHandler
+from config.private_config_cache import invalidate_private_config
+
+TAG = __name__
+
+
+class ConfigHandler(BaseHandler):
+    """让本地缓存的设备配置失效，供运维脚本在直接修改设备配置后调用"""
+
+    def _verify_secret(self, request) -> bool:
+        secret = self.config.get("manager-api", {}).get("secret", "")
+        auth_header = request.headers.get("Authorization", "")
+        if not secret or not auth_header.startswith("Bearer "):
+            return False
+        return hmac.compare_digest(auth_header[7:], secret)
+
+    async def handle_invalidate(self, request):
+        """POST {"deviceId": "..."}，不传deviceId时清空全部设备的配置缓存"""
+        if not self._verify_secret(request):
+            return web.json_response(
+                {"success": False, "message": "无效的认证信息"}, status=401
+            )
+        try:
+            body = await request.json() if request.can_read_body else {}
+        except json.JSONDecodeError:
+            body = {}
+        device_id = (body or {}).get("deviceId")
+        count = invalidate_private_config(device_id)
+        return web.json_response({"success": True, "invalidated": count})
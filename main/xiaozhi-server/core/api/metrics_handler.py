@@ -0,0 +1,27 @@
+import hmac
+from aiohttp import web
+from core.api.base_handler import BaseHandler
+from core.utils.telemetry import get_telemetry
+
+TAG = __name__
+
+
+class MetricsHandler(BaseHandler):
+    """以Prometheus文本格式导出运行指标"""
+
+    def _verify_token(self, request) -> bool:
+        token = self.config.get("metrics", {}).get("token", "")
+        if not token:
+            return True
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return False
+        return hmac.compare_digest(auth_header[7:], token)
+
+    async def handle_get(self, request):
+        if not self._verify_token(request):
+            return web.Response(text="Unauthorized", status=401)
+        return web.Response(
+            body=get_telemetry(self.config).render().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
@@ -1,19 +1,50 @@
+import io
 import json
-import copy
+import asyncio
+import hashlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from aiohttp import web
 from config.logger import setup_logging
 from core.utils.util import get_vision_url, is_valid_image_file
 from core.utils.vllm import create_instance
-from config.config_loader import get_private_config_from_api
+from core.utils.cache.manager import cache_manager, CacheType
+from config.config_loader import get_private_config_from_api_async
 from core.utils.auth import AuthToken
 import base64
 from typing import Tuple, Optional
 from plugins_func.register import Action
 
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
 TAG = __name__
 
 # 设置最大文件大小为5MB
 MAX_FILE_SIZE = 5 * 1024 * 1024
+# 最多保留的VLLM实例数（按模型配置区分）
+MAX_PROVIDERS = 32
+
+
+class VisionBusyError(Exception):
+    """同时处理的视觉分析请求已满"""
+
+
+def shrink_image(image_data: bytes, max_side: int, quality: int) -> bytes:
+    """长边超过max_side的图片缩小后重新编码为JPEG，失败或没有变小时返回原图"""
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            if max(image.size) <= max_side:
+                return image_data
+            image.thumbnail((max_side, max_side))
+            output = io.BytesIO()
+            image.convert("RGB").save(output, format="JPEG", quality=quality)
+    except Exception:
+        return image_data
+    shrunk = output.getvalue()
+    return shrunk if len(shrunk) < len(image_data) else image_data
 
 
 class VisionHandler:
@@ -22,6 +53,21 @@ class VisionHandler:
         self.logger = setup_logging()
         # 初始化认证工具
         self.auth = AuthToken(config["server"]["auth_key"])
+        vision_config = config.get("vision_service", {}) or {}
+        # 同时调用视觉模型的请求数，以及允许排队等待的请求数，超出时返回429
+        self.max_concurrency = int(vision_config.get("max_concurrency", 8))
+        self.max_waiting = int(vision_config.get("max_waiting", 16))
+        # 相同图片和问题的分析结果缓存时间(秒)，0表示不缓存
+        self.cache_ttl = float(vision_config.get("cache_ttl", 600))
+        # 图片长边超过该像素时先缩小再发送给模型，0表示不处理
+        self.max_image_side = int(vision_config.get("max_image_side", 1280))
+        self.jpeg_quality = int(vision_config.get("jpeg_quality", 85))
+        if self.max_image_side and Image is None:
+            self.logger.bind(tag=TAG).warning("未安装Pillow，视觉分析将发送原图")
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._waiting = 0
+        # 模型配置指纹 -> VLLM实例，实例无状态，所有请求共用
+        self._providers: "OrderedDict[str, object]" = OrderedDict()
 
     def _create_error_response(self, message: str) -> dict:
         """创建统一的错误响应格式"""
@@ -89,37 +135,8 @@ class VisionHandler:
                     "不支持的文件格式，请上传有效的图片文件（支持JPEG、PNG、GIF、BMP、TIFF、WEBP格式）"
                 )
 
-            # 将图片转换为base64编码
-            image_base64 = base64.b64encode(image_data).decode("utf-8")
-
-            # 如果开启了智控台，则从智控台获取模型配置
-            current_config = copy.deepcopy(self.config)
-            read_config_from_api = current_config.get("read_config_from_api", False)
-            if read_config_from_api:
-                current_config = get_private_config_from_api(
-                    current_config,
-                    device_id,
-                    client_id,
-                )
-
-            select_vllm_module = current_config["selected_module"].get("VLLM")
-            if not select_vllm_module:
-                raise ValueError("您还未设置默认的视觉分析模块")
-
-            vllm_type = (
-                select_vllm_module
-                if "type" not in current_config["VLLM"][select_vllm_module]
-                else current_config["VLLM"][select_vllm_module]["type"]
-            )
-
-            if not vllm_type:
-                raise ValueError(f"无法找到VLLM模块对应的供应器{vllm_type}")
-
-            vllm = create_instance(
-                vllm_type, current_config["VLLM"][select_vllm_module]
-            )
-
-            result = vllm.response(question, image_base64)
+            vllm_type, vllm_config = await self._get_vllm_config(device_id, client_id)
+            result = await self._analyze(vllm_type, vllm_config, question, image_data)
 
             return_json = {
                 "success": True,
@@ -131,6 +148,15 @@ class VisionHandler:
                 text=json.dumps(return_json, separators=(",", ":")),
                 content_type="application/json",
             )
+        except VisionBusyError:
+            self.logger.bind(tag=TAG).warning("视觉分析请求过多，返回429")
+            return_json = self._create_error_response("视觉分析繁忙，请稍后再试")
+            response = web.Response(
+                text=json.dumps(return_json, separators=(",", ":")),
+                content_type="application/json",
+                status=429,
+                headers={"Retry-After": "1"},
+            )
         except ValueError as e:
             self.logger.bind(tag=TAG).error(f"MCP Vision POST请求异常: {e}")
             return_json = self._create_error_response(str(e))
@@ -150,6 +176,82 @@ class VisionHandler:
                 self._add_cors_headers(response)
             return response
 
+    async def _get_vllm_config(self, device_id: str, client_id: str):
+        """获取设备选用的VLLM类型和配置，开启智控台时使用按设备缓存的配置"""
+        current_config = self.config
+        if current_config.get("read_config_from_api", False):
+            current_config = await get_private_config_from_api_async(
+                current_config,
+                device_id,
+                client_id,
+            )
+
+        select_vllm_module = current_config["selected_module"].get("VLLM")
+        if not select_vllm_module:
+            raise ValueError("您还未设置默认的视觉分析模块")
+
+        vllm_config = current_config["VLLM"][select_vllm_module]
+        vllm_type = vllm_config.get("type", select_vllm_module)
+        if not vllm_type:
+            raise ValueError(f"无法找到VLLM模块对应的供应器{vllm_type}")
+        return vllm_type, vllm_config
+
+    def _get_provider(self, vllm_type: str, vllm_config: dict, key: str):
+        """相同模型配置的请求共用一个VLLM实例"""
+        provider = self._providers.get(key)
+        if provider is None:
+            provider = create_instance(vllm_type, vllm_config)
+            self._providers[key] = provider
+            if len(self._providers) > MAX_PROVIDERS:
+                self._providers.popitem(last=False)
+        else:
+            self._providers.move_to_end(key)
+        return provider
+
+    async def _analyze(
+        self, vllm_type: str, vllm_config: dict, question: str, image_data: bytes
+    ) -> str:
+        """按(图片、问题、模型)缓存结果，相同的并发请求只调用一次模型"""
+        raw = json.dumps(
+            {"type": vllm_type, "config": vllm_config}, sort_keys=True, default=str
+        )
+        model_key = hashlib.md5(raw.encode("utf-8")).hexdigest()
+        image_key = hashlib.sha256(image_data).hexdigest()
+        question_key = hashlib.md5(question.encode("utf-8")).hexdigest()
+        cache_key = f"{model_key}:{image_key}:{question_key}"
+
+        async def compute():
+            async with self._acquire_slot():
+                provider = self._get_provider(vllm_type, vllm_config, model_key)
+                data = image_data
+                if self.max_image_side and Image is not None:
+                    data = await asyncio.to_thread(
+                        shrink_image, data, self.max_image_side, self.jpeg_quality
+                    )
+                image_base64 = base64.b64encode(data).decode("utf-8")
+                return await provider.response_async(question, image_base64)
+
+        if self.cache_ttl <= 0:
+            return await compute()
+        return await cache_manager.async_get_or_compute(
+            CacheType.VISION, cache_key, compute, ttl=self.cache_ttl
+        )
+
+    @asynccontextmanager
+    async def _acquire_slot(self):
+        """并发已满且排队数超过上限时直接拒绝，避免请求堆积"""
+        if self._semaphore.locked() and self._waiting >= self.max_waiting:
+            raise VisionBusyError()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
     async def handle_get(self, request):
         """处理 MCP Vision GET 请求"""
         try:
@@ -18,28 +18,29 @@ from core.utils.util import (
 )
 from typing import Dict, Any
 from collections import deque
-from core.utils.modules_initialize import (
-    initialize_modules,
-    initialize_tts,
-    initialize_asr,
-)
-from core.handle.reportHandle import report
+from core.utils.modules_initialize import initialize_modules
 from core.providers.tts.default import DefaultTTS
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from core.utils.dialogue import Message, Dialogue
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
 from core.providers.tools.unified_tool_handler import UnifiedToolHandler
+from core.providers.tools.device_iot import IotStateTracker
 from plugins_func.loadplugins import auto_import_modules
 from plugins_func.register import Action, ActionResponse
 from core.auth import AuthMiddleware, AuthenticationError
-from config.config_loader import get_private_config_from_api
+from config.config_loader import get_private_config_from_api_async
 from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
 from config.logger import setup_logging, build_module_string, create_connection_logger
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
 from core.utils.prompt_manager import PromptManager
 from core.utils.voiceprint_provider import VoiceprintProvider
 from core.utils import textUtils
+from core.utils.telemetry import get_telemetry
+from core.utils.cancellation import CancellationToken
+from core.utils.memory_summarizer import get_memory_summarizer
+from core.utils.component_pool import get_component_pool
 
 TAG = __name__
 
@@ -84,6 +85,8 @@ class ConnectionHandler:
 
         # 客户端状态相关
         self.client_abort = False
+        # 当前轮对话的取消令牌，打断时立即取消上游LLM/TTS流和工具调用
+        self.turn_cancel_token = None
         self.client_is_speaking = False
         self.client_listen_mode = "auto"
 
@@ -92,9 +95,7 @@ class ConnectionHandler:
         self.stop_event = threading.Event()
         self.executor = ThreadPoolExecutor(max_workers=5)
 
-        # 添加上报线程池
-        self.report_queue = queue.Queue()
-        self.report_thread = None
+        # 聊天记录上报开关，上报由进程级上报器统一处理
         # 未来可以通过修改此处，调节asr的上报和tts的上报，目前默认都开启
         self.report_asr_enable = self.read_config_from_api
         self.report_tts_enable = self.read_config_from_api
@@ -132,11 +133,14 @@ class ConnectionHandler:
 
         # tts相关变量
         self.sentence_id = None
+        # 本轮首段文本送入TTS的时间，下发首帧音频时用于统计TTS首帧耗时
+        self.tts_first_text_time = None
         # 处理TTS响应没有文本返回
         self.tts_MessageText = ""
 
         # iot相关变量
         self.iot_descriptors = {}
+        self.iot_state = IotStateTracker(float(self.config.get("iot_state_timeout", 0.25)))
         self.func_handler = None
 
         self.cmd_exit = self.config["exit_commands"]
@@ -217,7 +221,7 @@ class ConnectionHandler:
             self.welcome_msg["session_id"] = self.session_id
 
             # 获取差异化配置
-            self._initialize_private_config()
+            await self._initialize_private_config()
             # 异步初始化
             self.executor.submit(self._initialize_components)
 
@@ -251,25 +255,10 @@ class ConnectionHandler:
         """保存记忆并关闭连接"""
         try:
             if self.memory:
-                # 使用线程池异步保存记忆
-                def save_memory_task():
-                    try:
-                        # 创建新事件循环（避免与主循环冲突）
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(
-                            self.memory.save_memory(self.dialogue.dialogue)
-                        )
-                    except Exception as e:
-                        self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
-                    finally:
-                        try:
-                            loop.close()
-                        except Exception:
-                            pass
-
-                # 启动线程保存记忆，不等待完成
-                threading.Thread(target=save_memory_task, daemon=True).start()
+                # 交给进程内共享的记忆总结队列，不等待完成
+                get_memory_summarizer(self.config).submit(
+                    self.device_id, self.memory, self.dialogue.dialogue
+                )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
         finally:
@@ -451,8 +440,6 @@ class ConnectionHandler:
             self._initialize_memory()
             """加载意图识别"""
             self._initialize_intent()
-            """初始化上报线程"""
-            self._init_report_threads()
             """更新系统提示词"""
             self._init_prompt_enhancement()
 
@@ -460,8 +447,29 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).error(f"实例化组件失败: {e}")
 
     def _init_prompt_enhancement(self):
-        # 更新上下文信息
-        self.prompt_manager.update_context_info(self, self.client_ip)
+        # 在事件循环中异步更新位置、天气等上下文信息，短暂等待后先用已缓存的信息构建提示词
+        future = asyncio.run_coroutine_threadsafe(
+            self.prompt_manager.update_context_info(self, self.client_ip), self.loop
+        )
+        try:
+            future.result(timeout=float(self.config.get("prompt_context_timeout", 1.5)))
+        except FuturesTimeoutError:
+            # 上下文信息获取完成后再更新一次提示词
+            future.add_done_callback(lambda _: self._schedule_prompt_update())
+        except Exception as e:
+            self.logger.bind(tag=TAG).warning(f"更新上下文信息失败: {e}")
+        self._apply_enhanced_prompt()
+
+    def _schedule_prompt_update(self):
+        if self.executor is None or self.stop_event.is_set():
+            return
+        try:
+            self.executor.submit(self._apply_enhanced_prompt)
+        except RuntimeError:
+            # 连接已关闭，线程池不再接受任务
+            pass
+
+    def _apply_enhanced_prompt(self):
         enhanced_prompt = self.prompt_manager.build_enhanced_prompt(
             self.config["prompt"], self.device_id, self.client_ip
         )
@@ -469,24 +477,11 @@ class ConnectionHandler:
             self.change_system_prompt(enhanced_prompt)
             self.logger.bind(tag=TAG).info("系统提示词已增强更新")
 
-    def _init_report_threads(self):
-        """初始化ASR和TTS上报线程"""
-        if not self.read_config_from_api or self.need_bind:
-            return
-        if self.chat_history_conf == 0:
-            return
-        if self.report_thread is None or not self.report_thread.is_alive():
-            self.report_thread = threading.Thread(
-                target=self._report_worker, daemon=True
-            )
-            self.report_thread.start()
-            self.logger.bind(tag=TAG).info("TTS上报线程已启动")
-
     def _initialize_tts(self):
         """初始化TTS"""
         tts = None
         if not self.need_bind:
-            tts = initialize_tts(self.config)
+            tts = get_component_pool(self.config).lease_tts(self.config)
 
         if tts is None:
             tts = DefaultTTS(self.config, delete_audio_file=True)
@@ -500,9 +495,9 @@ class ConnectionHandler:
             # 因为本地一个实例ASR，可以被多个连接共享
             asr = self._asr
         else:
-            # 如果公共ASR是远程服务，则初始化一个新实例
+            # 如果公共ASR是远程服务，则从组件池租用一个实例
             # 因为远程ASR，涉及到websocket连接和接收线程，需要每个连接一个实例
-            asr = initialize_asr(self.config)
+            asr = get_component_pool(self.config).lease_asr(self.config)
 
         return asr
 
@@ -522,14 +517,14 @@ class ConnectionHandler:
         except Exception as e:
             self.logger.bind(tag=TAG).warning(f"声纹识别初始化失败: {str(e)}")
 
-    def _initialize_private_config(self):
+    async def _initialize_private_config(self):
         """如果是从配置文件获取，则进行二次实例化"""
         if not self.read_config_from_api:
             return
         """从接口获取差异化的配置进行二次实例化，非全量重新实例化"""
         try:
             begin_time = time.time()
-            private_config = get_private_config_from_api(
+            private_config = await get_private_config_from_api_async(
                 self.config,
                 self.headers.get("device-id"),
                 self.headers.get("client-id", self.headers.get("device-id")),
@@ -571,7 +566,7 @@ class ConnectionHandler:
                 "ASR"
             ]
         if private_config.get("TTS", None) is not None:
-            init_tts = True
+            # TTS不在这里创建，初始化组件时按差异化配置从组件池中租用
             self.config["TTS"] = private_config["TTS"]
             self.config["selected_module"]["TTS"] = private_config["selected_module"][
                 "TTS"
@@ -667,16 +662,20 @@ class ConnectionHandler:
         if memory_type == "nomem":
             return
         # 使用 mem_local_short 模式
-        elif memory_type == "mem_local_short":
-            memory_llm_name = memory_config[self.config["selected_module"]["Memory"]][
-                "llm"
-            ]
+        elif memory_type in ("mem_local_short", "mem_local_vector"):
+            memory_llm_name = memory_config[
+                self.config["selected_module"]["Memory"]
+            ].get("llm")
             if memory_llm_name and memory_llm_name in self.config["LLM"]:
                 # 如果配置了专用LLM，则创建独立的LLM实例
                 from core.utils import llm as llm_utils
 
                 memory_llm_config = self.config["LLM"][memory_llm_name]
                 memory_llm_type = memory_llm_config.get("type", memory_llm_name)
+                if memory_llm_type == "router":
+                    memory_llm_config = dict(
+                        memory_llm_config, llm_configs=self.config["LLM"]
+                    )
                 memory_llm = llm_utils.create_instance(
                     memory_llm_type, memory_llm_config
                 )
@@ -719,6 +718,10 @@ class ConnectionHandler:
 
                 intent_llm_config = self.config["LLM"][intent_llm_name]
                 intent_llm_type = intent_llm_config.get("type", intent_llm_name)
+                if intent_llm_type == "router":
+                    intent_llm_config = dict(
+                        intent_llm_config, llm_configs=self.config["LLM"]
+                    )
                 intent_llm = llm_utils.create_instance(
                     intent_llm_type, intent_llm_config
                 )
@@ -749,6 +752,9 @@ class ConnectionHandler:
 
         # 为最顶层时新建会话ID和发送FIRST请求
         if depth == 0:
+            self.tts_first_text_time = None
+            self.turn_cancel_token = CancellationToken()
+            self.turn_cancel_token.register(self.tts.on_turn_cancelled)
             self.sentence_id = str(uuid.uuid4().hex)
             self.dialogue.put(Message(role="user", content=query))
             self.tts.tts_text_queue.put(
@@ -774,6 +780,7 @@ class ConnectionHandler:
                 )
                 memory_str = future.result()
 
+            llm_start_time = time.monotonic()
             if self.intent_type == "function_call" and functions is not None:
                 # 使用支持functions的streaming接口
                 llm_responses = self.llm.response_with_functions(
@@ -782,6 +789,7 @@ class ConnectionHandler:
                         memory_str, self.config.get("voiceprint", {})
                     ),
                     functions=functions,
+                    cancel_token=self.turn_cancel_token,
                 )
             else:
                 llm_responses = self.llm.response(
@@ -789,6 +797,7 @@ class ConnectionHandler:
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
                     ),
+                    cancel_token=self.turn_cancel_token,
                 )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
@@ -796,14 +805,16 @@ class ConnectionHandler:
 
         # 处理流式响应
         tool_call_flag = False
-        function_name = None
-        function_id = None
-        function_arguments = ""
+        # 按index累积流式返回的工具调用，支持一轮中的多个并行工具调用
+        tool_calls_map = {}
         content_arguments = ""
         self.client_abort = False
         emotion_flag = True
         for response in llm_responses:
-            if self.client_abort:
+            if llm_start_time is not None:
+                get_telemetry().observe("llm_ttft", time.monotonic() - llm_start_time)
+                llm_start_time = None
+            if self.client_abort or self.turn_cancel_token.cancelled:
                 break
             if self.intent_type == "function_call" and functions is not None:
                 content, tools_call = response
@@ -819,12 +830,7 @@ class ConnectionHandler:
 
                 if tools_call is not None and len(tools_call) > 0:
                     tool_call_flag = True
-                    if tools_call[0].id is not None:
-                        function_id = tools_call[0].id
-                    if tools_call[0].function.name is not None:
-                        function_name = tools_call[0].function.name
-                    if tools_call[0].function.arguments is not None:
-                        function_arguments += tools_call[0].function.arguments
+                    self._merge_tool_call_deltas(tool_calls_map, tools_call)
             else:
                 content = response
 
@@ -839,6 +845,8 @@ class ConnectionHandler:
             if content is not None and len(content) > 0:
                 if not tool_call_flag:
                     response_message.append(content)
+                    if self.tts_first_text_time is None:
+                        self.tts_first_text_time = time.monotonic()
                     self.tts.tts_text_queue.put(
                         TTSMessageDTO(
                             sentence_id=self.sentence_id,
@@ -850,16 +858,26 @@ class ConnectionHandler:
         # 处理function call
         if tool_call_flag:
             bHasError = False
-            if function_id is None:
+            function_calls = [
+                tool_calls_map[index]
+                for index in sorted(tool_calls_map)
+                if tool_calls_map[index]["name"]
+            ]
+            if not function_calls:
                 a = extract_json_from_string(content_arguments)
                 if a is not None:
                     try:
                         content_arguments_json = json.loads(a)
-                        function_name = content_arguments_json["name"]
-                        function_arguments = json.dumps(
-                            content_arguments_json["arguments"], ensure_ascii=False
+                        function_calls.append(
+                            {
+                                "name": content_arguments_json["name"],
+                                "id": str(uuid.uuid4().hex),
+                                "arguments": json.dumps(
+                                    content_arguments_json["arguments"],
+                                    ensure_ascii=False,
+                                ),
+                            }
                         )
-                        function_id = str(uuid.uuid4().hex)
                     except Exception as e:
                         bHasError = True
                         response_message.append(a)
@@ -877,23 +895,35 @@ class ConnectionHandler:
                     self.tts_MessageText = text_buff
                     self.dialogue.put(Message(role="assistant", content=text_buff))
                 response_message.clear()
-                self.logger.bind(tag=TAG).debug(
-                    f"function_name={function_name}, function_id={function_id}, function_arguments={function_arguments}"
-                )
-                function_call_data = {
-                    "name": function_name,
-                    "id": function_id,
-                    "arguments": function_arguments,
-                }
-
-                # 使用统一工具处理器处理所有工具调用
-                result = asyncio.run_coroutine_threadsafe(
-                    self.func_handler.handle_llm_function_call(
-                        self, function_call_data
-                    ),
-                    self.loop,
-                ).result()
-                self._handle_function_result(result, function_call_data, depth=depth)
+                for call in function_calls:
+                    if call["id"] is None:
+                        call["id"] = str(uuid.uuid4().hex)
+                self.logger.bind(tag=TAG).debug(f"function_calls={function_calls}")
+
+                try:
+                    if len(function_calls) == 1:
+                        function_call_data = function_calls[0]
+                        # 使用统一工具处理器处理所有工具调用
+                        result = self._run_turn_coroutine(
+                            self.func_handler.handle_llm_function_call(
+                                self, function_call_data
+                            )
+                        )
+                        self._handle_function_result(
+                            result, function_call_data, depth=depth
+                        )
+                    else:
+                        # 多个工具调用并行执行，结果统一回传给大模型
+                        results = self._run_turn_coroutine(
+                            self.func_handler.handle_llm_function_calls(
+                                self, function_calls
+                            )
+                        )
+                        self._handle_function_results(
+                            results, function_calls, depth=depth
+                        )
+                except CancelledError:
+                    self.logger.bind(tag=TAG).info("对话已被打断，工具调用已取消")
 
         # 存储对话内容
         if len(response_message) > 0:
@@ -918,6 +948,37 @@ class ConnectionHandler:
 
         return True
 
+    def _run_turn_coroutine(self, coro):
+        """在事件循环上执行本轮对话的协程并等待结果，打断时随之取消"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        unregister = self.turn_cancel_token.register(future.cancel)
+        try:
+            return future.result()
+        finally:
+            unregister()
+
+    def cancel_turn(self):
+        """打断当前轮对话，立即取消进行中的上游流和工具调用"""
+        self.client_abort = True
+        if self.turn_cancel_token is not None:
+            self.turn_cancel_token.cancel()
+
+    def _merge_tool_call_deltas(self, tool_calls_map, tools_call):
+        """按index合并流式返回的工具调用片段"""
+        for position, tool_call in enumerate(tools_call):
+            index = getattr(tool_call, "index", None)
+            if index is None:
+                index = position
+            call = tool_calls_map.setdefault(
+                index, {"name": None, "id": None, "arguments": ""}
+            )
+            if tool_call.id is not None:
+                call["id"] = tool_call.id
+            if tool_call.function.name is not None:
+                call["name"] = tool_call.function.name
+            if tool_call.function.arguments is not None:
+                call["arguments"] += tool_call.function.arguments
+
     def _handle_function_result(self, result, function_call_data, depth):
         if result.action == Action.RESPONSE:  # 直接回复前端
             text = result.response
@@ -967,39 +1028,50 @@ class ConnectionHandler:
         else:
             pass
 
-    def _report_worker(self):
-        """聊天记录上报工作线程"""
-        while not self.stop_event.is_set():
-            try:
-                # 从队列获取数据，设置超时以便定期检查停止事件
-                item = self.report_queue.get(timeout=1)
-                if item is None:  # 检测毒丸对象
-                    break
-                try:
-                    # 检查线程池状态
-                    if self.executor is None:
-                        continue
-                    # 提交任务到线程池
-                    self.executor.submit(self._process_report, *item)
-                except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
-            except queue.Empty:
-                continue
-            except Exception as e:
-                self.logger.bind(tag=TAG).error(f"聊天记录上报工作线程异常: {e}")
-
-        self.logger.bind(tag=TAG).info("聊天记录上报线程已退出")
-
-    def _process_report(self, type, text, audio_data, report_time):
-        """处理上报任务"""
-        try:
-            # 执行上报（传入二进制数据）
-            report(self, type, text, audio_data, report_time)
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"上报处理异常: {e}")
-        finally:
-            # 标记任务完成
-            self.report_queue.task_done()
+    def _handle_function_results(self, results, function_calls, depth):
+        """处理并行工具调用的结果，需要大模型处理的结果合并为一次请求"""
+        llm_calls = []
+        for result, call in zip(results, function_calls):
+            if result.action == Action.REQLLM:
+                if result.result is not None and len(result.result) > 0:
+                    llm_calls.append((call, result.result))
+            elif result.action == Action.RESPONSE:
+                text = result.response
+                self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
+                self.dialogue.put(Message(role="assistant", content=text))
+            elif result.action == Action.NOTFOUND or result.action == Action.ERROR:
+                # 错误信息作为工具结果交给大模型，与其他工具结果统一组织回复
+                text = result.response if result.response else result.result
+                if text:
+                    llm_calls.append((call, str(text)))
+
+        if not llm_calls:
+            return
+
+        self.dialogue.put(
+            Message(
+                role="assistant",
+                tool_calls=[
+                    {
+                        "id": call["id"],
+                        "function": {
+                            "arguments": (
+                                "{}" if call["arguments"] == "" else call["arguments"]
+                            ),
+                            "name": call["name"],
+                        },
+                        "type": "function",
+                        "index": index,
+                    }
+                    for index, (call, _) in enumerate(llm_calls)
+                ],
+            )
+        )
+        for call, text in llm_calls:
+            self.dialogue.put(
+                Message(role="tool", tool_call_id=call["id"], content=text)
+            )
+        self.chat("\n".join(text for _, text in llm_calls), depth=depth + 1)
 
     def clearSpeakStatus(self):
         self.client_is_speaking = False
@@ -1012,6 +1084,10 @@ class ConnectionHandler:
             if hasattr(self, "audio_buffer"):
                 self.audio_buffer.clear()
 
+            # 取消进行中的对话
+            if self.turn_cancel_token is not None:
+                self.turn_cancel_token.cancel()
+
             # 取消超时任务
             if self.timeout_task and not self.timeout_task.done():
                 self.timeout_task.cancel()
@@ -1030,6 +1106,10 @@ class ConnectionHandler:
                         f"清理工具处理器时出错: {cleanup_error}"
                     )
 
+            # 结束设备端MCP挂起的请求
+            if getattr(self, "mcp_client", None):
+                self.mcp_client.close()
+
             # 触发停止事件
             if self.stop_event:
                 self.stop_event.set()
@@ -1076,6 +1156,13 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
+            # 归还组件池租用的实例，由组件池在后台重置后复用
+            component_pool = get_component_pool()
+            if self.tts:
+                component_pool.release(self.tts)
+            if self.asr is not None and self.asr is not self._asr:
+                component_pool.release(self.asr)
+
             # 最后关闭线程池（避免阻塞）
             if self.executor:
                 try:
@@ -1105,7 +1192,6 @@ class ConnectionHandler:
             for q in [
                 self.tts.tts_text_queue,
                 self.tts.tts_audio_queue,
-                self.report_queue,
             ]:
                 if not q:
                     continue
@@ -5,8 +5,8 @@ TAG = __name__
 
 async def handleAbortMessage(conn):
     conn.logger.bind(tag=TAG).info("Abort message received")
-    # 设置成打断状态，会自动打断llm、tts任务
-    conn.client_abort = True
+    # 设置成打断状态，并触发取消令牌，立即中止上游llm、tts流和工具调用
+    conn.cancel_turn()
     conn.clear_queues()
     # 打断客户端说话状态
     await conn.websocket.send(
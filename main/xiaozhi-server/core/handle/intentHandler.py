@@ -1,7 +1,9 @@
 import json
+import time
 import uuid
 import asyncio
 from core.utils.dialogue import Message
+from core.utils.telemetry import get_telemetry
 from core.providers.tts.dto.dto import ContentType
 from core.handle.helloHandle import checkWakeupWords
 from plugins_func.register import Action, ActionResponse
@@ -67,7 +69,9 @@ async def analyze_intent_with_llm(conn, text):
     # 对话历史记录
     dialogue = conn.dialogue
     try:
+        start_time = time.monotonic()
         intent_result = await conn.intent.detect_intent(conn, dialogue.dialogue, text)
+        get_telemetry().observe("intent", time.monotonic() - start_time)
         return intent_result
     except Exception as e:
         conn.logger.bind(tag=TAG).error(f"意图识别失败: {str(e)}")
@@ -2,6 +2,7 @@ import time
 import json
 import asyncio
 from core.utils.util import audio_to_data
+from core.utils.telemetry import get_telemetry
 from core.handle.abortHandle import handleAbortMessage
 from core.handle.intentHandler import handle_user_intent
 from core.utils.output_counter import check_device_output_limit
@@ -12,7 +13,9 @@ TAG = __name__
 
 async def handleAudioMessage(conn, audio):
     # 当前片段是否有人说话
+    vad_start = time.perf_counter()
     have_voice = conn.vad.is_vad(conn, audio)
+    get_telemetry().observe("vad", time.perf_counter() - vad_start)
     # 如果设备刚刚被唤醒，短暂忽略VAD检测
     if have_voice and hasattr(conn, "just_woken_up") and conn.just_woken_up:
         have_voice = False
@@ -1,57 +1,347 @@
 """
-TTS上报功能已集成到ConnectionHandler类中。
+聊天记录上报
 
-上报功能包括：
-1. 每个连接对象拥有自己的上报队列和处理线程
-2. 上报线程的生命周期与连接对象绑定
-3. 使用ConnectionHandler.enqueue_tts_report方法进行上报
-
-具体实现请参考core/connection.py中的相关代码。
+所有连接共用一个进程级上报器：
+1. 各连接只负责把上报条目放入有界队列，不占用连接的线程池
+2. 单个后台线程按条数/字节数/时间攒批，gzip压缩后批量上报；音频全程保持为Opus帧，由智控台解码
+3. 队列满时先丢弃音频只保留文本，仍然放不下则写入磁盘，积压消化后再补报
+4. 智控台不支持批量接口时，自动退回逐条并发上报，此时才在本地把音频转为WAV
+5. 只把上报失败的条目写入磁盘，已保存的条目不会重复上报；多次上报仍失败的条目转入死信文件
 """
 
+import os
+import json
 import time
+import gzip
+import base64
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import opuslib_next
 
-from config.manage_api_client import report as manage_report
+from config.logger import setup_logging
+from config.config_loader import get_project_dir
+from config.manage_api_client import (
+    report_item as manage_report_item,
+    report_batch as manage_report_batch,
+    BatchReportUnsupported,
+)
 
 TAG = __name__
+logger = setup_logging()
 
+OPUS_AUDIO_FORMAT = "opus/16000/1/60"
 
-def report(conn, type, text, opus_data, report_time):
-    """执行聊天记录上报操作
 
-    Args:
-        conn: 连接对象
-        type: 上报类型，1为用户，2为智能体
-        text: 合成文本
-        opus_data: opus音频数据
-        report_time: 上报时间
+def pack_opus_frames(opus_data):
+    """将Opus帧按 2字节长度+帧数据 拼接为紧凑的二进制"""
+    return b"".join(len(frame).to_bytes(2, "big") + frame for frame in opus_data)
+
+
+def encode_batch(batch):
+    """批量上报的请求体：4字节大端元数据长度 + JSON数组 + 各条音频依次拼接，整体gzip压缩
+
+    元数据中的audioLength是该条音频在音频区中的字节数，音频为pack_opus_frames的结果
     """
-    try:
-        if opus_data:
-            audio_data = opus_to_wav(conn, opus_data)
-        else:
-            audio_data = None
-        # 执行上报
-        manage_report(
-            mac_address=conn.device_id,
-            session_id=conn.session_id,
-            chat_type=type,
-            content=text,
-            audio=audio_data,
-            report_time=report_time,
+    meta, audios = [], []
+    for item in batch:
+        data = {k: v for k, v in item.items() if k not in ("audio", "attempts")}
+        audio = item["audio"] or b""
+        if audio:
+            data["audioFormat"] = OPUS_AUDIO_FORMAT
+        data["audioLength"] = len(audio)
+        meta.append(data)
+        audios.append(audio)
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    return gzip.compress(
+        len(meta_bytes).to_bytes(4, "big") + meta_bytes + b"".join(audios)
+    )
+
+
+def unpack_opus_frames(data):
+    frames, offset = [], 0
+    while offset + 2 <= len(data):
+        length = int.from_bytes(data[offset : offset + 2], "big")
+        frames.append(data[offset + 2 : offset + 2 + length])
+        offset += 2 + length
+    return frames
+
+
+class ChatHistoryReporter:
+    """进程级聊天记录上报器"""
+
+    def __init__(self, config=None):
+        report_config = (config or {}).get("chat_history_report", {}) or {}
+        self.max_queue = int(report_config.get("max_queue", 5000))
+        self.batch_size = int(report_config.get("batch_size", 50))
+        self.batch_bytes = int(report_config.get("batch_bytes", 2 * 1024 * 1024))
+        self.flush_interval = float(report_config.get("flush_interval", 2))
+        self.retry_delay = float(report_config.get("retry_delay", 5))
+        self.fallback_workers = int(report_config.get("fallback_workers", 4))
+        self.max_attempts = int(report_config.get("max_attempts", 20))
+        self.spill_path = get_project_dir() + report_config.get(
+            "spill_path", "data/.report_spill.jsonl"
         )
-    except Exception as e:
-        conn.logger.bind(tag=TAG).error(f"聊天记录上报失败: {e}")
+        self.dead_letter_path = get_project_dir() + report_config.get(
+            "dead_letter_path", "data/.report_dead_letter.jsonl"
+        )
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "failed": 0,
+            "audio_dropped": 0,
+            "spilled": 0,
+            "dead_lettered": 0,
+            "batches": 0,
+        }
+        self._spilled_pending = self._count_spilled()
+        self._batch_supported = True
+        self._fallback_executor = None
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._send_loop, name="chat-history-reporter", daemon=True
+        )
+        self._thread.start()
+
+    def _incr(self, field, amount=1):
+        with self._stats_lock:
+            self._stats[field] += amount
+
+    def submit(self, mac_address, session_id, chat_type, content, opus_data, report_time):
+        """放入上报队列，不会阻塞调用方"""
+        item = {
+            "macAddress": mac_address,
+            "sessionId": session_id,
+            "chatType": chat_type,
+            "content": content,
+            "reportTime": report_time,
+            "audio": pack_opus_frames(opus_data) if opus_data else None,
+        }
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # 队列已满：丢弃音频后写入磁盘，文本记录不丢失
+            if item["audio"]:
+                item["audio"] = None
+                self._incr("audio_dropped")
+            self._spill([item])
+            return
+        self._incr("enqueued")
+
+    def metrics(self):
+        """积压和上报情况，可导出到监控"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["spilled_pending"] = self._spilled_pending
+        stats["backlog"] = stats["queued"] + self._spilled_pending
+        return stats
+
+    def _next_batch(self):
+        """攒批：达到条数或字节上限，或等待超过flush_interval时返回"""
+        batch, size = [], 0
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and size < self.batch_bytes:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item["content"] or "") + len(item["audio"] or b"")
+        return batch
+
+    def _send_loop(self):
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if not batch:
+                # 空闲时补报磁盘中积压的条目
+                batch = self._load_spilled()
+                if not batch:
+                    continue
+            failed = self._send(batch)
+            if failed:
+                self._retry_later(failed)
+                self._stop_event.wait(self.retry_delay)
+
+    def _retry_later(self, failed):
+        """失败的条目计数后写入磁盘补报，达到max_attempts的转入死信文件不再重试"""
+        retry, dead = [], []
+        for item in failed:
+            item["attempts"] = item.get("attempts", 0) + 1
+            (dead if item["attempts"] >= self.max_attempts else retry).append(item)
+        if retry:
+            self._spill(retry)
+        if dead:
+            self._write_lines(self.dead_letter_path, dead)
+            self._incr("dead_lettered", len(dead))
+            logger.bind(tag=TAG).error(
+                f"{len(dead)}条聊天记录已失败{self.max_attempts}次，转入死信文件: {self.dead_letter_path}"
+            )
+
+    def _send(self, batch):
+        """上报一批条目，返回上报失败、需要写入磁盘的条目"""
+        if self._batch_supported:
+            try:
+                failed_indexes = set(manage_report_batch(encode_batch(batch)))
+            except BatchReportUnsupported:
+                logger.bind(tag=TAG).warning("智控台不支持批量上报，改为逐条上报")
+                self._batch_supported = False
+            except Exception as e:
+                self._incr("failed", len(batch))
+                logger.bind(tag=TAG).error(f"批量上报聊天记录失败: {e}")
+                return batch
+            else:
+                failed = [item for i, item in enumerate(batch) if i in failed_indexes]
+                self._record(len(batch), len(failed))
+                self._incr("batches")
+                return failed
+
+        # 逐条上报并发执行，单条请求慢不会拖住整批
+        if self._fallback_executor is None:
+            self._fallback_executor = ThreadPoolExecutor(
+                max_workers=self.fallback_workers,
+                thread_name_prefix="chat-history-report",
+            )
+        results = list(self._fallback_executor.map(self._send_item, batch))
+        failed = [item for item, ok in zip(batch, results) if not ok]
+        self._record(len(batch), len(failed))
+        return failed
+
+    def _record(self, total, failed):
+        self._incr("sent", total - failed)
+        if failed:
+            self._incr("failed", failed)
+            logger.bind(tag=TAG).warning(f"{failed}条聊天记录上报失败，稍后补报")
+
+    def _send_item(self, item):
+        if not item["content"]:
+            return True
+        try:
+            manage_report_item(
+                mac_address=item["macAddress"],
+                session_id=item["sessionId"],
+                chat_type=item["chatType"],
+                content=item["content"],
+                audio=self._to_wav(item),
+                report_time=item["reportTime"],
+            )
+            return True
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"上报聊天记录失败: {e}")
+            return False
+
+    @staticmethod
+    def _to_wav(item):
+        if not item["audio"]:
+            return None
+        try:
+            return opus_to_wav(unpack_opus_frames(item["audio"]))
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"音频转换失败: {e}")
+            return None
+
+    @staticmethod
+    def _to_spill_item(item):
+        data = {k: v for k, v in item.items() if k != "audio"}
+        if item["audio"]:
+            data["audioFormat"] = OPUS_AUDIO_FORMAT
+            data["audioOpus"] = base64.b64encode(item["audio"]).decode("ascii")
+        return data
+
+    def _spill(self, items):
+        """写入磁盘，等待积压消化后补报"""
+        if self._write_lines(self.spill_path, items):
+            with self._spill_lock:
+                self._spilled_pending += len(items)
+            self._incr("spilled", len(items))
+
+    def _write_lines(self, path, items):
+        try:
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    for item in items:
+                        f.write(
+                            json.dumps(self._to_spill_item(item), ensure_ascii=False)
+                            + "\n"
+                        )
+            return True
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"上报条目写入磁盘失败，丢弃{len(items)}条: {e}")
+            return False
+
+    def _count_spilled(self):
+        if not os.path.exists(self.spill_path):
+            return 0
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+
+    def _load_spilled(self):
+        """取出磁盘中的一批条目，其余写回"""
+        with self._spill_lock:
+            if not self._spilled_pending or not os.path.exists(self.spill_path):
+                return []
+            with open(self.spill_path, "r", encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+            batch_lines, rest = lines[: self.batch_size], lines[self.batch_size :]
+            tmp_path = self.spill_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(rest)
+            os.replace(tmp_path, self.spill_path)
+            self._spilled_pending = len(rest)
+        batch = []
+        for line in batch_lines:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            audio = data.pop("audioOpus", None)
+            data.pop("audioFormat", None)
+            data["audio"] = base64.b64decode(audio) if audio else None
+            batch.append(data)
+        return batch
+
+    def shutdown(self, timeout=5):
+        """退出时将未上报的条目写入磁盘"""
+        self._stop_event.set()
+        self._thread.join(timeout)
+        if self._fallback_executor is not None:
+            self._fallback_executor.shutdown(wait=False)
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if items:
+            self._spill(items)
 
 
-def opus_to_wav(conn, opus_data):
+_reporter = None
+_reporter_lock = threading.Lock()
+
+
+def get_chat_reporter(config=None):
+    """获取进程级上报器，首次调用时按配置创建"""
+    global _reporter
+    with _reporter_lock:
+        if _reporter is None:
+            _reporter = ChatHistoryReporter(config)
+        return _reporter
+
+
+def opus_to_wav(opus_data):
     """将Opus数据转换为WAV格式的字节流
 
     Args:
-        output_dir: 输出目录（保留参数以保持接口兼容）
-        opus_data: opus音频数据
+        opus_data: opus音频帧列表
 
     Returns:
         bytes: WAV格式的音频数据
@@ -64,7 +354,7 @@ def opus_to_wav(conn, opus_data):
             pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
             pcm_data.append(pcm_frame)
         except opuslib_next.OpusError as e:
-            conn.logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
+            logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
 
     if not pcm_data:
         raise ValueError("没有有效的PCM数据")
@@ -93,6 +383,16 @@ def opus_to_wav(conn, opus_data):
     return bytes(wav_header) + pcm_data_bytes
 
 
+def _enqueue_report(conn, chat_type, text, opus_data):
+    if conn.chat_history_conf == 2:
+        audio = opus_data
+    else:
+        audio = None
+    get_chat_reporter(conn.config).submit(
+        conn.device_id, conn.session_id, chat_type, text, audio, int(time.time())
+    )
+
+
 def enqueue_tts_report(conn, text, opus_data):
     if not conn.read_config_from_api or conn.need_bind or not conn.report_tts_enable:
         return
@@ -106,17 +406,10 @@ def enqueue_tts_report(conn, text, opus_data):
         opus_data: opus音频数据
     """
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
-        if conn.chat_history_conf == 2:
-            conn.report_queue.put((2, text, opus_data, int(time.time())))
-            conn.logger.bind(tag=TAG).debug(
-                f"TTS数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
-            )
-        else:
-            conn.report_queue.put((2, text, None, int(time.time())))
-            conn.logger.bind(tag=TAG).debug(
-                f"TTS数据已加入上报队列: {conn.device_id}, 不上报音频"
-            )
+        _enqueue_report(conn, 2, text, opus_data)
+        conn.logger.bind(tag=TAG).debug(
+            f"TTS数据已加入上报队列: {conn.device_id}, 音频帧数: {len(opus_data or [])}"
+        )
     except Exception as e:
         conn.logger.bind(tag=TAG).error(f"加入TTS上报队列失败: {text}, {e}")
 
@@ -134,16 +427,9 @@ def enqueue_asr_report(conn, text, opus_data):
         opus_data: opus音频数据
     """
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
-        if conn.chat_history_conf == 2:
-            conn.report_queue.put((1, text, opus_data, int(time.time())))
-            conn.logger.bind(tag=TAG).debug(
-                f"ASR数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
-            )
-        else:
-            conn.report_queue.put((1, text, None, int(time.time())))
-            conn.logger.bind(tag=TAG).debug(
-                f"ASR数据已加入上报队列: {conn.device_id}, 不上报音频"
-            )
+        _enqueue_report(conn, 1, text, opus_data)
+        conn.logger.bind(tag=TAG).debug(
+            f"ASR数据已加入上报队列: {conn.device_id}, 音频帧数: {len(opus_data or [])}"
+        )
     except Exception as e:
         conn.logger.bind(tag=TAG).debug(f"加入ASR上报队列失败: {text}, {e}")
@@ -3,6 +3,7 @@ import time
 import asyncio
 from core.utils import textUtils
 from core.utils.util import audio_to_data
+from core.utils.telemetry import get_telemetry
 from core.providers.tts.dto.dto import SentenceType
 
 TAG = __name__
@@ -10,17 +11,22 @@ TAG = __name__
 
 async def sendAudioMessage(conn, sentenceType, audios, text):
     if conn.tts.tts_audio_first_sentence:
-        conn.logger.bind(tag=TAG).info(f"发送第一段语音: {text}")
+        conn.logger.bind(tag=TAG).info("发送第一段语音: {}", text)
         conn.tts.tts_audio_first_sentence = False
         await send_tts_message(conn, "start", None)
 
     if sentenceType == SentenceType.FIRST:
         await send_tts_message(conn, "sentence_start", text)
 
+    first_text_time = getattr(conn, "tts_first_text_time", None)
+    if audios and first_text_time is not None:
+        get_telemetry().observe("tts_first_frame", time.monotonic() - first_text_time)
+        conn.tts_first_text_time = None
+
     await sendAudio(conn, audios)
     # 发送句子开始消息
     if sentenceType is not SentenceType.MIDDLE:
-        conn.logger.bind(tag=TAG).info(f"发送音频消息: {sentenceType}, {text}")
+        conn.logger.bind(tag=TAG).info("发送音频消息: {}, {}", sentenceType, text)
 
     # 发送结束消息（如果是最后一个文本）
     if conn.llm_finish_task and sentenceType == SentenceType.LAST:
@@ -112,6 +118,7 @@ async def sendAudio(conn, audios, frame_duration=60):
             flow_control["packet_count"] * frame_duration / 1000
         )
         delay = expected_time - current_time
+        get_telemetry().observe("downlink_lag", -delay)
         if delay > 0:
             await asyncio.sleep(delay)
         else:
@@ -168,6 +175,7 @@ async def sendAudio(conn, audios, frame_duration=60):
             expected_time = start_time + (play_position / 1000)
             current_time = time.perf_counter()
             delay = expected_time - current_time
+            get_telemetry().observe("downlink_lag", -delay)
             if delay > 0:
                 await asyncio.sleep(delay)
 
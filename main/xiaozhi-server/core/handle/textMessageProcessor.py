@@ -22,7 +22,7 @@ class TextMessageProcessor:
                 message_type = msg_json.get("type")
 
                 # 记录日志
-                conn.logger.bind(tag=TAG).info(f"收到{message_type}消息：{message}")
+                conn.logger.bind(tag=TAG).info("收到{}消息：{}", message_type, message)
 
                 # 获取并执行处理器
                 handler = self.registry.get_handler(message_type)
@@ -32,7 +32,7 @@ class TextMessageProcessor:
                     conn.logger.bind(tag=TAG).error(f"收到未知类型消息：{message}")
             # 处理纯数字消息
             elif isinstance(msg_json, int):
-                conn.logger.bind(tag=TAG).info(f"收到数字消息：{message}")
+                conn.logger.bind(tag=TAG).info("收到数字消息：{}", message)
                 await conn.websocket.send(message)
 
         except json.JSONDecodeError:
@@ -3,6 +3,8 @@ from aiohttp import web
 from config.logger import setup_logging
 from core.api.ota_handler import OTAHandler
 from core.api.vision_handler import VisionHandler
+from core.api.config_handler import ConfigHandler
+from core.api.metrics_handler import MetricsHandler
 
 TAG = __name__
 
@@ -13,6 +15,8 @@ class SimpleHttpServer:
         self.logger = setup_logging()
         self.ota_handler = OTAHandler(config)
         self.vision_handler = VisionHandler(config)
+        self.config_handler = ConfigHandler(config)
+        self.metrics_handler = MetricsHandler(config)
 
     def _get_websocket_url(self, local_ip: str, port: int) -> str:
         """获取websocket地址
@@ -50,6 +54,16 @@ class SimpleHttpServer:
                         web.options("/xiaozhi/ota/", self.ota_handler.handle_post),
                     ]
                 )
+            else:
+                # 智控台修改设备配置后通知本服务失效缓存
+                app.add_routes(
+                    [
+                        web.post(
+                            "/xiaozhi/config/invalidate",
+                            self.config_handler.handle_invalidate,
+                        ),
+                    ]
+                )
             # 添加路由
             app.add_routes(
                 [
@@ -58,6 +72,8 @@ class SimpleHttpServer:
                     web.options("/mcp/vision/explain", self.vision_handler.handle_post),
                 ]
             )
+            if self.config.get("metrics", {}).get("enabled", True):
+                app.add_routes([web.get("/metrics", self.metrics_handler.handle_get)])
 
             # 运行服务
             runner = web.AppRunner(app)
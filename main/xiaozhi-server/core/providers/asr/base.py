@@ -16,7 +16,9 @@ from typing import Optional, Tuple, List
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
+from core.utils.telemetry import get_telemetry
 from core.handle.receiveAudioHandle import handleAudioMessage
+from core.providers.asr.dto.dto import InterfaceType
 
 TAG = __name__
 logger = setup_logging()
@@ -101,6 +103,7 @@ class ASRProviderBase(ABC):
                             self.speech_to_text(asr_audio_task, conn.session_id, conn.audio_format)
                         )
                         end_time = time.monotonic()
+                        get_telemetry().observe("asr", end_time - start_time)
                         logger.bind(tag=TAG).info(f"ASR耗时: {end_time - start_time:.3f}s")
                         return result
                     finally:
@@ -217,6 +220,13 @@ class ASRProviderBase(ABC):
     def stop_ws_connection(self):
         pass
 
+    def reset(self, timeout=3):
+        """连接关闭后供下一个连接复用，返回False表示不可复用
+
+        非流式ASR的识别状态都保存在连接上，可直接复用；流式ASR持有websocket和识别结果，不复用
+        """
+        return getattr(self, "interface_type", None) == InterfaceType.NON_STREAM
+
     def save_audio_to_file(self, pcm_data: List[bytes], session_id: str) -> str:
         """PCM数据保存为WAV文件"""
         module_name = __name__.split(".")[-1]
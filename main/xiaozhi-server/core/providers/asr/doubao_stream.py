@@ -163,7 +163,7 @@ class ASRProvider(ASRProviderBase):
                 try:
                     response = await self.asr_ws.recv()
                     result = self.parse_response(response)
-                    logger.bind(tag=TAG).debug(f"收到ASR结果: {result}")
+                    logger.bind(tag=TAG).debug("收到ASR结果: {}", result)
 
                     if "payload_msg" in result:
                         payload = result["payload_msg"]
@@ -340,7 +340,7 @@ class ASRProvider(ASRProviderBase):
             try:
                 json_data = res[12:].decode("utf-8")
                 result = json.loads(json_data)
-                logger.bind(tag=TAG).debug(f"成功解析JSON响应: {result}")
+                logger.bind(tag=TAG).debug("成功解析JSON响应: {}", result)
                 return {"payload_msg": result}
             except (UnicodeDecodeError, json.JSONDecodeError) as e:
                 logger.bind(tag=TAG).error(f"JSON解析失败: {str(e)}")
@@ -213,7 +213,7 @@ class ASRProvider(ASRProviderBase):
                     timeout = 3.0 if self.last_frame_sent else 30.0
                     response = await asyncio.wait_for(self.asr_ws.recv(), timeout=timeout)
                     result = json.loads(response)
-                    logger.bind(tag=TAG).debug(f"收到ASR结果: {result}")
+                    logger.bind(tag=TAG).debug("收到ASR结果: {}", result)
 
                     header = result.get("header", {})
                     payload = result.get("payload", {})
@@ -1,6 +1,7 @@
 from typing import List, Dict
 from ..base import IntentProviderBase
-from plugins_func.functions.play_music import initialize_music_handler
+from plugins_func.functions.play_music import get_music_candidates
+from core.providers.tools.base import get_intent_prompt
 from config.logger import setup_logging
 import re
 import json
@@ -15,7 +16,6 @@ class IntentProvider(IntentProviderBase):
     def __init__(self, config):
         super().__init__(config)
         self.llm = None
-        self.promot = ""
         # 导入全局缓存管理器
         from core.utils.cache.manager import cache_manager, CacheType
 
@@ -148,20 +148,17 @@ class IntentProvider(IntentProviderBase):
             )
             return cached_intent
 
-        if self.promot == "":
-            functions = conn.func_handler.get_functions()
-            if hasattr(conn, "mcp_client"):
-                mcp_tools = conn.mcp_client.get_available_tools()
-                if mcp_tools is not None and len(mcp_tools) > 0:
-                    if functions is None:
-                        functions = []
-                    functions.extend(mcp_tools)
-
-            self.promot = self.get_intent_system_prompt(functions)
+        # 意图提示词按工具集指纹缓存，意图识别实例被多个连接共用，
+        # 不能把某个连接的提示词保存在实例上。设备端MCP工具已包含在函数列表中
+        functions = conn.func_handler.get_functions()
+        intent_prompt = get_intent_prompt(
+            conn.func_handler.get_tools_fingerprint(),
+            lambda: self.get_intent_system_prompt(functions),
+        )
 
-        music_config = initialize_music_handler(conn)
-        music_file_names = music_config["music_file_names"]
-        prompt_music = f"{self.promot}\n<musicNames>{music_file_names}\n</musicNames>"
+        # 只附带与本次输入最相关的歌名，曲库很大时提示词长度不变
+        music_file_names = await get_music_candidates(conn, text)
+        prompt_music = f"{intent_prompt}\n<musicNames>{music_file_names}\n</musicNames>"
 
         home_assistant_cfg = conn.config["plugins"].get("home_assistant")
         if home_assistant_cfg:
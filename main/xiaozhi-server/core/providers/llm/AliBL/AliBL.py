@@ -4,6 +4,7 @@ import dashscope
 from dashscope import Application
 from core.providers.llm.base import LLMProviderBase
 from core.utils.util import check_model_key
+from core.utils.cancellation import is_cancelled
 import time
 
 TAG = __name__
@@ -20,7 +21,8 @@ class LLMProvider(LLMProviderBase):
         self.streaming_chunk_size = config.get("streaming_chunk_size", 3)  # 每次流式返回的字符数
         check_model_key("AliBLLLM", self.api_key)
 
-    def response(self, session_id, dialogue):
+    def response(self, session_id, dialogue, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
         try:
             # 处理dialogue
             if self.is_No_prompt:
@@ -61,6 +63,9 @@ class LLMProvider(LLMProviderBase):
             last_text = ""
             try:
                 for resp in responses:
+                    # SDK未提供关闭流的接口，打断时停止消费
+                    if is_cancelled(cancel_token):
+                        break
                     if resp.status_code != HTTPStatus.OK:
                         logger.bind(tag=TAG).error(
                             f"code={resp.status_code}, message={resp.message}, 请参考文档：https://help.aliyun.com/zh/model-studio/developer-reference/error-code"
@@ -99,11 +104,11 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(f"【阿里百练API服务】响应异常: {e}")
             yield "【LLM服务响应异常】"
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         # 阿里百练当前未支持原生的 function call。为保持兼容，这里回退到普通文本流式输出。
         # 上层会按 (content, tool_calls) 的形式消费，这里始终返回 (token, None)
         logger.bind(tag=TAG).warning(
             "阿里百练未实现原生 function call，已回退为纯文本流式输出"
         )
-        for token in self.response(session_id, dialogue):
+        for token in self.response(session_id, dialogue, **kwargs):
             yield token, None
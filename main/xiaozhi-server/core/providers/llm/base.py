@@ -26,14 +26,17 @@ class LLMProviderBase(ABC):
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             return "【LLM服务响应异常】"
     
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         """
         Default implementation for function calling (streaming)
         This should be overridden by providers that support function calls
 
+        kwargs may carry cancel_token, a CancellationToken that fires on barge-in;
+        providers should close their upstream stream when it fires.
+
         Returns: generator that yields either text tokens or a special function call token
         """
         # For providers that don't support functions, just return regular response
-        for token in self.response(session_id, dialogue):
+        for token in self.response(session_id, dialogue, **kwargs):
             yield token, None
 
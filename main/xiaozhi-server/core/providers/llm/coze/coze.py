@@ -12,6 +12,7 @@ from cozepy import (
 )  # noqa
 from core.providers.llm.system_prompt import get_system_prompt_for_function
 from core.utils.util import check_model_key
+from core.utils.cancellation import is_cancelled
 
 TAG = __name__
 logger = setup_logging()
@@ -28,6 +29,7 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(model_key_msg)
 
     def response(self, session_id, dialogue, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
         coze_api_token = self.personal_access_token
         coze_api_base = COZE_CN_BASE_URL
 
@@ -50,11 +52,14 @@ class LLMProvider(LLMProviderBase):
             ],
             conversation_id=conversation_id,
         ):
+            # 打断时停止消费上游流
+            if is_cancelled(cancel_token):
+                break
             if event.event == ChatEventType.CONVERSATION_MESSAGE_DELTA:
                 print(event.message.content, end="", flush=True)
                 yield event.message.content
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         if len(dialogue) == 2 and functions is not None and len(functions) > 0:
             # 第一次调用llm， 取最后一条用户消息，附加tool提示词
             last_msg = dialogue[-1]["content"]
@@ -71,5 +76,5 @@ class LLMProvider(LLMProviderBase):
                     break
                 dialogue.pop()
 
-        for token in self.response(session_id, dialogue):
+        for token in self.response(session_id, dialogue, **kwargs):
             yield token, None
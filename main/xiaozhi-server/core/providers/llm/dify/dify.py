@@ -4,6 +4,7 @@ import requests
 from core.providers.llm.base import LLMProviderBase
 from core.providers.llm.system_prompt import get_system_prompt_for_function
 from core.utils.util import check_model_key
+from core.utils.cancellation import bind_cancel, is_cancelled
 
 TAG = __name__
 logger = setup_logging()
@@ -20,6 +21,8 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(model_key_msg)
 
     def response(self, session_id, dialogue, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
+        unbind = lambda: None
         try:
             # 取最后一条用户消息
             last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
@@ -53,6 +56,8 @@ class LLMProvider(LLMProviderBase):
                 json=request_json,
                 stream=True,
             ) as r:
+                # 打断时直接关闭上游HTTP流
+                unbind = bind_cancel(cancel_token, r.close)
                 if self.mode == "chat-messages":
                     for line in r.iter_lines():
                         if line.startswith(b"data: "):
@@ -88,10 +93,14 @@ class LLMProvider(LLMProviderBase):
                                 yield event["answer"]
 
         except Exception as e:
+            if is_cancelled(cancel_token):
+                return
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
             yield "【服务响应异常】"
+        finally:
+            unbind()
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         if len(dialogue) == 2 and functions is not None and len(functions) > 0:
             # 第一次调用llm， 取最后一条用户消息，附加tool提示词
             last_msg = dialogue[-1]["content"]
@@ -108,5 +117,5 @@ class LLMProvider(LLMProviderBase):
                     break
                 dialogue.pop()
 
-        for token in self.response(session_id, dialogue):
+        for token in self.response(session_id, dialogue, **kwargs):
             yield token, None
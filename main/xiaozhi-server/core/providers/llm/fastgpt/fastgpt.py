@@ -3,6 +3,7 @@ from config.logger import setup_logging
 import requests
 from core.providers.llm.base import LLMProviderBase
 from core.utils.util import check_model_key
+from core.utils.cancellation import bind_cancel, is_cancelled
 
 TAG = __name__
 logger = setup_logging()
@@ -19,6 +20,8 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(model_key_msg)
 
     def response(self, session_id, dialogue, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
+        unbind = lambda: None
         try:
             # 取最后一条用户消息
             last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
@@ -36,6 +39,8 @@ class LLMProvider(LLMProviderBase):
                 },
                 stream=True,
             ) as r:
+                # 打断时直接关闭上游HTTP流
+                unbind = bind_cancel(cancel_token, r.close)
                 for line in r.iter_lines():
                     if line:
                         try:
@@ -64,10 +69,14 @@ class LLMProvider(LLMProviderBase):
                             continue
 
         except Exception as e:
+            if is_cancelled(cancel_token):
+                return
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
             yield "【服务响应异常】"
+        finally:
+            unbind()
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         logger.bind(tag=TAG).error(
             f"fastgpt暂未实现完整的工具调用（function call），建议使用其他意图识别"
         )
@@ -8,6 +8,7 @@ from google.generativeai import types, GenerationConfig
 
 from core.providers.llm.base import LLMProviderBase
 from core.utils.util import check_model_key
+from core.utils.cancellation import is_cancelled
 from config.logger import setup_logging
 from google.generativeai.types import GenerateContentResponse
 from requests import RequestException
@@ -120,12 +121,14 @@ class LLMProvider(LLMProviderBase):
 
     # Gemini文档提到，无需维护session-id，直接用dialogue拼接而成
     def response(self, session_id, dialogue, **kwargs):
-        yield from self._generate(dialogue, None)
+        yield from self._generate(dialogue, None, kwargs.get("cancel_token"))
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
-        yield from self._generate(dialogue, self._build_tools(functions))
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
+        yield from self._generate(
+            dialogue, self._build_tools(functions), kwargs.get("cancel_token")
+        )
 
-    def _generate(self, dialogue, tools):
+    def _generate(self, dialogue, tools, cancel_token=None):
         role_map = {"assistant": "model", "user": "user"}
         contents: list = []
         # 拼接对话
@@ -133,7 +136,6 @@ class LLMProvider(LLMProviderBase):
             r = m["role"]
 
             if r == "assistant" and "tool_calls" in m:
-                tc = m["tool_calls"][0]
                 contents.append(
                     {
                         "role": "model",
@@ -144,6 +146,7 @@ class LLMProvider(LLMProviderBase):
                                     "args": json.loads(tc["function"]["arguments"]),
                                 }
                             }
+                            for tc in m["tool_calls"]
                         ],
                     }
                 )
@@ -175,6 +178,9 @@ class LLMProvider(LLMProviderBase):
 
         try:
             for chunk in stream:
+                # 打断时停止消费上游流
+                if is_cancelled(cancel_token):
+                    return
                 cand = chunk.candidates[0]
                 for part in cand.content.parts:
                     # a) 函数调用-通常是最后一段话才是函数调用
@@ -2,6 +2,7 @@ from config.logger import setup_logging
 from openai import OpenAI
 import json
 from core.providers.llm.base import LLMProviderBase
+from core.utils.cancellation import bind_cancel, is_cancelled
 
 TAG = __name__
 logger = setup_logging()
@@ -25,6 +26,8 @@ class LLMProvider(LLMProviderBase):
         self.is_qwen3 = self.model_name and self.model_name.lower().startswith("qwen3")
 
     def response(self, session_id, dialogue, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
+        unbind = lambda: None
         try:
             # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
             if self.is_qwen3:
@@ -47,6 +50,8 @@ class LLMProvider(LLMProviderBase):
             responses = self.client.chat.completions.create(
                 model=self.model_name, messages=dialogue, stream=True
             )
+            # 打断时直接关闭上游HTTP流
+            unbind = bind_cancel(cancel_token, responses.close)
             is_active = True
             # 用于处理跨chunk的标签
             buffer = ""
@@ -90,10 +95,16 @@ class LLMProvider(LLMProviderBase):
                     logger.bind(tag=TAG).error(f"Error processing chunk: {e}")
 
         except Exception as e:
+            if is_cancelled(cancel_token):
+                return
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             yield "【Ollama服务响应异常】"
+        finally:
+            unbind()
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
+        unbind = lambda: None
         try:
             # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
             if self.is_qwen3:
@@ -119,6 +130,8 @@ class LLMProvider(LLMProviderBase):
                 stream=True,
                 tools=functions,
             )
+            # 打断时直接关闭上游HTTP流
+            unbind = bind_cancel(cancel_token, stream.close)
 
             is_active = True
             buffer = ""
@@ -171,5 +184,9 @@ class LLMProvider(LLMProviderBase):
                     continue
 
         except Exception as e:
+            if is_cancelled(cancel_token):
+                return
             logger.bind(tag=TAG).error(f"Error in Ollama function call: {e}")
             yield f"【Ollama服务响应异常: {str(e)}】", None
+        finally:
+            unbind()
@@ -3,6 +3,7 @@ import openai
 from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
+from core.utils.cancellation import bind_cancel, is_cancelled
 from core.providers.llm.base import LLMProviderBase
 
 TAG = __name__
@@ -49,6 +50,8 @@ class LLMProvider(LLMProviderBase):
         self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=httpx.Timeout(self.timeout))
 
     def response(self, session_id, dialogue, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
+        unbind = lambda: None
         try:
             responses = self.client.chat.completions.create(
                 model=self.model_name,
@@ -61,6 +64,8 @@ class LLMProvider(LLMProviderBase):
                     "frequency_penalty", self.frequency_penalty
                 ),
             )
+            # 打断时直接关闭上游HTTP流
+            unbind = bind_cancel(cancel_token, responses.close)
 
             is_active = True
             for chunk in responses:
@@ -86,13 +91,21 @@ class LLMProvider(LLMProviderBase):
                         yield content
 
         except Exception as e:
+            if is_cancelled(cancel_token):
+                return
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+        finally:
+            unbind()
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
+        unbind = lambda: None
         try:
             stream = self.client.chat.completions.create(
                 model=self.model_name, messages=dialogue, stream=True, tools=functions
             )
+            # 打断时直接关闭上游HTTP流
+            unbind = bind_cancel(cancel_token, stream.close)
 
             for chunk in stream:
                 # 检查是否存在有效的choice且content不为空
@@ -110,5 +123,9 @@ class LLMProvider(LLMProviderBase):
                     )
 
         except Exception as e:
+            if is_cancelled(cancel_token):
+                return
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
             yield f"【OpenAI服务响应异常: {e}】", None
+        finally:
+            unbind()
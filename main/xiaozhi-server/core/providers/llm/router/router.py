@@ -0,0 +1,335 @@
+import copy
+import time
+import queue
+import threading
+from collections import deque
+from config.logger import setup_logging
+from core.utils import llm as llm_utils
+from core.providers.llm.base import LLMProviderBase
+from core.utils.cancellation import CancellationToken, bind_cancel, is_cancelled
+
+TAG = __name__
+logger = setup_logging()
+
+# 子线程结束标记
+_STREAM_END = object()
+
+
+class BackendState:
+    """单个后端LLM的运行状态：滑动窗口首字延迟与熔断信息"""
+
+    def __init__(self, name, provider, window_size):
+        self.name = name
+        self.provider = provider
+        self.ttft_samples = deque(maxlen=window_size)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        # 熔断过且冷却期已过时为半开状态，只放行一个试探请求
+        self.half_open = False
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def record_ttft(self, ttft):
+        with self.lock:
+            self.ttft_samples.append(ttft)
+
+    def record_success(self):
+        """完整输出结束才算成功，关闭熔断"""
+        with self.lock:
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            self.half_open = False
+            self.probing = False
+
+    def record_failure(self, failure_threshold, cooldown):
+        with self.lock:
+            self.consecutive_failures += 1
+            # 半开试探失败时立即重新熔断
+            if self.half_open or self.consecutive_failures >= failure_threshold:
+                self.open_until = time.monotonic() + cooldown
+                self.half_open = True
+                self.probing = False
+                logger.bind(tag=TAG).warning(
+                    f"LLM后端 {self.name} 连续失败{self.consecutive_failures}次，熔断{cooldown}秒"
+                )
+
+    def is_available(self):
+        """熔断未打开，或冷却期已过且没有正在进行的试探请求"""
+        with self.lock:
+            if time.monotonic() < self.open_until:
+                return False
+            return not (self.half_open and self.probing)
+
+    def acquire(self, force=False):
+        """发起请求前调用：返回None表示不放行，"probe"表示本次为半开试探请求
+
+        force为True时（所有后端均熔断）不检查熔断状态
+        """
+        with self.lock:
+            if not self.half_open:
+                return "closed"
+            if force:
+                return "forced"
+            if time.monotonic() < self.open_until or self.probing:
+                return None
+            self.probing = True
+            return "probe"
+
+    def release_probe(self):
+        """试探请求被取消、没有得出结果时，允许下一次试探"""
+        with self.lock:
+            self.probing = False
+
+    def percentile(self, p):
+        """首字延迟的百分位数，无样本时返回None"""
+        with self.lock:
+            samples = sorted(self.ttft_samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class LLMProvider(LLMProviderBase):
+    """路由LLM：包装多个已配置的LLM后端，按首字延迟选择最快的健康后端，
+    可选对冲请求（主请求超过p95延迟仍无输出时，向次优后端再发一次，取先输出者），
+    后端出错时熔断并自动切换。"""
+
+    def __init__(self, config):
+        llm_configs = config.get("llm_configs") or {}
+        self.hedge = bool(config.get("hedge", False))
+        self.hedge_percentile = float(config.get("hedge_percentile", 95))
+        self.hedge_min_delay = float(config.get("hedge_min_delay", 0.3))
+        self.hedge_default_delay = float(config.get("hedge_default_delay", 1.5))
+        self.failure_threshold = int(config.get("failure_threshold", 3))
+        self.cooldown = float(config.get("cooldown", 30))
+        # 单个后端等待首字的最长时间（秒），超时视为失败并切换下一个后端
+        self.first_token_timeout = float(config.get("first_token_timeout", 15))
+        window_size = int(config.get("window_size", 50))
+
+        self.backends = []
+        for backend in config.get("backends", []):
+            if isinstance(backend, dict):
+                name = backend.get("name") or backend.get("type")
+                backend_config = backend
+            else:
+                name = backend
+                backend_config = llm_configs.get(backend)
+                if backend_config is None:
+                    logger.bind(tag=TAG).error(f"路由LLM找不到后端配置: {backend}")
+                    continue
+            backend_type = backend_config.get("type", name)
+            if backend_type == "router":
+                logger.bind(tag=TAG).error(f"路由LLM不支持嵌套路由后端: {name}")
+                continue
+            provider = llm_utils.create_instance(backend_type, backend_config)
+            self.backends.append(BackendState(name, provider, window_size))
+
+        if not self.backends:
+            raise ValueError("路由LLM至少需要配置一个可用的backends")
+        logger.bind(tag=TAG).info(
+            f"路由LLM已加载后端: {[b.name for b in self.backends]}，对冲: {self.hedge}"
+        )
+
+    # 部分后端会原地修改对话（弹出、插入提示词、追加/no_think），
+    # 对冲和切换时每个后端请求都使用独立的副本
+    def response(self, session_id, dialogue, **kwargs):
+        yield from self._route(
+            lambda backend, cancel_token: backend.provider.response(
+                session_id,
+                copy.deepcopy(dialogue),
+                **dict(kwargs, cancel_token=cancel_token),
+            ),
+            kwargs.get("cancel_token"),
+        )
+
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
+        yield from self._route(
+            lambda backend, cancel_token: backend.provider.response_with_functions(
+                session_id,
+                copy.deepcopy(dialogue),
+                functions=functions,
+                **dict(kwargs, cancel_token=cancel_token),
+            ),
+            kwargs.get("cancel_token"),
+        )
+
+    def _ranked_backends(self):
+        """健康后端按p50首字延迟升序排列，无样本的后端优先以便采集数据"""
+        available = [b for b in self.backends if b.is_available()]
+        if not available:
+            # 全部熔断时，退化为按熔断结束时间尝试
+            return sorted(self.backends, key=lambda b: b.open_until), True
+
+        def sort_key(backend):
+            p50 = backend.percentile(50)
+            return (0, 0) if p50 is None else (1, p50)
+
+        return sorted(available, key=sort_key), False
+
+    @staticmethod
+    def _next_admitted(candidates, force):
+        """依次取出下一个放行的后端，半开后端已有试探请求时跳过"""
+        while candidates:
+            backend = candidates.pop(0)
+            admission = backend.acquire(force)
+            if admission is not None:
+                return backend, admission == "probe"
+        return None, False
+
+    def _hedge_delay(self, backend):
+        delay = backend.percentile(self.hedge_percentile)
+        if delay is None:
+            delay = self.hedge_default_delay
+        return max(delay, self.hedge_min_delay)
+
+    def _route(self, open_stream, cancel_token):
+        candidates, force = self._ranked_backends()
+        # 所有并发请求共用一个输出队列，元素为 (attempt, item)
+        outputs = queue.Queue()
+        while candidates:
+            if is_cancelled(cancel_token):
+                return
+            primary, probe = self._next_admitted(candidates, force)
+            if primary is None:
+                break
+            attempts = [
+                _StreamAttempt(primary, open_stream, cancel_token, outputs, probe)
+            ]
+            deadline = time.monotonic() + self.first_token_timeout
+            hedge_at = None
+            if self.hedge and candidates:
+                hedge_at = time.monotonic() + self._hedge_delay(primary)
+
+            winner, first_item = None, None
+            while attempts and winner is None:
+                now = time.monotonic()
+                if now >= deadline or is_cancelled(cancel_token):
+                    break
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    hedge_backend, probe = self._next_admitted(candidates, force)
+                    if hedge_backend is None:
+                        continue
+                    logger.bind(tag=TAG).info(
+                        f"LLM后端 {primary.name} 首字超过对冲延迟，向 {hedge_backend.name} 发起对冲请求"
+                    )
+                    attempts.append(
+                        _StreamAttempt(
+                            hedge_backend, open_stream, cancel_token, outputs, probe
+                        )
+                    )
+                    continue
+                wait_until = deadline if hedge_at is None else min(deadline, hedge_at)
+                try:
+                    attempt, item = outputs.get(timeout=max(0.0, wait_until - now))
+                except queue.Empty:
+                    continue
+                if attempt not in attempts:
+                    # 已被放弃的请求残留的输出
+                    continue
+                if item is _STREAM_END or self._is_error_item(item):
+                    attempt.fail(self.failure_threshold, self.cooldown)
+                    attempts.remove(attempt)
+                    continue
+                attempt.backend.record_ttft(time.monotonic() - attempt.started)
+                winner, first_item = attempt, item
+
+            # 取消未胜出的请求
+            for attempt in attempts:
+                if attempt is not winner:
+                    if winner is None:
+                        attempt.fail(self.failure_threshold, self.cooldown)
+                    attempt.cancel()
+
+            if winner is None:
+                if is_cancelled(cancel_token):
+                    return
+                logger.bind(tag=TAG).warning("当前LLM后端未能输出首字，切换下一个后端")
+                continue
+
+            try:
+                yield first_item
+                while True:
+                    attempt, item = outputs.get()
+                    if attempt is not winner:
+                        continue
+                    if item is _STREAM_END:
+                        # 输出中途出错同样计入熔断，完整结束才算成功
+                        if winner.error is not None:
+                            winner.fail(self.failure_threshold, self.cooldown)
+                        else:
+                            winner.succeed()
+                        break
+                    if self._is_error_item(item):
+                        winner.fail(self.failure_threshold, self.cooldown)
+                    yield item
+            finally:
+                winner.cancel()
+            return
+
+        if not is_cancelled(cancel_token):
+            logger.bind(tag=TAG).error("所有LLM后端均不可用")
+            yield "【LLM服务响应异常】"
+
+    @staticmethod
+    def _is_error_item(item):
+        """各LLM适配器出错时会输出【...异常...】提示文本，视为该后端失败"""
+        content = item[0] if isinstance(item, tuple) else item
+        if isinstance(item, dict):
+            content = item.get("content")
+        return (
+            isinstance(content, str)
+            and content.startswith("【")
+            and "异常" in content
+        )
+
+
+class _StreamAttempt:
+    """在独立线程中消费一个后端的流式输出，供路由器并发等待"""
+
+    def __init__(self, backend, open_stream, parent_token, outputs, probe=False):
+        self.backend = backend
+        self.started = time.monotonic()
+        self.token = CancellationToken()
+        self._unbind_parent = bind_cancel(parent_token, self.token.cancel)
+        self._outputs = outputs
+        self._probe = probe
+        self._failed = False
+        self._done = False
+        self.error = None
+        self.thread = threading.Thread(
+            target=self._run, args=(open_stream,), daemon=True
+        )
+        self.thread.start()
+
+    def _run(self, open_stream):
+        try:
+            for item in open_stream(self.backend, self.token):
+                if self.token.cancelled:
+                    break
+                self._outputs.put((self, item))
+        except Exception as e:
+            if not self.token.cancelled:
+                self.error = e
+                logger.bind(tag=TAG).error(f"LLM后端 {self.backend.name} 出错: {e}")
+        finally:
+            self._outputs.put((self, _STREAM_END))
+
+    def fail(self, failure_threshold, cooldown):
+        if not self._failed and not self.token.cancelled:
+            self._failed = True
+            self._done = True
+            self.backend.record_failure(failure_threshold, cooldown)
+
+    def succeed(self):
+        if not self._failed:
+            self._done = True
+            self.backend.record_success()
+
+    def cancel(self):
+        self.token.cancel()
+        self._unbind_parent()
+        if self._probe and not self._done:
+            self._done = True
+            self.backend.release_probe()
@@ -2,6 +2,7 @@ from config.logger import setup_logging
 from openai import OpenAI
 import json
 from core.providers.llm.base import LLMProviderBase
+from core.utils.cancellation import bind_cancel, is_cancelled
 
 TAG = __name__
 logger = setup_logging()
@@ -31,6 +32,8 @@ class LLMProvider(LLMProviderBase):
             raise
 
     def response(self, session_id, dialogue, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
+        unbind = lambda: None
         try:
             logger.bind(tag=TAG).debug(
                 f"Sending request to Xinference with model: {self.model_name}, dialogue length: {len(dialogue)}"
@@ -38,6 +41,8 @@ class LLMProvider(LLMProviderBase):
             responses = self.client.chat.completions.create(
                 model=self.model_name, messages=dialogue, stream=True
             )
+            # 打断时直接关闭上游HTTP流
+            unbind = bind_cancel(cancel_token, responses.close)
             is_active = True
             for chunk in responses:
                 try:
@@ -60,10 +65,16 @@ class LLMProvider(LLMProviderBase):
                     logger.bind(tag=TAG).error(f"Error processing chunk: {e}")
 
         except Exception as e:
+            if is_cancelled(cancel_token):
+                return
             logger.bind(tag=TAG).error(f"Error in Xinference response generation: {e}")
             yield "【Xinference服务响应异常】"
+        finally:
+            unbind()
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
+        cancel_token = kwargs.get("cancel_token")
+        unbind = lambda: None
         try:
             logger.bind(tag=TAG).debug(
                 f"Sending function call request to Xinference with model: {self.model_name}, dialogue length: {len(dialogue)}"
@@ -79,6 +90,8 @@ class LLMProvider(LLMProviderBase):
                 stream=True,
                 tools=functions,
             )
+            # 打断时直接关闭上游HTTP流
+            unbind = bind_cancel(cancel_token, stream.close)
 
             for chunk in stream:
                 delta = chunk.choices[0].delta
@@ -91,8 +104,12 @@ class LLMProvider(LLMProviderBase):
                     yield None, tool_calls
 
         except Exception as e:
+            if is_cancelled(cancel_token):
+                return
             logger.bind(tag=TAG).error(f"Error in Xinference function call: {e}")
             yield {
                 "type": "content",
                 "content": f"【Xinference服务响应异常: {str(e)}】",
             }
+        finally:
+            unbind()
@@ -1,11 +1,10 @@
 from ..base import MemoryProviderBase, logger
 import time
 import json
-import os
-import yaml
 from config.config_loader import get_project_dir
 from config.manage_api_client import save_mem_local_short
 from core.utils.util import check_model_key
+from .memory_store import get_memory_store
 
 
 short_term_memory_prompt = """
@@ -111,7 +110,10 @@ class MemoryProvider(MemoryProviderBase):
         super().__init__(config)
         self.short_memory = ""
         self.save_to_file = True
-        self.memory_path = get_project_dir() + "data/.memory.yaml"
+        self.store = get_memory_store(
+            get_project_dir() + config.get("db_path", "data/.memory.db"),
+            legacy_yaml_path=get_project_dir() + "data/.memory.yaml",
+        )
         self.load_memory(summary_memory)
 
     def init_memory(
@@ -127,21 +129,12 @@ class MemoryProvider(MemoryProviderBase):
             self.short_memory = summary_memory
             return
 
-        all_memory = {}
-        if os.path.exists(self.memory_path):
-            with open(self.memory_path, "r", encoding="utf-8") as f:
-                all_memory = yaml.safe_load(f) or {}
-        if self.role_id in all_memory:
-            self.short_memory = all_memory[self.role_id]
+        memory = self.store.get(self.role_id)
+        if memory is not None:
+            self.short_memory = memory
 
     def save_memory_to_file(self):
-        all_memory = {}
-        if os.path.exists(self.memory_path):
-            with open(self.memory_path, "r", encoding="utf-8") as f:
-                all_memory = yaml.safe_load(f) or {}
-        all_memory[self.role_id] = self.short_memory
-        with open(self.memory_path, "w", encoding="utf-8") as f:
-            yaml.dump(all_memory, f, allow_unicode=True)
+        self.store.put(self.role_id, self.short_memory)
 
     async def save_memory(self, msgs):
         # 打印使用的模型信息
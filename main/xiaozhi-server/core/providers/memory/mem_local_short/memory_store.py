@@ -0,0 +1,94 @@
+"""
+本地短期记忆存储：基于SQLite按role_id索引，单设备读写为O(1)，
+替代原先每次整体读写 data/.memory.yaml 的方式
+"""
+
+import os
+import time
+import yaml
+import sqlite3
+import threading
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class MemoryStore:
+    """进程内共享的记忆存储，WAL模式下写入为原子事务，多连接并发保存不会损坏数据"""
+
+    def __init__(self, db_path, legacy_yaml_path=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS short_memory ("
+                "role_id TEXT PRIMARY KEY, memory TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        if legacy_yaml_path:
+            self._migrate_from_yaml(legacy_yaml_path)
+
+    def get(self, role_id):
+        """按role_id读取记忆，不存在时返回None"""
+        if role_id is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT memory FROM short_memory WHERE role_id = ?", (str(role_id),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, role_id, memory):
+        """写入单个设备的记忆"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO short_memory (role_id, memory, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(role_id) DO UPDATE SET memory = excluded.memory, "
+                "updated_at = excluded.updated_at",
+                (str(role_id), memory or "", time.time()),
+            )
+
+    def _migrate_from_yaml(self, yaml_path):
+        """一次性从旧版YAML文件迁移记忆，迁移后将原文件重命名备份"""
+        if not os.path.exists(yaml_path):
+            return
+        try:
+            with open(yaml_path, "r", encoding="utf-8") as f:
+                all_memory = yaml.safe_load(f) or {}
+            now = time.time()
+            rows = [
+                (str(role_id), memory or "", now)
+                for role_id, memory in all_memory.items()
+                if role_id is not None
+            ]
+            with self._lock, self._conn:
+                # 已存在的记录以数据库为准，避免覆盖迁移后产生的新记忆
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO short_memory (role_id, memory, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+            os.replace(yaml_path, yaml_path + ".migrated")
+            logger.bind(tag=TAG).info(
+                f"已将{len(rows)}条记忆从 {yaml_path} 迁移到 {self.db_path}"
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"迁移旧版记忆文件失败: {e}")
+
+
+def get_memory_store(db_path, legacy_yaml_path=None):
+    """获取指定路径的共享存储实例，同一路径只打开一次"""
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = MemoryStore(db_path, legacy_yaml_path)
+            _stores[db_path] = store
+        return store
@@ -0,0 +1,149 @@
+"""
+本地向量检索记忆：按设备保存记忆条目及其向量，查询时只返回与当前问题最相关的top-k条，
+全部在本地CPU完成，无需网络请求
+"""
+
+import re
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from ..base import MemoryProviderBase, logger
+from config.config_loader import get_project_dir
+from .vector_index import VectorIndex, HashingEmbedder, SentenceTransformerEmbedder
+
+TAG = __name__
+
+fact_extract_prompt = """
+你是一个记忆提取助手，从对话中提取关于user的、值得长期记住的事实，遵循以下规则：
+1、每条事实是一句独立完整的短句，例如"用户叫张三"、"用户养了一只猫"
+2、只提取用户本身的信息、偏好、经历和计划，不要提取天气、时间、设备操控、播放音乐等内容
+3、没有值得记住的信息时返回空数组
+4、只返回JSON字符串数组，不需要解释、注释和说明
+"""
+
+
+class _IndexEntry:
+    """缓存中的索引及正在使用它的操作数，使用中的索引不会被淘汰"""
+
+    __slots__ = ("index", "refs")
+
+    def __init__(self, index):
+        self.index = index
+        self.refs = 0
+
+
+class MemoryProvider(MemoryProviderBase):
+    # 进程内共享的索引缓存，所有连接共用同一设备的索引
+    _indexes = OrderedDict()
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, config, summary_memory=None):
+        super().__init__(config)
+        self.top_k = int(config.get("top_k", 5))
+        self.min_score = float(config.get("min_score", 0.2))
+        # 与已有记忆相似度高于该值时视为重复，不再写入
+        self.dedup_score = float(config.get("dedup_score", 0.92))
+        self.max_cached_indexes = int(config.get("max_cached_indexes", 1000))
+        self.data_dir = get_project_dir() + config.get(
+            "data_dir", "data/memory_vector"
+        )
+        model_dir = config.get("model_dir")
+        if model_dir:
+            self.embedder = SentenceTransformerEmbedder(model_dir)
+        else:
+            self.embedder = HashingEmbedder(int(config.get("dim", 512)))
+        logger.bind(tag=TAG).info(
+            f"本地向量记忆已加载，向量维度: {self.embedder.dim}，top_k: {self.top_k}"
+        )
+
+    @contextmanager
+    def _lease_index(self, role_id):
+        """在一次读写期间占用设备的索引
+
+        同一设备同一时刻只能有一个VectorIndex对象，否则两个对象会分配相同的行并互相覆盖向量，
+        所以只淘汰没有被占用的索引
+        """
+        safe_id = re.sub(r"[^0-9A-Za-z_\-]", "_", str(role_id))
+        with self._indexes_lock:
+            entry = self._indexes.get(safe_id)
+            if entry is None:
+                entry = _IndexEntry(
+                    VectorIndex(f"{self.data_dir}/{safe_id}", self.embedder.dim)
+                )
+                self._indexes[safe_id] = entry
+            else:
+                self._indexes.move_to_end(safe_id)
+            entry.refs += 1
+        try:
+            yield entry.index
+        finally:
+            with self._indexes_lock:
+                entry.refs -= 1
+                self._evict_locked()
+
+    def _evict_locked(self):
+        excess = len(self._indexes) - self.max_cached_indexes
+        if excess <= 0:
+            return
+        idle = [key for key, entry in self._indexes.items() if entry.refs == 0]
+        for safe_id in idle[:excess]:
+            del self._indexes[safe_id]
+
+    def _extract_facts(self, msgs):
+        """优先由LLM提取事实，LLM不可用时退化为保存用户的原话"""
+        user_texts = [
+            msg.content for msg in msgs if msg.role == "user" and msg.content
+        ]
+        llm = getattr(self, "llm", None)
+        if llm is None:
+            return user_texts
+        dialogue = ""
+        for msg in msgs:
+            if msg.role == "user":
+                dialogue += f"User: {msg.content}\n"
+            elif msg.role == "assistant":
+                dialogue += f"Assistant: {msg.content}\n"
+        result = llm.response_no_stream(
+            fact_extract_prompt, dialogue, max_tokens=1000, temperature=0.2
+        )
+        start, end = result.find("["), result.rfind("]")
+        try:
+            facts = json.loads(result[start : end + 1])
+            return [str(fact).strip() for fact in facts if str(fact).strip()]
+        except Exception:
+            logger.bind(tag=TAG).warning(f"记忆提取结果无法解析: {result}")
+            return user_texts
+
+    async def save_memory(self, msgs):
+        if self.role_id is None or len(msgs) < 2:
+            return None
+        facts = self._extract_facts(msgs)
+        if not facts:
+            return None
+        vectors = self.embedder.embed(facts)
+        new_facts, new_vectors = [], []
+        with self._lease_index(self.role_id) as index:
+            for fact, vector in zip(facts, vectors):
+                hits = index.search(vector, 1)
+                if hits and hits[0][0] >= self.dedup_score:
+                    continue
+                if any(float(vector @ v) >= self.dedup_score for v in new_vectors):
+                    continue
+                new_facts.append(fact)
+                new_vectors.append(vector)
+            if new_facts:
+                index.add(new_facts, new_vectors)
+        logger.bind(tag=TAG).info(
+            f"Save memory successful - Role: {self.role_id}, 新增{len(new_facts)}条"
+        )
+        return new_facts
+
+    async def query_memory(self, query: str) -> str:
+        if self.role_id is None or not query:
+            return ""
+        vector = self.embedder.embed([query])[0]
+        with self._lease_index(self.role_id) as index:
+            hits = index.search(vector, self.top_k)
+        facts = [text for score, text in hits if score >= self.min_score]
+        return "\n".join(f"- {fact}" for fact in facts)
@@ -0,0 +1,127 @@
+"""
+单设备的向量记忆索引：向量保存在内存映射的numpy矩阵中，按行追加，
+记忆条目保存在同目录的jsonl文件中，新增条目无需重建索引
+"""
+
+import os
+import json
+import zlib
+import threading
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+FACTS_FILE = "facts.jsonl"
+
+
+class HashingEmbedder:
+    """基于字符n-gram哈希的轻量向量化，纯CPU、无需下载模型，适合中文短句"""
+
+    def __init__(self, dim=512, ngram_range=(1, 2)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            text = "".join(str(text).lower().split())
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(len(text) - n + 1):
+                    h = zlib.crc32(text[i : i + n].encode("utf-8"))
+                    vectors[row, h % self.dim] += 1.0
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """本地句向量模型，需要安装sentence_transformers并下载模型到model_dir"""
+
+    def __init__(self, model_dir):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_dir, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), convert_to_numpy=True)
+        return _normalize(vectors.astype(np.float32))
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    def __init__(self, directory, dim, initial_capacity=64):
+        self.directory = directory
+        self.dim = dim
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.facts = []
+        facts_path = os.path.join(directory, FACTS_FILE)
+        if os.path.exists(facts_path):
+            with open(facts_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.facts.append(json.loads(line)["text"])
+
+        vectors_path = os.path.join(directory, VECTORS_FILE)
+        self.matrix = None
+        if os.path.exists(vectors_path):
+            matrix = np.load(vectors_path, mmap_mode="r+")
+            if matrix.ndim == 2 and matrix.shape[1] == dim:
+                self.matrix = matrix
+        if self.matrix is None:
+            # 向量维度变化（更换模型）时重新建立索引
+            self.facts = []
+            if os.path.exists(facts_path):
+                os.remove(facts_path)
+            self.matrix = self._create_matrix(initial_capacity)
+        # 条目文件写入后进程中断时，以两者中较小的数量为准
+        self.count = min(len(self.facts), self.matrix.shape[0])
+        self.facts = self.facts[: self.count]
+
+    def _create_matrix(self, capacity):
+        return np.lib.format.open_memmap(
+            os.path.join(self.directory, VECTORS_FILE),
+            mode="w+",
+            dtype=np.float32,
+            shape=(capacity, self.dim),
+        )
+
+    def _ensure_capacity(self, size):
+        if size <= self.matrix.shape[0]:
+            return
+        capacity = self.matrix.shape[0]
+        while capacity < size:
+            capacity *= 2
+        old = np.array(self.matrix[: self.count])
+        del self.matrix
+        self.matrix = self._create_matrix(capacity)
+        self.matrix[: self.count] = old
+
+    def add(self, texts, vectors):
+        """追加条目，只写入新增的行"""
+        with self.lock:
+            self._ensure_capacity(self.count + len(texts))
+            self.matrix[self.count : self.count + len(texts)] = vectors
+            self.matrix.flush()
+            with open(
+                os.path.join(self.directory, FACTS_FILE), "a", encoding="utf-8"
+            ) as f:
+                for text in texts:
+                    f.write(json.dumps({"text": text}, ensure_ascii=False) + "\n")
+            self.facts.extend(texts)
+            self.count += len(texts)
+
+    def search(self, vector, top_k):
+        """返回 [(score, text)]，按相似度降序"""
+        with self.lock:
+            if self.count == 0:
+                return []
+            scores = self.matrix[: self.count] @ vector
+            k = min(top_k, self.count)
+            indices = np.argpartition(-scores, k - 1)[:k]
+            indices = indices[np.argsort(-scores[indices])]
+            return [(float(scores[i]), self.facts[i]) for i in indices]
@@ -2,5 +2,19 @@
 
 from .tool_types import ToolType, ToolDefinition
 from .tool_executor import ToolExecutor
+from .tool_cache import (
+    fingerprint,
+    intern_iot_tools,
+    intern_function_descriptions,
+    get_intent_prompt,
+)
 
-__all__ = ["ToolType", "ToolDefinition", "ToolExecutor"]
+__all__ = [
+    "ToolType",
+    "ToolDefinition",
+    "ToolExecutor",
+    "fingerprint",
+    "intern_iot_tools",
+    "intern_function_descriptions",
+    "get_intent_prompt",
+]
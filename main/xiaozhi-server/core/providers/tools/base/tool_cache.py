@@ -0,0 +1,66 @@
+"""
+工具描述的进程级驻留缓存
+
+同一固件的设备上报的IoT描述、MCP工具列表完全相同，插件列表只取决于配置，
+因此按工具集指纹缓存，所有连接共用同一份结果：
+1. IoT描述生成的工具定义
+2. 函数描述列表
+3. 意图识别的系统提示词
+
+缓存中的对象被多个连接同时引用，调用方只能读取，不能修改。
+"""
+
+import json
+import hashlib
+from typing import Any, Callable, Dict, List, Tuple
+
+from core.utils.cache.manager import cache_manager, CacheType
+from .tool_types import ToolDefinition
+
+IOT_NAMESPACE = "iot"
+FUNCTIONS_NAMESPACE = "functions"
+INTENT_PROMPT_NAMESPACE = "intent_prompt"
+
+
+def fingerprint(data: Any) -> str:
+    """计算工具描述的指纹，内容相同的描述得到相同的指纹"""
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def intern_iot_tools(
+    descriptors: List[Dict[str, Any]],
+    build: Callable[[List[Dict[str, Any]]], Dict[str, ToolDefinition]],
+) -> Dict[str, ToolDefinition]:
+    """按设备描述的指纹获取生成好的IoT工具定义，相同描述只生成一次"""
+    return cache_manager.get_or_compute(
+        CacheType.TOOL_SCHEMA,
+        fingerprint(descriptors),
+        lambda: build(descriptors),
+        namespace=IOT_NAMESPACE,
+    )
+
+
+def intern_function_descriptions(
+    tools: Dict[str, ToolDefinition],
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """返回工具集指纹和共享的函数描述列表"""
+    descriptions = [tool.description for tool in tools.values()]
+    key = fingerprint(descriptions)
+    shared = cache_manager.get_or_compute(
+        CacheType.TOOL_SCHEMA,
+        key,
+        lambda: descriptions,
+        namespace=FUNCTIONS_NAMESPACE,
+    )
+    return key, shared
+
+
+def get_intent_prompt(tools_key: str, build: Callable[[], str]) -> str:
+    """按工具集指纹获取意图识别的系统提示词，不同工具集的连接互不影响"""
+    return cache_manager.get_or_compute(
+        CacheType.TOOL_SCHEMA,
+        tools_key,
+        build,
+        namespace=INTENT_PROMPT_NAMESPACE,
+    )
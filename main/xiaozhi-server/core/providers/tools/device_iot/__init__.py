@@ -3,10 +3,12 @@
 from .iot_descriptor import IotDescriptor
 from .iot_handler import handleIotDescriptors, handleIotStatus
 from .iot_executor import DeviceIoTExecutor
+from .iot_state import IotStateTracker
 
 __all__ = [
     "IotDescriptor",
     "handleIotDescriptors",
     "handleIotStatus",
     "DeviceIoTExecutor",
+    "IotStateTracker",
 ]
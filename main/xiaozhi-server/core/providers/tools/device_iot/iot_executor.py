@@ -1,11 +1,14 @@
 """设备端IoT工具执行器"""
 
 import json
-import asyncio
 from typing import Dict, Any
-from ..base import ToolType, ToolDefinition, ToolExecutor
+from config.logger import setup_logging
+from ..base import ToolType, ToolDefinition, ToolExecutor, intern_iot_tools
 from plugins_func.register import Action, ActionResponse
 
+TAG = __name__
+logger = setup_logging()
+
 
 class DeviceIoTExecutor(ToolExecutor):
     """设备端IoT工具执行器"""
@@ -65,13 +68,14 @@ class DeviceIoTExecutor(ToolExecutor):
                         if k not in ["response_success", "response_failure"]
                     }
 
-                    # 发送IoT控制命令
-                    await self._send_iot_command(
+                    # 发送IoT控制命令，设备上报状态即视为确认
+                    confirmed = await self._send_iot_command(
                         device_name, method_name, control_params
                     )
-
-                    # 等待状态更新
-                    await asyncio.sleep(0.1)
+                    if not confirmed:
+                        logger.bind(tag=TAG).debug(
+                            f"设备未在超时时间内确认IoT命令: {tool_name}"
+                        )
 
                     response_success = arguments.get("response_success", "操作成功")
 
@@ -100,7 +104,14 @@ class DeviceIoTExecutor(ToolExecutor):
             return ActionResponse(action=Action.ERROR, response=response_failure)
 
     async def _get_iot_status(self, device_name: str, property_name: str):
-        """获取IoT设备状态"""
+        """获取IoT设备状态
+
+        设备从未上报过状态时描述中的默认值只是占位，有未确认的命令时上报的值可能已过时，
+        这两种情况下最多等待iot_state_timeout，其余直接返回已上报的值
+        """
+        tracker = self.conn.iot_state
+        if not tracker.has_reported(device_name) or tracker.is_pending(device_name):
+            await tracker.wait_for_update(device_name)
         for key, value in self.conn.iot_descriptors.items():
             if key.lower() == device_name.lower():
                 for property_item in value.properties:
@@ -110,8 +121,8 @@ class DeviceIoTExecutor(ToolExecutor):
 
     async def _send_iot_command(
         self, device_name: str, method_name: str, parameters: Dict[str, Any]
-    ):
-        """发送IoT控制命令"""
+    ) -> bool:
+        """发送IoT控制命令，返回设备是否在超时时间内上报了状态"""
         for key, value in self.conn.iot_descriptors.items():
             if key.lower() == device_name.lower():
                 for method in value.methods:
@@ -127,112 +138,126 @@ class DeviceIoTExecutor(ToolExecutor):
                         send_message = json.dumps(
                             {"type": "iot", "commands": [command]}
                         )
-                        await self.conn.websocket.send(send_message)
-                        return
+                        # 先登记再发送，避免确认消息先于等待到达
+                        tracker = self.conn.iot_state
+                        future = tracker.expect_update(key)
+                        try:
+                            await self.conn.websocket.send(send_message)
+                        except Exception:
+                            tracker.discard(future)
+                            raise
+                        return await tracker.wait(future)
 
         raise Exception(f"未找到设备{device_name}的方法{method_name}")
 
     def register_iot_tools(self, descriptors: list):
-        """注册IoT工具"""
-        for descriptor in descriptors:
-            device_name = descriptor["name"]
-            device_desc = descriptor["description"]
-
-            # 注册查询工具
-            if "properties" in descriptor:
-                for prop_name, prop_info in descriptor["properties"].items():
-                    tool_name = f"get_{device_name.lower()}_{prop_name.lower()}"
-
-                    tool_desc = {
-                        "type": "function",
-                        "function": {
-                            "name": tool_name,
-                            "description": f"查询{device_desc}的{prop_info['description']}",
-                            "parameters": {
-                                "type": "object",
-                                "properties": {
-                                    "response_success": {
-                                        "type": "string",
-                                        "description": f"查询成功时的友好回复，必须使用{{value}}作为占位符表示查询到的值",
-                                    },
-                                    "response_failure": {
-                                        "type": "string",
-                                        "description": f"查询失败时的友好回复",
-                                    },
-                                },
-                                "required": ["response_success", "response_failure"],
-                            },
-                        },
-                    }
+        """注册IoT工具，相同的设备描述只生成一次工具定义"""
+        self.iot_tools.update(intern_iot_tools(descriptors, build_iot_tools))
 
-                    self.iot_tools[tool_name] = ToolDefinition(
-                        name=tool_name,
-                        description=tool_desc,
-                        tool_type=ToolType.DEVICE_IOT,
-                    )
+    def get_tools(self) -> Dict[str, ToolDefinition]:
+        """获取所有设备端IoT工具"""
+        return self.iot_tools.copy()
+
+    def has_tool(self, tool_name: str) -> bool:
+        """检查是否有指定的设备端IoT工具"""
+        return tool_name in self.iot_tools
 
-            # 注册控制工具
-            if "methods" in descriptor:
-                for method_name, method_info in descriptor["methods"].items():
-                    tool_name = f"{device_name.lower()}_{method_name.lower()}"
-
-                    # 构建参数
-                    parameters = {}
-                    required_params = []
-
-                    # 添加方法的原始参数
-                    if "parameters" in method_info:
-                        parameters.update(
-                            {
-                                param_name: {
-                                    "type": param_info["type"],
-                                    "description": param_info["description"],
-                                }
-                                for param_name, param_info in method_info[
-                                    "parameters"
-                                ].items()
-                            }
-                        )
-                        required_params.extend(method_info["parameters"].keys())
 
-                    # 添加响应参数
+def build_iot_tools(descriptors: list) -> Dict[str, ToolDefinition]:
+    """根据设备上报的IoT描述生成工具定义"""
+    iot_tools: Dict[str, ToolDefinition] = {}
+    for descriptor in descriptors:
+        device_name = descriptor["name"]
+        device_desc = descriptor["description"]
+
+        # 注册查询工具
+        if "properties" in descriptor:
+            for prop_name, prop_info in descriptor["properties"].items():
+                tool_name = f"get_{device_name.lower()}_{prop_name.lower()}"
+
+                tool_desc = {
+                    "type": "function",
+                    "function": {
+                        "name": tool_name,
+                        "description": f"查询{device_desc}的{prop_info['description']}",
+                        "parameters": {
+                            "type": "object",
+                            "properties": {
+                                "response_success": {
+                                    "type": "string",
+                                    "description": f"查询成功时的友好回复，必须使用{{value}}作为占位符表示查询到的值",
+                                },
+                                "response_failure": {
+                                    "type": "string",
+                                    "description": f"查询失败时的友好回复",
+                                },
+                            },
+                            "required": ["response_success", "response_failure"],
+                        },
+                    },
+                }
+
+                iot_tools[tool_name] = ToolDefinition(
+                    name=tool_name,
+                    description=tool_desc,
+                    tool_type=ToolType.DEVICE_IOT,
+                )
+
+        # 注册控制工具
+        if "methods" in descriptor:
+            for method_name, method_info in descriptor["methods"].items():
+                tool_name = f"{device_name.lower()}_{method_name.lower()}"
+
+                # 构建参数
+                parameters = {}
+                required_params = []
+
+                # 添加方法的原始参数
+                if "parameters" in method_info:
                     parameters.update(
                         {
-                            "response_success": {
-                                "type": "string",
-                                "description": "操作成功时的友好回复",
-                            },
-                            "response_failure": {
-                                "type": "string",
-                                "description": "操作失败时的友好回复",
-                            },
+                            param_name: {
+                                "type": param_info["type"],
+                                "description": param_info["description"],
+                            }
+                            for param_name, param_info in method_info[
+                                "parameters"
+                            ].items()
                         }
                     )
-                    required_params.extend(["response_success", "response_failure"])
-
-                    tool_desc = {
-                        "type": "function",
-                        "function": {
-                            "name": tool_name,
-                            "description": f"{device_desc} - {method_info['description']}",
-                            "parameters": {
-                                "type": "object",
-                                "properties": parameters,
-                                "required": required_params,
-                            },
+                    required_params.extend(method_info["parameters"].keys())
+
+                # 添加响应参数
+                parameters.update(
+                    {
+                        "response_success": {
+                            "type": "string",
+                            "description": "操作成功时的友好回复",
+                        },
+                        "response_failure": {
+                            "type": "string",
+                            "description": "操作失败时的友好回复",
                         },
                     }
-
-                    self.iot_tools[tool_name] = ToolDefinition(
-                        name=tool_name,
-                        description=tool_desc,
-                        tool_type=ToolType.DEVICE_IOT,
-                    )
-
-    def get_tools(self) -> Dict[str, ToolDefinition]:
-        """获取所有设备端IoT工具"""
-        return self.iot_tools.copy()
-
-    def has_tool(self, tool_name: str) -> bool:
-        """检查是否有指定的设备端IoT工具"""
-        return tool_name in self.iot_tools
+                )
+                required_params.extend(["response_success", "response_failure"])
+
+                tool_desc = {
+                    "type": "function",
+                    "function": {
+                        "name": tool_name,
+                        "description": f"{device_desc} - {method_info['description']}",
+                        "parameters": {
+                            "type": "object",
+                            "properties": parameters,
+                            "required": required_params,
+                        },
+                    },
+                }
+
+                iot_tools[tool_name] = ToolDefinition(
+                    name=tool_name,
+                    description=tool_desc,
+                    tool_type=ToolType.DEVICE_IOT,
+                )
+    return iot_tools
@@ -81,3 +81,5 @@ async def handleIotStatus(conn, states):
                                 )
                             break
                 break
+        # 唤醒等待该设备确认的命令和查询
+        conn.iot_state.notify(state["name"])
@@ -0,0 +1,58 @@
+"""IoT设备状态跟踪，设备上报状态时唤醒等待中的命令和查询"""
+
+import asyncio
+from typing import Dict, List
+
+
+class IotStateTracker:
+    """按设备名登记等待者，收到设备的iot状态消息后立即唤醒"""
+
+    def __init__(self, timeout: float = 0.25):
+        # 等待设备确认的最长时间(秒)
+        self.timeout = timeout
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        # 至少上报过一次状态的设备
+        self._reported = set()
+
+    def expect_update(self, device_name: str) -> asyncio.Future:
+        """发送命令前登记，避免确认消息先于等待到达"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(device_name.lower(), []).append(future)
+        return future
+
+    async def wait(self, future: asyncio.Future) -> bool:
+        """等待设备上报状态，超时返回False"""
+        try:
+            await asyncio.wait_for(future, self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.discard(future)
+
+    async def wait_for_update(self, device_name: str) -> bool:
+        return await self.wait(self.expect_update(device_name))
+
+    def has_reported(self, device_name: str) -> bool:
+        return device_name.lower() in self._reported
+
+    def is_pending(self, device_name: str) -> bool:
+        """设备是否有尚未确认的命令"""
+        return bool(self._waiters.get(device_name.lower()))
+
+    def notify(self, device_name: str):
+        """设备上报了状态，唤醒所有等待该设备的命令和查询"""
+        key = device_name.lower()
+        self._reported.add(key)
+        for future in self._waiters.pop(key, ()):
+            if not future.done():
+                future.set_result(True)
+
+    def discard(self, future: asyncio.Future):
+        """取消登记的等待"""
+        for key, waiters in list(self._waiters.items()):
+            if future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[key]
+                return
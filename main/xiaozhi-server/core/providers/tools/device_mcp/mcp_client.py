@@ -1,13 +1,71 @@
-"""设备端MCP客户端定义"""
+"""设备端MCP客户端定义
 
+- 请求id由计数器分配，挂起请求登记在字典中，都在事件循环线程内完成，无需加锁
+- 所有设备的挂起请求由一个进程级时间轮统一检查超时，超时的请求立即清理
+- 设备支持时，同一时刻发起的多个工具调用合并为一个JSON-RPC批量请求
+- 记录每个设备的RPC调用次数和耗时，连接关闭时输出到日志；耗时和进程级计数通过/metrics导出
+"""
+
+import math
+import time
 import asyncio
-from concurrent.futures import Future
+import weakref
+import itertools
+from collections import deque
+from typing import Any, Dict, List, Optional
 from core.utils.util import sanitize_tool_name
+from core.utils.telemetry import get_telemetry
 from config.logger import setup_logging
 
 TAG = __name__
 logger = setup_logging()
 
+MCP_INITIALIZE_ID = 1
+MCP_TOOLS_LIST_ID = 2
+# 小于该值的id保留给初始化和工具列表请求
+FIRST_REQUEST_ID = 10
+
+# 进程内所有设备的累计计数，连接关闭后也保留，供/metrics导出
+_totals = {"calls": 0, "errors": 0, "timeouts": 0, "batches": 0}
+
+
+def totals() -> Dict[str, int]:
+    return dict(_totals)
+
+
+class _TimeoutWheel:
+    """挂起请求的超时时间轮，按tick分槽，每个tick只处理到期的槽"""
+
+    def __init__(self, tick: float = 0.5):
+        self.tick = tick
+        # 槽号 -> [(客户端弱引用, 请求id)]
+        self._slots: Dict[int, List[tuple]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def schedule(self, client: "MCPClient", request_id: int, timeout: float):
+        slot = math.ceil((time.monotonic() + timeout) / self.tick)
+        self._slots.setdefault(slot, []).append((weakref.ref(client), request_id))
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        cursor = int(time.monotonic() / self.tick)
+        while self._slots:
+            await asyncio.sleep(self.tick)
+            current = int(time.monotonic() / self.tick)
+            while cursor <= current:
+                for client_ref, request_id in self._slots.pop(cursor, ()):
+                    client = client_ref()
+                    if client is not None:
+                        client.expire_call(request_id)
+                cursor += 1
+
+
+_timeout_wheel = _TimeoutWheel()
+
 
 class MCPClient:
     """设备端MCP客户端，用于管理MCP状态和工具"""
@@ -16,10 +74,17 @@ class MCPClient:
         self.tools = {}  # sanitized_name -> tool_data
         self.name_mapping = {}
         self.ready = False
-        self.call_results = {}  # To store Futures for tool call responses
-        self.next_id = 1
-        self.lock = asyncio.Lock()
+        self.call_results: Dict[int, asyncio.Future] = {}
+        # 设备在初始化响应中声明支持批量请求时为True
+        self.supports_batch = False
+        self._ids = itertools.count(FIRST_REQUEST_ID)
+        self._sent_at: Dict[int, float] = {}
+        self._tools_list_ids = set()
+        self._batch: Optional[List[dict]] = None
+        self.flush_task: Optional[asyncio.Task] = None
         self._cached_available_tools = None  # Cache for get_available_tools
+        self._stats = {"calls": 0, "errors": 0, "timeouts": 0, "batches": 0}
+        self._latencies = deque(maxlen=256)
 
     def has_tool(self, name: str) -> bool:
         return name in self.tools
@@ -47,47 +112,111 @@ class MCPClient:
         return result
 
     async def is_ready(self) -> bool:
-        async with self.lock:
-            return self.ready
+        return self.ready
 
     async def set_ready(self, status: bool):
-        async with self.lock:
-            self.ready = status
+        self.ready = status
 
-    async def add_tool(self, tool_data: dict):
-        async with self.lock:
+    def add_tools(self, tools: List[dict]):
+        for tool_data in tools:
             sanitized_name = sanitize_tool_name(tool_data["name"])
             self.tools[sanitized_name] = tool_data
             self.name_mapping[sanitized_name] = tool_data["name"]
-            self._cached_available_tools = (
-                None  # Invalidate the cache when a tool is added
-            )
-
-    async def get_next_id(self) -> int:
-        async with self.lock:
-            current_id = self.next_id
-            self.next_id += 1
-            return current_id
-
-    async def register_call_result_future(self, id: int, future: Future):
-        async with self.lock:
-            self.call_results[id] = future
-
-    async def resolve_call_result(self, id: int, result: any):
-        async with self.lock:
-            if id in self.call_results:
-                future = self.call_results.pop(id)
-                if not future.done():
-                    future.set_result(result)
-
-    async def reject_call_result(self, id: int, exception: Exception):
-        async with self.lock:
-            if id in self.call_results:
-                future = self.call_results.pop(id)
-                if not future.done():
-                    future.set_exception(exception)
-
-    async def cleanup_call_result(self, id: int):
-        async with self.lock:
-            if id in self.call_results:
-                self.call_results.pop(id)
+        # Invalidate the cache when tools are added
+        self._cached_available_tools = None
+
+    def add_tool(self, tool_data: dict):
+        self.add_tools([tool_data])
+
+    def allocate_id(self) -> int:
+        return next(self._ids)
+
+    def track_tools_list(self, request_id: int):
+        """登记工具列表请求的id，分页请求各自使用不同的id"""
+        self._tools_list_ids.add(request_id)
+
+    def is_tools_list_response(self, request_id: int) -> bool:
+        if request_id in self._tools_list_ids:
+            self._tools_list_ids.discard(request_id)
+            return True
+        return False
+
+    def register_call(self, request_id: int, timeout: float) -> asyncio.Future:
+        """登记挂起的请求，超时由时间轮统一处理"""
+        future = asyncio.get_running_loop().create_future()
+        self.call_results[request_id] = future
+        self._sent_at[request_id] = time.monotonic()
+        self._count("calls")
+        _timeout_wheel.schedule(self, request_id, timeout)
+        return future
+
+    def _finish(self, request_id: int) -> Optional[asyncio.Future]:
+        future = self.call_results.pop(request_id, None)
+        sent_at = self._sent_at.pop(request_id, None)
+        if sent_at is not None:
+            latency = time.monotonic() - sent_at
+            self._latencies.append(latency)
+            get_telemetry().observe("device_mcp_rpc", latency)
+        return future
+
+    def resolve_call_result(self, request_id: int, result: Any):
+        future = self._finish(request_id)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def reject_call_result(self, request_id: int, exception: Exception):
+        future = self._finish(request_id)
+        if future is not None and not future.done():
+            self._count("errors")
+            future.set_exception(exception)
+
+    def expire_call(self, request_id: int):
+        future = self.call_results.pop(request_id, None)
+        self._sent_at.pop(request_id, None)
+        if future is not None and not future.done():
+            self._count("timeouts")
+            future.set_exception(asyncio.TimeoutError())
+
+    def cleanup_call_result(self, request_id: int):
+        self.call_results.pop(request_id, None)
+        self._sent_at.pop(request_id, None)
+
+    def queue_batch(self, payload: dict) -> bool:
+        """加入待发送的批量请求，返回True表示调用方负责发送这一批"""
+        if self._batch is None:
+            self._batch = [payload]
+            return True
+        self._batch.append(payload)
+        return False
+
+    def take_batch(self) -> List[dict]:
+        batch, self._batch = self._batch or [], None
+        if len(batch) > 1:
+            self._count("batches")
+        return batch
+
+    def _count(self, key: str):
+        self._stats[key] += 1
+        _totals[key] += 1
+
+    def close(self):
+        """连接关闭时结束所有挂起的请求，并输出本连接的RPC统计"""
+        for request_id in list(self.call_results):
+            self.reject_call_result(request_id, ConnectionError("设备连接已关闭"))
+        if self._stats["calls"]:
+            logger.bind(tag=TAG).info(f"设备MCP调用统计: {self.metrics()}")
+
+    def metrics(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        stats = dict(self._stats)
+        stats["pending"] = len(self.call_results)
+        stats["p50_ms"] = round(percentile(0.5) * 1000, 1)
+        stats["p95_ms"] = round(percentile(0.95) * 1000, 1)
+        stats["max_ms"] = round((latencies[-1] if latencies else 0.0) * 1000, 1)
+        return stats
@@ -3,99 +3,15 @@
 import json
 import asyncio
 import re
-from concurrent.futures import Future
-from core.utils.util import get_vision_url, sanitize_tool_name
+from core.utils.util import get_vision_url
 from core.utils.auth import AuthToken
 from config.logger import setup_logging
+from .mcp_client import MCPClient, MCP_INITIALIZE_ID, MCP_TOOLS_LIST_ID
 
 TAG = __name__
 logger = setup_logging()
 
 
-class MCPClient:
-    """设备端MCP客户端，用于管理MCP状态和工具"""
-
-    def __init__(self):
-        self.tools = {}  # sanitized_name -> tool_data
-        self.name_mapping = {}
-        self.ready = False
-        self.call_results = {}  # To store Futures for tool call responses
-        self.next_id = 1
-        self.lock = asyncio.Lock()
-        self._cached_available_tools = None  # Cache for get_available_tools
-
-    def has_tool(self, name: str) -> bool:
-        return name in self.tools
-
-    def get_available_tools(self) -> list:
-        # Check if the cache is valid
-        if self._cached_available_tools is not None:
-            return self._cached_available_tools
-
-        # If cache is not valid, regenerate the list
-        result = []
-        for tool_name, tool_data in self.tools.items():
-            function_def = {
-                "name": tool_name,
-                "description": tool_data["description"],
-                "parameters": {
-                    "type": tool_data["inputSchema"].get("type", "object"),
-                    "properties": tool_data["inputSchema"].get("properties", {}),
-                    "required": tool_data["inputSchema"].get("required", []),
-                },
-            }
-            result.append({"type": "function", "function": function_def})
-
-        self._cached_available_tools = result  # Store the generated list in cache
-        return result
-
-    async def is_ready(self) -> bool:
-        async with self.lock:
-            return self.ready
-
-    async def set_ready(self, status: bool):
-        async with self.lock:
-            self.ready = status
-
-    async def add_tool(self, tool_data: dict):
-        async with self.lock:
-            sanitized_name = sanitize_tool_name(tool_data["name"])
-            self.tools[sanitized_name] = tool_data
-            self.name_mapping[sanitized_name] = tool_data["name"]
-            self._cached_available_tools = (
-                None  # Invalidate the cache when a tool is added
-            )
-
-    async def get_next_id(self) -> int:
-        async with self.lock:
-            current_id = self.next_id
-            self.next_id += 1
-            return current_id
-
-    async def register_call_result_future(self, id: int, future: Future):
-        async with self.lock:
-            self.call_results[id] = future
-
-    async def resolve_call_result(self, id: int, result: any):
-        async with self.lock:
-            if id in self.call_results:
-                future = self.call_results.pop(id)
-                if not future.done():
-                    future.set_result(result)
-
-    async def reject_call_result(self, id: int, exception: Exception):
-        async with self.lock:
-            if id in self.call_results:
-                future = self.call_results.pop(id)
-                if not future.done():
-                    future.set_exception(exception)
-
-    async def cleanup_call_result(self, id: int):
-        async with self.lock:
-            if id in self.call_results:
-                self.call_results.pop(id)
-
-
 async def send_mcp_message(conn, payload: dict):
     """Helper to send MCP messages, encapsulating common logic."""
     if not conn.features.get("mcp"):
@@ -106,14 +22,39 @@ async def send_mcp_message(conn, payload: dict):
 
     try:
         await conn.websocket.send(message)
-        logger.bind(tag=TAG).info(f"成功发送MCP消息: {message}")
+        logger.bind(tag=TAG).debug("成功发送MCP消息: {}", message)
     except Exception as e:
         logger.bind(tag=TAG).error(f"发送MCP消息失败: {e}")
 
 
+async def send_mcp_request(conn, mcp_client: MCPClient, payload: dict):
+    """发送MCP请求，设备支持批量请求时，同一时刻发起的请求合并发送"""
+    if not mcp_client.supports_batch:
+        await send_mcp_message(conn, payload)
+        return
+    if mcp_client.queue_batch(payload):
+        # 由本批第一个请求创建发送任务，发送不依赖发起请求的协程，它被取消时同批的其他请求照常发出
+        mcp_client.flush_task = asyncio.create_task(_flush_batch(conn, mcp_client))
+
+
+async def _flush_batch(conn, mcp_client: MCPClient):
+    # 新任务排在当前已就绪的回调之后执行，并行发起的其他调用已加入这一批
+    batch = mcp_client.take_batch()
+    if batch:
+        await send_mcp_message(conn, batch if len(batch) > 1 else batch[0])
+
+
 async def handle_mcp_message(conn, mcp_client: MCPClient, payload: dict):
     """处理MCP消息,包括初始化、工具列表和工具调用响应等"""
-    logger.bind(tag=TAG).info(f"处理MCP消息: {str(payload)[:100]}")
+    logger.bind(tag=TAG).opt(lazy=True).debug(
+        "处理MCP消息: {}", lambda: str(payload)[:100]
+    )
+
+    # 批量请求的响应是一个数组
+    if isinstance(payload, list):
+        for item in payload:
+            await handle_mcp_message(conn, mcp_client, item)
+        return
 
     if not isinstance(payload, dict):
         logger.bind(tag=TAG).error("MCP消息缺少payload字段或格式错误")
@@ -129,10 +70,10 @@ async def handle_mcp_message(conn, mcp_client: MCPClient, payload: dict):
             logger.bind(tag=TAG).debug(
                 f"收到工具调用响应，ID: {msg_id}, 结果: {result}"
             )
-            await mcp_client.resolve_call_result(msg_id, result)
+            mcp_client.resolve_call_result(msg_id, result)
             return
 
-        if msg_id == 1:  # mcpInitializeID
+        if msg_id == MCP_INITIALIZE_ID:
             logger.bind(tag=TAG).debug("收到MCP初始化响应")
             server_info = result.get("serverInfo")
             if isinstance(server_info, dict):
@@ -141,9 +82,16 @@ async def handle_mcp_message(conn, mcp_client: MCPClient, payload: dict):
                 logger.bind(tag=TAG).info(
                     f"客户端MCP服务器信息: name={name}, version={version}"
                 )
+            capabilities = result.get("capabilities") or {}
+            experimental = capabilities.get("experimental") or {}
+            mcp_client.supports_batch = bool(
+                capabilities.get("batch") or experimental.get("batch")
+            )
+            if mcp_client.supports_batch:
+                logger.bind(tag=TAG).info("客户端MCP支持批量请求")
             return
 
-        elif msg_id == 2:  # mcpToolsListID
+        elif mcp_client.is_tools_list_response(msg_id):
             logger.bind(tag=TAG).debug("收到MCP工具列表响应")
             if isinstance(result, dict) and "tools" in result:
                 tools_data = result["tools"]
@@ -155,6 +103,13 @@ async def handle_mcp_message(conn, mcp_client: MCPClient, payload: dict):
                     f"客户端设备支持的工具数量: {len(tools_data)}"
                 )
 
+                # 先请求下一页，设备准备下一页的同时处理本页
+                next_cursor = result.get("nextCursor", "")
+                if next_cursor:
+                    logger.bind(tag=TAG).info(f"有更多工具，nextCursor: {next_cursor}")
+                    await send_mcp_tools_list_continue_request(conn, next_cursor)
+
+                new_tools = []
                 for i, tool in enumerate(tools_data):
                     if not isinstance(tool, dict):
                         continue
@@ -176,28 +131,25 @@ async def handle_mcp_message(conn, mcp_client: MCPClient, payload: dict):
                         "description": description,
                         "inputSchema": input_schema,
                     }
-                    await mcp_client.add_tool(new_tool)
+                    new_tools.append(new_tool)
                     logger.bind(tag=TAG).debug(f"客户端工具 #{i+1}: {name}")
+                mcp_client.add_tools(new_tools)
+
+                if not next_cursor:
+                    # 所有分页都收到后，统一替换工具描述中的工具名称
+                    for tool_data in mcp_client.tools.values():
+                        if "description" in tool_data:
+                            description = tool_data["description"]
+                            # 遍历所有工具名称进行替换
+                            for (
+                                sanitized_name,
+                                original_name,
+                            ) in mcp_client.name_mapping.items():
+                                description = description.replace(
+                                    original_name, sanitized_name
+                                )
+                            tool_data["description"] = description
 
-                # 替换所有工具描述中的工具名称
-                for tool_data in mcp_client.tools.values():
-                    if "description" in tool_data:
-                        description = tool_data["description"]
-                        # 遍历所有工具名称进行替换
-                        for (
-                            sanitized_name,
-                            original_name,
-                        ) in mcp_client.name_mapping.items():
-                            description = description.replace(
-                                original_name, sanitized_name
-                            )
-                        tool_data["description"] = description
-
-                next_cursor = result.get("nextCursor", "")
-                if next_cursor:
-                    logger.bind(tag=TAG).info(f"有更多工具，nextCursor: {next_cursor}")
-                    await send_mcp_tools_list_continue_request(conn, next_cursor)
-                else:
                     await mcp_client.set_ready(True)
                     logger.bind(tag=TAG).info("所有工具已获取，MCP客户端准备就绪")
 
@@ -219,9 +171,7 @@ async def handle_mcp_message(conn, mcp_client: MCPClient, payload: dict):
 
         msg_id = int(payload.get("id", 0))
         if msg_id in mcp_client.call_results:
-            await mcp_client.reject_call_result(
-                msg_id, Exception(f"MCP错误: {error_msg}")
-            )
+            mcp_client.reject_call_result(msg_id, Exception(f"MCP错误: {error_msg}"))
 
 
 async def send_mcp_initialize_message(conn):
@@ -240,7 +190,7 @@ async def send_mcp_initialize_message(conn):
 
     payload = {
         "jsonrpc": "2.0",
-        "id": 1,  # mcpInitializeID
+        "id": MCP_INITIALIZE_ID,
         "method": "initialize",
         "params": {
             "protocolVersion": "2024-11-05",
@@ -261,9 +211,10 @@ async def send_mcp_initialize_message(conn):
 
 async def send_mcp_tools_list_request(conn):
     """发送MCP工具列表请求"""
+    conn.mcp_client.track_tools_list(MCP_TOOLS_LIST_ID)
     payload = {
         "jsonrpc": "2.0",
-        "id": 2,  # mcpToolsListID
+        "id": MCP_TOOLS_LIST_ID,
         "method": "tools/list",
     }
     logger.bind(tag=TAG).debug("发送MCP工具列表请求")
@@ -272,9 +223,12 @@ async def send_mcp_tools_list_request(conn):
 
 async def send_mcp_tools_list_continue_request(conn, cursor: str):
     """发送带有cursor的MCP工具列表请求"""
+    # 每一页使用独立的id，避免与上一页的响应混淆
+    request_id = conn.mcp_client.allocate_id()
+    conn.mcp_client.track_tools_list(request_id)
     payload = {
         "jsonrpc": "2.0",
-        "id": 2,  # mcpToolsListID (same ID for continuation)
+        "id": request_id,
         "method": "tools/list",
         "params": {"cursor": cursor},
     }
@@ -294,10 +248,6 @@ async def call_mcp_tool(
     if not mcp_client.has_tool(tool_name):
         raise ValueError(f"工具 {tool_name} 不存在")
 
-    tool_call_id = await mcp_client.get_next_id()
-    result_future = asyncio.Future()
-    await mcp_client.register_call_result_future(tool_call_id, result_future)
-
     # 处理参数
     try:
         if isinstance(args, str):
@@ -348,6 +298,10 @@ async def call_mcp_tool(
             raise ValueError(f"参数处理失败: {str(e)}")
         raise e
 
+    # 参数校验通过后才登记请求，参数错误不会留下挂起的请求
+    tool_call_id = mcp_client.allocate_id()
+    result_future = mcp_client.register_call(tool_call_id, timeout)
+
     actual_name = mcp_client.name_mapping.get(tool_name, tool_name)
     payload = {
         "jsonrpc": "2.0",
@@ -357,11 +311,11 @@ async def call_mcp_tool(
     }
 
     logger.bind(tag=TAG).info(f"发送客户端mcp工具调用请求: {actual_name}，参数: {args}")
-    await send_mcp_message(conn, payload)
 
     try:
-        # Wait for response or timeout
-        raw_result = await asyncio.wait_for(result_future, timeout=timeout)
+        await send_mcp_request(conn, mcp_client, payload)
+        # 超时由时间轮统一处理
+        raw_result = await result_future
         logger.bind(tag=TAG).info(
             f"客户端mcp工具调用 {actual_name} 成功，原始结果: {raw_result}"
         )
@@ -381,8 +335,6 @@ async def call_mcp_tool(
         # 如果结果不是预期的格式，将其转换为字符串
         return str(raw_result)
     except asyncio.TimeoutError:
-        await mcp_client.cleanup_call_result(tool_call_id)
         raise TimeoutError("工具调用请求超时")
-    except Exception as e:
-        await mcp_client.cleanup_call_result(tool_call_id)
-        raise e
+    finally:
+        mcp_client.cleanup_call_result(tool_call_id)
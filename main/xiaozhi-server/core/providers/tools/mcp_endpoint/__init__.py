@@ -9,6 +9,7 @@ from .mcp_endpoint_handler import (
     send_mcp_endpoint_tools_list,
     call_mcp_endpoint_tool,
 )
+from .mcp_endpoint_manager import MCPEndpointManager, get_mcp_endpoint_manager
 
 __all__ = [
     "MCPEndpointExecutor",
@@ -18,4 +19,6 @@ __all__ = [
     "send_mcp_endpoint_notification",
     "send_mcp_endpoint_tools_list",
     "call_mcp_endpoint_tool",
+    "MCPEndpointManager",
+    "get_mcp_endpoint_manager",
 ]
@@ -1,7 +1,16 @@
-"""MCP接入点客户端定义"""
+"""MCP接入点客户端定义
 
+同一接入点地址的所有设备连接共用一个客户端：
+- 工具列表只获取一次，所有连接读取同一份
+- 请求id由计数器分配，各连接的调用按id区分响应，都在事件循环线程内完成，无需加锁
+- 工具列表变化时通知已接入的连接刷新函数列表
+"""
+
+import time
 import asyncio
-from concurrent.futures import Future
+import weakref
+import itertools
+from typing import Any, Dict, List
 from core.utils.util import sanitize_tool_name
 from config.logger import setup_logging
 
@@ -12,16 +21,19 @@ logger = setup_logging()
 class MCPEndpointClient:
     """MCP接入点客户端，用于管理MCP接入点状态和工具"""
 
-    def __init__(self, conn=None):
-        self.conn = conn
+    def __init__(self, url: str = ""):
+        self.url = url
         self.tools = {}  # sanitized_name -> tool_data
         self.name_mapping = {}
         self.ready = False
-        self.call_results = {}  # To store Futures for tool call responses
-        self.next_id = 1
-        self.lock = asyncio.Lock()
+        self.call_results: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
         self._cached_available_tools = None  # Cache for get_available_tools
         self.websocket = None  # WebSocket连接
+        # 使用该接入点的设备连接，连接对象释放后自动移除
+        self.conns = weakref.WeakSet()
+        self.last_used = time.monotonic()
+        self._stats = {"calls": 0, "errors": 0, "timeouts": 0, "reconnects": 0}
 
     def has_tool(self, name: str) -> bool:
         return name in self.tools
@@ -49,50 +61,77 @@ class MCPEndpointClient:
         return result
 
     async def is_ready(self) -> bool:
-        async with self.lock:
-            return self.ready
+        return self.ready
 
     async def set_ready(self, status: bool):
-        async with self.lock:
-            self.ready = status
+        self.ready = status
 
-    async def add_tool(self, tool_data: dict):
-        async with self.lock:
+    def set_tools(self, tools: List[dict]):
+        """整体替换工具列表，并把描述中的原始工具名替换为规范化后的名称"""
+        new_tools, name_mapping = {}, {}
+        for tool_data in tools:
             sanitized_name = sanitize_tool_name(tool_data["name"])
-            self.tools[sanitized_name] = tool_data
-            self.name_mapping[sanitized_name] = tool_data["name"]
-            self._cached_available_tools = (
-                None  # Invalidate the cache when a tool is added
-            )
-
-    async def get_next_id(self) -> int:
-        async with self.lock:
-            current_id = self.next_id
-            self.next_id += 1
-            return current_id
-
-    async def register_call_result_future(self, id: int, future: Future):
-        async with self.lock:
-            self.call_results[id] = future
-
-    async def resolve_call_result(self, id: int, result: any):
-        async with self.lock:
-            if id in self.call_results:
-                future = self.call_results.pop(id)
-                if not future.done():
-                    future.set_result(result)
-
-    async def reject_call_result(self, id: int, exception: Exception):
-        async with self.lock:
-            if id in self.call_results:
-                future = self.call_results.pop(id)
-                if not future.done():
-                    future.set_exception(exception)
-
-    async def cleanup_call_result(self, id: int):
-        async with self.lock:
-            if id in self.call_results:
-                self.call_results.pop(id)
+            new_tools[sanitized_name] = tool_data
+            name_mapping[sanitized_name] = tool_data["name"]
+        for tool_data in new_tools.values():
+            description = tool_data.get("description", "")
+            for sanitized_name, original_name in name_mapping.items():
+                description = description.replace(original_name, sanitized_name)
+            tool_data["description"] = description
+        self.tools = new_tools
+        self.name_mapping = name_mapping
+        # Invalidate the cache when tools are replaced
+        self._cached_available_tools = None
+
+    def attach(self, conn):
+        if conn is not None:
+            self.conns.add(conn)
+        self.last_used = time.monotonic()
+
+    def detach(self, conn):
+        """设备连接关闭时调用，接入点连接保留给其他设备使用"""
+        self.conns.discard(conn)
+        self.last_used = time.monotonic()
+
+    def notify_tools_changed(self):
+        """工具列表变化后刷新所有已接入连接的函数列表"""
+        for conn in list(self.conns):
+            func_handler = getattr(conn, "func_handler", None)
+            if func_handler is None:
+                continue
+            try:
+                func_handler.tool_manager.refresh_tools()
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"刷新连接工具列表失败: {e}")
+
+    def allocate_id(self) -> int:
+        return next(self._ids)
+
+    def register_call(self, request_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.call_results[request_id] = future
+        self.last_used = time.monotonic()
+        return future
+
+    def resolve_call_result(self, request_id: int, result: Any):
+        future = self.call_results.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def reject_call_result(self, request_id: int, exception: Exception):
+        future = self.call_results.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_exception(exception)
+
+    def cleanup_call_result(self, request_id: int):
+        self.call_results.pop(request_id, None)
+
+    def fail_pending(self, exception: Exception):
+        """连接断开时结束所有挂起的请求"""
+        pending, self.call_results = self.call_results, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exception)
 
     def set_websocket(self, websocket):
         """设置WebSocket连接"""
@@ -105,6 +144,17 @@ class MCPEndpointClient:
         else:
             raise RuntimeError("WebSocket连接未建立")
 
+    def record(self, key: str):
+        self._stats[key] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["ready"] = self.ready
+        stats["tools"] = len(self.tools)
+        stats["conns"] = len(self.conns)
+        stats["pending"] = len(self.call_results)
+        return stats
+
     async def close(self):
         """关闭WebSocket连接"""
         if self.websocket:
@@ -4,6 +4,7 @@ import json
 import asyncio
 import re
 import websockets
+from typing import Any, Dict, List, Optional
 from config.logger import setup_logging
 from .mcp_endpoint_client import MCPEndpointClient
 
@@ -12,54 +13,48 @@ logger = setup_logging()
 
 
 async def connect_mcp_endpoint(mcp_endpoint_url: str, conn=None) -> MCPEndpointClient:
-    """连接到MCP接入点"""
+    """获取MCP接入点客户端，同一接入点地址的连接共用一条websocket"""
     if not mcp_endpoint_url or "你的" in mcp_endpoint_url or mcp_endpoint_url == "null":
         return None
 
-    try:
-        websocket = await websockets.connect(mcp_endpoint_url)
-
-        mcp_client = MCPEndpointClient(conn)
-        mcp_client.set_websocket(websocket)
-
-        # 启动消息监听器
-        asyncio.create_task(_message_listener(mcp_client))
-
-        # 发送初始化消息
-        await send_mcp_endpoint_initialize(mcp_client)
-
-        # 发送初始化完成通知
-        await send_mcp_endpoint_notification(mcp_client, "notifications/initialized")
-
-        # 获取工具列表
-        await send_mcp_endpoint_tools_list(mcp_client)
-
-        logger.bind(tag=TAG).info("MCP接入点连接成功")
-        return mcp_client
+    from .mcp_endpoint_manager import get_mcp_endpoint_manager
 
+    try:
+        config = conn.config if conn is not None else None
+        return await get_mcp_endpoint_manager(config).acquire(mcp_endpoint_url, conn)
     except Exception as e:
         logger.bind(tag=TAG).error(f"连接MCP接入点失败: {e}")
         return None
 
 
-async def _message_listener(mcp_client: MCPEndpointClient):
-    """监听MCP接入点消息"""
+async def handshake_mcp_endpoint(mcp_client: MCPEndpointClient, timeout: float):
+    """新建立的websocket上完成初始化并获取工具列表"""
+    await send_mcp_endpoint_initialize(mcp_client, timeout)
+    await send_mcp_endpoint_notification(mcp_client, "notifications/initialized")
+    await refresh_mcp_endpoint_tools(mcp_client, timeout)
+
+
+async def message_listener(mcp_client: MCPEndpointClient, websocket):
+    """监听MCP接入点消息，连接断开时返回"""
     try:
-        async for message in mcp_client.websocket:
-            await handle_mcp_endpoint_message(mcp_client, message)
+        async for message in websocket:
+            handle_mcp_endpoint_message(mcp_client, message)
     except websockets.exceptions.ConnectionClosed:
         logger.bind(tag=TAG).info("MCP接入点连接已关闭")
-    except Exception as e:
-        logger.bind(tag=TAG).error(f"MCP接入点消息监听器错误: {e}")
-    finally:
-        await mcp_client.set_ready(False)
 
 
-async def handle_mcp_endpoint_message(mcp_client: MCPEndpointClient, message: str):
-    """处理MCP接入点消息"""
+def _message_id(payload: dict) -> Optional[int]:
+    try:
+        return int(payload.get("id"))
+    except (TypeError, ValueError):
+        return None
+
+
+def handle_mcp_endpoint_message(mcp_client: MCPEndpointClient, message: str):
+    """处理MCP接入点消息，响应按id交给发起请求的调用方"""
     try:
         payload = json.loads(message)
-        logger.bind(tag=TAG).debug(f"收到MCP接入点消息: {payload}")
+        logger.bind(tag=TAG).debug("收到MCP接入点消息: {}", payload)
 
         if not isinstance(payload, dict):
             logger.bind(tag=TAG).error("MCP接入点消息格式错误")
@@ -67,148 +62,28 @@ async def handle_mcp_endpoint_message(mcp_client: MCPEndpointClient, message: st
 
         # Handle result
         if "result" in payload:
-            result = payload["result"]
-            # 安全地获取消息ID，如果为None则使用0
-            msg_id_raw = payload.get("id")
-            msg_id = int(msg_id_raw) if msg_id_raw is not None else 0
-
-            # Check for tool call response first
+            msg_id = _message_id(payload)
             if msg_id in mcp_client.call_results:
-                logger.bind(tag=TAG).debug(
-                    f"收到工具调用响应，ID: {msg_id}, 结果: {result}"
-                )
-                await mcp_client.resolve_call_result(msg_id, result)
-                return
-
-            if msg_id == 1:  # mcpInitializeID
-                logger.bind(tag=TAG).debug("收到MCP接入点初始化响应")
-                if result is not None and isinstance(result, dict):
-                    server_info = result.get("serverInfo")
-                    if isinstance(server_info, dict):
-                        name = server_info.get("name")
-                        version = server_info.get("version")
-                        logger.bind(tag=TAG).info(
-                            f"MCP接入点服务器信息: name={name}, version={version}"
-                        )
-                else:
-                    logger.bind(tag=TAG).warning(
-                        "MCP接入点初始化响应结果为空或格式错误"
-                    )
-                return
-
-            elif msg_id == 2:  # mcpToolsListID
-                logger.bind(tag=TAG).debug("收到MCP接入点工具列表响应")
-                if (
-                    result is not None
-                    and isinstance(result, dict)
-                    and "tools" in result
-                ):
-                    tools_data = result["tools"]
-                    if not isinstance(tools_data, list):
-                        logger.bind(tag=TAG).error("工具列表格式错误")
-                        return
-
-                    logger.bind(tag=TAG).info(
-                        f"MCP接入点支持的工具数量: {len(tools_data)}"
-                    )
-
-                    for i, tool in enumerate(tools_data):
-                        if not isinstance(tool, dict):
-                            continue
-
-                        name = tool.get("name", "")
-                        description = tool.get("description", "")
-                        input_schema = {
-                            "type": "object",
-                            "properties": {},
-                            "required": [],
-                        }
-
-                        if "inputSchema" in tool and isinstance(
-                            tool["inputSchema"], dict
-                        ):
-                            schema = tool["inputSchema"]
-                            input_schema["type"] = schema.get("type", "object")
-                            input_schema["properties"] = schema.get("properties", {})
-                            input_schema["required"] = [
-                                s
-                                for s in schema.get("required", [])
-                                if isinstance(s, str)
-                            ]
-
-                        new_tool = {
-                            "name": name,
-                            "description": description,
-                            "inputSchema": input_schema,
-                        }
-                        await mcp_client.add_tool(new_tool)
-                        logger.bind(tag=TAG).debug(f"MCP接入点工具 #{i+1}: {name}")
-
-                    # 替换所有工具描述中的工具名称
-                    for tool_data in mcp_client.tools.values():
-                        if "description" in tool_data:
-                            description = tool_data["description"]
-                            # 遍历所有工具名称进行替换
-                            for (
-                                sanitized_name,
-                                original_name,
-                            ) in mcp_client.name_mapping.items():
-                                description = description.replace(
-                                    original_name, sanitized_name
-                                )
-                            tool_data["description"] = description
-
-                    next_cursor = (
-                        result.get("nextCursor", "") if result is not None else ""
-                    )
-                    if next_cursor:
-                        logger.bind(tag=TAG).info(
-                            f"有更多工具，nextCursor: {next_cursor}"
-                        )
-                        await send_mcp_endpoint_tools_list_continue(
-                            mcp_client, next_cursor
-                        )
-                    else:
-                        await mcp_client.set_ready(True)
-                        logger.bind(tag=TAG).info(
-                            "所有MCP接入点工具已获取，客户端准备就绪"
-                        )
-
-                        # 刷新工具缓存，确保MCP接入点工具被包含在函数列表中
-                        if (
-                            hasattr(mcp_client, "conn")
-                            and mcp_client.conn
-                            and hasattr(mcp_client.conn, "func_handler")
-                            and mcp_client.conn.func_handler
-                        ):
-                            mcp_client.conn.func_handler.tool_manager.refresh_tools()
-                            mcp_client.conn.func_handler.current_support_functions()
-
-                        logger.bind(tag=TAG).info(
-                            f"MCP接入点工具获取完成，共 {len(mcp_client.tools)} 个工具"
-                        )
-                else:
-                    logger.bind(tag=TAG).warning(
-                        "MCP接入点工具列表响应结果为空或格式错误"
-                    )
-                return
+                logger.bind(tag=TAG).debug(f"收到MCP接入点响应，ID: {msg_id}")
+                mcp_client.resolve_call_result(msg_id, payload["result"])
+            else:
+                logger.bind(tag=TAG).debug(f"忽略已超时或未知的响应，ID: {msg_id}")
 
         # Handle method calls (requests from the endpoint)
         elif "method" in payload:
             method = payload["method"]
             logger.bind(tag=TAG).info(f"收到MCP接入点请求: {method}")
+            if method == "notifications/tools/list_changed":
+                asyncio.create_task(_refresh_tools_quietly(mcp_client))
 
         elif "error" in payload:
             error_data = payload["error"]
             error_msg = error_data.get("message", "未知错误")
             logger.bind(tag=TAG).error(f"收到MCP接入点错误响应: {error_msg}")
 
-            # 安全地获取消息ID，如果为None则使用0
-            msg_id_raw = payload.get("id")
-            msg_id = int(msg_id_raw) if msg_id_raw is not None else 0
-
+            msg_id = _message_id(payload)
             if msg_id in mcp_client.call_results:
-                await mcp_client.reject_call_result(
+                mcp_client.reject_call_result(
                     msg_id, Exception(f"MCP接入点错误: {error_msg}")
                 )
 
@@ -221,13 +96,34 @@ async def handle_mcp_endpoint_message(mcp_client: MCPEndpointClient, message: st
         logger.bind(tag=TAG).error(f"错误详情: {traceback.format_exc()}")
 
 
-async def send_mcp_endpoint_initialize(mcp_client: MCPEndpointClient):
+async def send_mcp_endpoint_request(
+    mcp_client: MCPEndpointClient,
+    method: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: float = 30,
+) -> Any:
+    """发送请求并等待对应id的响应"""
+    request_id = mcp_client.allocate_id()
+    future = mcp_client.register_call(request_id)
+    payload = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        payload["params"] = params
+    try:
+        await mcp_client.send_message(json.dumps(payload))
+        return await asyncio.wait_for(future, timeout=timeout)
+    finally:
+        mcp_client.cleanup_call_result(request_id)
+
+
+async def send_mcp_endpoint_initialize(
+    mcp_client: MCPEndpointClient, timeout: float = 30
+):
     """发送MCP接入点初始化消息"""
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 1,  # mcpInitializeID
-        "method": "initialize",
-        "params": {
+    logger.bind(tag=TAG).info("发送MCP接入点初始化消息")
+    result = await send_mcp_endpoint_request(
+        mcp_client,
+        "initialize",
+        {
             "protocolVersion": "2024-11-05",
             "capabilities": {
                 "roots": {"listChanged": True},
@@ -238,10 +134,15 @@ async def send_mcp_endpoint_initialize(mcp_client: MCPEndpointClient):
                 "version": "1.0.0",
             },
         },
-    }
-    message = json.dumps(payload)
-    logger.bind(tag=TAG).info("发送MCP接入点初始化消息")
-    await mcp_client.send_message(message)
+        timeout,
+    )
+    if isinstance(result, dict) and isinstance(result.get("serverInfo"), dict):
+        server_info = result["serverInfo"]
+        logger.bind(tag=TAG).info(
+            f"MCP接入点服务器信息: name={server_info.get('name')}, version={server_info.get('version')}"
+        )
+    else:
+        logger.bind(tag=TAG).warning("MCP接入点初始化响应结果为空或格式错误")
 
 
 async def send_mcp_endpoint_notification(mcp_client: MCPEndpointClient, method: str):
@@ -256,31 +157,67 @@ async def send_mcp_endpoint_notification(mcp_client: MCPEndpointClient, method:
     await mcp_client.send_message(message)
 
 
-async def send_mcp_endpoint_tools_list(mcp_client: MCPEndpointClient):
-    """发送MCP接入点工具列表请求"""
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 2,  # mcpToolsListID
-        "method": "tools/list",
+def _parse_tool(tool: dict) -> dict:
+    input_schema = {
+        "type": "object",
+        "properties": {},
+        "required": [],
     }
-    message = json.dumps(payload)
-    logger.bind(tag=TAG).debug("发送MCP接入点工具列表请求")
-    await mcp_client.send_message(message)
+    if isinstance(tool.get("inputSchema"), dict):
+        schema = tool["inputSchema"]
+        input_schema["type"] = schema.get("type", "object")
+        input_schema["properties"] = schema.get("properties", {})
+        input_schema["required"] = [
+            s for s in schema.get("required", []) if isinstance(s, str)
+        ]
+    return {
+        "name": tool.get("name", ""),
+        "description": tool.get("description", ""),
+        "inputSchema": input_schema,
+    }
+
+
+async def send_mcp_endpoint_tools_list(
+    mcp_client: MCPEndpointClient, timeout: float = 30
+) -> List[dict]:
+    """获取MCP接入点的全部工具，有nextCursor时继续请求下一页"""
+    tools: List[dict] = []
+    cursor = ""
+    while True:
+        params = {"cursor": cursor} if cursor else None
+        logger.bind(tag=TAG).debug(f"发送MCP接入点工具列表请求: {cursor}")
+        result = await send_mcp_endpoint_request(
+            mcp_client, "tools/list", params, timeout
+        )
+        if not isinstance(result, dict) or not isinstance(result.get("tools"), list):
+            logger.bind(tag=TAG).warning("MCP接入点工具列表响应结果为空或格式错误")
+            return tools
+        tools.extend(
+            _parse_tool(tool) for tool in result["tools"] if isinstance(tool, dict)
+        )
+        cursor = result.get("nextCursor", "")
+        if not cursor:
+            return tools
+        logger.bind(tag=TAG).info(f"有更多工具，nextCursor: {cursor}")
 
 
-async def send_mcp_endpoint_tools_list_continue(
-    mcp_client: MCPEndpointClient, cursor: str
+async def refresh_mcp_endpoint_tools(
+    mcp_client: MCPEndpointClient, timeout: float = 30
 ):
-    """发送带有cursor的MCP接入点工具列表请求"""
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 2,  # mcpToolsListID (same ID for continuation)
-        "method": "tools/list",
-        "params": {"cursor": cursor},
-    }
-    message = json.dumps(payload)
-    logger.bind(tag=TAG).info(f"发送带cursor的MCP接入点工具列表请求: {cursor}")
-    await mcp_client.send_message(message)
+    """重新获取工具列表，所有使用该接入点的连接共用"""
+    tools = await send_mcp_endpoint_tools_list(mcp_client, timeout)
+    mcp_client.set_tools(tools)
+    logger.bind(tag=TAG).info(
+        f"MCP接入点工具获取完成，共 {len(mcp_client.tools)} 个工具"
+    )
+    mcp_client.notify_tools_changed()
+
+
+async def _refresh_tools_quietly(mcp_client: MCPEndpointClient):
+    try:
+        await refresh_mcp_endpoint_tools(mcp_client)
+    except Exception as e:
+        logger.bind(tag=TAG).warning(f"刷新MCP接入点工具列表失败: {e}")
 
 
 async def call_mcp_endpoint_tool(
@@ -295,10 +232,6 @@ async def call_mcp_endpoint_tool(
     if not mcp_client.has_tool(tool_name):
         raise ValueError(f"工具 {tool_name} 不存在")
 
-    tool_call_id = await mcp_client.get_next_id()
-    result_future = asyncio.Future()
-    await mcp_client.register_call_result_future(tool_call_id, result_future)
-
     # 处理参数
     try:
         if isinstance(args, str):
@@ -350,20 +283,16 @@ async def call_mcp_endpoint_tool(
         raise e
 
     actual_name = mcp_client.name_mapping.get(tool_name, tool_name)
-    payload = {
-        "jsonrpc": "2.0",
-        "id": tool_call_id,
-        "method": "tools/call",
-        "params": {"name": actual_name, "arguments": arguments},
-    }
-
-    message = json.dumps(payload)
     logger.bind(tag=TAG).info(f"发送MCP接入点工具调用请求: {actual_name}，参数: {args}")
-    await mcp_client.send_message(message)
+    mcp_client.record("calls")
 
     try:
-        # Wait for response or timeout
-        raw_result = await asyncio.wait_for(result_future, timeout=timeout)
+        raw_result = await send_mcp_endpoint_request(
+            mcp_client,
+            "tools/call",
+            {"name": actual_name, "arguments": arguments},
+            timeout,
+        )
         logger.bind(tag=TAG).info(
             f"MCP接入点工具调用 {actual_name} 成功，原始结果: {raw_result}"
         )
@@ -383,8 +312,8 @@ async def call_mcp_endpoint_tool(
         # 如果结果不是预期的格式，将其转换为字符串
         return str(raw_result)
     except asyncio.TimeoutError:
-        await mcp_client.cleanup_call_result(tool_call_id)
+        mcp_client.record("timeouts")
         raise TimeoutError("工具调用请求超时")
-    except Exception as e:
-        await mcp_client.cleanup_call_result(tool_call_id)
-        raise e
+    except Exception:
+        mcp_client.record("errors")
+        raise
@@ -0,0 +1,159 @@
+"""
+MCP接入点连接管理
+
+同一智能体的设备配置的是同一个接入点地址，每个地址在进程内只保持一条websocket：
+1. 首个设备接入时建立连接，完成初始化并获取工具列表，之后的设备直接复用
+2. 所有设备的工具调用通过这条连接发送，按请求id区分响应
+3. 断线后自动重连，重新获取工具列表并通知已接入的设备
+4. 没有设备使用且超过idle_timeout后断开
+"""
+
+import time
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+import websockets
+
+from config.logger import setup_logging
+from .mcp_endpoint_client import MCPEndpointClient
+from .mcp_endpoint_handler import handshake_mcp_endpoint, message_listener
+
+TAG = __name__
+logger = setup_logging()
+
+
+class MCPEndpointManager:
+    """按接入点地址管理共享的websocket连接"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        pool_config = (config or {}).get("mcp_endpoint_pool", {}) or {}
+        # 设备接入时等待连接就绪的时间(秒)，超时后连接继续在后台建立
+        self.connect_timeout = float(pool_config.get("connect_timeout", 10))
+        # 初始化和获取工具列表的超时时间(秒)
+        self.request_timeout = float(pool_config.get("request_timeout", 30))
+        # 断线重连的初始间隔和最大间隔(秒)
+        self.reconnect_interval = float(pool_config.get("reconnect_interval", 2))
+        self.max_reconnect_interval = float(
+            pool_config.get("max_reconnect_interval", 60)
+        )
+        # 没有设备使用超过该时间(秒)后断开
+        self.idle_timeout = float(pool_config.get("idle_timeout", 600))
+        self._clients: Dict[str, MCPEndpointClient] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._ready_events: Dict[str, asyncio.Event] = {}
+
+    async def acquire(self, url: str, conn=None) -> MCPEndpointClient:
+        """获取接入点的共享客户端，连接尚未就绪时最多等待connect_timeout"""
+        client = self._clients.get(url)
+        if client is None:
+            client = self._clients[url] = MCPEndpointClient(url)
+            self._ready_events[url] = asyncio.Event()
+        client.attach(conn)
+        task = self._tasks.get(url)
+        if task is None or task.done():
+            self._tasks[url] = asyncio.create_task(
+                self._run(client), name=f"MCPEndpoint:{url}"
+            )
+        if not client.ready:
+            try:
+                await asyncio.wait_for(
+                    self._ready_events[url].wait(), self.connect_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.bind(tag=TAG).warning(
+                    "MCP接入点尚未就绪，连接成功后将自动刷新工具列表"
+                )
+        return client
+
+    def _idle(self, client: MCPEndpointClient) -> bool:
+        return (
+            not client.conns and time.monotonic() - client.last_used > self.idle_timeout
+        )
+
+    async def _run(self, client: MCPEndpointClient):
+        interval = self.reconnect_interval
+        ready_event = self._ready_events[client.url]
+        while True:
+            try:
+                await self._connect_once(client, ready_event)
+                interval = self.reconnect_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.bind(tag=TAG).warning(
+                    f"MCP接入点连接断开: {e}，{interval}秒后重连"
+                )
+            finally:
+                ready_event.clear()
+                client.ready = False
+                client.set_websocket(None)
+                client.fail_pending(ConnectionError("MCP接入点连接已断开"))
+            if self._idle(client):
+                logger.bind(tag=TAG).info("MCP接入点长时间未使用，断开连接")
+                self._clients.pop(client.url, None)
+                self._tasks.pop(client.url, None)
+                self._ready_events.pop(client.url, None)
+                return
+            client.record("reconnects")
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_reconnect_interval)
+
+    async def _connect_once(self, client: MCPEndpointClient, ready_event):
+        async with websockets.connect(
+            client.url, max_size=None, open_timeout=self.connect_timeout
+        ) as websocket:
+            client.set_websocket(websocket)
+            reader = asyncio.create_task(message_listener(client, websocket))
+            try:
+                await handshake_mcp_endpoint(client, self.request_timeout)
+                client.ready = True
+                ready_event.set()
+                logger.bind(tag=TAG).info(
+                    f"MCP接入点连接成功，当前使用的设备数: {len(client.conns)}"
+                )
+                await self._watch_idle(client, reader)
+            finally:
+                reader.cancel()
+
+    async def _watch_idle(self, client: MCPEndpointClient, reader: asyncio.Task):
+        """读循环结束（断线）或长时间没有设备使用时返回"""
+        while not reader.done():
+            if self._idle(client):
+                return
+            await asyncio.wait({reader}, timeout=min(60.0, self.idle_timeout))
+        reader.result()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            f"endpoint_{index}": client.metrics()
+            for index, client in enumerate(self._clients.values())
+        }
+
+    async def shutdown(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        for client in self._clients.values():
+            await client.close()
+        self._tasks.clear()
+        self._clients.clear()
+        self._ready_events.clear()
+
+
+_manager: Optional[MCPEndpointManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_mcp_endpoint_manager(
+    config: Optional[Dict[str, Any]] = None,
+) -> MCPEndpointManager:
+    """获取进程级MCP接入点连接管理器，首次调用时按配置创建"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = MCPEndpointManager(config)
+        return _manager
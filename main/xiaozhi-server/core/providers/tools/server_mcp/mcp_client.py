@@ -122,6 +122,27 @@ class ServerMCPClient:
         fut: concurrent.futures.Future = asyncio.run_coroutine_threadsafe(coro, loop)
         return await asyncio.wrap_future(fut)
 
+    async def refresh_tools(self) -> None:
+        """重新获取工具列表"""
+        if not self.session:
+            raise RuntimeError("服务端MCP客户端未初始化")
+
+        loop = self._worker_task.get_loop()
+        coro = self.session.list_tools()
+        if loop is asyncio.get_running_loop():
+            result = await coro
+        else:
+            fut = asyncio.run_coroutine_threadsafe(coro, loop)
+            result = await asyncio.wrap_future(fut)
+
+        self.tools = result.tools
+        self.tools_dict = {}
+        self.name_mapping = {}
+        for t in self.tools:
+            sanitized = sanitize_tool_name(t.name)
+            self.tools_dict[sanitized] = t
+            self.name_mapping[sanitized] = t.name
+
     def is_connected(self) -> bool:
         """检查MCP客户端是否连接正常
 
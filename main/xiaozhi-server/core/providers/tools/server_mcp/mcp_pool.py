@@ -0,0 +1,323 @@
+"""服务端MCP会话池
+
+所有连接共用一组长连接的MCP会话：
+1. 每个MCP服务保持固定数量的会话，多个连接的工具调用在会话上并发复用
+2. 按服务限制同时进行的调用数，避免压垮MCP服务
+3. 工具列表在会话建立时获取并缓存，定期刷新
+4. 由后台任务集中做健康检查，断开的会话自动重启
+"""
+
+import os
+import json
+import asyncio
+from typing import Dict, Any, List, Optional
+from config.config_loader import get_project_dir
+from config.logger import setup_logging
+from .mcp_client import ServerMCPClient
+
+TAG = __name__
+logger = setup_logging()
+
+
+class _ServerEntry:
+    """单个MCP服务的会话组"""
+
+    def __init__(self, name: str, config: Dict[str, Any], size: int, concurrency: int):
+        self.name = name
+        self.config = config
+        self.size = size
+        self.sessions: List[Optional[ServerMCPClient]] = [None] * size
+        self.restarting: Dict[int, asyncio.Task] = {}
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.next_index = 0
+        self.tools: List[Dict[str, Any]] = []
+        self.tool_names = set()
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+
+    def healthy_sessions(self) -> List[ServerMCPClient]:
+        return [s for s in self.sessions if s is not None and s.is_connected()]
+
+    def pick(self) -> Optional[ServerMCPClient]:
+        """轮询选择一个可用会话"""
+        for _ in range(self.size):
+            index = self.next_index % self.size
+            self.next_index += 1
+            session = self.sessions[index]
+            if session is not None and session.is_connected():
+                return session
+        return None
+
+    def update_tools(self, client: ServerMCPClient):
+        self.tools = client.get_available_tools()
+        self.tool_names = {t["function"]["name"] for t in self.tools}
+
+
+class ServerMCPPool:
+    """进程级服务端MCP会话池"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        pool_config = (config or {}).get("server_mcp_pool", {}) or {}
+        # 每个MCP服务保持的会话数
+        self.sessions_per_server = max(
+            1, int(pool_config.get("sessions_per_server", 1))
+        )
+        # 每个MCP服务同时进行的工具调用数
+        self.max_concurrency = max(1, int(pool_config.get("max_concurrency", 8)))
+        # 健康检查间隔(秒)
+        self.health_check_interval = float(pool_config.get("health_check_interval", 30))
+        # 工具列表刷新间隔(秒)
+        self.tools_refresh_interval = float(
+            pool_config.get("tools_refresh_interval", 300)
+        )
+        self.max_retries = int(pool_config.get("max_retries", 3))
+        self.retry_interval = float(pool_config.get("retry_interval", 2))
+
+        self.config_path = get_project_dir() + "data/.mcp_server_settings.json"
+        self._config_loaded = False
+        self._config_mtime: Optional[float] = None
+        self._servers: Dict[str, _ServerEntry] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    def load_config(self) -> Dict[str, Any]:
+        """加载MCP服务配置"""
+        if not os.path.exists(self.config_path):
+            return {}
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            return config.get("mcpServers", {})
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"Error loading MCP config from {self.config_path}: {e}"
+            )
+            return {}
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return None
+
+    async def ensure_started(self) -> None:
+        """首次调用时启动所有MCP服务的会话，配置文件变化时重新加载"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._start_lock = asyncio.Lock()
+        elif asyncio.get_running_loop() is not self._loop:
+            future = asyncio.run_coroutine_threadsafe(self.ensure_started(), self._loop)
+            await asyncio.wrap_future(future)
+            return
+
+        if self._config_loaded and self._current_mtime() == self._config_mtime:
+            return
+        async with self._start_lock:
+            mtime = self._current_mtime()
+            if self._config_loaded and mtime == self._config_mtime:
+                return
+            if not self._config_loaded and mtime is None:
+                logger.bind(tag=TAG).warning(
+                    f"请检查mcp服务配置文件：data/.mcp_server_settings.json"
+                )
+            await self._reconcile(self.load_config())
+            self._config_loaded = True
+            self._config_mtime = mtime
+            if self._health_task is None or self._health_task.done():
+                self._health_task = asyncio.create_task(
+                    self._health_loop(), name="ServerMCPPoolHealth"
+                )
+
+    async def _reconcile(self, config: Dict[str, Any]) -> None:
+        """按最新配置启动新增的服务，关闭已删除或配置已变化的服务"""
+        for name in list(self._servers):
+            if config.get(name) != self._servers[name].config:
+                await self._stop_server(self._servers.pop(name))
+
+        starting = []
+        for name, srv_config in config.items():
+            if name in self._servers:
+                continue
+            if not srv_config.get("command") and not srv_config.get("url"):
+                logger.bind(tag=TAG).warning(
+                    f"Skipping server {name}: neither command nor url specified"
+                )
+                continue
+            entry = _ServerEntry(
+                name,
+                srv_config,
+                max(1, int(srv_config.get("sessions", self.sessions_per_server))),
+                max(1, int(srv_config.get("max_concurrency", self.max_concurrency))),
+            )
+            self._servers[name] = entry
+            starting.extend(
+                self._start_session(entry, index) for index in range(entry.size)
+            )
+        if starting:
+            await asyncio.gather(*starting)
+
+    async def _start_session(self, entry: _ServerEntry, index: int) -> bool:
+        logger.bind(tag=TAG).info(f"初始化服务端MCP会话: {entry.name}#{index}")
+        client = ServerMCPClient(entry.config)
+        try:
+            await client.initialize()
+            if not client.is_connected():
+                raise RuntimeError("会话未建立")
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"Failed to initialize MCP server {entry.name}#{index}: {e}"
+            )
+            await client.cleanup()
+            return False
+        old = entry.sessions[index]
+        entry.sessions[index] = client
+        entry.update_tools(client)
+        if old is not None:
+            await self._cleanup_client(entry.name, old)
+        return True
+
+    def _restart_session(self, entry: _ServerEntry, index: int) -> asyncio.Task:
+        """重启指定会话，同一会话并发的重启请求只执行一次"""
+        task = entry.restarting.get(index)
+        if task is None or task.done():
+            entry.restarts += 1
+            task = asyncio.create_task(self._start_session(entry, index))
+            entry.restarting[index] = task
+        return task
+
+    async def _cleanup_client(self, name: str, client: ServerMCPClient) -> None:
+        try:
+            await asyncio.wait_for(client.cleanup(), timeout=20)
+        except (asyncio.TimeoutError, Exception) as e:
+            logger.bind(tag=TAG).error(f"关闭服务端MCP客户端 {name} 时出错: {e}")
+
+    async def _stop_server(self, entry: _ServerEntry) -> None:
+        for task in entry.restarting.values():
+            task.cancel()
+        for client in entry.sessions:
+            if client is not None:
+                await self._cleanup_client(entry.name, client)
+        logger.bind(tag=TAG).info(f"服务端MCP服务已关闭: {entry.name}")
+
+    async def _health_loop(self) -> None:
+        elapsed_since_refresh = 0.0
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            elapsed_since_refresh += self.health_check_interval
+            refresh_tools = elapsed_since_refresh >= self.tools_refresh_interval
+            if refresh_tools:
+                elapsed_since_refresh = 0.0
+            try:
+                await self.ensure_started()
+                for entry in list(self._servers.values()):
+                    for index, session in enumerate(entry.sessions):
+                        if session is None or not session.is_connected():
+                            logger.bind(tag=TAG).warning(
+                                f"服务端MCP会话不可用，重新连接: {entry.name}#{index}"
+                            )
+                            self._restart_session(entry, index)
+                    if refresh_tools:
+                        await self._refresh_tools(entry)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"服务端MCP健康检查失败: {e}")
+
+    async def _refresh_tools(self, entry: _ServerEntry) -> None:
+        session = entry.pick()
+        if session is None:
+            return
+        try:
+            await session.refresh_tools()
+            entry.update_tools(session)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"刷新MCP工具列表失败 {entry.name}: {e}")
+
+    def get_all_tools(self) -> List[Dict[str, Any]]:
+        """获取所有服务的工具function定义（缓存）"""
+        tools = []
+        for entry in self._servers.values():
+            tools.extend(entry.tools)
+        return tools
+
+    def _find_server(self, tool_name: str) -> Optional[_ServerEntry]:
+        for entry in self._servers.values():
+            if tool_name in entry.tool_names:
+                return entry
+        return None
+
+    def has_tool(self, tool_name: str) -> bool:
+        return self._find_server(tool_name) is not None
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """执行工具调用，会话异常时由池重启会话后重试"""
+        if self._loop is not None and asyncio.get_running_loop() is not self._loop:
+            future = asyncio.run_coroutine_threadsafe(
+                self.call_tool(tool_name, arguments), self._loop
+            )
+            return await asyncio.wrap_future(future)
+
+        entry = self._find_server(tool_name)
+        if entry is None:
+            raise ValueError(f"工具 {tool_name} 在任意MCP服务中未找到")
+
+        async with entry.semaphore:
+            for attempt in range(self.max_retries):
+                session = entry.pick()
+                try:
+                    if session is None:
+                        raise RuntimeError(f"MCP服务 {entry.name} 没有可用会话")
+                    entry.calls += 1
+                    return await session.call_tool(tool_name, arguments)
+                except Exception as e:
+                    entry.failures += 1
+                    # 最后一次尝试失败时直接抛出异常
+                    if attempt == self.max_retries - 1:
+                        raise
+                    logger.bind(tag=TAG).warning(
+                        f"执行工具 {tool_name} 失败 (尝试 {attempt+1}/{self.max_retries}): {e}"
+                    )
+                    # 只重启已断开的会话，其他连接正在使用的会话不受影响
+                    restarts = [
+                        self._restart_session(entry, index)
+                        for index, s in enumerate(entry.sessions)
+                        if s is None or not s.is_connected()
+                    ]
+                    if restarts:
+                        await asyncio.shield(asyncio.gather(*restarts))
+                    await asyncio.sleep(self.retry_interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "sessions": entry.size,
+                "healthy": len(entry.healthy_sessions()),
+                "calls": entry.calls,
+                "failures": entry.failures,
+                "restarts": entry.restarts,
+                "tools": len(entry.tools),
+            }
+            for name, entry in self._servers.items()
+        }
+
+    async def shutdown(self) -> None:
+        """关闭所有MCP会话"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for name in list(self._servers):
+            await self._stop_server(self._servers.pop(name))
+        self._config_loaded = False
+
+
+_pool: Optional[ServerMCPPool] = None
+
+
+def get_server_mcp_pool(config: Optional[Dict[str, Any]] = None) -> ServerMCPPool:
+    """获取进程级服务端MCP会话池，首次调用时按配置创建"""
+    global _pool
+    if _pool is None:
+        _pool = ServerMCPPool(config)
+    return _pool
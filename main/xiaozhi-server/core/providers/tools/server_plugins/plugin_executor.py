@@ -3,6 +3,7 @@
 from typing import Dict, Any
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import all_function_registry, Action, ActionResponse
+from .plugin_runtime import get_plugin_runtime, PluginTimeoutError
 
 
 class ServerPluginExecutor(ToolExecutor):
@@ -11,6 +12,7 @@ class ServerPluginExecutor(ToolExecutor):
     def __init__(self, conn):
         self.conn = conn
         self.config = conn.config
+        self.runtime = get_plugin_runtime(conn.config)
 
     async def execute(
         self, conn, tool_name: str, arguments: Dict[str, Any]
@@ -23,23 +25,22 @@ class ServerPluginExecutor(ToolExecutor):
             )
 
         try:
-            # 根据工具类型决定如何调用
-            if hasattr(func_item, "type"):
-                func_type = func_item.type
-                if func_type.code in [4, 5]:  # SYSTEM_CTL, IOT_CTL (需要conn参数)
-                    result = func_item.func(conn, **arguments)
-                elif func_type.code == 2:  # WAIT
-                    result = func_item.func(**arguments)
-                elif func_type.code == 3:  # CHANGE_SYS_PROMPT
-                    result = func_item.func(conn, **arguments)
-                else:
-                    result = func_item.func(**arguments)
+            # 根据工具类型决定如何调用，同步插件在插件线程池中执行，不阻塞事件循环
+            func_type = getattr(func_item, "type", None)
+            if func_type is not None and func_type.code in [3, 4, 5]:
+                # CHANGE_SYS_PROMPT, SYSTEM_CTL, IOT_CTL (需要conn参数)
+                result = await self.runtime.run(func_item, conn, **arguments)
             else:
-                # 默认不传conn参数
-                result = func_item.func(**arguments)
+                # WAIT及其他类型不传conn参数
+                result = await self.runtime.run(func_item, **arguments)
 
             return result
 
+        except PluginTimeoutError as e:
+            return ActionResponse(
+                action=Action.ERROR,
+                response=str(e),
+            )
         except Exception as e:
             return ActionResponse(
                 action=Action.ERROR,
@@ -0,0 +1,179 @@
+"""服务端插件运行时
+
+- 同步插件放到进程内共享的有界线程池中执行，不阻塞事件循环
+- 异步插件直接在事件循环中执行
+- 每个插件有独立的超时时间和并发上限，并记录调用耗时
+"""
+
+import time
+import asyncio
+import threading
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class PluginTimeoutError(Exception):
+    """插件执行超时"""
+
+
+class _PluginStats:
+    def __init__(self, window: int = 256):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.running = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "running": self.running,
+            "p50_ms": round(percentile(0.5) * 1000, 1),
+            "p95_ms": round(percentile(0.95) * 1000, 1),
+            "max_ms": round((latencies[-1] if latencies else 0.0) * 1000, 1),
+        }
+
+
+class PluginRuntime:
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        runtime_config = (config or {}).get("plugin_runtime", {}) or {}
+        # 同步插件共用的线程数
+        self.workers = int(runtime_config.get("workers", 16))
+        # 插件未单独指定时的超时时间(秒)和并发上限
+        self.default_timeout = float(runtime_config.get("default_timeout", 15))
+        self.default_max_concurrency = int(
+            runtime_config.get("default_max_concurrency", 8)
+        )
+        # 按插件名覆盖超时时间和并发上限
+        self.overrides = runtime_config.get("plugins", {}) or {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="plugin"
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _PluginStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def _limits(self, func_item):
+        override = self.overrides.get(func_item.name, {}) or {}
+        timeout = override.get("timeout", func_item.timeout)
+        max_concurrency = override.get("max_concurrency", func_item.max_concurrency)
+        return (
+            float(timeout if timeout is not None else self.default_timeout),
+            int(
+                max_concurrency
+                if max_concurrency is not None
+                else self.default_max_concurrency
+            ),
+        )
+
+    def _stat(self, name: str) -> _PluginStats:
+        with self._stats_lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _PluginStats()
+            return stats
+
+    async def run(self, func_item, *args, **kwargs) -> Any:
+        """执行插件，超时抛出PluginTimeoutError，插件自身的异常原样抛出"""
+        timeout, max_concurrency = self._limits(func_item)
+        semaphore = self._semaphores.get(func_item.name)
+        if semaphore is None:
+            semaphore = self._semaphores[func_item.name] = asyncio.Semaphore(
+                max_concurrency
+            )
+        stats = self._stat(func_item.name)
+        stats.calls += 1
+        deadline = time.monotonic() + timeout
+        try:
+            # 排队等待的时间也计入超时
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise PluginTimeoutError(f"插件 {func_item.name} 并发已满，等待超时")
+
+        start = time.monotonic()
+        stats.running += 1
+        released = False
+
+        def release(_=None):
+            nonlocal released
+            if not released:
+                released = True
+                stats.running -= 1
+                semaphore.release()
+
+        try:
+            remaining = max(0.0, deadline - time.monotonic())
+            if func_item.is_async:
+                try:
+                    return await asyncio.wait_for(
+                        func_item.func(*args, **kwargs), remaining
+                    )
+                finally:
+                    release()
+
+            loop = asyncio.get_running_loop()
+            try:
+                future = loop.run_in_executor(
+                    self._executor, functools.partial(func_item.func, *args, **kwargs)
+                )
+            except Exception:
+                release()
+                raise
+            # 线程中的同步插件无法强制中断，执行结束后才释放并发名额，
+            # 避免卡住的插件占满线程池
+            future.add_done_callback(release)
+            return await asyncio.wait_for(asyncio.shield(future), remaining)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.bind(tag=TAG).warning(
+                f"插件 {func_item.name} 执行超时({timeout}秒)"
+            )
+            raise PluginTimeoutError(f"插件 {func_item.name} 执行超时")
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.latencies.append(time.monotonic() - start)
+
+    def run_sync(self, func: Callable, *args, **kwargs):
+        """在插件线程池中执行同步函数，供插件内部使用"""
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            items = list(self._stats.items())
+        return {name: stats.snapshot() for name, stats in items}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_runtime: Optional[PluginRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_plugin_runtime(config: Optional[Dict[str, Any]] = None) -> PluginRuntime:
+    """获取进程级插件运行时，首次调用时按配置创建"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = PluginRuntime(config)
+        return _runtime
@@ -1,6 +1,7 @@
 """统一工具处理器"""
 
 import json
+import asyncio
 from typing import Dict, List, Any, Optional
 from config.logger import setup_logging
 from plugins_func.loadplugins import auto_import_modules
@@ -50,6 +51,9 @@ class UnifiedToolHandler:
             ToolType.MCP_ENDPOINT, self.mcp_endpoint_executor
         )
 
+        # 单个工具调用的超时时间（秒）
+        self.tool_call_timeout = float(self.config.get("tool_call_timeout", 30))
+
         # 初始化标志
         self.finish_init = False
 
@@ -120,6 +124,10 @@ class UnifiedToolHandler:
         """获取所有工具的函数描述"""
         return self.tool_manager.get_function_descriptions()
 
+    def get_tools_fingerprint(self) -> str:
+        """获取当前工具集的指纹"""
+        return self.tool_manager.get_tools_fingerprint()
+
     def current_support_functions(self) -> List[str]:
         """获取当前支持的函数名称列表"""
         func_names = self.tool_manager.get_supported_tool_names()
@@ -142,35 +150,58 @@ class UnifiedToolHandler:
         try:
             # 处理多函数调用
             if "function_calls" in function_call_data:
-                responses = []
-                for call in function_call_data["function_calls"]:
-                    result = await self.tool_manager.execute_tool(
-                        call["name"], call.get("arguments", {})
-                    )
-                    responses.append(result)
+                responses = await self.handle_llm_function_calls(
+                    conn, function_call_data["function_calls"]
+                )
                 return self._combine_responses(responses)
 
-            # 处理单函数调用
-            function_name = function_call_data["name"]
-            arguments = function_call_data.get("arguments", {})
+            return await self._execute_function_call(function_call_data)
+
+        except Exception as e:
+            self.logger.error(f"处理function call错误: {e}")
+            return ActionResponse(action=Action.ERROR, response=str(e))
+
+    async def handle_llm_function_calls(
+        self, conn, function_calls: List[Dict[str, Any]]
+    ) -> List[ActionResponse]:
+        """并行处理同一轮中的多个LLM函数调用，结果顺序与调用顺序一致"""
+        return await asyncio.gather(
+            *(self._execute_function_call(call) for call in function_calls)
+        )
 
-            # 如果arguments是字符串，尝试解析为JSON
-            if isinstance(arguments, str):
-                try:
-                    arguments = json.loads(arguments) if arguments else {}
-                except json.JSONDecodeError:
-                    self.logger.error(f"无法解析函数参数: {arguments}")
-                    return ActionResponse(
-                        action=Action.ERROR,
-                        response="无法解析函数参数",
-                    )
+    async def _execute_function_call(
+        self, function_call_data: Dict[str, Any]
+    ) -> ActionResponse:
+        """执行单个函数调用，带超时控制"""
+        function_name = function_call_data["name"]
+        arguments = function_call_data.get("arguments", {})
+
+        # 如果arguments是字符串，尝试解析为JSON
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments else {}
+            except json.JSONDecodeError:
+                self.logger.error(f"无法解析函数参数: {arguments}")
+                return ActionResponse(
+                    action=Action.ERROR,
+                    response="无法解析函数参数",
+                )
 
-            self.logger.debug(f"调用函数: {function_name}, 参数: {arguments}")
+        self.logger.debug(f"调用函数: {function_name}, 参数: {arguments}")
 
+        try:
             # 执行工具调用
-            result = await self.tool_manager.execute_tool(function_name, arguments)
-            return result
-
+            return await asyncio.wait_for(
+                self.tool_manager.execute_tool(function_name, arguments),
+                timeout=self.tool_call_timeout,
+            )
+        except asyncio.TimeoutError:
+            self.logger.error(
+                f"工具 {function_name} 执行超时({self.tool_call_timeout}秒)"
+            )
+            return ActionResponse(
+                action=Action.ERROR, response=f"工具 {function_name} 执行超时"
+            )
         except Exception as e:
             self.logger.error(f"处理function call错误: {e}")
             return ActionResponse(action=Action.ERROR, response=str(e))
@@ -223,12 +254,12 @@ class UnifiedToolHandler:
         try:
             await self.server_mcp_executor.cleanup()
 
-            # 清理MCP接入点连接
+            # 接入点连接由所有设备共用，这里只解除当前连接的使用
             if (
                 hasattr(self.conn, "mcp_endpoint_client")
                 and self.conn.mcp_endpoint_client
             ):
-                await self.conn.mcp_endpoint_client.close()
+                self.conn.mcp_endpoint_client.detach(self.conn)
 
             self.logger.info("工具处理器清理完成")
         except Exception as e:
@@ -3,7 +3,12 @@
 from typing import Dict, List, Optional, Any
 from config.logger import setup_logging
 from plugins_func.register import Action, ActionResponse
-from .base import ToolType, ToolDefinition, ToolExecutor
+from .base import (
+    ToolType,
+    ToolDefinition,
+    ToolExecutor,
+    intern_function_descriptions,
+)
 
 
 class ToolManager:
@@ -15,6 +20,7 @@ class ToolManager:
         self.executors: Dict[ToolType, ToolExecutor] = {}
         self._cached_tools: Optional[Dict[str, ToolDefinition]] = None
         self._cached_function_descriptions: Optional[List[Dict[str, Any]]] = None
+        self._cached_fingerprint: Optional[str] = None
 
     def register_executor(self, tool_type: ToolType, executor: ToolExecutor):
         """注册工具执行器"""
@@ -26,6 +32,7 @@ class ToolManager:
         """使缓存失效"""
         self._cached_tools = None
         self._cached_function_descriptions = None
+        self._cached_fingerprint = None
 
     def get_all_tools(self) -> Dict[str, ToolDefinition]:
         """获取所有工具定义"""
@@ -47,18 +54,24 @@ class ToolManager:
         return all_tools
 
     def get_function_descriptions(self) -> List[Dict[str, Any]]:
-        """获取所有工具的函数描述（OpenAI格式）"""
+        """获取所有工具的函数描述（OpenAI格式）
+
+        工具集相同的连接共用同一个列表，调用方不能修改
+        """
         if self._cached_function_descriptions is not None:
             return self._cached_function_descriptions
 
-        descriptions = []
-        tools = self.get_all_tools()
-        for tool_definition in tools.values():
-            descriptions.append(tool_definition.description)
-
+        fingerprint, descriptions = intern_function_descriptions(self.get_all_tools())
+        self._cached_fingerprint = fingerprint
         self._cached_function_descriptions = descriptions
         return descriptions
 
+    def get_tools_fingerprint(self) -> str:
+        """获取当前工具集的指纹，工具集变化后指纹随之变化"""
+        if self._cached_fingerprint is None:
+            self.get_function_descriptions()
+        return self._cached_fingerprint
+
     def has_tool(self, tool_name: str) -> bool:
         """检查是否存在指定工具"""
         tools = self.get_all_tools()
@@ -197,7 +197,7 @@ class TTSProvider(TTSProviderBase):
 
             await self.ws.send(json.dumps(continue_task_message))
             self.last_active_time = time.time()
-            logger.bind(tag=TAG).debug(f"已发送文本: {filtered_text}")
+            logger.bind(tag=TAG).debug("已发送文本: {}", filtered_text)
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
@@ -297,6 +297,10 @@ class TTSProvider(TTSProviderBase):
             await self.close()
             raise
 
+    async def abort_stream(self):
+        """打断时立即关闭监听任务和WebSocket连接，下一轮会话重新建连"""
+        await self.close()
+
     async def close(self):
         """清理资源"""
         # 取消监听任务
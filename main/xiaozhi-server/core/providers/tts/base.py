@@ -76,7 +76,7 @@ class TTSProviderBase(ABC):
         )
 
     def handle_opus(self, opus_data: bytes):
-        logger.bind(tag=TAG).debug(f"推送数据到队列里面帧数～～ {len(opus_data)}")
+        logger.bind(tag=TAG).debug("推送数据到队列里面帧数～～ {}", len(opus_data))
         self.tts_audio_queue.put((SentenceType.MIDDLE, opus_data, None))
 
     def handle_audio_file(self, file_audio: bytes, text):
@@ -355,6 +355,16 @@ class TTSProviderBase(ABC):
             except Exception as e:
                 logger.bind(tag=TAG).error(f"audio_play_priority_thread: {text} {e}")
 
+    def on_turn_cancelled(self):
+        """本轮对话被打断时由取消令牌回调，立即中止上游合成"""
+        if self.conn is None or self.conn.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.abort_stream(), self.conn.loop)
+
+    async def abort_stream(self):
+        """中止进行中的上游合成并释放连接，流式TTS子类按各自协议重写"""
+        pass
+
     async def start_session(self, session_id):
         pass
 
@@ -366,6 +376,37 @@ class TTSProviderBase(ABC):
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
+    def reset(self, timeout=3):
+        """连接关闭后恢复到初始状态供下一个连接复用，返回False表示不可复用
+
+        流式TTS带有上游会话和编码器状态，只复用非流式实例
+        """
+        if self.interface_type != InterfaceType.NON_STREAM:
+            return False
+        if getattr(self, "ws", None):
+            return False
+        # 等待工作线程随连接的stop_event退出，避免旧线程继续消费新连接的队列
+        for thread in (
+            getattr(self, "tts_priority_thread", None),
+            getattr(self, "audio_play_priority_thread", None),
+        ):
+            if thread is not None:
+                thread.join(timeout)
+                if thread.is_alive():
+                    return False
+        self.conn = None
+        self.tts_text_queue = queue.Queue()
+        self.tts_audio_queue = queue.Queue()
+        self.tts_audio_first_sentence = True
+        self.before_stop_play_files = []
+        self.tts_text_buff = []
+        self.tts_stop_request = False
+        self.processed_chars = 0
+        self.is_first_sentence = True
+        self.tts_priority_thread = None
+        self.audio_play_priority_thread = None
+        return True
+
     def _get_segment_text(self):
         # 合并当前全部文本并处理未分割部分
         full_text = "".join(self.tts_text_buff)
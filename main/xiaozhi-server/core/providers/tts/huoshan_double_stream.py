@@ -382,6 +382,11 @@ class TTSProvider(TTSProviderBase):
             await self.close()
             raise
 
+    async def abort_stream(self):
+        """打断时立即取消服务端会话，监听任务收到SessionCanceled后退出"""
+        if self.ws:
+            await self.cancel_session(self.conn.sentence_id)
+
     async def cancel_session(self,session_id):
         logger.bind(tag=TAG).info(f"取消会话，释放服务端资源～～{session_id}")
         try:
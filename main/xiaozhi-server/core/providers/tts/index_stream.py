@@ -141,6 +141,9 @@ class TTSProvider(TTSProviderBase):
 
                     # 处理音频流数据
                     async for chunk in resp.content.iter_any():
+                        # 打断时停止读取上游音频流
+                        if self.conn.client_abort:
+                            break
                         data = chunk[0] if isinstance(chunk, (list, tuple)) else chunk
                         if not data:
                             continue
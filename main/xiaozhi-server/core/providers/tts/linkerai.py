@@ -163,6 +163,9 @@ class TTSProvider(TTSProviderBase):
 
                     # 兼容 iter_chunked / iter_chunks / iter_any
                     async for chunk in resp.content.iter_any():
+                        # 打断时停止读取上游音频流
+                        if self.conn.client_abort:
+                            break
                         data = chunk[0] if isinstance(chunk, (list, tuple)) else chunk
                         if not data:
                             continue
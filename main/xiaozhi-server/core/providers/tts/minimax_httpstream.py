@@ -192,6 +192,9 @@ class TTSProvider(TTSProviderBase):
                     # 处理音频流数据
                     buffer = b""
                     async for chunk in resp.content.iter_any():
+                        # 打断时停止读取上游音频流
+                        if self.conn.client_abort:
+                            break
                         if not chunk:
                             continue
 
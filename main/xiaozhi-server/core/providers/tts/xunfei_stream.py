@@ -305,6 +305,10 @@ class TTSProvider(TTSProviderBase):
             await self.close()
             raise
 
+    async def abort_stream(self):
+        """打断时立即关闭监听任务和WebSocket连接，下一轮会话重新建连"""
+        await self.close()
+
     async def close(self):
         """资源清理"""
         if self._monitor_task:
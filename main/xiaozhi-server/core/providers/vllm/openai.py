@@ -38,27 +38,45 @@ class VLLMProvider(VLLMProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
         self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.async_client = openai.AsyncOpenAI(
+            api_key=self.api_key, base_url=self.base_url
+        )
 
-    def response(self, question, base64_image):
+    def _build_messages(self, question, base64_image):
         question = question + "(请使用中文回复)"
-        try:
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": question},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            },
-                        },
-                    ],
-                }
-            ]
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": question},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+                    },
+                ],
+            }
+        ]
 
+    def response(self, question, base64_image):
+        try:
             response = self.client.chat.completions.create(
-                model=self.model_name, messages=messages, stream=False
+                model=self.model_name,
+                messages=self._build_messages(question, base64_image),
+                stream=False,
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+            raise
+
+    async def response_async(self, question, base64_image):
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model_name,
+                messages=self._build_messages(question, base64_image),
+                stream=False,
             )
 
             return response.choices[0].message.content
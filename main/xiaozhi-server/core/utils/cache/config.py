@@ -19,6 +19,9 @@ class CacheType(Enum):
     CONFIG = "config"
     DEVICE_PROMPT = "device_prompt"
     VOICEPRINT_HEALTH = "voiceprint_health"  # 声纹识别健康检查
+    PLUGIN_HTTP = "plugin_http"  # 插件的HTTP响应
+    TOOL_SCHEMA = "tool_schema"  # 按工具集指纹共享的函数描述和意图提示词
+    VISION = "vision"  # 按图片、问题和模型缓存的视觉分析结果
 
 
 @dataclass
@@ -28,7 +31,9 @@ class CacheConfig:
     strategy: CacheStrategy = CacheStrategy.TTL
     ttl: Optional[float] = 300  # 默认5分钟
     max_size: Optional[int] = 1000  # 默认最大1000条
+    max_bytes: Optional[int] = None  # 最大占用字节数，None表示不限制
     cleanup_interval: float = 60  # 清理间隔（秒）
+    shards: int = 8  # 锁分片数量
 
     @classmethod
     def for_type(cls, cache_type: CacheType) -> "CacheConfig":
@@ -58,5 +63,17 @@ class CacheConfig:
             CacheType.VOICEPRINT_HEALTH: cls(
                 strategy=CacheStrategy.TTL, ttl=600, max_size=100  # 10分钟过期
             ),
+            CacheType.PLUGIN_HTTP: cls(
+                strategy=CacheStrategy.TTL_LRU,
+                ttl=300,  # 5分钟，调用方可按URL指定
+                max_size=2000,
+                max_bytes=64 * 1024 * 1024,
+            ),
+            CacheType.TOOL_SCHEMA: cls(
+                strategy=CacheStrategy.LRU, ttl=None, max_size=1000  # 内容寻址，无需过期
+            ),
+            CacheType.VISION: cls(
+                strategy=CacheStrategy.TTL_LRU, ttl=600, max_size=1000  # 10分钟
+            ),
         }
         return configs.get(cache_type, cls())
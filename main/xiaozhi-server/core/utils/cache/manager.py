@@ -2,12 +2,165 @@
 全局缓存管理器
 """
 
+import sys
 import time
+import heapq
+import asyncio
+import itertools
 import threading
-from typing import Any, Optional, Dict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from collections import OrderedDict
 from .strategies import CacheStrategy, CacheEntry
 from .config import CacheConfig, CacheType
+from .persistent import PersistentCacheStore
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """粗略估算对象占用的字节数，音频等二进制数据按实际长度计算"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8", errors="ignore"))
+    size = sys.getsizeof(value, 64)
+    if _depth >= 3:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _depth + 1)
+    return size
+
+
+class CacheStats:
+    """单个缓存类型的命中/未命中/淘汰计数"""
+
+    FIELDS = (
+        "hits",
+        "misses",
+        "sets",
+        "evictions",
+        "expirations",
+        "computes",
+        "rejected",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field: str, amount: int = 1):
+        with self._lock:
+            self._counters[field] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+class _Shard:
+    """缓存分片：独立的锁、按插入/访问顺序排列的条目，以及按过期时间排列的小顶堆"""
+
+    def __init__(self, config: CacheConfig, max_size, max_bytes, stats: CacheStats):
+        self.config = config
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # (过期时间, 序号, key, 条目)，条目被覆盖或删除后堆中记录视为失效
+        self.expiry_heap: List[tuple] = []
+        self.bytes = 0
+        self.last_sweep = time.monotonic()
+        self._seq = itertools.count()
+
+    def _remove(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry
+
+    def sweep(self, now: float):
+        """弹出堆顶已过期的条目，每个条目只会出入堆一次，均摊O(1)"""
+        heap = self.expiry_heap
+        while heap and heap[0][0] <= now:
+            _, _, key, entry = heapq.heappop(heap)
+            if self.entries.get(key) is entry:
+                self._remove(key)
+                self.stats.incr("expirations")
+        # 被覆盖的条目会在堆中留下失效记录，过多时重建
+        if len(heap) > 2 * len(self.entries) + 64:
+            self.expiry_heap = [
+                item for item in heap if self.entries.get(item[2]) is item[3]
+            ]
+            heapq.heapify(self.expiry_heap)
+        self.last_sweep = now
+
+    def set(self, key: str, entry: CacheEntry) -> bool:
+        """写入条目，超过字节上限而未缓存时返回False"""
+        now = time.monotonic()
+        self._remove(key)
+        if self.max_bytes and entry.size > self.max_bytes:
+            # 单个条目超过字节上限时不缓存，也不淘汰其他条目
+            self.stats.incr("rejected")
+            return False
+        self.entries[key] = entry
+        self.bytes += entry.size
+        if entry.expires_at is not None:
+            heapq.heappush(
+                self.expiry_heap, (entry.expires_at, next(self._seq), key, entry)
+            )
+        self.sweep(now)
+        # 超出条数或字节上限时，淘汰最早插入（LRU策略下为最久未访问）的条目
+        while self.entries and (
+            (self.max_size and len(self.entries) > self.max_size)
+            or (self.max_bytes and self.bytes > self.max_bytes)
+        ):
+            victim_key = next(iter(self.entries))
+            self._remove(victim_key)
+            self.stats.incr("evictions")
+        return True
+
+    def get(self, key: str):
+        now = time.monotonic()
+        if now - self.last_sweep > self.config.cleanup_interval:
+            self.sweep(now)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.is_expired(now):
+            self._remove(key)
+            self.stats.incr("expirations")
+            return None
+        entry.touch()
+        if self.config.strategy in (CacheStrategy.LRU, CacheStrategy.TTL_LRU):
+            self.entries.move_to_end(key)
+        return entry
+
+
+class _CacheSpace:
+    """一个缓存空间（缓存类型+命名空间），按key哈希分布到多个分片"""
+
+    def __init__(self, config: CacheConfig, stats: CacheStats):
+        self.config = config
+        shard_count = max(1, config.shards)
+        if config.max_size:
+            # 条目较少的缓存不分片，保证条数上限精确
+            shard_count = min(shard_count, max(1, config.max_size // 64))
+        per_shard_size = (
+            -(-config.max_size // shard_count) if config.max_size else None
+        )
+        per_shard_bytes = (
+            -(-config.max_bytes // shard_count) if config.max_bytes else None
+        )
+        self.shards = [
+            _Shard(config, per_shard_size, per_shard_bytes, stats)
+            for _ in range(shard_count)
+        ]
+
+    def shard(self, key: str) -> _Shard:
+        return self.shards[hash(key) % len(self.shards)]
 
 
 class GlobalCacheManager:
@@ -15,12 +168,16 @@ class GlobalCacheManager:
 
     def __init__(self):
         self._logger = None
-        self._caches: Dict[str, Dict[str, CacheEntry]] = {}
+        self._spaces: Dict[str, _CacheSpace] = {}
         self._configs: Dict[str, CacheConfig] = {}
-        self._locks: Dict[str, threading.RLock] = {}
-        self._global_lock = threading.RLock()
-        self._last_cleanup = time.time()
-        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "cleanups": 0}
+        self._stats: Dict[CacheType, CacheStats] = {}
+        self._global_lock = threading.Lock()
+        # 单飞：正在计算的key，同一key的并发未命中只计算一次
+        self._inflight: Dict[tuple, threading.Event] = {}
+        self._async_inflight: Dict[tuple, asyncio.Future] = {}
+        # 持久化层，仅对启用的缓存类型生效
+        self._persistent: Optional[PersistentCacheStore] = None
+        self._persistent_types = set()
 
     @property
     def logger(self):
@@ -37,20 +194,102 @@ class GlobalCacheManager:
             return f"{cache_type.value}:{namespace}"
         return cache_type.value
 
-    def _get_or_create_cache(
-        self, cache_name: str, config: CacheConfig
-    ) -> Dict[str, CacheEntry]:
+    def _get_stats(self, cache_type: CacheType) -> CacheStats:
+        stats = self._stats.get(cache_type)
+        if stats is None:
+            with self._global_lock:
+                stats = self._stats.setdefault(cache_type, CacheStats())
+        return stats
+
+    def _get_or_create_space(
+        self, cache_type: CacheType, cache_name: str
+    ) -> _CacheSpace:
         """获取或创建缓存空间"""
+        space = self._spaces.get(cache_name)
+        if space is not None:
+            return space
+        stats = self._get_stats(cache_type)
         with self._global_lock:
-            if cache_name not in self._caches:
-                self._caches[cache_name] = (
-                    OrderedDict()
-                    if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]
-                    else {}
+            if cache_name not in self._spaces:
+                config = self._configs.get(cache_name) or CacheConfig.for_type(
+                    cache_type
                 )
                 self._configs[cache_name] = config
-                self._locks[cache_name] = threading.RLock()
-            return self._caches[cache_name]
+                space = _CacheSpace(config, stats)
+                if cache_type in self._persistent_types:
+                    self._load_persistent(cache_name, space)
+                self._spaces[cache_name] = space
+            return self._spaces[cache_name]
+
+    def enable_persistence(self, config: Dict[str, Any]) -> None:
+        """按配置启用持久化层，缓存空间首次使用时从磁盘加载，写入异步落盘"""
+        persistent_config = (config.get("cache") or {}).get("persistent") or {}
+        if not persistent_config.get("enabled", False) or self._persistent:
+            return
+        from config.config_loader import get_project_dir
+
+        types = set()
+        for name in persistent_config.get("types", []):
+            try:
+                types.add(CacheType(name))
+            except ValueError:
+                self.logger.warning(f"未知的持久化缓存类型: {name}")
+        db_path = get_project_dir() + persistent_config.get("path", "data/.cache.db")
+        try:
+            self._persistent = PersistentCacheStore(
+                db_path, float(persistent_config.get("flush_interval", 1.0)), self.logger
+            )
+        except Exception as e:
+            self.logger.error(f"启用缓存持久化失败: {e}")
+            return
+        with self._global_lock:
+            self._persistent_types = types
+            # 已创建的缓存空间也补充加载一次
+            for cache_name, space in self._spaces.items():
+                if self._cache_type_of(cache_name) in types:
+                    self._load_persistent(cache_name, space)
+        self.logger.info(
+            f"缓存持久化已启用: {db_path}，类型: {[t.value for t in types]}"
+        )
+
+    def close_persistence(self) -> None:
+        """退出时将未写入的数据落盘"""
+        if self._persistent:
+            self._persistent.close()
+            self._persistent = None
+            self._persistent_types = set()
+
+    @staticmethod
+    def _cache_type_of(cache_name: str) -> Optional[CacheType]:
+        try:
+            return CacheType(cache_name.split(":", 1)[0])
+        except ValueError:
+            return None
+
+    def _load_persistent(self, cache_name: str, space: _CacheSpace) -> None:
+        loaded = 0
+        for key, value, ttl in self._persistent.load(cache_name):
+            entry = CacheEntry(
+                value=value, timestamp=time.time(), ttl=ttl, size=estimate_size(value)
+            )
+            shard = space.shard(key)
+            with shard.lock:
+                if key not in shard.entries and shard.set(key, entry):
+                    loaded += 1
+        if loaded:
+            self.logger.debug(f"从磁盘加载缓存 {cache_name}: {loaded} 条")
+
+    def _is_persistent(self, cache_type: CacheType) -> bool:
+        return self._persistent is not None and cache_type in self._persistent_types
+
+    def configure(
+        self, cache_type: CacheType, config: CacheConfig, namespace: str = ""
+    ) -> None:
+        """覆盖指定缓存的配置，需在首次使用前调用"""
+        cache_name = self._get_cache_name(cache_type, namespace)
+        with self._global_lock:
+            self._configs[cache_name] = config
+            self._spaces.pop(cache_name, None)
 
     def set(
         self,
@@ -59,157 +298,196 @@ class GlobalCacheManager:
         value: Any,
         ttl: Optional[float] = None,
         namespace: str = "",
+        size: Optional[int] = None,
     ) -> None:
-        """设置缓存值"""
+        """设置缓存值，size为占用字节数，不传时自动估算"""
         cache_name = self._get_cache_name(cache_type, namespace)
-        config = self._configs.get(cache_name) or CacheConfig.for_type(cache_type)
-        cache = self._get_or_create_cache(cache_name, config)
+        space = self._get_or_create_space(cache_type, cache_name)
 
         # 使用配置的TTL或传入的TTL
-        effective_ttl = ttl if ttl is not None else config.ttl
-
-        with self._locks[cache_name]:
-            # 创建缓存条目
-            entry = CacheEntry(value=value, timestamp=time.time(), ttl=effective_ttl)
-
-            # 处理不同策略
-            if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]:
-                # LRU策略：如果已存在则移动到末尾
-                if key in cache:
-                    del cache[key]
-                cache[key] = entry
-
-                # 检查大小限制
-                if config.max_size and len(cache) > config.max_size:
-                    # 移除最旧的条目
-                    oldest_key = next(iter(cache))
-                    del cache[oldest_key]
-                    self._stats["evictions"] += 1
-
+        effective_ttl = ttl if ttl is not None else space.config.ttl
+        entry = CacheEntry(
+            value=value,
+            timestamp=time.time(),
+            ttl=effective_ttl,
+            size=size if size is not None else estimate_size(value),
+        )
+        shard = space.shard(key)
+        with shard.lock:
+            stored = shard.set(key, entry)
+        self._get_stats(cache_type).incr("sets")
+        if self._is_persistent(cache_type):
+            if stored:
+                self._persistent.put(cache_name, key, value, effective_ttl)
             else:
-                cache[key] = entry
-
-                # 检查大小限制
-                if config.max_size and len(cache) > config.max_size:
-                    # 简单策略：随机移除一个条目
-                    victim_key = next(iter(cache))
-                    del cache[victim_key]
-                    self._stats["evictions"] += 1
-
-        # 定期清理过期条目
-        self._maybe_cleanup(cache_name)
+                self._persistent.delete(cache_name, key)
 
     def get(
         self, cache_type: CacheType, key: str, namespace: str = ""
     ) -> Optional[Any]:
         """获取缓存值"""
         cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
-            self._stats["misses"] += 1
+        stats = self._get_stats(cache_type)
+        space = self._spaces.get(cache_name)
+        if space is None and self._is_persistent(cache_type):
+            # 持久化的缓存空间在首次读取时从磁盘加载
+            space = self._get_or_create_space(cache_type, cache_name)
+        if space is None:
+            stats.incr("misses")
             return None
 
-        cache = self._caches[cache_name]
-        config = self._configs[cache_name]
-
-        with self._locks[cache_name]:
-            if key not in cache:
-                self._stats["misses"] += 1
-                return None
-
-            entry = cache[key]
-
-            # 检查过期
-            if entry.is_expired():
-                del cache[key]
-                self._stats["misses"] += 1
-                return None
-
-            # 更新访问信息
-            entry.touch()
-
-            # LRU策略：移动到末尾
-            if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]:
-                del cache[key]
-                cache[key] = entry
+        shard = space.shard(key)
+        with shard.lock:
+            entry = shard.get(key)
+        if entry is None:
+            stats.incr("misses")
+            return None
+        stats.incr("hits")
+        return entry.value
 
-            self._stats["hits"] += 1
-            return entry.value
+    def get_or_compute(
+        self,
+        cache_type: CacheType,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+        namespace: str = "",
+    ) -> Any:
+        """获取缓存值，未命中时调用compute计算并写入缓存；
+        多个线程同时未命中同一key时只有一个线程执行compute，其余等待结果。
+        compute返回None时不写入缓存"""
+        value = self.get(cache_type, key, namespace)
+        if value is not None:
+            return value
+        flight_key = (self._get_cache_name(cache_type, namespace), key)
+        while True:
+            with self._global_lock:
+                event = self._inflight.get(flight_key)
+                leader = event is None
+                if leader:
+                    event = self._inflight[flight_key] = threading.Event()
+            if leader:
+                break
+            event.wait()
+            value = self.get(cache_type, key, namespace)
+            if value is not None:
+                return value
+            # 计算者失败或结果为空时，由当前线程重新竞争计算
+
+        try:
+            value = compute()
+            self._get_stats(cache_type).incr("computes")
+            if value is not None:
+                self.set(cache_type, key, value, ttl=ttl, namespace=namespace)
+            return value
+        finally:
+            with self._global_lock:
+                self._inflight.pop(flight_key, None)
+            event.set()
+
+    async def async_get_or_compute(
+        self,
+        cache_type: CacheType,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        namespace: str = "",
+    ) -> Any:
+        """get_or_compute的协程版本，同一事件循环内并发未命中同一key时共享一次计算"""
+        value = self.get(cache_type, key, namespace)
+        if value is not None:
+            return value
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), self._get_cache_name(cache_type, namespace), key)
+        future = self._async_inflight.get(flight_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        self._async_inflight[flight_key] = future
+        try:
+            value = await compute()
+            self._get_stats(cache_type).incr("computes")
+            if value is not None:
+                self.set(cache_type, key, value, ttl=ttl, namespace=namespace)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 避免没有等待者时出现未获取异常的警告
+            future.exception()
+            raise
+        finally:
+            self._async_inflight.pop(flight_key, None)
 
     def delete(self, cache_type: CacheType, key: str, namespace: str = "") -> bool:
         """删除缓存条目"""
         cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
+        if self._is_persistent(cache_type):
+            self._persistent.delete(cache_name, key)
+        space = self._spaces.get(cache_name)
+        if space is None:
             return False
 
-        cache = self._caches[cache_name]
-
-        with self._locks[cache_name]:
-            if key in cache:
-                del cache[key]
-                return True
-            return False
+        shard = space.shard(key)
+        with shard.lock:
+            return shard._remove(key) is not None
 
     def clear(self, cache_type: CacheType, namespace: str = "") -> None:
         """清空指定缓存"""
         cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
+        if self._is_persistent(cache_type):
+            self._persistent.delete(cache_name)
+        space = self._spaces.get(cache_name)
+        if space is None:
             return
 
-        with self._locks[cache_name]:
-            self._caches[cache_name].clear()
+        for shard in space.shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.expiry_heap.clear()
+                shard.bytes = 0
 
     def invalidate_pattern(
         self, cache_type: CacheType, pattern: str, namespace: str = ""
     ) -> int:
         """按模式失效缓存条目"""
         cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
-            return 0
-
-        cache = self._caches[cache_name]
-        deleted_count = 0
-
-        with self._locks[cache_name]:
-            keys_to_delete = [key for key in cache.keys() if pattern in key]
-            for key in keys_to_delete:
-                del cache[key]
-                deleted_count += 1
-
-        return deleted_count
-
-    def _cleanup_expired(self, cache_name: str) -> int:
-        """清理过期条目"""
-        if cache_name not in self._caches:
+        space = self._spaces.get(cache_name)
+        if space is None:
             return 0
 
-        cache = self._caches[cache_name]
         deleted_count = 0
-
-        with self._locks[cache_name]:
-            expired_keys = [key for key, entry in cache.items() if entry.is_expired()]
-            for key in expired_keys:
-                del cache[key]
-                deleted_count += 1
+        for shard in space.shards:
+            with shard.lock:
+                keys_to_delete = [key for key in shard.entries if pattern in key]
+                for key in keys_to_delete:
+                    shard._remove(key)
+                    deleted_count += 1
+                    if self._is_persistent(cache_type):
+                        self._persistent.delete(cache_name, key)
 
         return deleted_count
 
-    def _maybe_cleanup(self, cache_name: str):
-        """定期清理检查"""
-        config = self._configs.get(cache_name)
-        if not config:
-            return
-
-        now = time.time()
-        if now - self._last_cleanup > config.cleanup_interval:
-            self._last_cleanup = now
-            deleted = self._cleanup_expired(cache_name)
-            if deleted > 0:
-                self._stats["cleanups"] += 1
-                self.logger.debug(f"清理缓存 {cache_name}: 删除 {deleted} 个过期条目")
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """按缓存类型汇总的计数、条目数和占用字节数，可导出到监控"""
+        result = {}
+        with self._global_lock:
+            stats_items = list(self._stats.items())
+            spaces = list(self._spaces.items())
+        for cache_type, stats in stats_items:
+            result[cache_type.value] = dict(stats.snapshot(), entries=0, bytes=0)
+        for cache_name, space in spaces:
+            type_name = cache_name.split(":", 1)[0]
+            summary = result.setdefault(type_name, {"entries": 0, "bytes": 0})
+            for shard in space.shards:
+                with shard.lock:
+                    summary["entries"] += len(shard.entries)
+                    summary["bytes"] += shard.bytes
+        return result
 
 
 # 创建全局缓存管理器实例
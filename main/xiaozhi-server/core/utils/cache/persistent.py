@@ -0,0 +1,125 @@
+"""
+缓存的持久化层：将指定类型的缓存异步写入SQLite，重启后按需加载，保留剩余的过期时间
+"""
+
+import os
+import json
+import time
+import queue
+import sqlite3
+import threading
+from typing import Any, Iterator, Optional, Tuple
+
+_FLUSH = object()
+_STOP = object()
+
+
+class PersistentCacheStore:
+    """后台线程批量写入，调用方只做入队操作，不会阻塞事件循环"""
+
+    def __init__(self, db_path: str, flush_interval: float = 1.0, logger=None):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.logger = logger
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "cache_name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL, PRIMARY KEY (cache_name, key))"
+            )
+            # 启动时清理已过期的数据
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            )
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="cache-writer", daemon=True
+        )
+        self._writer.start()
+
+    def load(self, cache_name: str) -> Iterator[Tuple[str, Any, Optional[float]]]:
+        """读取某个缓存空间未过期的条目，返回 (key, value, 剩余ttl)"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, expires_at FROM cache_entries "
+                "WHERE cache_name = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (cache_name, now),
+            ).fetchall()
+        for key, value, expires_at in rows:
+            try:
+                yield key, json.loads(value), (
+                    None if expires_at is None else expires_at - now
+                )
+            except ValueError:
+                continue
+
+    def put(self, cache_name: str, key: str, value: Any, ttl: Optional[float]):
+        try:
+            data = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            # 无法序列化的值只保存在内存中
+            return
+        expires_at = None if ttl is None else time.time() + ttl
+        self._queue.put(("put", cache_name, str(key), data, expires_at))
+
+    def delete(self, cache_name: str, key: Optional[str] = None):
+        """删除单个条目，key为空时删除整个缓存空间"""
+        self._queue.put(("delete", cache_name, key))
+
+    def flush(self, timeout: float = 5.0):
+        """等待已入队的写操作落盘"""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        self._queue.put((_STOP,))
+        self._writer.join(timeout)
+
+    def _write_loop(self):
+        while True:
+            ops = [self._queue.get()]
+            # 攒一批后统一提交，减少事务次数
+            deadline = time.monotonic() + self.flush_interval
+            while ops[-1][0] not in (_FLUSH, _STOP):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    ops.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._apply(ops)
+            if ops[-1][0] is _FLUSH:
+                ops[-1][1].set()
+            elif ops[-1][0] is _STOP:
+                return
+
+    def _apply(self, ops):
+        try:
+            with self._lock, self._conn:
+                for op in ops:
+                    if op[0] == "put":
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO cache_entries "
+                            "(cache_name, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                            op[1:],
+                        )
+                    elif op[0] == "delete" and op[2] is None:
+                        self._conn.execute(
+                            "DELETE FROM cache_entries WHERE cache_name = ?", (op[1],)
+                        )
+                    elif op[0] == "delete":
+                        self._conn.execute(
+                            "DELETE FROM cache_entries WHERE cache_name = ? AND key = ?",
+                            (op[1], str(op[2])),
+                        )
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"缓存持久化写入失败: {e}")
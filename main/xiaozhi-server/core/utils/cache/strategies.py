@@ -26,16 +26,20 @@ class CacheEntry:
     ttl: Optional[float] = None  # 生存时间（秒）
     access_count: int = 0
     last_access: float = None
+    size: int = 0  # 估算的占用字节数
+    expires_at: Optional[float] = None  # 过期时间点（monotonic）
 
     def __post_init__(self):
         if self.last_access is None:
             self.last_access = self.timestamp
+        if self.expires_at is None and self.ttl is not None:
+            self.expires_at = time.monotonic() + self.ttl
 
-    def is_expired(self) -> bool:
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """检查是否过期"""
-        if self.ttl is None:
+        if self.expires_at is None:
             return False
-        return time.time() - self.timestamp > self.ttl
+        return (time.monotonic() if now is None else now) > self.expires_at
 
     def touch(self):
         """更新访问时间和计数"""
@@ -0,0 +1,69 @@
+"""
+单轮对话的取消令牌，用户打断时立即通知LLM、TTS和工具执行器释放上游资源
+"""
+
+import threading
+from typing import Callable, List
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class CancellationToken:
+    """线程安全的取消令牌，可在事件循环和工作线程之间共享"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def register(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """注册取消回调，返回注销函数；若令牌已被取消则立即执行回调"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._unregister(callback)
+        self._run_callback(callback)
+        return lambda: None
+
+    def _unregister(self, callback: Callable[[], None]):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def cancel(self):
+        """触发取消，每个回调只执行一次"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._run_callback(callback)
+
+    @staticmethod
+    def _run_callback(callback: Callable[[], None]):
+        try:
+            callback()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"执行取消回调失败: {e}")
+
+
+def bind_cancel(cancel_token, callback: Callable[[], None]) -> Callable[[], None]:
+    """在令牌可能为空时注册取消回调，返回注销函数"""
+    if cancel_token is None:
+        return lambda: None
+    return cancel_token.register(callback)
+
+
+def is_cancelled(cancel_token) -> bool:
+    """判断令牌是否已取消，令牌为空时视为未取消"""
+    return cancel_token is not None and cancel_token.cancelled
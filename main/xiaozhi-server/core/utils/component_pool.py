@@ -0,0 +1,315 @@
+"""
+连接组件池：按配置指纹预先创建TTS、远程ASR实例，设备连接时直接租用，
+连接关闭后由组件自行重置，能复用的放回池中，缩短设备连接到可对话的时间
+
+只为服务端默认配置和被租用过不止一次的配置保持空闲实例；后台定期清理过期实例
+和不再使用的指纹，指纹总数有上限，按最近使用淘汰
+"""
+
+import copy
+import json
+import time
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from config.logger import setup_logging
+from core.utils.modules_initialize import initialize_tts, initialize_asr
+
+TAG = __name__
+logger = setup_logging()
+
+
+def config_fingerprint(kind, config):
+    """根据选中模块的配置计算指纹，配置相同的连接可以共用同一组预热实例"""
+    module_name = config["selected_module"][kind]
+    data = {
+        "kind": kind,
+        "module": module_name,
+        "config": config[kind][module_name],
+        "delete_audio": str(config.get("delete_audio", True)).lower(),
+    }
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{kind}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+
+def _module_config(kind, config):
+    """只保留创建实例所需的配置，避免预热任务持有整个连接的配置"""
+    module_name = config["selected_module"][kind]
+    return {
+        "selected_module": {kind: module_name},
+        kind: {module_name: copy.deepcopy(config[kind][module_name])},
+        "delete_audio": config.get("delete_audio", True),
+    }
+
+
+class _PoolKey:
+    """单个配置指纹的创建函数和使用情况"""
+
+    __slots__ = ("factory", "leases", "pinned", "last_used")
+
+    def __init__(self, factory):
+        self.factory = factory
+        # 累计租用次数，租用过不止一次的配置才值得保持空闲实例
+        self.leases = 0
+        # 服务端默认配置，始终预热且不会被淘汰
+        self.pinned = False
+        self.last_used = time.monotonic()
+
+
+class ComponentPool:
+    def __init__(self, config=None):
+        pool_config = (config or {}).get("component_pool", {}) or {}
+        self.enabled = bool(pool_config.get("enabled", True))
+        # 每种配置保持的空闲实例数
+        self.min_idle = int(pool_config.get("min_idle", 2))
+        self.max_idle = int(pool_config.get("max_idle", 8))
+        # 空闲超过该时间(秒)的实例不再使用
+        self.idle_ttl = float(pool_config.get("idle_ttl", 600))
+        # 最多跟踪的配置指纹数，超出后淘汰最久未使用的
+        self.max_keys = int(pool_config.get("max_keys", 32))
+        # 清理过期空闲实例和无用指纹的间隔(秒)
+        self.sweep_interval = float(pool_config.get("sweep_interval", 60))
+        # 回收时等待组件工作线程退出的时间(秒)
+        self.release_timeout = float(pool_config.get("release_timeout", 3))
+        self._lock = threading.Lock()
+        # 指纹 -> deque[(实例, 放入时间)]
+        self._idle = {}
+        # 指纹 -> _PoolKey，按最近使用排序
+        self._keys = OrderedDict()
+        # 指纹 -> 正在创建的实例数
+        self._warming = {}
+        # 租出的实例 -> 指纹
+        self._leased = weakref.WeakKeyDictionary()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "created": 0,
+            "recycled": 0,
+            "dropped": 0,
+            "evicted_keys": 0,
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(pool_config.get("workers", 2)),
+            thread_name_prefix="component-pool",
+        )
+        self._stop_event = threading.Event()
+        if self.enabled:
+            threading.Thread(
+                target=self._sweep_loop, name="component-pool-sweep", daemon=True
+            ).start()
+
+    def lease(self, key, factory):
+        """取出一个预热好的实例，没有时当场创建；同一配置再次租用时才在后台补充空闲实例"""
+        if not self.enabled:
+            return factory()
+        instance = None
+        with self._lock:
+            entry = self._touch_locked(key, factory)
+            entry.leases += 1
+            idle = self._idle.get(key)
+            now = time.monotonic()
+            while idle:
+                candidate, idle_since = idle.popleft()
+                if now - idle_since < self.idle_ttl:
+                    instance = candidate
+                    break
+                self._stats["dropped"] += 1
+            self._stats["hits" if instance is not None else "misses"] += 1
+        if instance is None:
+            instance = factory()
+        with self._lock:
+            self._leased[instance] = key
+        self._refill(key)
+        return instance
+
+    def prewarm(self, key, factory):
+        """提前为指定配置创建空闲实例，例如服务启动时的默认配置"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._touch_locked(key, factory).pinned = True
+        self._refill(key)
+
+    def _touch_locked(self, key, factory):
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = self._keys[key] = _PoolKey(factory)
+            self._evict_keys_locked()
+        else:
+            entry.factory = factory
+            entry.last_used = time.monotonic()
+            self._keys.move_to_end(key)
+        return entry
+
+    def _evict_keys_locked(self):
+        """指纹数超出上限时，淘汰最久未使用、且没有正在创建实例的指纹"""
+        excess = len(self._keys) - self.max_keys
+        if excess <= 0:
+            return
+        # 最后一个是刚加入的指纹，不参与淘汰
+        for key in list(self._keys)[:-1]:
+            if excess <= 0:
+                break
+            if self._keys[key].pinned or self._warming.get(key):
+                continue
+            self._drop_key_locked(key)
+            excess -= 1
+
+    def _drop_key_locked(self, key):
+        del self._keys[key]
+        self._warming.pop(key, None)
+        self._stats["dropped"] += len(self._idle.pop(key, ()))
+        self._stats["evicted_keys"] += 1
+
+    def _sweep_loop(self):
+        while not self._stop_event.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"清理组件池失败: {e}")
+
+    def sweep(self):
+        """丢弃过期的空闲实例，并移除没有空闲、租出和创建中实例的非默认指纹"""
+        now = time.monotonic()
+        with self._lock:
+            for idle in self._idle.values():
+                while idle and now - idle[0][1] >= self.idle_ttl:
+                    idle.popleft()
+                    self._stats["dropped"] += 1
+            in_use = set(self._leased.values())
+            for key, entry in list(self._keys.items()):
+                if (
+                    entry.pinned
+                    or key in in_use
+                    or self._idle.get(key)
+                    or self._warming.get(key)
+                    or now - entry.last_used < self.idle_ttl
+                ):
+                    continue
+                self._drop_key_locked(key)
+            for key in [key for key in self._idle if key not in self._keys]:
+                del self._idle[key]
+
+    def release(self, instance):
+        """连接关闭后归还实例，重置在后台线程中进行，不阻塞调用方"""
+        with self._lock:
+            key = self._leased.pop(instance, None)
+        if key is None:
+            return
+        try:
+            self._executor.submit(self._recycle, key, instance)
+        except RuntimeError:
+            # 进程退出时线程池已关闭
+            pass
+
+    def _recycle(self, key, instance):
+        reset = getattr(instance, "reset", None)
+        try:
+            reusable = reset is not None and reset(self.release_timeout)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"重置组件失败，不再复用: {e}")
+            reusable = False
+        with self._lock:
+            self._put_idle_locked(key, instance if reusable else None)
+            if reusable and key in self._keys:
+                self._stats["recycled"] += 1
+
+    def _put_idle_locked(self, key, instance):
+        """放入空闲队列，指纹已被淘汰或空闲实例已满时丢弃"""
+        if instance is None:
+            self._stats["dropped"] += 1
+            return
+        idle = self._idle.setdefault(key, deque()) if key in self._keys else None
+        if idle is not None and len(idle) < self.max_idle:
+            idle.append((instance, time.monotonic()))
+        else:
+            self._stats["dropped"] += 1
+
+    def _refill(self, key):
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None or not (entry.pinned or entry.leases > 1):
+                return
+            idle = self._idle.setdefault(key, deque())
+            needed = self.min_idle - len(idle) - self._warming.get(key, 0)
+            if needed <= 0:
+                return
+            self._warming[key] = self._warming.get(key, 0) + needed
+            factory = entry.factory
+        for _ in range(needed):
+            try:
+                self._executor.submit(self._create, key, factory)
+            except RuntimeError:
+                with self._lock:
+                    self._warming[key] -= 1
+
+    def _create(self, key, factory):
+        instance = None
+        try:
+            instance = factory()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"预热组件失败 {key}: {e}")
+        with self._lock:
+            if key in self._warming:
+                self._warming[key] -= 1
+            if instance is None:
+                return
+            self._stats["created"] += 1
+            self._put_idle_locked(key, instance)
+
+    def lease_tts(self, config):
+        module_config = _module_config("TTS", config)
+        return self.lease(
+            config_fingerprint("TTS", config), lambda: initialize_tts(module_config)
+        )
+
+    def lease_asr(self, config):
+        module_config = _module_config("ASR", config)
+        return self.lease(
+            config_fingerprint("ASR", config), lambda: initialize_asr(module_config)
+        )
+
+    def prewarm_config(self, config, include_asr=False):
+        """按服务端默认配置预热TTS，远程ASR需要每个连接一个实例时一并预热"""
+        try:
+            kinds = ("TTS", "ASR") if include_asr else ("TTS",)
+            for kind in kinds:
+                module_config = _module_config(kind, config)
+                factory = initialize_tts if kind == "TTS" else initialize_asr
+                self.prewarm(
+                    config_fingerprint(kind, config),
+                    lambda factory=factory, module_config=module_config: factory(
+                        module_config
+                    ),
+                )
+        except KeyError as e:
+            logger.bind(tag=TAG).warning(f"缺少模块配置，跳过预热: {e}")
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = sum(len(idle) for idle in self._idle.values())
+            stats["warming"] = sum(self._warming.values())
+            stats["keys"] = len(self._keys)
+        return stats
+
+    def shutdown(self):
+        self._stop_event.set()
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            self._idle.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_component_pool(config=None):
+    """获取进程级组件池，首次调用时按配置创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ComponentPool(config)
+        return _pool
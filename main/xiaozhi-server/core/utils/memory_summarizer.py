@@ -0,0 +1,254 @@
+"""
+进程内共享的记忆总结任务队列：固定数量的工作线程执行记忆总结，
+同一设备只保留最新一次对话，失败按指数退避重试，退出时等待执行中的任务，
+仍未完成的任务连同排队中的任务一起持久化
+"""
+
+import os
+import copy
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from config.logger import setup_logging
+from config.config_loader import get_project_dir
+from core.utils.dialogue import Message
+
+TAG = __name__
+logger = setup_logging()
+
+
+class _SummaryJob:
+    def __init__(self, role_id, memory, messages):
+        self.role_id = role_id
+        self.memory = memory
+        self.messages = messages
+        self.attempts = 0
+        self.not_before = 0.0
+
+    def to_dict(self):
+        return {
+            "role_id": self.role_id,
+            "save_to_file": getattr(self.memory, "save_to_file", True),
+            "short_memory": getattr(self.memory, "short_memory", None),
+            "messages": [
+                {"role": m.role, "content": m.content}
+                for m in self.messages
+                if m.role in ("user", "assistant") and m.content
+            ],
+        }
+
+
+class MemorySummarizer:
+    def __init__(self, config=None):
+        summary_config = (config or {}).get("memory_summary", {}) or {}
+        self.worker_count = max(1, int(summary_config.get("workers", 2)))
+        self.max_pending = int(summary_config.get("max_pending", 10000))
+        self.max_retries = int(summary_config.get("max_retries", 3))
+        self.retry_base_delay = float(summary_config.get("retry_base_delay", 5))
+        # 退出时等待执行中任务完成的最长时间(秒)
+        self.shutdown_timeout = float(summary_config.get("shutdown_timeout", 10))
+        self.pending_path = get_project_dir() + summary_config.get(
+            "pending_path", "data/.memory_pending.json"
+        )
+
+        self._cond = threading.Condition()
+        # role_id -> 待执行任务，按提交顺序排列
+        self._pending = OrderedDict()
+        # role_id -> 执行中的任务
+        self._running = {}
+        self._stopped = False
+        self._stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "completed": 0,
+            "failed": 0,
+            "retried": 0,
+            "dropped": 0,
+        }
+        self._workers = []
+        for i in range(self.worker_count):
+            worker = threading.Thread(
+                target=self._worker_loop, name=f"memory-summary-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, role_id, memory, messages):
+        """提交记忆总结任务，同一设备未开始执行的旧任务会被新任务替换"""
+        if memory is None or role_id is None:
+            return False
+        # 共享的记忆实例会被后续连接修改，这里保存当前连接的快照
+        job = _SummaryJob(role_id, copy.copy(memory), list(messages))
+        with self._cond:
+            if self._stopped:
+                return False
+            if role_id in self._pending:
+                self._stats["coalesced"] += 1
+            elif len(self._pending) >= self.max_pending:
+                self._stats["dropped"] += 1
+                logger.bind(tag=TAG).warning(
+                    f"记忆总结队列已满({self.max_pending})，丢弃设备 {role_id} 的任务"
+                )
+                return False
+            self._pending[role_id] = job
+            self._stats["submitted"] += 1
+            self._cond.notify()
+        return True
+
+    def _next_job(self):
+        """取出一个可执行的任务，调用方需持有锁"""
+        now = time.monotonic()
+        wait = None
+        for role_id, job in self._pending.items():
+            if role_id in self._running:
+                # 同一设备的任务串行执行，避免新旧记忆互相覆盖
+                continue
+            if job.not_before > now:
+                delay = job.not_before - now
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            del self._pending[role_id]
+            self._running[role_id] = job
+            return job, None
+        return None, wait
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    # 停止后不再取新任务，排队中的任务由shutdown保存
+                    if self._stopped:
+                        return
+                    job, wait = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait(timeout=wait)
+            try:
+                self._run_job(job)
+                with self._cond:
+                    self._stats["completed"] += 1
+            except Exception as e:
+                self._handle_failure(job, e)
+            finally:
+                with self._cond:
+                    self._running.pop(job.role_id, None)
+                    self._cond.notify_all()
+
+    def _run_job(self, job):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(job.memory.save_memory(job.messages))
+        finally:
+            loop.close()
+
+    def _handle_failure(self, job, error):
+        job.attempts += 1
+        with self._cond:
+            if job.attempts > self.max_retries:
+                self._stats["failed"] += 1
+                logger.bind(tag=TAG).error(
+                    f"设备 {job.role_id} 记忆总结失败，已重试{job.attempts - 1}次: {error}"
+                )
+                return
+            if job.role_id in self._pending:
+                # 已有更新的对话等待总结，旧任务直接作废
+                return
+            if self._stopped:
+                # 正在退出，放回队列由shutdown保存，下次启动时重试
+                self._pending[job.role_id] = job
+                return
+            job.not_before = time.monotonic() + self.retry_base_delay * (
+                2 ** (job.attempts - 1)
+            )
+            self._pending[job.role_id] = job
+            self._stats["retried"] += 1
+        logger.bind(tag=TAG).warning(
+            f"设备 {job.role_id} 记忆总结失败，第{job.attempts}次重试: {error}"
+        )
+
+    def metrics(self):
+        """队列指标"""
+        with self._cond:
+            return dict(
+                self._stats,
+                pending=len(self._pending),
+                running=len(self._running),
+                workers=self.worker_count,
+            )
+
+    def shutdown(self):
+        """停止接收新任务，等待执行中的任务最多shutdown_timeout秒，
+        将未执行和仍未完成的任务持久化到磁盘，下次启动时恢复"""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cond.notify_all()
+            deadline = time.monotonic() + self.shutdown_timeout
+            while self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            # 同一设备已有更新的对话排队时，与提交时一样只保留新任务
+            jobs = [
+                job
+                for role_id, job in self._running.items()
+                if role_id not in self._pending
+            ]
+            jobs.extend(self._pending.values())
+            self._pending.clear()
+        if not jobs:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.pending_path), exist_ok=True)
+            tmp_path = self.pending_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump([job.to_dict() for job in jobs], f, ensure_ascii=False)
+            os.replace(tmp_path, self.pending_path)
+            logger.bind(tag=TAG).info(f"已保存{len(jobs)}个未完成的记忆总结任务")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"保存未完成的记忆总结任务失败: {e}")
+
+    def restore_pending(self, memory, llm):
+        """恢复上次退出时未完成的任务，使用服务端默认的记忆模块和LLM执行"""
+        if memory is None or not os.path.exists(self.pending_path):
+            return
+        try:
+            with open(self.pending_path, "r", encoding="utf-8") as f:
+                records = json.load(f) or []
+            os.remove(self.pending_path)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"读取未完成的记忆总结任务失败: {e}")
+            return
+        restored = 0
+        for record in records:
+            job_memory = copy.copy(memory)
+            job_memory.init_memory(
+                role_id=record["role_id"],
+                llm=llm,
+                summary_memory=record.get("short_memory"),
+                save_to_file=record.get("save_to_file", True),
+            )
+            messages = [
+                Message(role=m["role"], content=m["content"])
+                for m in record.get("messages", [])
+            ]
+            if self.submit(record["role_id"], job_memory, messages):
+                restored += 1
+        logger.bind(tag=TAG).info(f"已恢复{restored}个未完成的记忆总结任务")
+
+
+_summarizer = None
+_summarizer_lock = threading.Lock()
+
+
+def get_memory_summarizer(config=None):
+    """获取进程内共享的记忆总结队列，首次调用时按配置创建"""
+    global _summarizer
+    with _summarizer_lock:
+        if _summarizer is None:
+            _summarizer = MemorySummarizer(config)
+        return _summarizer
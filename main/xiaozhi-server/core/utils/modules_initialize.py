@@ -41,9 +41,13 @@ def initialize_modules(
             if "type" not in config["LLM"][select_llm_module]
             else config["LLM"][select_llm_module]["type"]
         )
+        llm_config = config["LLM"][select_llm_module]
+        if llm_type == "router":
+            # 路由LLM需要按名称引用其他LLM配置作为后端
+            llm_config = dict(llm_config, llm_configs=config["LLM"])
         modules["llm"] = llm.create_instance(
             llm_type,
-            config["LLM"][select_llm_module],
+            llm_config,
         )
         logger.bind(tag=TAG).info(f"初始化组件: llm成功 {select_llm_module}")
 
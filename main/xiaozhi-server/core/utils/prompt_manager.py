@@ -4,13 +4,57 @@
 """
 
 import os
-import cnlunar
-from typing import Dict, Any
+import asyncio
+import hashlib
+import threading
+from typing import Dict, Any, Tuple
 from config.logger import setup_logging
 from jinja2 import Template
 
 TAG = __name__
 
+# 按模板内容哈希缓存编译后的模板，所有连接共用
+_compiled_templates: Dict[str, Template] = {}
+# 当天的日期、星期、农历，跨天时重新计算
+_calendar_cache: Dict[str, Tuple[str, str, str]] = {}
+_cache_lock = threading.Lock()
+# 查不到城市时缓存"未知位置"的时间(秒)，避免每次连接都重新查询，过期后再重试
+UNKNOWN_LOCATION = "未知位置"
+UNKNOWN_LOCATION_TTL = 300
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def get_compiled_template(template_content: str) -> Template:
+    """同一模板内容只编译一次"""
+    key = _content_hash(template_content)
+    template = _compiled_templates.get(key)
+    if template is None:
+        template = Template(template_content)
+        with _cache_lock:
+            _compiled_templates[key] = template
+    return template
+
+
+def get_calendar_info() -> Tuple[str, str, str]:
+    """获取今天的日期、星期和农历，同一天内只计算一次"""
+    from .current_time import (
+        get_current_date,
+        get_current_weekday,
+        get_current_lunar_date,
+    )
+
+    today_date = get_current_date()
+    cached = _calendar_cache.get(today_date)
+    if cached is None:
+        cached = (today_date, get_current_weekday(), get_current_lunar_date() + "\n")
+        with _cache_lock:
+            _calendar_cache.clear()
+            _calendar_cache[today_date] = cached
+    return cached
+
 WEEKDAY_MAP = {
     "Monday": "星期一",
     "Tuesday": "星期二",
@@ -117,67 +161,64 @@ class PromptManager:
 
     def _get_current_time_info(self) -> tuple:
         """获取当前时间信息"""
-        from .current_time import get_current_date, get_current_weekday, get_current_lunar_date
-        
-        today_date = get_current_date()
-        today_weekday = get_current_weekday()
-        lunar_date = get_current_lunar_date() + "\n"
+        return get_calendar_info()
 
-        return today_date, today_weekday, lunar_date
+    async def _get_location_info(self, client_ip: str) -> str:
+        """获取位置信息，同一IP的并发查询只请求一次"""
 
-    def _get_location_info(self, client_ip: str) -> str:
-        """获取位置信息"""
-        try:
-            # 先从缓存获取
-            cached_location = self.cache_manager.get(self.CacheType.LOCATION, client_ip)
-            if cached_location is not None:
-                return cached_location
-
-            # 缓存未命中，调用API获取
+        async def fetch_location():
             from core.utils.util import get_ip_info
 
-            ip_info = get_ip_info(client_ip, self.logger)
-            city = ip_info.get("city", "未知位置")
-            location = f"{city}"
+            ip_info = await asyncio.to_thread(get_ip_info, client_ip, self.logger)
+            city = ip_info.get("city")
+            if city:
+                return f"{city}"
+            # 位置缓存默认不过期，查不到的结果只短时间缓存
+            self.cache_manager.set(
+                self.CacheType.LOCATION,
+                client_ip,
+                UNKNOWN_LOCATION,
+                ttl=UNKNOWN_LOCATION_TTL,
+            )
+            return None
 
-            # 存入缓存
-            self.cache_manager.set(self.CacheType.LOCATION, client_ip, location)
-            return location
+        try:
+            location = await self.cache_manager.async_get_or_compute(
+                self.CacheType.LOCATION, client_ip, fetch_location
+            )
+            return location or UNKNOWN_LOCATION
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"获取位置信息失败: {e}")
-            return "未知位置"
+            return UNKNOWN_LOCATION
 
-    def _get_weather_info(self, conn, location: str) -> str:
-        """获取天气信息"""
-        try:
-            # 先从缓存获取
-            cached_weather = self.cache_manager.get(self.CacheType.WEATHER, location)
-            if cached_weather is not None:
-                return cached_weather
+    async def _get_weather_info(self, conn, location: str) -> str:
+        """获取天气信息，同一地点的并发查询只请求一次"""
 
-            # 缓存未命中，调用get_weather函数获取
+        async def fetch_weather():
             from plugins_func.functions.get_weather import get_weather
             from plugins_func.register import ActionResponse
 
-            # 调用get_weather函数
-            result = get_weather(conn, location=location, lang="zh_CN")
+            result = await get_weather(conn, location=location, lang="zh_CN")
             if isinstance(result, ActionResponse):
-                weather_report = result.result
-                self.cache_manager.set(self.CacheType.WEATHER, location, weather_report)
-                return weather_report
-            return "天气信息获取失败"
+                return result.result
+            return None
 
+        try:
+            weather = await self.cache_manager.async_get_or_compute(
+                self.CacheType.WEATHER, location, fetch_weather
+            )
+            return weather or "天气信息获取失败"
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"获取天气信息失败: {e}")
             return "天气信息获取失败"
 
-    def update_context_info(self, conn, client_ip: str):
-        """同步更新上下文信息"""
+    async def update_context_info(self, conn, client_ip: str):
+        """异步更新上下文信息，需在事件循环中执行"""
         try:
             # 获取位置信息（使用全局缓存）
-            local_address = self._get_location_info(client_ip)
+            local_address = await self._get_location_info(client_ip)
             # 获取天气信息（使用全局缓存）
-            self._get_weather_info(conn, local_address)
+            await self._get_weather_info(conn, local_address)
             self.logger.bind(tag=TAG).info(f"上下文信息更新完成")
 
         except Exception as e:
@@ -191,10 +232,8 @@ class PromptManager:
             return user_prompt
 
         try:
-            # 获取最新的时间信息（不缓存）
-            today_date, today_weekday, lunar_date = (
-                self._get_current_time_info()
-            )
+            # 获取当天的时间信息（按天缓存）
+            today_date, today_weekday, lunar_date = self._get_current_time_info()
 
             # 获取缓存的上下文信息
             local_address = ""
@@ -213,24 +252,48 @@ class PromptManager:
                         or ""
                     )
 
-            # 替换模板变量
-            template = Template(self.base_prompt_template)
-            enhanced_prompt = template.render(
-                base_prompt=user_prompt,
-                current_time="{{current_time}}",
-                today_date=today_date,
-                today_weekday=today_weekday,
-                lunar_date=lunar_date,
-                local_address=local_address,
-                weather_info=weather_info,
-                emojiList=EMOJI_List,
-                device_id=device_id,
+            # 相同设备、日期、位置、天气和人设的提示词直接复用渲染结果
+            render_key = _content_hash(
+                "\0".join(
+                    [
+                        self.base_prompt_template,
+                        user_prompt,
+                        str(device_id),
+                        today_date,
+                        local_address,
+                        weather_info,
+                    ]
+                )
             )
+            enhanced_prompt = self.cache_manager.get(
+                self.CacheType.DEVICE_PROMPT, render_key, namespace="rendered"
+            )
+            if enhanced_prompt is None:
+                # 替换模板变量
+                template = get_compiled_template(self.base_prompt_template)
+                enhanced_prompt = template.render(
+                    base_prompt=user_prompt,
+                    current_time="{{current_time}}",
+                    today_date=today_date,
+                    today_weekday=today_weekday,
+                    lunar_date=lunar_date,
+                    local_address=local_address,
+                    weather_info=weather_info,
+                    emojiList=EMOJI_List,
+                    device_id=device_id,
+                )
+                self.cache_manager.set(
+                    self.CacheType.DEVICE_PROMPT,
+                    render_key,
+                    enhanced_prompt,
+                    ttl=86400,
+                    namespace="rendered",
+                )
             device_cache_key = f"device_prompt:{device_id}"
             self.cache_manager.set(
                 self.CacheType.DEVICE_PROMPT, device_cache_key, enhanced_prompt
             )
-            self.logger.bind(tag=TAG).info(
+            self.logger.bind(tag=TAG).debug(
                 f"构建增强提示词成功，长度: {len(enhanced_prompt)}"
             )
             return enhanced_prompt
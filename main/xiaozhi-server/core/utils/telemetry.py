@@ -0,0 +1,308 @@
+"""
+运行指标，通过/metrics接口以Prometheus文本格式导出
+
+- 各处理阶段的耗时直方图：VAD、ASR、意图识别、LLM首token、TTS首帧、下行音频发送延迟、事件循环延迟、设备MCP请求
+- 处理线程和事件循环中都会调用observe，内部加锁，单次记录只是一次二分查找和计数
+- 连接数、队列深度、线程池排队数、缓存命中率等瞬时值在采集时读取，平时没有开销
+"""
+
+import time
+import asyncio
+import weakref
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from config.logger import setup_logging
+from core.utils.cache.manager import cache_manager
+
+TAG = __name__
+logger = setup_logging()
+
+# 毫秒级阶段使用的分桶上限(秒)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+# 网络请求类阶段使用的分桶上限(秒)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 30)
+
+# 阶段名 -> (说明, 分桶)
+STAGES = {
+    "vad": ("单帧VAD检测耗时", FAST_BUCKETS),
+    "asr": ("语音识别耗时", SLOW_BUCKETS),
+    "intent": ("意图识别耗时", SLOW_BUCKETS),
+    "llm_ttft": ("LLM返回首个token的耗时", SLOW_BUCKETS),
+    "tts_first_frame": ("LLM首段文本送入TTS到首帧音频下发的耗时", SLOW_BUCKETS),
+    "downlink_lag": ("下行音频帧晚于预定发送时间的时长", FAST_BUCKETS),
+    "event_loop_lag": ("事件循环调度延迟", FAST_BUCKETS),
+    "device_mcp_rpc": ("设备端MCP请求从发送到收到响应的耗时", SLOW_BUCKETS),
+}
+
+PREFIX = "xiaozhi_"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """固定分桶的累计直方图"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return list(self.counts), self.sum, self.count
+
+
+class _Writer:
+    """按指标族输出HELP、TYPE和样本行"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, metric_type: str, help_text: str):
+        self.lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        self.lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+
+    def sample(self, name: str, value, labels: Optional[Dict[str, Any]] = None):
+        label_text = ""
+        if labels:
+            label_text = (
+                "{"
+                + ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                + "}"
+            )
+        self.lines.append(f"{PREFIX}{name}{label_text} {_format(value)}")
+
+    def gauge(self, name: str, help_text: str, value):
+        self.family(name, "gauge", help_text)
+        self.sample(name, value)
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def _executor_stats(executor) -> Dict[str, int]:
+    """线程池的最大线程数、已创建线程数和排队任务数，排队数大于0说明线程已全部占用"""
+    if executor is None:
+        return {"workers": 0, "threads": 0, "queued": 0}
+    return {
+        "workers": getattr(executor, "_max_workers", 0),
+        "threads": len(getattr(executor, "_threads", ())),
+        "queued": (
+            executor._work_queue.qsize() if hasattr(executor, "_work_queue") else 0
+        ),
+    }
+
+
+class Telemetry:
+    """进程级运行指标"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or {}
+        metrics_config = self.config.get("metrics", {}) or {}
+        # 事件循环延迟的采样间隔(秒)
+        self.loop_lag_interval = float(metrics_config.get("loop_lag_interval", 0.5))
+        self._lock = threading.Lock()
+        self._histograms = {
+            stage: Histogram(buckets) for stage, (_, buckets) in STAGES.items()
+        }
+        self._server_ref = None
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    def observe(self, stage: str, seconds: float):
+        """记录一次阶段耗时(秒)"""
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            return
+        with self._lock:
+            histogram.observe(max(0.0, seconds))
+
+    def watch_server(self, server):
+        """WebSocketServer启动时调用，记录连接集合并开始采样事件循环延迟"""
+        self._server_ref = weakref.ref(server)
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._monitor_event_loop())
+
+    async def _monitor_event_loop(self):
+        interval = self.loop_lag_interval
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            self.observe("event_loop_lag", time.monotonic() - start - interval)
+
+    def _connections(self) -> list:
+        server = self._server_ref() if self._server_ref else None
+        if server is None:
+            return []
+        return list(server.active_connections)
+
+    def _write_queues(self, writer: _Writer, connections: list):
+        depths = {"asr_audio": [], "tts_text": [], "tts_audio": []}
+        for conn in connections:
+            asr_queue = getattr(conn, "asr_audio_queue", None)
+            if asr_queue is not None:
+                depths["asr_audio"].append(asr_queue.qsize())
+            tts = getattr(conn, "tts", None)
+            if tts is not None:
+                depths["tts_text"].append(tts.tts_text_queue.qsize())
+                depths["tts_audio"].append(tts.tts_audio_queue.qsize())
+
+        writer.family("queue_depth", "gauge", "各连接队列中等待处理的条目数之和")
+        for name, values in depths.items():
+            writer.sample("queue_depth", sum(values), {"queue": name})
+        writer.sample("queue_depth", self._report_queued(), {"queue": "report"})
+        writer.family("queue_depth_max", "gauge", "单个连接队列的最大深度")
+        for name, values in depths.items():
+            writer.sample("queue_depth_max", max(values, default=0), {"queue": name})
+
+    def _write_executors(self, writer: _Writer, connections: list):
+        executor_totals = {"workers": 0, "threads": 0, "queued": 0}
+        for conn in connections:
+            for key, value in _executor_stats(getattr(conn, "executor", None)).items():
+                executor_totals[key] += value
+        executors = {"connection": executor_totals}
+        executors.update(self._shared_executors())
+        for key, help_text in (
+            ("workers", "线程池最大线程数"),
+            ("threads", "线程池已创建的线程数"),
+            ("queued", "线程池排队等待的任务数，大于0说明线程已全部占用"),
+        ):
+            writer.family(f"executor_{key}", "gauge", help_text)
+            for name, stats in executors.items():
+                writer.sample(f"executor_{key}", stats[key], {"executor": name})
+
+    def _report_queued(self) -> int:
+        if not self.config.get("read_config_from_api", False):
+            return 0
+        from core.handle.reportHandle import get_chat_reporter
+
+        return get_chat_reporter(self.config).metrics().get("queued", 0)
+
+    def _shared_executors(self) -> Dict[str, Dict[str, int]]:
+        from core.utils.component_pool import get_component_pool
+        from core.providers.tools.server_plugins.plugin_runtime import (
+            get_plugin_runtime,
+        )
+
+        return {
+            "component_pool": _executor_stats(
+                getattr(get_component_pool(self.config), "_executor", None)
+            ),
+            "plugin_runtime": _executor_stats(
+                getattr(get_plugin_runtime(self.config), "_executor", None)
+            ),
+        }
+
+    def _write_cache(self, writer: _Writer, connections: list):
+        stats = cache_manager.get_stats()
+        writer.family("cache_requests_total", "counter", "缓存查询次数")
+        for name, values in stats.items():
+            writer.sample(
+                "cache_requests_total",
+                values.get("hits", 0),
+                {"cache": name, "result": "hit"},
+            )
+            writer.sample(
+                "cache_requests_total",
+                values.get("misses", 0),
+                {"cache": name, "result": "miss"},
+            )
+        writer.family("cache_hit_ratio", "gauge", "缓存命中率")
+        for name, values in stats.items():
+            total = values.get("hits", 0) + values.get("misses", 0)
+            ratio = values.get("hits", 0) / total if total else 0.0
+            writer.sample("cache_hit_ratio", round(ratio, 4), {"cache": name})
+        writer.family("cache_evictions_total", "counter", "缓存因容量淘汰的条目数")
+        for name, values in stats.items():
+            writer.sample(
+                "cache_evictions_total", values.get("evictions", 0), {"cache": name}
+            )
+        writer.family("cache_entries", "gauge", "缓存条目数")
+        for name, values in stats.items():
+            writer.sample("cache_entries", values.get("entries", 0), {"cache": name})
+        writer.family("cache_bytes", "gauge", "缓存估算占用字节数")
+        for name, values in stats.items():
+            writer.sample("cache_bytes", values.get("bytes", 0), {"cache": name})
+
+    def _write_device_mcp(self, writer: _Writer, connections: list):
+        from core.providers.tools.device_mcp.mcp_client import totals
+
+        counts = totals()
+        writer.family("device_mcp_requests_total", "counter", "设备端MCP请求数")
+        writer.sample("device_mcp_requests_total", counts["calls"])
+        writer.family("device_mcp_failures_total", "counter", "设备端MCP请求失败数")
+        for reason in ("errors", "timeouts"):
+            writer.sample(
+                "device_mcp_failures_total", counts[reason], {"reason": reason}
+            )
+        writer.family("device_mcp_batches_total", "counter", "合并发送的批量请求数")
+        writer.sample("device_mcp_batches_total", counts["batches"])
+        pending = 0
+        for conn in connections:
+            mcp_client = getattr(conn, "mcp_client", None)
+            if mcp_client is not None:
+                pending += len(mcp_client.call_results)
+        writer.gauge("device_mcp_pending", "等待设备响应的MCP请求数", pending)
+
+    def _write_histograms(self, writer: _Writer):
+        with self._lock:
+            snapshots = {
+                stage: histogram.snapshot()
+                for stage, histogram in self._histograms.items()
+            }
+        for stage, (counts, total, count) in snapshots.items():
+            name = f"{stage}_seconds"
+            writer.family(name, "histogram", STAGES[stage][0])
+            cumulative = 0
+            buckets = self._histograms[stage].buckets + (float("inf"),)
+            for upper, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                writer.sample(f"{name}_bucket", cumulative, {"le": _format(upper)})
+            writer.sample(f"{name}_sum", round(total, 6))
+            writer.sample(f"{name}_count", count)
+
+    def render(self) -> str:
+        """生成Prometheus文本格式的指标"""
+        writer = _Writer()
+        connections = self._connections()
+        writer.gauge("threads", "进程线程数", threading.active_count())
+        writer.gauge("active_connections", "当前设备连接数", len(connections))
+        for section in (
+            self._write_queues,
+            self._write_executors,
+            self._write_cache,
+            self._write_device_mcp,
+        ):
+            try:
+                section(writer, connections)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"采集运行指标失败: {e}")
+        self._write_histograms(writer)
+        return writer.text()
+
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry(config: Optional[Dict[str, Any]] = None) -> Telemetry:
+    """获取进程级运行指标，首次调用时按配置创建"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry(config)
+        return _telemetry
@@ -3,7 +3,14 @@ import websockets
 from config.logger import setup_logging
 from core.connection import ConnectionHandler
 from config.config_loader import get_config_from_api
+from config.private_config_cache import invalidate_private_config
 from core.utils.modules_initialize import initialize_modules
+from core.utils.memory_summarizer import get_memory_summarizer
+from core.utils.component_pool import get_component_pool
+from core.utils.telemetry import get_telemetry
+from plugins_func.http_client import get_plugin_http_client
+from core.providers.tools.server_mcp import get_server_mcp_pool
+from core.providers.asr.dto.dto import InterfaceType
 from core.utils.util import check_vad_update, check_asr_update
 
 TAG = __name__
@@ -37,6 +44,22 @@ class WebSocketServer:
         host = server_config.get("ip", "0.0.0.0")
         port = int(server_config.get("port", 8000))
 
+        # 恢复上次退出时未完成的记忆总结任务
+        get_memory_summarizer(self.config).restore_pending(self._memory, self._llm)
+
+        # 插件共用的HTTP客户端按服务端配置创建，插件中获取时不再传配置
+        get_plugin_http_client(self.config)
+        # 按默认配置预热TTS和远程ASR实例，设备连接后可直接使用
+        get_component_pool(self.config).prewarm_config(
+            self.config,
+            include_asr=self._asr is not None
+            and self._asr.interface_type != InterfaceType.LOCAL,
+        )
+        # 在后台启动共享的服务端MCP会话，不阻塞服务启动
+        asyncio.create_task(get_server_mcp_pool(self.config).ensure_started())
+        # 采集连接、队列和事件循环延迟等运行指标
+        get_telemetry(self.config).watch_server(self)
+
         async with websockets.serve(
             self._handle_connection, host, port, process_request=self._http_response
         ):
@@ -108,6 +131,7 @@ class WebSocketServer:
                 )
                 # 更新配置
                 self.config = new_config
+                invalidate_private_config()
                 # 重新初始化组件
                 modules = initialize_modules(
                     self.logger,
@@ -0,0 +1,661 @@
+"""
+端到端并发压测：模拟多台设备通过真实的WebSocket协议连接服务端
+
+- 服务端在子进程中运行真实的WebSocketServer，ASR、LLM、TTS（可选VAD）替换为本地桩，
+  延迟可调，整个测试不需要网络和模型
+- 每台模拟设备：hello握手 -> listen start(manual) -> 按60ms帧率上传Opus音频 -> listen stop，
+  等待服务端返回音频，可选MQTT网关的16字节头部格式
+- 统计连接到就绪耗时、说完话到收到首帧音频的耗时分位数，
+  以及服务端的事件循环延迟、线程数、内存和每个连接的CPU占用
+
+用法（在xiaozhi-server目录下执行）：
+    python performance_tester/performance_tester_load.py --devices 50 --rounds 3
+    python performance_tester/performance_tester_load.py --devices 20 --mqtt --wav test.wav
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import wave
+import socket
+import asyncio
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+description = "多设备并发端到端压测（本地桩ASR/LLM/TTS，无需网络）"
+
+STATS_PREFIX = "LOADTEST_STATS "
+READY_LINE = "LOADTEST_READY"
+STUB_MODULE = "LoadTest"
+SAMPLE_RATE = 16000
+FRAME_DURATION = 60
+FRAME_SIZE = SAMPLE_RATE * FRAME_DURATION // 1000
+TRAILING_SILENCE_MS = 600
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--devices", type=int, default=10, help="模拟设备数")
+    parser.add_argument("--rounds", type=int, default=3, help="每台设备的对话轮数")
+    parser.add_argument(
+        "--ramp", type=float, default=5, help="所有设备在多少秒内陆续连接"
+    )
+    parser.add_argument("--think", type=float, default=1.0, help="两轮对话的间隔(秒)")
+    parser.add_argument(
+        "--round-timeout",
+        type=float,
+        default=30,
+        help="单轮等待服务端播放完成的时间(秒)",
+    )
+    parser.add_argument(
+        "--wav", default="", help="上传的录音，WAV文件或目录，不指定时使用合成的音频"
+    )
+    parser.add_argument(
+        "--mqtt", action="store_true", help="模拟MQTT网关，音频包带16字节头部"
+    )
+    parser.add_argument(
+        "--vad", choices=["stub", "real"], default="stub", help="使用桩VAD或配置中的VAD"
+    )
+    parser.add_argument("--asr-latency", type=float, default=0.3, help="桩ASR耗时(秒)")
+    parser.add_argument(
+        "--llm-first-token", type=float, default=0.5, help="桩LLM首个token耗时(秒)"
+    )
+    parser.add_argument(
+        "--llm-token-interval", type=float, default=0.03, help="桩LLM后续token间隔(秒)"
+    )
+    parser.add_argument("--llm-tokens", type=int, default=40, help="桩LLM回复的token数")
+    parser.add_argument(
+        "--tts-latency", type=float, default=0.2, help="桩TTS单句耗时(秒)"
+    )
+    parser.add_argument(
+        "--tts-char-ms", type=float, default=200, help="桩TTS每个字生成的音频时长(毫秒)"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=1.0, help="服务端采样间隔(秒)"
+    )
+    parser.add_argument("--port", type=int, default=0, help="服务端端口，0为自动选择")
+    parser.add_argument(
+        "--server-log", default="tmp/loadtest_server.log", help="服务端输出保存位置"
+    )
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+
+# ---------------------------------------------------------------------------
+# 服务端（子进程）
+# ---------------------------------------------------------------------------
+
+
+def build_server_config(args) -> dict:
+    """基于config.yaml生成压测配置，选中的ASR/LLM/TTS替换为桩"""
+    from config.config_loader import read_config, merge_configs
+
+    config = read_config(os.path.join(PROJECT_DIR, "config.yaml"))
+    custom_path = os.path.join(PROJECT_DIR, "data", ".config.yaml")
+    if os.path.exists(custom_path):
+        custom = read_config(custom_path) or {}
+        if not custom.get("manager-api", {}).get("url"):
+            config = merge_configs(config, custom)
+
+    config["read_config_from_api"] = False
+    config["server"]["ip"] = "127.0.0.1"
+    config["server"]["port"] = args.port
+    config["server"].setdefault("auth", {})["enabled"] = False
+    config["log"]["log_level"] = "WARNING"
+    config["log"]["log_dir"] = os.path.join("tmp", "loadtest")
+    # 避免压测产生的对话触发记忆总结和聊天记录上报
+    config["chat_history_conf"] = 0
+    config["enable_wakeup_words_response_cache"] = False
+
+    stub = {"type": "loadtest", "output_dir": "tmp/"}
+    for kind in ("ASR", "LLM", "TTS"):
+        config.setdefault(kind, {})[STUB_MODULE] = dict(stub)
+        config["selected_module"][kind] = STUB_MODULE
+    if args.vad == "stub":
+        config.setdefault("VAD", {})[STUB_MODULE] = dict(stub)
+        config["selected_module"]["VAD"] = STUB_MODULE
+    config["selected_module"]["Memory"] = "nomem"
+    config["selected_module"]["Intent"] = "nointent"
+    config.setdefault("Memory", {}).setdefault("nomem", {"type": "nomem"})
+    config.setdefault("Intent", {}).setdefault("nointent", {"type": "nointent"})
+    return config
+
+
+def install_stub_providers(args):
+    """把type为loadtest的模块替换为本地桩，其余类型仍走原来的工厂方法"""
+    import io
+    import opuslib_next
+    from core.utils import asr, llm, tts, vad
+    from core.providers.asr.base import ASRProviderBase
+    from core.providers.asr.dto.dto import InterfaceType as ASRInterfaceType
+    from core.providers.llm.base import LLMProviderBase
+    from core.providers.tts.base import TTSProviderBase
+    from core.providers.tts.dto.dto import InterfaceType as TTSInterfaceType
+    from core.providers.vad.base import VADProviderBase
+
+    class StubVAD(VADProviderBase):
+        """按音量判断是否有人说话，设备使用manual模式时只影响打断判断"""
+
+        def __init__(self, config):
+            self.threshold = float(config.get("threshold", 500))
+            self._decoders = threading.local()
+
+        def is_vad(self, conn, data) -> bool:
+            if not data:
+                return False
+            decoder = getattr(self._decoders, "decoder", None)
+            if decoder is None:
+                decoder = self._decoders.decoder = opuslib_next.Decoder(SAMPLE_RATE, 1)
+            try:
+                pcm = np.frombuffer(decoder.decode(data, FRAME_SIZE), dtype=np.int16)
+            except Exception:
+                return False
+            return bool(pcm.size) and float(np.abs(pcm).mean()) > self.threshold
+
+    class StubASR(ASRProviderBase):
+        """解码上传的音频后等待固定时间，返回固定文本"""
+
+        def __init__(self, config, delete_audio_file):
+            super().__init__()
+            self.interface_type = ASRInterfaceType.NON_STREAM
+            self.output_dir = config.get("output_dir", "tmp/")
+            self.delete_audio_file = delete_audio_file
+
+        async def speech_to_text(self, opus_data, session_id, audio_format="opus"):
+            if audio_format != "pcm":
+                self.decode_opus(opus_data)
+            await asyncio.sleep(args.asr_latency)
+            return "给我讲一个关于小猫的故事", None
+
+    class StubLLM(LLMProviderBase):
+        """按设定的首token耗时和间隔逐个输出token"""
+
+        def __init__(self, config):
+            self.tokens = ["小猫", "在", "花园", "里", "追", "蝴蝶", "，"]
+
+        def response(self, session_id, dialogue, **kwargs):
+            time.sleep(args.llm_first_token)
+            for i in range(args.llm_tokens):
+                if i:
+                    time.sleep(args.llm_token_interval)
+                token = self.tokens[i % len(self.tokens)]
+                # 每隔几句给出句号，让TTS按句切分
+                yield "。" if i % 14 == 13 else token
+
+    class StubTTS(TTSProviderBase):
+        """等待固定时间后生成与文本长度成正比的WAV音频"""
+
+        def __init__(self, config, delete_audio_file):
+            super().__init__(config, delete_audio_file)
+            self.interface_type = TTSInterfaceType.NON_STREAM
+            self.audio_file_type = "wav"
+
+        async def text_to_speak(self, text, output_file):
+            await asyncio.sleep(args.tts_latency)
+            samples = int(SAMPLE_RATE * max(len(text), 1) * args.tts_char_ms / 1000)
+            t = np.arange(samples) / SAMPLE_RATE
+            pcm = (np.sin(2 * np.pi * 440 * t) * 3000).astype(np.int16)
+            buffer = io.BytesIO()
+            with wave.open(buffer, "wb") as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(SAMPLE_RATE)
+                wav_file.writeframes(pcm.tobytes())
+            if output_file:
+                with open(output_file, "wb") as f:
+                    f.write(buffer.getvalue())
+                return None
+            return buffer.getvalue()
+
+    stubs = [(asr, StubASR), (llm, StubLLM), (tts, StubTTS), (vad, StubVAD)]
+    for module, stub_class in stubs:
+        original = module.create_instance
+
+        def create_instance(class_name, *a, _original=original, _stub=stub_class, **kw):
+            if class_name == "loadtest":
+                return _stub(*a, **kw)
+            return _original(class_name, *a, **kw)
+
+        module.create_instance = create_instance
+
+
+async def _monitor(server, interval: float):
+    """采样事件循环延迟和进程资源占用，按行输出给主进程"""
+    import psutil
+
+    process = psutil.Process()
+    process.cpu_percent(None)
+    lags: List[float] = []
+    tick = 0.05
+    next_report = time.monotonic() + interval
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, time.monotonic() - start - tick) * 1000)
+        if time.monotonic() < next_report:
+            continue
+        next_report += interval
+        cpu_times = process.cpu_times()
+        stats = {
+            "time": time.time(),
+            "connections": len(server.active_connections),
+            "lag_ms": percentiles(lags),
+            "threads": process.num_threads(),
+            "rss_mb": process.memory_info().rss / 1024 / 1024,
+            "cpu_percent": process.cpu_percent(None),
+            "cpu_seconds": cpu_times.user + cpu_times.system,
+        }
+        lags = []
+        print(STATS_PREFIX + json.dumps(stats), flush=True)
+
+
+async def _serve(server_config: dict, interval: float):
+    from core.websocket_server import WebSocketServer
+
+    server = WebSocketServer(server_config)
+    server_task = asyncio.create_task(server.start())
+    port = server_config["server"]["port"]
+    # 等待端口开始监听，用普通HTTP请求探测，避免服务端记录握手失败
+    for _ in range(300):
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET / HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+            await reader.readline()
+            writer.close()
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    print(READY_LINE, flush=True)
+    await asyncio.gather(server_task, _monitor(server, interval))
+
+
+def serve(args):
+    os.chdir(PROJECT_DIR)
+    server_config = build_server_config(args)
+    # 提前写入配置缓存，服务端各模块读取到的都是压测配置
+    from core.utils.cache.manager import cache_manager, CacheType
+    from config import settings
+
+    cache_manager.set(CacheType.CONFIG, "main_config", server_config)
+    settings.config_file_valid = True
+    install_stub_providers(args)
+    asyncio.run(_serve(server_config, args.interval))
+
+
+# ---------------------------------------------------------------------------
+# 模拟设备（主进程）
+# ---------------------------------------------------------------------------
+
+
+def _read_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wav_file:
+        channels = wav_file.getnchannels()
+        rate = wav_file.getframerate()
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"只支持16位WAV: {path}")
+        pcm = np.frombuffer(wav_file.readframes(wav_file.getnframes()), np.int16)
+    if channels > 1:
+        pcm = pcm.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(pcm), rate / SAMPLE_RATE)
+        pcm = np.interp(positions, np.arange(len(pcm)), pcm)
+    return pcm.astype(np.int16)
+
+
+def _synthetic_speech(seconds: float = 2.0) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    wave_data = np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 660 * t)
+    return (wave_data * envelope * 8000).astype(np.int16)
+
+
+def load_utterances(path: str) -> List[List[bytes]]:
+    """读取录音并预先编码为60ms的Opus帧，压测过程中不再编码"""
+    import opuslib_next
+
+    if not path:
+        pcms = [_synthetic_speech()]
+    elif os.path.isdir(path):
+        files = sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.lower().endswith(".wav")
+        )
+        if not files:
+            raise ValueError(f"目录中没有WAV文件: {path}")
+        pcms = [_read_wav(file) for file in files]
+    else:
+        pcms = [_read_wav(path)]
+
+    utterances = []
+    for pcm in pcms:
+        encoder = opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_AUDIO)
+        frames = []
+        for start in range(0, len(pcm), FRAME_SIZE):
+            chunk = pcm[start : start + FRAME_SIZE]
+            if len(chunk) < FRAME_SIZE:
+                chunk = np.pad(chunk, (0, FRAME_SIZE - len(chunk)))
+            frames.append(encoder.encode(chunk.tobytes(), FRAME_SIZE))
+        # 服务端少于15帧的语音不做识别，短录音重复到满足长度
+        while len(frames) <= 16:
+            frames = frames + frames
+        # 结尾补一段静音，和真实设备一样说完后才松开按键
+        silence = np.zeros(FRAME_SIZE, np.int16).tobytes()
+        for _ in range(TRAILING_SILENCE_MS // FRAME_DURATION):
+            frames.append(encoder.encode(silence, FRAME_SIZE))
+        utterances.append(frames)
+    return utterances
+
+
+class SimulatedDevice:
+    def __init__(self, index: int, url: str, args, utterances: List[List[bytes]]):
+        self.index = index
+        self.url = url
+        self.args = args
+        self.utterances = utterances
+        self.device_id = "aa:bb:cc:%02x:%02x:%02x" % (
+            (index >> 16) & 0xFF,
+            (index >> 8) & 0xFF,
+            index & 0xFF,
+        )
+        self.connect_time: Optional[float] = None
+        self.first_audio: List[float] = []
+        self.round_time: List[float] = []
+        self.errors: List[str] = []
+        self._hello = asyncio.Event()
+        self._first_audio = asyncio.Event()
+        self._tts_stop = asyncio.Event()
+        self._sequence = 0
+
+    def _pack(self, frame: bytes, timestamp: int) -> bytes:
+        if not self.args.mqtt:
+            return frame
+        header = bytearray(16)
+        header[0] = 1
+        header[2:4] = len(frame).to_bytes(2, "big")
+        header[4:8] = self._sequence.to_bytes(4, "big")
+        header[8:12] = (timestamp & 0xFFFFFFFF).to_bytes(4, "big")
+        header[12:16] = len(frame).to_bytes(4, "big")
+        self._sequence += 1
+        return bytes(header) + frame
+
+    async def _reader(self, ws):
+        async for message in ws:
+            if isinstance(message, bytes):
+                self._first_audio.set()
+                continue
+            try:
+                data = json.loads(message)
+            except json.JSONDecodeError:
+                continue
+            if data.get("type") == "hello":
+                self._hello.set()
+            elif data.get("type") == "tts" and data.get("state") == "stop":
+                self._tts_stop.set()
+
+    async def run(self):
+        import websockets
+
+        headers = {
+            "device-id": self.device_id,
+            "client-id": str(uuid.uuid4()),
+            "protocol-version": "1",
+            "authorization": "Bearer loadtest",
+        }
+        start = time.monotonic()
+        try:
+            async with websockets.connect(
+                self.url, additional_headers=headers, max_size=None
+            ) as ws:
+                reader = asyncio.create_task(self._reader(ws))
+                try:
+                    await ws.send(
+                        json.dumps(
+                            {
+                                "type": "hello",
+                                "version": 1,
+                                "transport": "websocket",
+                                "audio_params": {
+                                    "format": "opus",
+                                    "sample_rate": SAMPLE_RATE,
+                                    "channels": 1,
+                                    "frame_duration": FRAME_DURATION,
+                                },
+                            }
+                        )
+                    )
+                    await asyncio.wait_for(self._hello.wait(), self.args.round_timeout)
+                    self.connect_time = time.monotonic() - start
+                    for round_index in range(self.args.rounds):
+                        if round_index:
+                            await asyncio.sleep(self.args.think)
+                        await self._talk(ws, round_index)
+                finally:
+                    reader.cancel()
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+    async def _talk(self, ws, round_index: int):
+        frames = self.utterances[(self.index + round_index) % len(self.utterances)]
+        self._first_audio.clear()
+        self._tts_stop.clear()
+        await ws.send(
+            json.dumps({"type": "listen", "state": "start", "mode": "manual"})
+        )
+        started = time.monotonic()
+        for i, frame in enumerate(frames):
+            # 按真实设备的节奏上传
+            delay = started + i * FRAME_DURATION / 1000 - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await ws.send(self._pack(frame, int(i * FRAME_DURATION)))
+        await ws.send(json.dumps({"type": "listen", "state": "stop", "mode": "manual"}))
+        end_of_speech = time.monotonic()
+        try:
+            await asyncio.wait_for(self._first_audio.wait(), self.args.round_timeout)
+            self.first_audio.append(time.monotonic() - end_of_speech)
+            await asyncio.wait_for(self._tts_stop.wait(), self.args.round_timeout)
+            self.round_time.append(time.monotonic() - end_of_speech)
+        except asyncio.TimeoutError:
+            self.errors.append(f"第{round_index + 1}轮等待服务端响应超时")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LoadTester:
+    def __init__(self, args):
+        self.args = args
+        self.stats: List[dict] = []
+        self._ready = asyncio.Event()
+
+    async def _start_server(self):
+        command = [sys.executable, os.path.abspath(__file__), "--serve"]
+        for key, value in vars(self.args).items():
+            if key in ("serve", "mqtt", "wav", "devices", "rounds", "ramp", "think"):
+                continue
+            command += ["--" + key.replace("_", "-"), str(value)]
+        return await asyncio.create_subprocess_exec(
+            *command,
+            cwd=PROJECT_DIR,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+
+    async def _read_server_output(self, process):
+        log_path = os.path.join(PROJECT_DIR, self.args.server_log)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, "w", encoding="utf-8") as log_file:
+            async for raw in process.stdout:
+                line = raw.decode("utf-8", errors="replace").rstrip()
+                if line.startswith(STATS_PREFIX):
+                    self.stats.append(json.loads(line[len(STATS_PREFIX) :]))
+                elif line == READY_LINE:
+                    self._ready.set()
+                else:
+                    log_file.write(line + "\n")
+
+    async def run(self) -> Optional[List["SimulatedDevice"]]:
+        """执行压测并输出结果，返回各模拟设备的统计，服务端启动失败时返回None"""
+        if not self.args.port:
+            self.args.port = _free_port()
+        utterances = load_utterances(self.args.wav)
+        path = "/xiaozhi/v1/" + ("?from=mqtt_gateway" if self.args.mqtt else "")
+        url = f"ws://127.0.0.1:{self.args.port}{path}"
+
+        process = await self._start_server()
+        output_task = asyncio.create_task(self._read_server_output(process))
+        # 服务端启动时出错退出的，不用等满超时
+        ready = asyncio.create_task(self._ready.wait())
+        exited = asyncio.create_task(process.wait())
+        await asyncio.wait(
+            {ready, exited}, timeout=120, return_when=asyncio.FIRST_COMPLETED
+        )
+        exited.cancel()
+        if not self._ready.is_set():
+            ready.cancel()
+            if process.returncode is None:
+                process.kill()
+            await output_task
+            print(f"服务端启动失败，详见 {self.args.server_log}")
+            return None
+
+        # 等待一个采样周期作为空载基线
+        await asyncio.sleep(self.args.interval * 1.5)
+        baseline = self.stats[-1] if self.stats else None
+        print(f"服务端已启动: {url}，开始模拟 {self.args.devices} 台设备")
+
+        devices = [
+            SimulatedDevice(i, url, self.args, utterances)
+            for i in range(self.args.devices)
+        ]
+        started = time.monotonic()
+
+        async def launch(device: SimulatedDevice):
+            if self.args.devices > 1:
+                await asyncio.sleep(
+                    self.args.ramp * device.index / (self.args.devices - 1)
+                )
+            await device.run()
+
+        await asyncio.gather(*(launch(device) for device in devices))
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(self.args.interval * 1.5)
+        load_stats = [
+            s for s in self.stats if baseline is None or s["time"] > baseline["time"]
+        ]
+
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), 10)
+        except asyncio.TimeoutError:
+            process.kill()
+        output_task.cancel()
+        self._print_results(devices, baseline, load_stats, elapsed)
+        return devices
+
+    def _print_results(self, devices, baseline, load_stats, elapsed):
+        from tabulate import tabulate
+
+        connect = [d.connect_time for d in devices if d.connect_time is not None]
+        first_audio = [v for d in devices for v in d.first_audio]
+        round_time = [v for d in devices for v in d.round_time]
+        errors = [e for d in devices for e in d.errors]
+        rounds = self.args.devices * self.args.rounds
+
+        rows = []
+        for name, values in (
+            ("连接到就绪", connect),
+            ("说完话到首帧音频", first_audio),
+            ("说完话到播放结束", round_time),
+        ):
+            p = percentiles(values)
+            rows.append(
+                [name, len(values)]
+                + [f"{p[key] * 1000:.0f}" for key in ("p50", "p95", "p99", "max")]
+            )
+        print(
+            f"\n模拟设备: {self.args.devices}，完成轮次: {len(first_audio)}/{rounds}，耗时: {elapsed:.1f}s"
+        )
+        print(
+            tabulate(
+                rows,
+                headers=["指标(毫秒)", "样本数", "p50", "p95", "p99", "max"],
+                tablefmt="github",
+            )
+        )
+
+        if baseline and load_stats:
+            connections = max(1, max(s["connections"] for s in load_stats))
+            peak_rss = max(s["rss_mb"] for s in load_stats)
+            peak_threads = max(s["threads"] for s in load_stats)
+            cpu_seconds = load_stats[-1]["cpu_seconds"] - baseline["cpu_seconds"]
+            resource_rows = [
+                ["最大并发连接", connections, ""],
+                [
+                    "事件循环延迟(毫秒)",
+                    f"p99 {max(s['lag_ms']['p99'] for s in load_stats):.1f}",
+                    f"max {max(s['lag_ms']['max'] for s in load_stats):.1f}",
+                ],
+                [
+                    "线程数",
+                    f"峰值 {peak_threads}",
+                    f"每连接 {(peak_threads - baseline['threads']) / connections:.2f}",
+                ],
+                [
+                    "内存RSS(MB)",
+                    f"峰值 {peak_rss:.1f}",
+                    f"每连接 {(peak_rss - baseline['rss_mb']) / connections:.2f}",
+                ],
+                [
+                    "CPU",
+                    f"峰值 {max(s['cpu_percent'] for s in load_stats):.0f}%",
+                    f"每连接 {cpu_seconds / connections:.3f}s",
+                ],
+            ]
+            print(
+                tabulate(
+                    resource_rows, headers=["服务端资源", "", ""], tablefmt="github"
+                )
+            )
+
+        if errors:
+            print(f"\n错误 {len(errors)} 个，前5个:")
+            for error in errors[:5]:
+                print(f"  {error}")
+        print(f"服务端日志: {self.args.server_log}")
+
+
+async def main():
+    await LoadTester(parse_args([])).run()
+
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    if cli_args.serve:
+        serve(cli_args)
+    else:
+        asyncio.run(LoadTester(cli_args).run())
@@ -1,9 +1,9 @@
 import random
-import requests
 import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from plugins_func.http_client import get_plugin_http_client
 
 TAG = __name__
 logger = setup_logging()
@@ -40,73 +40,74 @@ GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC = {
 }
 
 
-def fetch_news_from_rss(rss_url):
-    """从RSS源获取新闻列表"""
-    try:
-        response = requests.get(rss_url)
-        response.raise_for_status()
+def parse_rss(response):
+    """解析RSS源中的新闻列表"""
+    root = ET.fromstring(response.content)
 
-        # 解析XML
-        root = ET.fromstring(response.content)
+    # 查找所有item元素（新闻条目）
+    news_items = []
+    for item in root.findall(".//item"):
+        title = item.find("title").text if item.find("title") is not None else "无标题"
+        link = item.find("link").text if item.find("link") is not None else "#"
+        description = (
+            item.find("description").text
+            if item.find("description") is not None
+            else "无描述"
+        )
+        pubDate = (
+            item.find("pubDate").text if item.find("pubDate") is not None else "未知时间"
+        )
 
-        # 查找所有item元素（新闻条目）
-        news_items = []
-        for item in root.findall(".//item"):
-            title = (
-                item.find("title").text if item.find("title") is not None else "无标题"
-            )
-            link = item.find("link").text if item.find("link") is not None else "#"
-            description = (
-                item.find("description").text
-                if item.find("description") is not None
-                else "无描述"
-            )
-            pubDate = (
-                item.find("pubDate").text
-                if item.find("pubDate") is not None
-                else "未知时间"
-            )
+        news_items.append(
+            {
+                "title": title,
+                "link": link,
+                "description": description,
+                "pubDate": pubDate,
+            }
+        )
 
-            news_items.append(
-                {
-                    "title": title,
-                    "link": link,
-                    "description": description,
-                    "pubDate": pubDate,
-                }
-            )
+    return news_items
+
+
+def parse_news_detail(response):
+    """提取新闻详情页的正文"""
+    soup = BeautifulSoup(response.content, "html.parser")
 
-        return news_items
+    # 尝试提取正文内容 (这里的选择器需要根据实际网站结构调整)
+    content_div = soup.select_one(".content_desc, .content, article, .article-content")
+    if content_div:
+        paragraphs = content_div.find_all("p")
+        content = "\n".join(
+            [p.get_text().strip() for p in paragraphs if p.get_text().strip()]
+        )
+        return content
+    else:
+        # 如果找不到特定的内容区域，尝试获取所有段落
+        paragraphs = soup.find_all("p")
+        content = "\n".join(
+            [p.get_text().strip() for p in paragraphs if p.get_text().strip()]
+        )
+        return content[:2000]  # 限制长度
+
+
+async def fetch_news_from_rss(rss_url):
+    """从RSS源获取新闻列表，RSS由后台定时预取"""
+    try:
+        return await get_plugin_http_client().get_cached(
+            rss_url, parse=parse_rss, key=f"rss:{rss_url}", prefetch=True
+        )
     except Exception as e:
         logger.bind(tag=TAG).error(f"获取RSS新闻失败: {e}")
         return []
 
 
-def fetch_news_detail(url):
-    """获取新闻详情页内容并总结"""
+async def fetch_news_detail(url):
+    """获取新闻详情页内容，提取后的正文按URL缓存"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # 尝试提取正文内容 (这里的选择器需要根据实际网站结构调整)
-        content_div = soup.select_one(
-            ".content_desc, .content, article, .article-content"
+        return await get_plugin_http_client().get_cached(
+            url, parse=parse_news_detail, key=f"chinanews_detail:{url}", ttl=3600
         )
-        if content_div:
-            paragraphs = content_div.find_all("p")
-            content = "\n".join(
-                [p.get_text().strip() for p in paragraphs if p.get_text().strip()]
-            )
-            return content
-        else:
-            # 如果找不到特定的内容区域，尝试获取所有段落
-            paragraphs = soup.find_all("p")
-            content = "\n".join(
-                [p.get_text().strip() for p in paragraphs if p.get_text().strip()]
-            )
-            return content[:2000]  # 限制长度
     except Exception as e:
         logger.bind(tag=TAG).error(f"获取新闻详情失败: {e}")
         return "无法获取详细内容"
@@ -144,7 +145,7 @@ def map_category(category_text):
     GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
 )
-def get_news_from_chinanews(
+async def get_news_from_chinanews(
     conn, category: str = None, detail: bool = False, lang: str = "zh_CN"
 ):
     """获取新闻并随机选择一条进行播报，或获取上一条新闻的详细内容"""
@@ -173,7 +174,7 @@ def get_news_from_chinanews(
             logger.bind(tag=TAG).debug(f"获取新闻详情: {title}, URL={link}")
 
             # 获取新闻详情
-            detail_content = fetch_news_detail(link)
+            detail_content = await fetch_news_detail(link)
 
             if not detail_content or detail_content == "无法获取详细内容":
                 return ActionResponse(
@@ -213,7 +214,7 @@ def get_news_from_chinanews(
         )
 
         # 获取新闻列表
-        news_items = fetch_news_from_rss(rss_url)
+        news_items = await fetch_news_from_rss(rss_url)
 
         if not news_items:
             return ActionResponse(
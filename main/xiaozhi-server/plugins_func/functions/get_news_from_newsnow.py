@@ -1,9 +1,10 @@
+import io
 import random
-import requests
 import json
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
-from markitdown import MarkItDown
+from plugins_func.http_client import get_plugin_http_client
+from markitdown import MarkItDown, StreamInfo
 
 TAG = __name__
 logger = setup_logging()
@@ -116,8 +117,32 @@ GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC = {
 }
 
 
-def fetch_news_from_api(conn, source="thepaper"):
-    """从API获取新闻列表"""
+def parse_news_items(response):
+    """解析新闻列表接口的响应"""
+    data = response.json()
+    if "items" in data:
+        return data["items"]
+    logger.bind(tag=TAG).error(f"获取新闻API响应格式错误: {data}")
+    return None
+
+
+def parse_news_detail(response):
+    """使用MarkItDown清理新闻详情页的HTML"""
+    md = MarkItDown(enable_plugins=False)
+    result = md.convert_stream(
+        io.BytesIO(response.content),
+        stream_info=StreamInfo(
+            mimetype="text/html",
+            extension=".html",
+            charset=response.encoding,
+            url=response.url,
+        ),
+    )
+    return result.text_content
+
+
+async def fetch_news_from_api(conn, source="thepaper"):
+    """从API获取新闻列表，热门新闻源由后台定时预取"""
     try:
         api_url = f"https://newsnow.busiyi.world/api/s?id={source}"
         if conn.config["plugins"].get("get_news_from_newsnow") and conn.config[
@@ -125,36 +150,22 @@ def fetch_news_from_api(conn, source="thepaper"):
         ]["get_news_from_newsnow"].get("url"):
             api_url = conn.config["plugins"]["get_news_from_newsnow"]["url"] + source
 
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(api_url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        data = response.json()
-
-        if "items" in data:
-            return data["items"]
-        else:
-            logger.bind(tag=TAG).error(f"获取新闻API响应格式错误: {data}")
-            return []
+        news_items = await get_plugin_http_client().get_cached(
+            api_url, parse=parse_news_items, key=f"newsnow:{api_url}", prefetch=True
+        )
+        return news_items or []
 
     except Exception as e:
         logger.bind(tag=TAG).error(f"获取新闻API失败: {e}")
         return []
 
 
-def fetch_news_detail(url):
-    """获取新闻详情页内容并使用MarkItDown清理HTML"""
+async def fetch_news_detail(url):
+    """获取新闻详情页内容并使用MarkItDown清理HTML，清理后的内容按URL缓存"""
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        # 使用MarkItDown清理HTML内容
-        md = MarkItDown(enable_plugins=False)
-        result = md.convert(response)
-
-        # 获取清理后的文本内容
-        clean_text = result.text_content
+        clean_text = await get_plugin_http_client().get_cached(
+            url, parse=parse_news_detail, key=f"newsnow_detail:{url}", ttl=3600
+        )
 
         # 如果清理后的内容为空，返回提示信息
         if not clean_text or len(clean_text.strip()) == 0:
@@ -172,7 +183,7 @@ def fetch_news_detail(url):
     GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
 )
-def get_news_from_newsnow(
+async def get_news_from_newsnow(
     conn, source: str = "澎湃新闻", detail: bool = False, lang: str = "zh_CN"
 ):
     """获取新闻并随机选择一条进行播报，或获取上一条新闻的详细内容"""
@@ -209,7 +220,7 @@ def get_news_from_newsnow(
             )
 
             # 获取新闻详情
-            detail_content = fetch_news_detail(url)
+            detail_content = await fetch_news_detail(url)
 
             if not detail_content or detail_content == "无法获取详细内容":
                 return ActionResponse(
@@ -251,7 +262,7 @@ def get_news_from_newsnow(
         logger.bind(tag=TAG).info(f"获取新闻: 新闻源={source}({english_source_id})")
 
         # 获取新闻列表
-        news_items = fetch_news_from_api(conn, english_source_id)
+        news_items = await fetch_news_from_api(conn, english_source_id)
 
         if not news_items:
             return ActionResponse(
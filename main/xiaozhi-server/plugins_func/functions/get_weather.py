@@ -1,7 +1,8 @@
-import requests
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from plugins_func.http_client import get_plugin_http_client
+from core.providers.tools.server_plugins.plugin_runtime import get_plugin_runtime
 from core.utils.util import get_ip_info
 
 TAG = __name__
@@ -107,20 +108,30 @@ WEATHER_CODE_MAP = {
 }
 
 
-def fetch_city_info(location, api_key, api_host):
-    url = f"https://{api_host}/geo/v2/city/lookup?key={api_key}&location={location}&lang=zh"
-    response = requests.get(url, headers=HEADERS).json()
-    if response.get("error") is not None:
+def parse_city_info(response):
+    data = response.json()
+    if data.get("error") is not None:
         logger.bind(tag=TAG).error(
-            f"获取天气失败，原因：{response.get('error', {}).get('detail')}"
+            f"获取天气失败，原因：{data.get('error', {}).get('detail')}"
         )
         return None
-    return response.get("location", [])[0] if response.get("location") else None
+    return data.get("location", [])[0] if data.get("location") else None
+
+
+async def fetch_city_info(location, api_key, api_host):
+    """查询城市信息，城市不会变化，按地名缓存一天"""
+    url = f"https://{api_host}/geo/v2/city/lookup?key={api_key}&location={location}&lang=zh"
+    return await get_plugin_http_client().get_cached(
+        url,
+        headers=HEADERS,
+        parse=parse_city_info,
+        key=f"weather_city:{api_host}:{location}",
+        ttl=86400,
+    )
 
 
-def fetch_weather_page(url):
-    response = requests.get(url, headers=HEADERS)
-    return BeautifulSoup(response.text, "html.parser") if response.ok else None
+def parse_weather_page(response):
+    return parse_weather_info(BeautifulSoup(response.text, "html.parser"))
 
 
 def parse_weather_info(soup):
@@ -155,7 +166,7 @@ def parse_weather_info(soup):
 
 
 @register_function("get_weather", GET_WEATHER_FUNCTION_DESC, ToolType.SYSTEM_CTL)
-def get_weather(conn, location: str = None, lang: str = "zh_CN"):
+async def get_weather(conn, location: str = None, lang: str = "zh_CN"):
     from core.utils.cache.manager import cache_manager, CacheType
 
     api_host = conn.config["plugins"]["get_weather"].get(
@@ -171,38 +182,58 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
     if not location:
         # 通过客户端IP解析城市
         if client_ip:
-            # 先从缓存获取IP对应的城市信息
-            cached_ip_info = cache_manager.get(CacheType.IP_INFO, client_ip)
-            if cached_ip_info:
-                location = cached_ip_info.get("city")
-            else:
-                # 缓存未命中，调用API获取
-                ip_info = get_ip_info(client_ip, logger)
-                if ip_info:
-                    cache_manager.set(CacheType.IP_INFO, client_ip, ip_info)
-                    location = ip_info.get("city")
+            # 先从缓存获取IP对应的城市信息，未命中时在线程池中调用API获取
+            async def lookup_ip_info():
+                ip_info = await get_plugin_runtime().run_sync(
+                    get_ip_info, client_ip, logger
+                )
+                return ip_info or None
+
+            ip_info = await cache_manager.async_get_or_compute(
+                CacheType.IP_INFO, client_ip, lookup_ip_info
+            )
+            if ip_info:
+                location = ip_info.get("city")
 
             if not location:
                 location = default_location
         else:
             # 若无IP，使用默认位置
             location = default_location
-    # 尝试从缓存获取完整天气报告
-    weather_cache_key = f"full_weather_{location}_{lang}"
-    cached_weather_report = cache_manager.get(CacheType.WEATHER, weather_cache_key)
-    if cached_weather_report:
-        return ActionResponse(Action.REQLLM, cached_weather_report, None)
 
-    # 缓存未命中，获取实时天气数据
-    city_info = fetch_city_info(location, api_key, api_host)
-    if not city_info:
+    # 同一地点的并发查询只生成一次天气报告
+    weather_cache_key = f"full_weather_{location}_{lang}"
+    try:
+        weather_report = await cache_manager.async_get_or_compute(
+            CacheType.WEATHER,
+            weather_cache_key,
+            lambda: build_weather_report(location, api_key, api_host),
+        )
+    except Exception as e:
+        logger.bind(tag=TAG).error(f"获取天气失败: {e}")
+        return ActionResponse(Action.REQLLM, None, "请求失败")
+    if not weather_report:
         return ActionResponse(
             Action.REQLLM, f"未找到相关的城市: {location}，请确认地点是否正确", None
         )
-    soup = fetch_weather_page(city_info["fxLink"])
-    if not soup:
-        return ActionResponse(Action.REQLLM, None, "请求失败")
-    city_name, current_abstract, current_basic, temps_list = parse_weather_info(soup)
+    return ActionResponse(Action.REQLLM, weather_report, None)
+
+
+async def build_weather_report(location, api_key, api_host):
+    """获取实时天气数据并生成报告，找不到城市时返回None"""
+    city_info = await fetch_city_info(location, api_key, api_host)
+    if not city_info:
+        return None
+    # 页面只短暂缓存，用于合并并发请求，完整报告由调用方缓存
+    city_name, current_abstract, current_basic, temps_list = (
+        await get_plugin_http_client().get_cached(
+            city_info["fxLink"],
+            headers=HEADERS,
+            parse=parse_weather_page,
+            key=f"weather_page:{city_info['fxLink']}",
+            ttl=60,
+        )
+    )
 
     weather_report = f"您查询的位置是：{city_name}\n\n当前天气: {current_abstract}\n"
 
@@ -221,7 +252,4 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
     # 提示语
     weather_report += "\n（如需某一天的具体天气，请告诉我日期）"
 
-    # 缓存完整的天气报告
-    cache_manager.set(CacheType.WEATHER, weather_cache_key, weather_report)
-
-    return ActionResponse(Action.REQLLM, weather_report, None)
+    return weather_report
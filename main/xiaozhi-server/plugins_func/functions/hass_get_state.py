@@ -1,8 +1,8 @@
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from plugins_func.functions.hass_init import initialize_hass_handler
+from plugins_func.hass_client import get_hass_manager
 from config.logger import setup_logging
 import asyncio
-import requests
 
 TAG = __name__
 logger = setup_logging()
@@ -27,9 +27,9 @@ hass_get_state_function_desc = {
 
 
 @register_function("hass_get_state", hass_get_state_function_desc, ToolType.SYSTEM_CTL)
-def hass_get_state(conn, entity_id=""):
+async def hass_get_state(conn, entity_id=""):
     try:
-        ha_response = handle_hass_get_state(conn, entity_id)
+        ha_response = await handle_hass_get_state(conn, entity_id)
         return ActionResponse(Action.REQLLM, ha_response, None)
     except asyncio.TimeoutError:
         logger.bind(tag=TAG).error("获取Home Assistant状态超时")
@@ -40,56 +40,28 @@ def hass_get_state(conn, entity_id=""):
         return ActionResponse(Action.ERROR, error_msg, None)
 
 
-def handle_hass_get_state(conn, entity_id):
+async def handle_hass_get_state(conn, entity_id):
     ha_config = initialize_hass_handler(conn)
     api_key = ha_config.get("api_key")
     base_url = ha_config.get("base_url")
-    url = f"{base_url}/api/states/{entity_id}"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    response = requests.get(url, headers=headers, timeout=5)
-    if response.status_code == 200:
-        responsetext = "设备状态:" + response.json()["state"] + " "
-        logger.bind(tag=TAG).info(f"api返回内容: {response.json()}")
+    # 状态从本地镜像读取，由Home Assistant的事件推送实时更新
+    hass = get_hass_manager(conn.config).get_instance(base_url, api_key)
+    state = await hass.get_state(entity_id)
+    if state is None:
+        return f"未找到设备: {entity_id}"
 
-        if "media_title" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "正在播放的是:"
-                + str(response.json()["attributes"]["media_title"])
-                + " "
-            )
-        if "volume_level" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "音量是:"
-                + str(response.json()["attributes"]["volume_level"])
-                + " "
-            )
-        if "color_temp_kelvin" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "色温是:"
-                + str(response.json()["attributes"]["color_temp_kelvin"])
-                + " "
-            )
-        if "rgb_color" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "rgb颜色是:"
-                + str(response.json()["attributes"]["rgb_color"])
-                + " "
-            )
-        if "brightness" in response.json()["attributes"]:
-            responsetext = (
-                responsetext
-                + "亮度是:"
-                + str(response.json()["attributes"]["brightness"])
-                + " "
-            )
-        logger.bind(tag=TAG).info(f"查询返回内容: {responsetext}")
-        return responsetext
-        # return response.json()['attributes']
-        # response.attributes
-
-    else:
-        return f"切换失败，错误码: {response.status_code}"
+    logger.bind(tag=TAG).info(f"设备状态: {state}")
+    attributes = state.get("attributes", {})
+    responsetext = "设备状态:" + str(state["state"]) + " "
+    if "media_title" in attributes:
+        responsetext += "正在播放的是:" + str(attributes["media_title"]) + " "
+    if "volume_level" in attributes:
+        responsetext += "音量是:" + str(attributes["volume_level"]) + " "
+    if "color_temp_kelvin" in attributes:
+        responsetext += "色温是:" + str(attributes["color_temp_kelvin"]) + " "
+    if "rgb_color" in attributes:
+        responsetext += "rgb颜色是:" + str(attributes["rgb_color"]) + " "
+    if "brightness" in attributes:
+        responsetext += "亮度是:" + str(attributes["brightness"]) + " "
+    logger.bind(tag=TAG).info(f"查询返回内容: {responsetext}")
+    return responsetext
@@ -1,8 +1,8 @@
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from plugins_func.functions.hass_init import initialize_hass_handler
+from plugins_func.hass_client import get_hass_manager
 from config.logger import setup_logging
 import asyncio
-import requests
 
 TAG = __name__
 logger = setup_logging()
@@ -50,11 +50,11 @@ hass_set_state_function_desc = {
 
 
 @register_function("hass_set_state", hass_set_state_function_desc, ToolType.SYSTEM_CTL)
-def hass_set_state(conn, entity_id="", state=None):
+async def hass_set_state(conn, entity_id="", state=None):
     if state is None:
         state = {}
     try:
-        ha_response = handle_hass_set_state(conn, entity_id, state)
+        ha_response = await handle_hass_set_state(conn, entity_id, state)
         return ActionResponse(Action.REQLLM, ha_response, None)
     except asyncio.TimeoutError:
         logger.bind(tag=TAG).error("设置Home Assistant状态超时")
@@ -65,7 +65,7 @@ def hass_set_state(conn, entity_id="", state=None):
         return ActionResponse(Action.ERROR, error_msg, None)
 
 
-def handle_hass_set_state(conn, entity_id, state):
+async def handle_hass_set_state(conn, entity_id, state):
     ha_config = initialize_hass_handler(conn)
     api_key = ha_config.get("api_key")
     base_url = ha_config.get("base_url")
@@ -163,13 +163,14 @@ def handle_hass_set_state(conn, entity_id, state):
         }
     else:
         data = {"entity_id": entity_id, arg: value}
-    url = f"{base_url}/api/services/{domain}/{action}"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    response = requests.post(url, headers=headers, json=data, timeout=5)  # 设置5秒超时
-    logger.bind(tag=TAG).info(
-        f"设置状态:{description},url:{url},return_code:{response.status_code}"
-    )
-    if response.status_code == 200:
-        return description
-    else:
-        return f"设置失败，错误码: {response.status_code}"
+    # 通过共享的websocket连接发送命令
+    hass = get_hass_manager(conn.config).get_instance(base_url, api_key)
+    try:
+        await hass.call_service(domain, action, data)
+    except asyncio.TimeoutError:
+        raise
+    except Exception as e:
+        logger.bind(tag=TAG).error(f"设置状态失败:{domain}.{action},{data},{e}")
+        return f"设置失败: {e}"
+    logger.bind(tag=TAG).info(f"设置状态:{description},service:{domain}.{action}")
+    return description
@@ -1,18 +1,21 @@
 import os
 import re
-import time
 import random
-import difflib
+import asyncio
+import threading
 import traceback
-from pathlib import Path
+from config.config_loader import get_project_dir
 from core.handle.sendAudioHandle import send_stt_message
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.dialogue import Message
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType, ContentType
+from plugins_func.music_index import MusicIndex
 
 TAG = __name__
 
 MUSIC_CACHE = {}
+# 首次建立索引较慢，并发调用时只建立一次
+_music_init_lock = threading.Lock()
 
 play_music_function_desc = {
     "type": "function",
@@ -47,9 +50,9 @@ def play_music(conn, song_name: str):
                 action=Action.RESPONSE, result="系统繁忙", response="请稍后再试"
             )
 
-        # 提交异步任务
-        task = conn.loop.create_task(
-            handle_music_command(conn, music_intent)  # 封装异步逻辑
+        # 提交异步任务（插件在线程池中执行，需线程安全地提交到事件循环）
+        task = asyncio.run_coroutine_threadsafe(
+            handle_music_command(conn, music_intent), conn.loop  # 封装异步逻辑
         )
 
         # 非阻塞回调处理
@@ -82,67 +85,53 @@ def _extract_song_name(text):
     return None
 
 
-def _find_best_match(potential_song, music_files):
-    """查找最匹配的歌曲"""
-    best_match = None
-    highest_ratio = 0
-
-    for music_file in music_files:
-        song_name = os.path.splitext(music_file)[0]
-        ratio = difflib.SequenceMatcher(None, potential_song, song_name).ratio()
-        if ratio > highest_ratio and ratio > 0.4:
-            highest_ratio = ratio
-            best_match = music_file
-    return best_match
-
-
-def get_music_files(music_dir, music_ext):
-    music_dir = Path(music_dir)
-    music_files = []
-    music_file_names = []
-    for file in music_dir.rglob("*"):
-        # 判断是否是文件
-        if file.is_file():
-            # 获取文件扩展名
-            ext = file.suffix.lower()
-            # 判断扩展名是否在列表中
-            if ext in music_ext:
-                # 添加相对路径
-                music_files.append(str(file.relative_to(music_dir)))
-                music_file_names.append(
-                    os.path.splitext(str(file.relative_to(music_dir)))[0]
-                )
-    return music_files, music_file_names
-
-
 def initialize_music_handler(conn):
+    """建立音乐索引，首次调用会扫描目录，需在线程中执行"""
     global MUSIC_CACHE
-    if MUSIC_CACHE == {}:
-        if "play_music" in conn.config["plugins"]:
-            MUSIC_CACHE["music_config"] = conn.config["plugins"]["play_music"]
-            MUSIC_CACHE["music_dir"] = os.path.abspath(
-                MUSIC_CACHE["music_config"].get("music_dir", "./music")  # 默认路径修改
-            )
-            MUSIC_CACHE["music_ext"] = MUSIC_CACHE["music_config"].get(
-                "music_ext", (".mp3", ".wav", ".p3")
-            )
-            MUSIC_CACHE["refresh_time"] = MUSIC_CACHE["music_config"].get(
-                "refresh_time", 60
-            )
-        else:
-            MUSIC_CACHE["music_dir"] = os.path.abspath("./music")
-            MUSIC_CACHE["music_ext"] = (".mp3", ".wav", ".p3")
-            MUSIC_CACHE["refresh_time"] = 60
-        # 获取音乐文件列表
-        MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = get_music_files(
-            MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
+    if MUSIC_CACHE:
+        return MUSIC_CACHE
+    with _music_init_lock:
+        if MUSIC_CACHE:
+            return MUSIC_CACHE
+        music_config = conn.config["plugins"].get("play_music", {}) or {}
+        music_cache = {
+            "music_config": music_config,
+            "music_dir": os.path.abspath(
+                music_config.get("music_dir", "./music")  # 默认路径修改
+            ),
+            "music_ext": music_config.get("music_ext", (".mp3", ".wav", ".p3")),
+            "refresh_time": music_config.get("refresh_time", 60),
+            # 意图识别提示词中最多附带的候选歌名数
+            "prompt_top_k": int(music_config.get("prompt_top_k", 10)),
+        }
+        # 建立音乐索引，目录列表和歌名拼音缓存在磁盘上
+        music_cache["index"] = MusicIndex(
+            music_cache["music_dir"],
+            music_cache["music_ext"],
+            music_cache["refresh_time"],
+            index_path=get_project_dir() + "data/.music_index.json",
         )
-        MUSIC_CACHE["scan_time"] = time.time()
+        music_cache["index"].refresh(force=True)
+        # 索引建好后一次性放入，其他线程不会读到不完整的配置
+        MUSIC_CACHE.update(music_cache)
     return MUSIC_CACHE
 
 
+def _prepare_music_index(conn):
+    """建立索引，超过刷新间隔时检查目录变化，只重新列出有变化的目录"""
+    music_cache = initialize_music_handler(conn)
+    music_cache["index"].refresh()
+    return music_cache
+
+
+async def get_music_candidates(conn, text):
+    """根据用户输入返回最相关的几首歌名，避免把整个曲库放进提示词"""
+    music_cache = await asyncio.to_thread(_prepare_music_index, conn)
+    return music_cache["index"].candidate_titles(text, music_cache["prompt_top_k"])
+
+
 async def handle_music_command(conn, text):
-    initialize_music_handler(conn)
+    await asyncio.to_thread(initialize_music_handler, conn)
     global MUSIC_CACHE
 
     """处理音乐播放指令"""
@@ -151,16 +140,12 @@ async def handle_music_command(conn, text):
 
     # 尝试匹配具体歌名
     if os.path.exists(MUSIC_CACHE["music_dir"]):
-        if time.time() - MUSIC_CACHE["scan_time"] > MUSIC_CACHE["refresh_time"]:
-            # 刷新音乐文件列表
-            MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = (
-                get_music_files(MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"])
-            )
-            MUSIC_CACHE["scan_time"] = time.time()
+        # 超过刷新间隔时检查目录变化，只重新列出有变化的目录
+        await asyncio.to_thread(MUSIC_CACHE["index"].refresh)
 
         potential_song = _extract_song_name(clean_text)
         if potential_song:
-            best_match = _find_best_match(potential_song, MUSIC_CACHE["music_files"])
+            best_match = MUSIC_CACHE["index"].best_match(potential_song)
             if best_match:
                 conn.logger.bind(tag=TAG).info(f"找到最匹配的歌曲: {best_match}")
                 await play_local_music(conn, specific_file=best_match)
@@ -202,10 +187,11 @@ async def play_local_music(conn, specific_file=None):
             selected_music = specific_file
             music_path = os.path.join(MUSIC_CACHE["music_dir"], specific_file)
         else:
-            if not MUSIC_CACHE["music_files"]:
+            music_files = MUSIC_CACHE["index"].files
+            if not music_files:
                 conn.logger.bind(tag=TAG).error("未找到MP3音乐文件")
                 return
-            selected_music = random.choice(MUSIC_CACHE["music_files"])
+            selected_music = random.choice(music_files)
             music_path = os.path.join(MUSIC_CACHE["music_dir"], selected_music)
 
         if not os.path.exists(music_path):
@@ -0,0 +1,316 @@
+"""
+Home Assistant 本地状态镜像
+
+每个Home Assistant实例（地址+令牌）在进程内只保持一条websocket连接，
+同一家庭的所有设备连接共用：
+1. 连接建立后拉取全部实体状态，并订阅state_changed事件实时更新内存中的镜像
+2. 查询状态直接读内存，不再每次请求REST接口
+3. 控制命令通过已建立的websocket发送，并发命令按消息id区分响应
+4. websocket不可用、命令没有发出时退回REST接口；命令已发出但断线丢失响应时直接报错，不重复执行
+5. 断线后自动重连
+"""
+
+import json
+import time
+import asyncio
+import itertools
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import websockets
+
+from config.logger import setup_logging
+from plugins_func.http_client import get_plugin_http_client
+
+TAG = __name__
+logger = setup_logging()
+
+
+class HassError(Exception):
+    """Home Assistant返回错误"""
+
+
+class _NotSentError(ConnectionError):
+    """命令没有发出，可以安全地改用REST接口"""
+
+
+class HassInstance:
+    """单个Home Assistant实例的websocket连接和实体状态镜像"""
+
+    def __init__(self, base_url: str, api_key: str, settings: Dict[str, float]):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.ws_url = self._to_ws_url(self.base_url) + "/api/websocket"
+        self.connect_timeout = settings["connect_timeout"]
+        self.call_timeout = settings["call_timeout"]
+        self.reconnect_interval = settings["reconnect_interval"]
+        self.max_reconnect_interval = settings["max_reconnect_interval"]
+        self.idle_timeout = settings["idle_timeout"]
+        # entity_id -> HA的状态对象（state、attributes等）
+        self.states: Dict[str, Dict[str, Any]] = {}
+        self.last_used = time.monotonic()
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ws = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"reads": 0, "calls": 0, "fallbacks": 0, "reconnects": 0}
+
+    @staticmethod
+    def _to_ws_url(base_url: str) -> str:
+        if base_url.startswith("https://"):
+            return "wss://" + base_url[len("https://") :]
+        if base_url.startswith("http://"):
+            return "ws://" + base_url[len("http://") :]
+        return base_url
+
+    @property
+    def connected(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(
+                self._run(), name=f"HassMirror:{self.base_url}"
+            )
+
+    async def _run(self):
+        interval = self.reconnect_interval
+        while True:
+            try:
+                await self._connect_once()
+                interval = self.reconnect_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.bind(tag=TAG).warning(
+                    f"Home Assistant连接断开 {self.base_url}: {e}，{interval}秒后重连"
+                )
+            finally:
+                self._on_disconnected()
+            if time.monotonic() - self.last_used > self.idle_timeout:
+                logger.bind(tag=TAG).info(
+                    f"Home Assistant长时间未使用，断开: {self.base_url}"
+                )
+                return
+            self._stats["reconnects"] += 1
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_reconnect_interval)
+
+    async def _connect_once(self):
+        async with websockets.connect(
+            self.ws_url, max_size=None, open_timeout=self.connect_timeout
+        ) as ws:
+            await self._authenticate(ws)
+            self._ws = ws
+            reader = asyncio.create_task(self._read_loop(ws))
+            try:
+                # 先订阅再拉取全量状态，避免漏掉两者之间的变化
+                await self._call(
+                    {"type": "subscribe_events", "event_type": "state_changed"}
+                )
+                states = await self._call({"type": "get_states"})
+                self.states = {item["entity_id"]: item for item in states or []}
+                self._ready.set()
+                logger.bind(tag=TAG).info(
+                    f"Home Assistant状态镜像已建立: {self.base_url}, 实体数: {len(self.states)}"
+                )
+                await self._watch_idle(reader)
+            finally:
+                reader.cancel()
+
+    async def _authenticate(self, ws):
+        message = json.loads(await ws.recv())
+        if message.get("type") != "auth_required":
+            raise HassError(f"未知的握手消息: {message}")
+        await ws.send(json.dumps({"type": "auth", "access_token": self.api_key}))
+        message = json.loads(await ws.recv())
+        if message.get("type") != "auth_ok":
+            raise HassError(f"认证失败: {message.get('message', message)}")
+
+    async def _watch_idle(self, reader: asyncio.Task):
+        """读循环结束（断线）或长时间没有使用时返回"""
+        while not reader.done():
+            if time.monotonic() - self.last_used > self.idle_timeout:
+                return
+            await asyncio.wait({reader}, timeout=min(60.0, self.idle_timeout))
+        reader.result()
+
+    async def _read_loop(self, ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            message_type = message.get("type")
+            if message_type == "event":
+                data = message.get("event", {}).get("data", {})
+                entity_id = data.get("entity_id")
+                new_state = data.get("new_state")
+                if entity_id and new_state is None:
+                    self.states.pop(entity_id, None)
+                elif entity_id:
+                    self.states[entity_id] = new_state
+            elif message_type == "result":
+                future = self._pending.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if message.get("success"):
+                    future.set_result(message.get("result"))
+                else:
+                    error = message.get("error") or {}
+                    future.set_exception(
+                        HassError(error.get("message", "Home Assistant执行失败"))
+                    )
+
+    def _on_disconnected(self):
+        self._ready.clear()
+        self._ws = None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Home Assistant连接已断开"))
+
+    async def _call(self, payload: Dict[str, Any]) -> Any:
+        if self._ws is None:
+            raise _NotSentError("Home Assistant连接未建立")
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            try:
+                await self._ws.send(json.dumps({**payload, "id": message_id}))
+            except websockets.ConnectionClosed as e:
+                raise _NotSentError("Home Assistant连接已断开") from e
+            return await asyncio.wait_for(future, self.call_timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def _wait_ready(self) -> bool:
+        self.last_used = time.monotonic()
+        self.start()
+        if self._ready.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._ready.wait(), self.connect_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    async def get_state(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """读取实体状态，镜像可用时直接读内存，实体不存在时返回None"""
+        if await self._wait_ready():
+            self._stats["reads"] += 1
+            return self.states.get(entity_id)
+        self._stats["fallbacks"] += 1
+        response = await get_plugin_http_client().get(
+            f"{self.base_url}/api/states/{entity_id}",
+            headers=self._headers(),
+            timeout=self.call_timeout,
+        )
+        if response.status == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def call_service(
+        self, domain: str, service: str, service_data: Dict[str, Any]
+    ) -> Any:
+        """调用服务，通过已建立的websocket发送，命令没有发出时退回REST接口"""
+        self._stats["calls"] += 1
+        if await self._wait_ready():
+            try:
+                return await self._call(
+                    {
+                        "type": "call_service",
+                        "domain": domain,
+                        "service": service,
+                        "service_data": service_data,
+                    }
+                )
+            except _NotSentError as e:
+                logger.bind(tag=TAG).warning(f"websocket发送失败，改用REST接口: {e}")
+            except ConnectionError as e:
+                # 命令已发出，HA可能已经执行，重发会重复执行切换类操作
+                raise HassError(f"命令已发送，但连接断开，未收到执行结果: {e}") from e
+        self._stats["fallbacks"] += 1
+        response = await get_plugin_http_client().post(
+            f"{self.base_url}/api/services/{domain}/{service}",
+            headers=self._headers(),
+            json=service_data,
+            timeout=self.call_timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def metrics(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["connected"] = self.connected
+        stats["entities"] = len(self.states)
+        return stats
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+class HassManager:
+    """按实例地址和令牌管理共享的Home Assistant连接"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        mirror_config = (config or {}).get("hass_mirror", {}) or {}
+        self.settings = {
+            # 等待websocket就绪的时间(秒)，超时则本次退回REST接口
+            "connect_timeout": float(mirror_config.get("connect_timeout", 3)),
+            # 单个命令等待响应的时间(秒)
+            "call_timeout": float(mirror_config.get("call_timeout", 5)),
+            # 断线重连的初始间隔和最大间隔(秒)
+            "reconnect_interval": float(mirror_config.get("reconnect_interval", 2)),
+            "max_reconnect_interval": float(
+                mirror_config.get("max_reconnect_interval", 60)
+            ),
+            # 超过该时间(秒)没有使用的连接自动断开
+            "idle_timeout": float(mirror_config.get("idle_timeout", 3600)),
+        }
+        self._instances: Dict[Tuple[str, str], HassInstance] = {}
+
+    def get_instance(self, base_url: str, api_key: str) -> HassInstance:
+        key = (base_url.rstrip("/"), api_key)
+        instance = self._instances.get(key)
+        if instance is None:
+            instance = self._instances[key] = HassInstance(
+                base_url, api_key, self.settings
+            )
+        return instance
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            instance.base_url: instance.metrics()
+            for instance in self._instances.values()
+        }
+
+    async def shutdown(self):
+        for instance in list(self._instances.values()):
+            await instance.close()
+        self._instances.clear()
+
+
+_manager: Optional[HassManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_hass_manager(config: Optional[Dict[str, Any]] = None) -> HassManager:
+    """获取进程级Home Assistant连接管理器，首次调用时按配置创建"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = HassManager(config)
+        return _manager
@@ -0,0 +1,233 @@
+"""
+插件共用的HTTP层：
+- 进程内共享一个保持长连接的aiohttp会话
+- 按URL缓存响应或解析后的结果，并发请求同一URL时只请求一次
+- 热门的RSS和新闻列表在后台定时预取，插件调用直接命中内存
+"""
+
+import time
+import json
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import aiohttp
+
+from config.logger import setup_logging
+from core.utils.cache.manager import cache_manager, CacheType
+from core.providers.tools.server_plugins.plugin_runtime import get_plugin_runtime
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+class PluginHttpError(Exception):
+    """上游返回错误状态码"""
+
+    def __init__(self, url: str, status: int):
+        super().__init__(f"请求 {url} 失败，状态码: {status}")
+        self.url = url
+        self.status = status
+
+
+class PluginHttpResponse:
+    def __init__(self, url: str, status: int, body: bytes, encoding: str):
+        self.url = url
+        self.status = status
+        self.content = body
+        self.encoding = encoding
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise PluginHttpError(self.url, self.status)
+
+
+class _PrefetchItem:
+    def __init__(self, url, headers, parse, ttl):
+        self.url = url
+        self.headers = headers
+        self.parse = parse
+        self.ttl = ttl
+        self.last_used = time.monotonic()
+
+
+class PluginHttpClient:
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        http_config = (config or {}).get("plugin_http", {}) or {}
+        # 单次请求超时(秒)
+        self.timeout = float(http_config.get("timeout", 10))
+        # 未指定时的响应缓存时间(秒)
+        self.cache_ttl = float(http_config.get("cache_ttl", 300))
+        # 连接池上限，以及每个域名的连接数上限
+        self.max_connections = int(http_config.get("max_connections", 100))
+        self.max_connections_per_host = int(
+            http_config.get("max_connections_per_host", 20)
+        )
+        # 后台预取的间隔(秒)，以及多久没有被请求的数据不再预取
+        self.prefetch_interval = float(http_config.get("prefetch_interval", 300))
+        self.prefetch_idle = float(http_config.get("prefetch_idle", 3600))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._prefetch: Dict[str, _PrefetchItem] = {}
+        self._prefetch_task: Optional[asyncio.Task] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if (
+            self._session is None
+            or self._session.closed
+            or self._session_loop is not loop
+        ):
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    limit_per_host=self.max_connections_per_host,
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=DEFAULT_HEADERS,
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        timeout: Optional[float] = None,
+    ) -> PluginHttpResponse:
+        """发送请求并读取完整响应，不做缓存"""
+        request_timeout = (
+            aiohttp.ClientTimeout(total=timeout) if timeout is not None else None
+        )
+        async with self._get_session().request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            json=json,
+            timeout=request_timeout,
+        ) as response:
+            body = await response.read()
+            return PluginHttpResponse(
+                str(response.url), response.status, body, response.get_encoding()
+            )
+
+    async def get(self, url: str, **kwargs) -> PluginHttpResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> PluginHttpResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def _load(
+        self, url: str, headers: Optional[Dict[str, str]], parse: Optional[Callable]
+    ) -> Any:
+        response = await self.get(url, headers=headers)
+        response.raise_for_status()
+        if parse is None:
+            return response.text
+        # 解析HTML/XML比较耗CPU，放到插件线程池中执行
+        return await get_plugin_runtime().run_sync(parse, response)
+
+    async def get_cached(
+        self,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        parse: Optional[Callable[[PluginHttpResponse], Any]] = None,
+        ttl: Optional[float] = None,
+        key: Optional[str] = None,
+        prefetch: bool = False,
+    ) -> Any:
+        """GET请求并按URL缓存结果，同一URL的并发请求只发起一次
+
+        Args:
+            parse: 对响应的同步解析函数，缓存的是解析后的结果，返回None时不缓存
+            key: 缓存键，同一URL使用不同解析函数时需要区分
+            prefetch: 登记为热门数据，由后台定时刷新，调用方始终命中缓存
+        """
+        cache_key = key or url
+        ttl = ttl if ttl is not None else self.cache_ttl
+        if prefetch:
+            self._register_prefetch(cache_key, url, headers, parse, ttl)
+        return await cache_manager.async_get_or_compute(
+            CacheType.PLUGIN_HTTP,
+            cache_key,
+            lambda: self._load(url, headers, parse),
+            ttl=self._effective_ttl(cache_key, ttl),
+        )
+
+    def _effective_ttl(self, cache_key: str, ttl: float) -> float:
+        # 预取的数据在两次刷新之间不能过期
+        if cache_key in self._prefetch:
+            return max(ttl, self.prefetch_interval * 2)
+        return ttl
+
+    def _register_prefetch(self, cache_key, url, headers, parse, ttl):
+        item = self._prefetch.get(cache_key)
+        if item is None:
+            self._prefetch[cache_key] = _PrefetchItem(url, headers, parse, ttl)
+        else:
+            item.last_used = time.monotonic()
+        if self._prefetch_task is None or self._prefetch_task.done():
+            self._prefetch_task = asyncio.create_task(self._prefetch_loop())
+
+    async def _prefetch_loop(self):
+        while self._prefetch:
+            await asyncio.sleep(self.prefetch_interval)
+            now = time.monotonic()
+            for cache_key, item in list(self._prefetch.items()):
+                if now - item.last_used > self.prefetch_idle:
+                    # 长时间没有被请求，不再预取
+                    self._prefetch.pop(cache_key, None)
+                    continue
+                try:
+                    value = await self._load(item.url, item.headers, item.parse)
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"预取 {item.url} 失败: {e}")
+                    continue
+                if value is not None:
+                    cache_manager.set(
+                        CacheType.PLUGIN_HTTP,
+                        cache_key,
+                        value,
+                        ttl=self._effective_ttl(cache_key, item.ttl),
+                    )
+
+    async def close(self):
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+            self._prefetch_task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_client: Optional[PluginHttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_plugin_http_client(config: Optional[Dict[str, Any]] = None) -> PluginHttpClient:
+    """获取进程级插件HTTP客户端，首次调用时按配置创建"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PluginHttpClient(config)
+        return _client
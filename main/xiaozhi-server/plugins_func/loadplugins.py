@@ -6,6 +6,10 @@ TAG = __name__
 
 logger = setup_logging()
 
+# 已导入过的包，每个连接初始化工具处理器时无需重复扫描
+_imported_packages = set()
+
+
 def auto_import_modules(package_name):
     """
     自动导入指定包内的所有模块。
@@ -13,6 +17,8 @@ def auto_import_modules(package_name):
     Args:
         package_name (str): 包的名称，如 'functions'。
     """
+    if package_name in _imported_packages:
+        return
     # 获取包的路径
     package = importlib.import_module(package_name)
     package_path = package.__path__
@@ -22,4 +28,5 @@ def auto_import_modules(package_name):
         # 导入模块
         full_module_name = f"{package_name}.{module_name}"
         importlib.import_module(full_module_name)
-        #logger.bind(tag=TAG).info(f"模块 '{full_module_name}' 已加载")
\ No newline at end of file
+        #logger.bind(tag=TAG).info(f"模块 '{full_module_name}' 已加载")
+    _imported_packages.add(package_name)
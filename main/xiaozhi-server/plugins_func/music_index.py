@@ -0,0 +1,272 @@
+"""
+本地音乐索引
+
+1. 按目录记录修改时间，刷新时只重新列出有变化的目录，不再每次遍历全部文件
+2. 歌名按字符和拼音切分为n-gram建立倒排索引，同音字、错别字也能匹配，
+   查询只比较命中的候选，不随曲库大小线性增长
+3. 目录列表和歌名拼音保存到磁盘，服务重启后无需重新计算
+"""
+
+import os
+import json
+import time
+import heapq
+import difflib
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from pypinyin import lazy_pinyin
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+INDEX_VERSION = 1
+# 粗排后参与精排的候选数
+RERANK_SIZE = 20
+# n-gram出现在超过该数量且超过一成的歌名中时视为常见词
+STOP_GRAM_MIN = 50
+
+
+def normalize_title(text: str) -> str:
+    """统一全角半角和大小写，去掉空白和标点"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def _char_grams(text: str) -> set:
+    grams = set(text)
+    grams.update(text[i : i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _pinyin_grams(syllables: List[str]) -> set:
+    grams = {"py:" + s for s in syllables}
+    grams.update(
+        "py:" + syllables[i] + syllables[i + 1] for i in range(len(syllables) - 1)
+    )
+    return grams
+
+
+class _Entry:
+    __slots__ = ("file", "title", "normalized", "pinyin", "grams")
+
+    def __init__(self, file: str, title: str, normalized: str, pinyin: List[str]):
+        self.file = file
+        self.title = title
+        self.normalized = normalized
+        self.pinyin = pinyin
+        self.grams = _char_grams(normalized) | _pinyin_grams(pinyin)
+
+
+class MusicIndex:
+    def __init__(
+        self,
+        music_dir: str,
+        music_ext,
+        refresh_time: float = 60,
+        index_path: Optional[str] = None,
+    ):
+        self.music_dir = music_dir
+        self.music_ext = tuple(ext.lower() for ext in music_ext)
+        self.refresh_time = float(refresh_time)
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        # 相对目录 -> {"mtime", "files", "subdirs"}
+        self._dirs: Dict[str, dict] = {}
+        # 歌名 -> 拼音音节，歌名不变时无需重新计算
+        self._pinyin: Dict[str, List[str]] = {}
+        # (条目列表, n-gram -> 条目编号)，整体替换，查询时无需加锁
+        self._index: Tuple[List[_Entry], Dict[str, List[int]]] = ([], {})
+        self._scan_time = 0.0
+        self._load()
+
+    @property
+    def files(self) -> List[str]:
+        return [entry.file for entry in self._index[0]]
+
+    @property
+    def titles(self) -> List[str]:
+        return [entry.title for entry in self._index[0]]
+
+    def refresh(self, force: bool = False) -> bool:
+        """距上次扫描超过refresh_time时检查目录变化，返回索引是否有更新"""
+        if not force and time.time() - self._scan_time < self.refresh_time:
+            return False
+        with self._lock:
+            if not force and time.time() - self._scan_time < self.refresh_time:
+                return False
+            dirs, changed = self._scan_dirs()
+            self._scan_time = time.time()
+            if not changed:
+                return False
+            self._dirs = dirs
+            self._rebuild()
+            self._save()
+            logger.bind(tag=TAG).info(
+                f"音乐索引已更新: {self.music_dir}, 共{len(self._index[0])}首"
+            )
+            return True
+
+    def _scan_dirs(self) -> Tuple[Dict[str, dict], bool]:
+        """只有修改时间变化的目录才重新列出文件"""
+        dirs: Dict[str, dict] = {}
+        changed = False
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            path = os.path.join(self.music_dir, rel_dir)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                # 目录不存在，之前索引过时才算变化
+                changed = changed or rel_dir in self._dirs
+                continue
+            cached = self._dirs.get(rel_dir)
+            if cached is not None and cached["mtime"] == mtime:
+                dirs[rel_dir] = cached
+            else:
+                changed = True
+                dirs[rel_dir] = self._list_dir(path, rel_dir, mtime)
+            stack.extend(dirs[rel_dir]["subdirs"])
+        if dirs.keys() != self._dirs.keys():
+            changed = True
+        return dirs, changed
+
+    def _list_dir(self, path: str, rel_dir: str, mtime: float) -> dict:
+        files, subdirs = [], []
+        try:
+            with os.scandir(path) as it:
+                for item in it:
+                    rel_path = os.path.join(rel_dir, item.name)
+                    if item.is_dir():
+                        subdirs.append(rel_path)
+                    elif (
+                        item.is_file()
+                        and os.path.splitext(item.name)[1].lower() in self.music_ext
+                    ):
+                        files.append(rel_path)
+        except OSError as e:
+            logger.bind(tag=TAG).warning(f"读取音乐目录失败 {path}: {e}")
+        return {"mtime": mtime, "files": sorted(files), "subdirs": sorted(subdirs)}
+
+    def _rebuild(self):
+        entries: List[_Entry] = []
+        pinyin_cache: Dict[str, List[str]] = {}
+        for rel_dir in sorted(self._dirs):
+            for file in self._dirs[rel_dir]["files"]:
+                title = os.path.splitext(file)[0]
+                normalized = normalize_title(os.path.basename(title))
+                syllables = self._pinyin.get(normalized)
+                if syllables is None:
+                    syllables = [s for s in lazy_pinyin(normalized) if s.strip()]
+                pinyin_cache[normalized] = syllables
+                entries.append(_Entry(file, title, normalized, syllables))
+
+        postings: Dict[str, List[int]] = {}
+        for entry_id, entry in enumerate(entries):
+            for gram in entry.grams:
+                postings.setdefault(gram, []).append(entry_id)
+
+        self._pinyin = pinyin_cache
+        self._index = (entries, postings)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """模糊查找歌曲，返回[(文件, 相似度)]，按相似度从高到低排列"""
+        normalized = normalize_title(query)
+        if not normalized:
+            return []
+        entries, postings = self._index
+        syllables = [s for s in lazy_pinyin(normalized) if s.strip()]
+        query_grams = _char_grams(normalized) | _pinyin_grams(syllables)
+
+        # 粗排：按共有的n-gram数量计算Dice系数
+        # 几乎所有歌名都有的n-gram区分度很低，有其他n-gram命中时跳过
+        lists = sorted(
+            (postings[gram] for gram in query_grams if gram in postings), key=len
+        )
+        common = max(STOP_GRAM_MIN, len(entries) // 10)
+        hits: Dict[int, int] = {}
+        for posting in lists:
+            if hits and len(posting) > common:
+                break
+            for entry_id in posting:
+                hits[entry_id] = hits.get(entry_id, 0) + 1
+        if not hits:
+            return []
+        candidates = heapq.nlargest(
+            RERANK_SIZE,
+            hits,
+            key=lambda i: hits[i] * 2 / (len(query_grams) + len(entries[i].grams)),
+        )
+
+        # 精排：字面和拼音的编辑相似度取较高者
+        query_pinyin = " ".join(syllables)
+        results = []
+        for entry_id in candidates:
+            entry = entries[entry_id]
+            ratio = max(
+                difflib.SequenceMatcher(None, normalized, entry.normalized).ratio(),
+                difflib.SequenceMatcher(
+                    None, query_pinyin, " ".join(entry.pinyin)
+                ).ratio(),
+            )
+            results.append((entry.file, ratio))
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:top_k]
+
+    def best_match(self, query: str, threshold: float = 0.4) -> Optional[str]:
+        """查找最匹配的歌曲，相似度不超过阈值时返回None"""
+        results = self.search(query, top_k=1)
+        if results and results[0][1] > threshold:
+            return results[0][0]
+        return None
+
+    def candidate_titles(self, query: str, top_k: int = 10) -> List[str]:
+        """供意图识别提示词使用的候选歌名，曲库较小时返回全部歌名"""
+        entries = self._index[0]
+        if len(entries) <= top_k:
+            return [entry.title for entry in entries]
+        return [
+            os.path.splitext(file)[0] for file, _ in self.search(query, top_k=top_k)
+        ]
+
+    def _load(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (
+                data.get("version") != INDEX_VERSION
+                or data.get("music_dir") != self.music_dir
+                or tuple(data.get("music_ext", ())) != self.music_ext
+            ):
+                return
+            self._dirs = data.get("dirs", {})
+            self._pinyin = data.get("pinyin", {})
+            self._rebuild()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"加载音乐索引失败，将重新扫描: {e}")
+            self._dirs, self._pinyin = {}, {}
+
+    def _save(self):
+        if not self.index_path:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "music_dir": self.music_dir,
+            "music_ext": list(self.music_ext),
+            "dirs": self._dirs,
+            "pinyin": self._pinyin,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"保存音乐索引失败: {e}")
@@ -1,3 +1,4 @@
+import inspect
 from config.logger import setup_logging
 from enum import Enum
 
@@ -42,11 +43,18 @@ class ActionResponse:
 
 
 class FunctionItem:
-    def __init__(self, name, description, func, type):
+    def __init__(
+        self, name, description, func, type, timeout=None, max_concurrency=None
+    ):
         self.name = name
         self.description = description
         self.func = func
         self.type = type
+        # 异步插件在事件循环中执行，同步插件放到插件线程池中执行
+        self.is_async = inspect.iscoroutinefunction(func)
+        # 为空时使用 plugin_runtime 配置中的默认值
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
 
 
 class DeviceTypeRegistry:
@@ -79,11 +87,18 @@ class DeviceTypeRegistry:
 all_function_registry = {}
 
 
-def register_function(name, desc, type=None):
-    """注册函数到函数注册字典的装饰器"""
+def register_function(name, desc, type=None, timeout=None, max_concurrency=None):
+    """注册函数到函数注册字典的装饰器，支持同步函数和async函数
+
+    Args:
+        timeout: 单次调用的超时时间(秒)
+        max_concurrency: 进程内同时执行的调用数上限
+    """
 
     def decorator(func):
-        all_function_registry[name] = FunctionItem(name, desc, func, type)
+        all_function_registry[name] = FunctionItem(
+            name, desc, func, type, timeout, max_concurrency
+        )
         logger.bind(tag=TAG).debug(f"函数 '{name}' 已加载，可以注册使用")
         return func
 
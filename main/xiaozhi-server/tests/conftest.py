@@ -0,0 +1,22 @@
+"""测试公共配置：使用config.yaml作为运行配置，日志和数据写入临时目录，不需要data/.config.yaml"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# 各模块的工厂方法按相对路径查找provider
+os.chdir(ROOT)
+
+from config import settings  # noqa: E402
+from config.config_loader import read_config  # noqa: E402
+from core.utils.cache.manager import cache_manager, CacheType  # noqa: E402
+
+_config = read_config(os.path.join(ROOT, "config.yaml"))
+_tmp_dir = tempfile.mkdtemp(prefix="xiaozhi-test-")
+_config["log"]["log_dir"] = _tmp_dir
+_config["log"]["data_dir"] = _tmp_dir
+settings.config_file_valid = True
+cache_manager.set(CacheType.CONFIG, "main_config", _config)
@@ -0,0 +1,138 @@
+"""模拟Home Assistant的websocket接口，只实现状态镜像用到的消息"""
+
+import json
+import asyncio
+from typing import Any, Dict, Optional
+
+import websockets
+
+TOKEN = "test-token"
+
+
+class FakeHass:
+    """支持认证、get_states、state_changed订阅和call_service
+
+    call_service的service_data中可以带delay(秒)，用来让并发命令乱序返回；
+    drop_on_call为True时收到call_service后不回复，直接断开连接
+    """
+
+    def __init__(self, states: Optional[Dict[str, str]] = None):
+        self.states: Dict[str, Dict[str, Any]] = {
+            entity_id: {"entity_id": entity_id, "state": state, "attributes": {}}
+            for entity_id, state in (states or {}).items()
+        }
+        self.connections = set()
+        self.subscribers = set()
+        self.auth_attempts = 0
+        self.calls = []
+        self.drop_on_call = False
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def drop_connections(self):
+        """模拟HA重启，断开所有客户端"""
+        for ws in list(self.connections):
+            await ws.close()
+
+    async def set_state(self, entity_id: str, state: str):
+        """修改实体状态并推送state_changed事件"""
+        old_state = self.states.get(entity_id)
+        new_state = {"entity_id": entity_id, "state": state, "attributes": {}}
+        self.states[entity_id] = new_state
+        event = {
+            "type": "event",
+            "event": {
+                "event_type": "state_changed",
+                "data": {
+                    "entity_id": entity_id,
+                    "old_state": old_state,
+                    "new_state": new_state,
+                },
+            },
+        }
+        for ws, subscription_id in list(self.subscribers):
+            try:
+                await ws.send(json.dumps({**event, "id": subscription_id}))
+            except websockets.ConnectionClosed:
+                pass
+
+    async def _handle(self, ws):
+        self.connections.add(ws)
+        try:
+            await ws.send(json.dumps({"type": "auth_required"}))
+            message = json.loads(await ws.recv())
+            self.auth_attempts += 1
+            if message.get("access_token") != TOKEN:
+                await ws.send(
+                    json.dumps({"type": "auth_invalid", "message": "Invalid access"})
+                )
+                return
+            await ws.send(json.dumps({"type": "auth_ok"}))
+            async for raw in ws:
+                message = json.loads(raw)
+                asyncio.create_task(self._dispatch(ws, message))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(ws)
+            self.subscribers = {item for item in self.subscribers if item[0] is not ws}
+
+    async def _dispatch(self, ws, message):
+        message_id = message["id"]
+        message_type = message["type"]
+        if message_type == "subscribe_events":
+            self.subscribers.add((ws, message_id))
+            await self._result(ws, message_id, None)
+        elif message_type == "get_states":
+            await self._result(ws, message_id, list(self.states.values()))
+        elif message_type == "call_service":
+            data = dict(message.get("service_data") or {})
+            self.calls.append((message["domain"], message["service"], data))
+            if self.drop_on_call:
+                await ws.close()
+                return
+            await asyncio.sleep(data.pop("delay", 0))
+            entity_id = data.get("entity_id")
+            if entity_id not in self.states:
+                await ws.send(
+                    json.dumps(
+                        {
+                            "id": message_id,
+                            "type": "result",
+                            "success": False,
+                            "error": {"code": "not_found", "message": entity_id},
+                        }
+                    )
+                )
+                return
+            state = {"turn_on": "on", "turn_off": "off"}.get(message["service"])
+            if state:
+                await self.set_state(entity_id, state)
+            await self._result(ws, message_id, {"context": {"id": str(message_id)}})
+
+    async def _result(self, ws, message_id, result):
+        try:
+            await ws.send(
+                json.dumps(
+                    {
+                        "id": message_id,
+                        "type": "result",
+                        "success": True,
+                        "result": result,
+                    }
+                )
+            )
+        except websockets.ConnectionClosed:
+            pass
@@ -0,0 +1,79 @@
+"""全局缓存：字节上限、淘汰和持久化"""
+
+import time
+
+from core.utils.cache.manager import GlobalCacheManager
+from core.utils.cache.config import CacheConfig, CacheStrategy, CacheType
+
+
+def test_oversized_entry_does_not_flush_shard():
+    manager = GlobalCacheManager()
+    manager.configure(
+        CacheType.PLUGIN_HTTP,
+        CacheConfig(strategy=CacheStrategy.LRU, max_bytes=4096, shards=1),
+    )
+    for i in range(5):
+        manager.set(CacheType.PLUGIN_HTTP, f"small{i}", "x", size=100)
+    manager.set(CacheType.PLUGIN_HTTP, "small0", "x", size=100)
+    manager.set(CacheType.PLUGIN_HTTP, "huge", "y", size=10000)
+
+    assert manager.get(CacheType.PLUGIN_HTTP, "huge") is None
+    for i in range(5):
+        assert manager.get(CacheType.PLUGIN_HTTP, f"small{i}") == "x"
+    stats = manager.get_stats()[CacheType.PLUGIN_HTTP.value]
+    assert stats["rejected"] == 1
+    assert stats["evictions"] == 0
+
+
+def test_oversized_entry_replaces_stale_value():
+    manager = GlobalCacheManager()
+    manager.configure(
+        CacheType.PLUGIN_HTTP,
+        CacheConfig(strategy=CacheStrategy.LRU, max_bytes=4096, shards=1),
+    )
+    manager.set(CacheType.PLUGIN_HTTP, "key", "old", size=100)
+    manager.set(CacheType.PLUGIN_HTTP, "key", "new", size=10000)
+    assert manager.get(CacheType.PLUGIN_HTTP, "key") is None
+
+
+def test_persistence_round_trip(tmp_path, monkeypatch):
+    from config import config_loader
+
+    monkeypatch.setattr(config_loader, "get_project_dir", lambda: f"{tmp_path}/")
+    config = {
+        "cache": {
+            "persistent": {
+                "enabled": True,
+                "path": "data/cache.db",
+                "types": ["weather", "location"],
+                "flush_interval": 0.05,
+            }
+        }
+    }
+
+    before = GlobalCacheManager()
+    before.enable_persistence(config)
+    before.set(CacheType.WEATHER, "北京", {"text": "晴", "temp": 25}, ttl=600)
+    before.set(CacheType.LOCATION, "1.2.3.4", "北京市")
+    before.set(CacheType.WEATHER, "上海", "小雨", ttl=0.05)
+    before.set(CacheType.WEATHER, "广州", "多云", ttl=600)
+    before.delete(CacheType.WEATHER, "广州")
+    before.set(CacheType.INTENT, "播放音乐", "play_music", ttl=600)
+    before.close_persistence()
+    time.sleep(0.1)
+
+    # 模拟重启：新的管理器从同一个数据库加载
+    after = GlobalCacheManager()
+    after.enable_persistence(config)
+    try:
+        assert after.get(CacheType.WEATHER, "北京") == {"text": "晴", "temp": 25}
+        assert after.get(CacheType.LOCATION, "1.2.3.4") == "北京市"
+        # 已过期、已删除和未启用持久化的类型不会恢复
+        assert after.get(CacheType.WEATHER, "上海") is None
+        assert after.get(CacheType.WEATHER, "广州") is None
+        assert after.get(CacheType.INTENT, "播放音乐") is None
+        # 剩余的过期时间沿用重启前的设置
+        shard = after._spaces["weather"].shard("北京")
+        assert 0 < shard.entries["北京"].ttl <= 600
+    finally:
+        after.close_persistence()
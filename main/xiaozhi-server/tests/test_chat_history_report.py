@@ -0,0 +1,166 @@
+"""聊天记录上报：批量接口探测、请求体格式、失败条目落盘和死信"""
+
+import gzip
+import json
+import threading
+
+import httpx
+import pytest
+
+from config import manage_api_client
+from config.manage_api_client import ManageApiClient, BatchReportUnsupported
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """用MockTransport替换智控台连接，handler按请求返回响应"""
+    state = {"handler": None, "requests": []}
+
+    def transport(request):
+        state["requests"].append(request)
+        return state["handler"](request)
+
+    monkeypatch.setattr(ManageApiClient, "_instance", object.__new__(ManageApiClient))
+    monkeypatch.setattr(
+        ManageApiClient,
+        "_client",
+        httpx.Client(
+            base_url="http://manager/xiaozhi/",
+            transport=httpx.MockTransport(transport),
+        ),
+    )
+    monkeypatch.setattr(ManageApiClient, "max_retries", 0, raising=False)
+    monkeypatch.setattr(ManageApiClient, "retry_delay", 0, raising=False)
+    return state
+
+
+@pytest.mark.parametrize("code", [401, 404])
+def test_batch_rejected_by_auth_filter_is_unsupported(api, code):
+    api["handler"] = lambda request: httpx.Response(
+        200, json={"code": code, "msg": "unauthorized"}
+    )
+    with pytest.raises(BatchReportUnsupported):
+        manage_api_client.report_batch(gzip.compress(b"[]"))
+
+
+def test_batch_returns_failed_indexes(api):
+    api["handler"] = lambda request: httpx.Response(200, json={"code": 0, "data": [1]})
+    assert manage_api_client.report_batch(gzip.compress(b"[{}, {}]")) == [1]
+    request = api["requests"][0]
+    assert request.url.path == "/xiaozhi/agent/chat-history/report/batch"
+    assert request.headers["Content-Encoding"] == "gzip"
+
+
+def test_report_item_raises_on_error(api):
+    api["handler"] = lambda request: httpx.Response(500)
+    with pytest.raises(httpx.HTTPStatusError):
+        manage_api_client.report_item("mac", "session", 1, "你好", None, 1)
+    assert manage_api_client.report("mac", "session", 1, "你好", None, 1) is None
+
+
+@pytest.fixture
+def reporter(tmp_path, monkeypatch):
+    pytest.importorskip("opuslib_next")
+    from core.handle import reportHandle
+
+    monkeypatch.setattr(reportHandle, "get_project_dir", lambda: str(tmp_path) + "/")
+    instance = reportHandle.ChatHistoryReporter(
+        {"chat_history_report": {"flush_interval": 0.05, "retry_delay": 60}}
+    )
+    yield instance
+    instance.shutdown(timeout=1)
+
+
+def _items(count):
+    return [
+        {
+            "macAddress": "mac",
+            "sessionId": "session",
+            "chatType": 1,
+            "content": f"第{i}句",
+            "reportTime": i,
+            "audio": None,
+        }
+        for i in range(count)
+    ]
+
+
+def decode_batch(content):
+    """按智控台的方式解析批量上报请求体"""
+    body = gzip.decompress(content)
+    meta_length = int.from_bytes(body[:4], "big")
+    items = json.loads(body[4 : 4 + meta_length])
+    offset = 4 + meta_length
+    for item in items:
+        item["audio"] = body[offset : offset + item["audioLength"]]
+        offset += item["audioLength"]
+    assert offset == len(body)
+    return items
+
+
+def test_batch_spills_only_failed_items(api, reporter):
+    api["handler"] = lambda request: httpx.Response(
+        200, json={"code": 0, "data": [0, 2]}
+    )
+    failed = reporter._send(_items(4))
+    assert [item["content"] for item in failed] == ["第0句", "第2句"]
+    request = api["requests"][0]
+    assert request.headers["Content-Type"] == "application/octet-stream"
+    body = decode_batch(request.content)
+    assert [item["content"] for item in body] == ["第0句", "第1句", "第2句", "第3句"]
+    assert reporter.metrics()["sent"] == 2
+
+
+def test_batch_sends_opus_frames_as_is(api, reporter):
+    from core.handle.reportHandle import pack_opus_frames, unpack_opus_frames
+
+    api["handler"] = lambda request: httpx.Response(200, json={"code": 0, "data": []})
+    items = _items(3)
+    items[0]["audio"] = pack_opus_frames([b"\x01\x02", b"\x03"])
+    items[2]["audio"] = pack_opus_frames([b"\x04" * 300])
+    items[2]["attempts"] = 1
+    assert reporter._send(items) == []
+
+    body = decode_batch(api["requests"][0].content)
+    assert unpack_opus_frames(body[0]["audio"]) == [b"\x01\x02", b"\x03"]
+    assert body[0]["audioFormat"] == "opus/16000/1/60"
+    assert body[1]["audioLength"] == 0 and "audioFormat" not in body[1]
+    assert unpack_opus_frames(body[2]["audio"]) == [b"\x04" * 300]
+    assert "attempts" not in body[2]
+
+
+def test_items_failing_too_often_go_to_dead_letter(api, reporter):
+    reporter.max_attempts = 2
+    items = _items(2)
+    items[1]["attempts"] = 1
+    reporter._retry_later(items)
+
+    assert reporter._spilled_pending == 1
+    respilled = reporter._load_spilled()
+    assert [(item["content"], item["attempts"]) for item in respilled] == [("第0句", 1)]
+    with open(reporter.dead_letter_path, "r", encoding="utf-8") as f:
+        dead = [json.loads(line) for line in f]
+    assert [(item["content"], item["attempts"]) for item in dead] == [("第1句", 2)]
+    assert reporter.metrics()["dead_lettered"] == 1
+
+
+def test_fallback_checks_each_item_and_runs_concurrently(api, reporter):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def handler(request):
+        if request.url.path.endswith("/batch"):
+            return httpx.Response(200, json={"code": 401, "msg": "unauthorized"})
+        content = json.loads(request.content)["content"]
+        # 两条请求必须同时在途，串行执行会在这里超时
+        barrier.wait()
+        if content == "第1句":
+            return httpx.Response(500)
+        return httpx.Response(200, json={"code": 0, "data": True})
+
+    api["handler"] = handler
+    failed = reporter._send(_items(2))
+    assert [item["content"] for item in failed] == ["第1句"]
+    assert reporter._batch_supported is False
+    stats = reporter.metrics()
+    assert stats["sent"] == 1
+    assert stats["failed"] == 1
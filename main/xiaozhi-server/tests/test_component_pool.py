@@ -0,0 +1,88 @@
+"""组件池：按需预热、指纹淘汰和定期清理"""
+
+import time
+
+import pytest
+
+pytest.importorskip("opuslib_next")
+
+from core.utils.component_pool import ComponentPool
+
+
+class Component:
+    def reset(self, timeout):
+        return True
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**pool_config):
+        pool_config.setdefault("sweep_interval", 3600)
+        pool = ComponentPool({"component_pool": pool_config})
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_one_off_config_is_not_prefilled(make_pool):
+    pool = make_pool(min_idle=2)
+    created = []
+    pool.lease("TTS:once", lambda: created.append(1) or Component())
+    time.sleep(0.1)
+    assert len(created) == 1
+    assert pool.metrics()["idle"] == 0
+
+
+def test_repeated_and_default_configs_are_prefilled(make_pool):
+    pool = make_pool(min_idle=2)
+    pool.lease("TTS:device", Component)
+    pool.lease("TTS:device", Component)
+    pool.prewarm("TTS:default", Component)
+    assert wait_for(lambda: pool.metrics()["idle"] == 4)
+
+
+def test_keys_are_capped_by_lru(make_pool):
+    pool = make_pool(min_idle=1, max_keys=3)
+    pool.prewarm("TTS:default", Component)
+    for i in range(10):
+        pool.release(pool.lease(f"TTS:{i}", Component))
+    assert wait_for(lambda: pool.metrics()["keys"] == 3)
+    assert "TTS:default" in pool._keys
+    assert list(pool._keys)[-2:] == ["TTS:8", "TTS:9"]
+    assert set(pool._idle) <= set(pool._keys)
+
+
+def test_sweep_drops_expired_instances_and_unused_keys(make_pool):
+    pool = make_pool(min_idle=1, idle_ttl=0.05)
+    pool.prewarm("TTS:default", Component)
+    pool.release(pool.lease("TTS:device", Component))
+    held = pool.lease("TTS:held", Component)
+    assert wait_for(lambda: pool.metrics()["idle"] == 2)
+
+    time.sleep(0.1)
+    pool.sweep()
+
+    assert pool.metrics()["idle"] == 0
+    assert set(pool._keys) == {"TTS:default", "TTS:held"}
+    assert set(pool._idle) <= set(pool._keys)
+    assert held is not None
+
+
+def test_sweep_thread_runs_periodically(make_pool):
+    pool = make_pool(min_idle=1, idle_ttl=0.05, sweep_interval=0.05)
+    pool.release(pool.lease("TTS:device", Component))
+    assert wait_for(lambda: pool.metrics()["keys"] == 0)
@@ -0,0 +1,145 @@
+"""设备端MCP：批量发送、发起者取消和超时时间轮"""
+
+import json
+import asyncio
+
+import pytest
+
+pytest.importorskip("opuslib_next")
+
+from core.providers.tools.device_mcp import mcp_client as mcp_client_module
+from core.providers.tools.device_mcp.mcp_client import MCPClient
+from core.providers.tools.device_mcp.mcp_handler import (
+    call_mcp_tool,
+    handle_mcp_message,
+)
+from core.utils.telemetry import Telemetry
+
+
+class FakeWebsocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message)["payload"])
+
+
+class FakeConn:
+    def __init__(self):
+        self.features = {"mcp": True}
+        self.websocket = FakeWebsocket()
+
+
+def make_client(supports_batch=True):
+    client = MCPClient()
+    client.supports_batch = supports_batch
+    client.ready = True
+    client.add_tools(
+        [
+            {"name": "self.light.on", "description": "开灯", "inputSchema": {}},
+            {"name": "self.volume.get", "description": "音量", "inputSchema": {}},
+        ]
+    )
+    return client
+
+
+async def reply(conn, client, payloads):
+    """按发送的请求逐个回复，批量请求用数组回复"""
+    for payload in payloads:
+        requests = payload if isinstance(payload, list) else [payload]
+        response = [
+            {
+                "jsonrpc": "2.0",
+                "id": request["id"],
+                "result": {
+                    "content": [{"type": "text", "text": request["params"]["name"]}]
+                },
+            }
+            for request in requests
+        ]
+        await handle_mcp_message(conn, client, response)
+
+
+def test_parallel_calls_are_sent_as_one_batch():
+    async def main():
+        conn, client = FakeConn(), make_client()
+        calls = asyncio.gather(
+            call_mcp_tool(conn, client, "self_light_on"),
+            call_mcp_tool(conn, client, "self_volume_get"),
+        )
+        await asyncio.sleep(0.01)
+        assert len(conn.websocket.sent) == 1
+        assert [item["id"] for item in conn.websocket.sent[0]] == sorted(
+            client.call_results
+        )
+        await reply(conn, client, conn.websocket.sent)
+        assert await calls == ["self.light.on", "self.volume.get"]
+        assert client.metrics()["batches"] == 1
+
+        # 单独发起的请求不包装成数组
+        single = asyncio.create_task(call_mcp_tool(conn, client, "self_light_on"))
+        await asyncio.sleep(0.01)
+        assert isinstance(conn.websocket.sent[1], dict)
+        await reply(conn, client, conn.websocket.sent[1:])
+        assert await single == "self.light.on"
+
+    asyncio.run(main())
+
+
+def test_cancelled_leader_does_not_block_batch():
+    async def main():
+        conn, client = FakeConn(), make_client()
+        leader = asyncio.create_task(call_mcp_tool(conn, client, "self_light_on"))
+        follower = asyncio.create_task(call_mcp_tool(conn, client, "self_volume_get"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        assert leader.cancelled()
+        assert client._batch is None
+        assert len(conn.websocket.sent) == 1
+
+        await reply(conn, client, conn.websocket.sent)
+        assert await follower == "self.volume.get"
+
+        # 之后的请求照常发出
+        later = asyncio.create_task(call_mcp_tool(conn, client, "self_light_on"))
+        await asyncio.sleep(0.01)
+        await reply(conn, client, conn.websocket.sent[1:])
+        assert await asyncio.wait_for(later, 1) == "self.light.on"
+        assert client.call_results == {}
+
+    asyncio.run(main())
+
+
+def test_timeout_wheel_expires_unanswered_calls():
+    async def main():
+        conn, client = FakeConn(), make_client(supports_batch=False)
+        before = mcp_client_module.totals()["timeouts"]
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(
+                call_mcp_tool(conn, client, "self_light_on", timeout=0.1), 2
+            )
+        assert client.call_results == {}
+        assert client.metrics()["timeouts"] == 1
+        assert mcp_client_module.totals()["timeouts"] == before + 1
+
+        # 超时之后到达的响应直接忽略
+        await reply(conn, client, conn.websocket.sent)
+        assert client.metrics()["pending"] == 0
+
+    asyncio.run(main())
+
+
+def test_rpc_metrics_are_exported():
+    async def main():
+        conn, client = FakeConn(), make_client(supports_batch=False)
+        call = asyncio.create_task(call_mcp_tool(conn, client, "self_light_on"))
+        await asyncio.sleep(0.01)
+        await reply(conn, client, conn.websocket.sent)
+        await call
+
+    asyncio.run(main())
+    text = Telemetry().render()
+    assert "xiaozhi_device_mcp_requests_total " in text
+    assert 'xiaozhi_device_mcp_failures_total{reason="timeouts"}' in text
+    assert "xiaozhi_device_mcp_rpc_seconds_count" in text
@@ -0,0 +1,195 @@
+"""Home Assistant状态镜像：认证、状态同步、并发命令、断线重连和丢失响应"""
+
+import time
+import asyncio
+
+import pytest
+
+from plugins_func import hass_client
+from plugins_func.hass_client import HassManager
+
+from fake_hass import FakeHass, TOKEN
+
+SETTINGS = {
+    "hass_mirror": {
+        "connect_timeout": 1,
+        "call_timeout": 2,
+        "reconnect_interval": 0.05,
+        "max_reconnect_interval": 0.2,
+        "idle_timeout": 60,
+    }
+}
+
+
+class RestResponse:
+    status = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"rest": True}
+
+
+class FakeRestClient:
+    """记录退回REST接口的请求"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def get(self, url, **kwargs):
+        self.requests.append(("GET", url))
+        return RestResponse()
+
+    async def post(self, url, **kwargs):
+        self.requests.append(("POST", url))
+        return RestResponse()
+
+
+@pytest.fixture
+def rest(monkeypatch):
+    client = FakeRestClient()
+    monkeypatch.setattr(hass_client, "get_plugin_http_client", lambda: client)
+    return client
+
+
+def run(scenario, states=None):
+    async def main():
+        hass = await FakeHass(states).start()
+        manager = HassManager(SETTINGS)
+        try:
+            await scenario(hass, manager)
+        finally:
+            await manager.shutdown()
+            await hass.stop()
+
+    asyncio.run(main())
+
+
+async def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.01)
+    return predicate()
+
+
+def test_rejected_token_falls_back_to_rest(rest):
+    async def scenario(hass, manager):
+        instance = manager.get_instance(hass.base_url, "wrong-token")
+        assert await instance.get_state("light.kitchen") == {"rest": True}
+        assert not instance.connected
+        assert hass.auth_attempts >= 1
+        assert rest.requests == [("GET", f"{hass.base_url}/api/states/light.kitchen")]
+
+    run(scenario, {"light.kitchen": "off"})
+
+
+def test_state_mirror_follows_events(rest):
+    async def scenario(hass, manager):
+        instance = manager.get_instance(hass.base_url, TOKEN)
+        assert (await instance.get_state("light.kitchen"))["state"] == "off"
+        assert await instance.get_state("light.unknown") is None
+
+        await hass.set_state("light.kitchen", "on")
+        await hass.set_state("sensor.door", "open")
+        assert await wait_for(
+            lambda: instance.states["light.kitchen"]["state"] == "on"
+            and "sensor.door" in instance.states
+        )
+        assert (await instance.get_state("sensor.door"))["state"] == "open"
+        assert instance.metrics()["fallbacks"] == 0
+        assert rest.requests == []
+
+    run(scenario, {"light.kitchen": "off"})
+
+
+def test_concurrent_calls_match_responses_by_id(rest):
+    async def scenario(hass, manager):
+        instance = manager.get_instance(hass.base_url, TOKEN)
+        # 先发出的命令最后返回，响应按消息id对应回各自的调用
+        results = await asyncio.gather(
+            instance.call_service(
+                "light", "turn_on", {"entity_id": "light.a", "delay": 0.2}
+            ),
+            instance.call_service(
+                "light", "turn_off", {"entity_id": "light.b", "delay": 0.1}
+            ),
+            instance.call_service("light", "turn_on", {"entity_id": "light.c"}),
+        )
+        ids = [int(result["context"]["id"]) for result in results]
+        assert len(set(ids)) == 3
+        sent = {data["entity_id"]: data for _, _, data in hass.calls}
+        assert set(sent) == {"light.a", "light.b", "light.c"}
+        assert await wait_for(
+            lambda: [instance.states[e]["state"] for e in ("light.a", "light.b")]
+            == ["on", "off"]
+        )
+
+        with pytest.raises(hass_client.HassError):
+            await instance.call_service("light", "turn_on", {"entity_id": "light.x"})
+        assert rest.requests == []
+
+    run(scenario, {"light.a": "off", "light.b": "on", "light.c": "off"})
+
+
+def test_reconnects_and_reloads_states(rest):
+    async def scenario(hass, manager):
+        instance = manager.get_instance(hass.base_url, TOKEN)
+        await instance.get_state("light.kitchen")
+        assert instance.connected
+
+        await hass.drop_connections()
+        assert await wait_for(lambda: not instance.connected)
+        # 断线期间的变化没有事件推送，重连后重新拉取全量状态
+        hass.states["light.kitchen"]["state"] = "on"
+        assert await wait_for(lambda: instance.connected)
+        assert (await instance.get_state("light.kitchen"))["state"] == "on"
+        assert instance.metrics()["reconnects"] >= 1
+        assert hass.auth_attempts == 2
+
+        result = await instance.call_service(
+            "light", "turn_off", {"entity_id": "light.kitchen"}
+        )
+        assert "context" in result
+        assert rest.requests == []
+
+    run(scenario, {"light.kitchen": "off"})
+
+
+def test_lost_reply_is_not_replayed_over_rest(rest):
+    async def scenario(hass, manager):
+        instance = manager.get_instance(hass.base_url, TOKEN)
+        await instance.get_state("light.kitchen")
+        hass.drop_on_call = True
+
+        # 命令已经送达HA，断线丢失的只是响应，不能再通过REST重复执行
+        with pytest.raises(hass_client.HassError):
+            await instance.call_service(
+                "light", "toggle", {"entity_id": "light.kitchen"}
+            )
+        assert len(hass.calls) == 1
+        assert rest.requests == []
+        assert instance.metrics()["fallbacks"] == 0
+
+    run(scenario, {"light.kitchen": "off"})
+
+
+def test_unsent_command_falls_back_to_rest(rest):
+    async def scenario(hass, manager):
+        instance = manager.get_instance(hass.base_url, TOKEN)
+        await instance.get_state("light.kitchen")
+        # 就绪后连接对象已不可用，命令没有发出
+        instance._ws = None
+
+        result = await instance.call_service(
+            "light", "turn_on", {"entity_id": "light.kitchen"}
+        )
+        assert result == {"rest": True}
+        assert hass.calls == []
+        assert rest.requests == [
+            ("POST", f"{hass.base_url}/api/services/light/turn_on")
+        ]
+
+    run(scenario, {"light.kitchen": "off"})
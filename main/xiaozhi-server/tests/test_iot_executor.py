@@ -0,0 +1,112 @@
+"""设备端IoT：命令确认和状态查询的等待"""
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+from core.providers.tools.device_iot import DeviceIoTExecutor, IotStateTracker
+
+
+class Websocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def make_executor(timeout=0.25):
+    lamp = SimpleNamespace(
+        properties=[{"name": "power", "value": False}],
+        methods=[{"name": "TurnOn"}],
+    )
+    conn = SimpleNamespace(
+        iot_state=IotStateTracker(timeout),
+        iot_descriptors={"Lamp": lamp},
+        websocket=Websocket(),
+    )
+    return DeviceIoTExecutor(conn), conn, lamp
+
+
+def test_read_uses_reported_value_without_waiting():
+    async def main():
+        executor, conn, lamp = make_executor(timeout=5)
+        lamp.properties[0]["value"] = True
+        conn.iot_state.notify("Lamp")
+        start = time.monotonic()
+        assert await executor._get_iot_status("lamp", "power") is True
+        assert time.monotonic() - start < 0.1
+
+    asyncio.run(main())
+
+
+def test_read_waits_for_pending_command():
+    async def main():
+        executor, conn, lamp = make_executor(timeout=5)
+        conn.iot_state.notify("Lamp")
+        # 命令已发出但设备还没确认，读取要等到设备上报新状态
+        conn.iot_state.expect_update("Lamp")
+        assert conn.iot_state.is_pending("lamp")
+
+        async def report():
+            await asyncio.sleep(0.05)
+            lamp.properties[0]["value"] = True
+            conn.iot_state.notify("Lamp")
+
+        asyncio.create_task(report())
+        start = time.monotonic()
+        assert await executor._get_iot_status("lamp", "power") is True
+        assert time.monotonic() - start < 1
+        assert not conn.iot_state.is_pending("lamp")
+
+    asyncio.run(main())
+
+
+def test_read_with_unconfirmed_command_waits_at_most_timeout():
+    async def main():
+        executor, conn, _ = make_executor()
+        conn.iot_state.notify("Lamp")
+        conn.iot_state.expect_update("Lamp")
+        start = time.monotonic()
+        assert await executor._get_iot_status("Lamp", "power") is False
+        assert 0.2 <= time.monotonic() - start < 0.5
+
+    asyncio.run(main())
+
+
+def test_first_read_waits_for_report():
+    async def main():
+        executor, conn, lamp = make_executor(timeout=5)
+
+        async def report():
+            await asyncio.sleep(0.05)
+            lamp.properties[0]["value"] = True
+            conn.iot_state.notify("lamp")
+
+        asyncio.create_task(report())
+        start = time.monotonic()
+        assert await executor._get_iot_status("Lamp", "power") is True
+        assert time.monotonic() - start < 1
+
+    asyncio.run(main())
+
+
+def test_command_returns_on_report_or_short_timeout():
+    async def main():
+        executor, conn, _ = make_executor()
+
+        async def report():
+            while not conn.websocket.sent:
+                await asyncio.sleep(0.01)
+            conn.iot_state.notify("Lamp")
+
+        asyncio.create_task(report())
+        assert await executor._send_iot_command("lamp", "turnon", {}) is True
+
+        # 状态没有变化时固件不会上报，最多等待iot_state_timeout
+        start = time.monotonic()
+        assert await executor._send_iot_command("Lamp", "TurnOn", {}) is False
+        assert 0.2 <= time.monotonic() - start < 0.5
+        assert len(conn.websocket.sent) == 2
+
+    asyncio.run(main())
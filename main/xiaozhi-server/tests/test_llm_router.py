@@ -0,0 +1,173 @@
+"""路由LLM：使用本地桩后端验证切换、对冲、熔断和对话隔离"""
+
+import copy
+import time
+
+import pytest
+
+from core.utils import llm as llm_utils
+from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.router.router import LLMProvider as RouterLLM
+
+
+class StubLLM(LLMProviderBase):
+    """可调首字延迟的桩后端，像ollama一样原地修改收到的对话"""
+
+    def __init__(self, config):
+        self.first_token = config.get("first_token", 0)
+        self.fail = config.get("fail", False)
+        self.text = config.get("text", "")
+        # 输出完text后抛出异常，模拟流式输出中途断开
+        self.break_after = config.get("break_after", False)
+        self.calls = []
+
+    def response(self, session_id, dialogue, **kwargs):
+        dialogue[-1]["content"] += "/no_think"
+        self.calls.append(copy.deepcopy(dialogue))
+        time.sleep(self.first_token)
+        if self.fail:
+            yield "【LLM服务响应异常】"
+            return
+        for char in self.text:
+            yield char
+        if self.break_after:
+            raise ConnectionError("stream broken")
+
+
+@pytest.fixture
+def make_router(monkeypatch):
+    original = llm_utils.create_instance
+
+    def create_instance(class_name, *args, **kwargs):
+        if class_name == "stub":
+            return StubLLM(*args, **kwargs)
+        return original(class_name, *args, **kwargs)
+
+    monkeypatch.setattr(llm_utils, "create_instance", create_instance)
+
+    def make(backends, **options):
+        config = {"type": "router", "backends": backends}
+        config.update(options)
+        return RouterLLM(config)
+
+    return make
+
+
+def _dialogue():
+    return [{"role": "user", "content": "你好"}]
+
+
+def test_failover_uses_clean_dialogue(make_router):
+    router = make_router(
+        [
+            {"name": "a", "type": "stub", "fail": True},
+            {"name": "b", "type": "stub", "text": "ok"},
+        ]
+    )
+    dialogue = _dialogue()
+    assert "".join(router.response("s", dialogue)) == "ok"
+    backup = router.backends[1].provider
+    assert backup.calls == [[{"role": "user", "content": "你好/no_think"}]]
+    assert dialogue == _dialogue()
+    assert router.backends[0].consecutive_failures == 1
+
+
+def test_hedge_to_faster_backend(make_router):
+    router = make_router(
+        [
+            {"name": "slow", "type": "stub", "first_token": 1.0, "text": "slow"},
+            {"name": "fast", "type": "stub", "text": "fast"},
+        ],
+        hedge=True,
+        hedge_default_delay=0.1,
+        hedge_min_delay=0.05,
+    )
+    start = time.monotonic()
+    assert "".join(router.response("s", _dialogue())) == "fast"
+    assert time.monotonic() - start < 0.8
+    # 两个并发请求各自收到独立的对话副本
+    fast = router.backends[1].provider
+    assert fast.calls == [[{"role": "user", "content": "你好/no_think"}]]
+
+
+def test_circuit_opens_after_failures(make_router):
+    router = make_router(
+        [
+            {"name": "a", "type": "stub", "fail": True},
+            {"name": "b", "type": "stub", "text": "ok"},
+        ],
+        failure_threshold=1,
+        cooldown=60,
+    )
+    assert "".join(router.response("s", _dialogue())) == "ok"
+    assert not router.backends[0].is_available()
+    assert "".join(router.response("s", _dialogue())) == "ok"
+    # 熔断期间不再请求a
+    assert len(router.backends[0].provider.calls) == 1
+
+
+def test_all_backends_failing(make_router):
+    router = make_router([{"name": "a", "type": "stub", "fail": True}])
+    assert "".join(router.response("s", _dialogue())) == "【LLM服务响应异常】"
+
+
+def test_half_open_admits_single_probe(make_router):
+    router = make_router(
+        [
+            {"name": "a", "type": "stub", "fail": True},
+            {"name": "b", "type": "stub", "text": "b"},
+        ],
+        failure_threshold=1,
+        cooldown=0.05,
+    )
+    a = router.backends[0]
+    assert "".join(router.response("s", _dialogue())) == "b"
+    time.sleep(0.1)
+
+    # 冷却期已过，已有试探请求在进行时其他请求不会再发往a
+    assert a.acquire() == "probe"
+    assert a.acquire() is None
+    assert "".join(router.response("s", _dialogue())) == "b"
+    assert len(a.provider.calls) == 1
+
+    # 试探请求成功后熔断关闭，a恢复接收请求
+    a.release_probe()
+    a.provider.fail = False
+    a.provider.text = "a"
+    assert "".join(router.response("s", _dialogue())) == "a"
+    assert a.acquire() == "closed"
+    assert a.consecutive_failures == 0
+
+
+def test_failed_probe_reopens_circuit(make_router):
+    router = make_router(
+        [
+            {"name": "a", "type": "stub", "fail": True},
+            {"name": "b", "type": "stub", "text": "b"},
+        ],
+        failure_threshold=3,
+        cooldown=0.05,
+    )
+    a = router.backends[0]
+    for _ in range(3):
+        assert "".join(router.response("s", _dialogue())) == "b"
+    assert not a.is_available()
+    time.sleep(0.1)
+    assert "".join(router.response("s", _dialogue())) == "b"
+    # 试探失败一次即重新熔断，不需要再累计3次
+    assert len(a.provider.calls) == 4
+    assert not a.is_available()
+
+
+def test_mid_stream_errors_trip_circuit(make_router):
+    router = make_router(
+        [{"name": "a", "type": "stub", "text": "partial", "break_after": True}],
+        failure_threshold=2,
+        cooldown=60,
+    )
+    a = router.backends[0]
+    # 首字已输出，但中途断开仍计为失败，不会被首字清零
+    for _ in range(2):
+        assert "".join(router.response("s", _dialogue())) == "partial"
+    assert a.consecutive_failures == 2
+    assert not a.is_available()
@@ -0,0 +1,43 @@
+"""端到端压测脚本：对当前的WebSocketServer跑一次小规模压测"""
+
+import asyncio
+import importlib.util
+import os
+
+import pytest
+
+pytest.importorskip("opuslib_next")
+pytest.importorskip("psutil")
+pytest.importorskip("tabulate")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_tester_module():
+    # 项目根目录下有同名的performance_tester.py，按路径加载
+    path = os.path.join(ROOT, "performance_tester", "performance_tester_load.py")
+    spec = importlib.util.spec_from_file_location("performance_tester_load", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_smoke_run_completes_every_round(tmp_path):
+    load = load_tester_module()
+    server_log = tmp_path / "server.log"
+    # 桩模块的延迟尽量小，只验证压测流程能跑通
+    options = (
+        "--devices 2 --rounds 2 --ramp 0 --think 0.1 --round-timeout 20"
+        " --asr-latency 0.05 --llm-first-token 0.05 --llm-token-interval 0.005"
+        " --llm-tokens 14 --tts-latency 0.05 --tts-char-ms 20 --interval 0.5"
+    )
+    args = load.parse_args(options.split() + ["--server-log", str(server_log)])
+
+    devices = asyncio.run(load.LoadTester(args).run())
+
+    assert devices is not None, server_log.read_text(encoding="utf-8")[-2000:]
+    for device in devices:
+        assert device.errors == []
+        assert device.connect_time is not None
+        assert len(device.first_audio) == 2
+        assert len(device.round_time) == 2
@@ -0,0 +1,42 @@
+"""本地向量记忆：索引缓存淘汰时并发写入不能互相覆盖向量"""
+
+import random
+import asyncio
+import string
+
+import numpy as np
+
+from core.utils.dialogue import Message
+from core.providers.memory.mem_local_vector.mem_local_vector import MemoryProvider
+from core.providers.memory.mem_local_vector.vector_index import VectorIndex
+
+
+def test_concurrent_saves_with_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(MemoryProvider, "_indexes", type(MemoryProvider._indexes)())
+    provider = MemoryProvider({"max_cached_indexes": 1})
+    provider.data_dir = str(tmp_path)
+    provider.llm = None
+    devices = ["dev0", "dev1", "dev2"]
+
+    def save(role_id):
+        text = "".join(random.sample(string.ascii_lowercase + string.digits, 20))
+        worker = MemoryProvider.__new__(MemoryProvider)
+        worker.__dict__.update(provider.__dict__, role_id=role_id)
+        msgs = [
+            Message(role="user", content=text),
+            Message(role="assistant", content="好"),
+        ]
+        asyncio.run(worker.save_memory(msgs))
+
+    async def run():
+        await asyncio.gather(
+            *(asyncio.to_thread(save, devices[i % 3]) for i in range(60))
+        )
+
+    asyncio.run(run())
+    assert len(MemoryProvider._indexes) <= 1
+    for role_id in devices:
+        index = VectorIndex(str(tmp_path / role_id), provider.embedder.dim)
+        assert index.count == 20
+        expected = provider.embedder.embed(index.facts)
+        assert np.allclose(np.asarray(index.matrix[: index.count]), expected, atol=1e-5)
@@ -0,0 +1,67 @@
+"""本地短期记忆：SQLite存储和旧版YAML迁移"""
+
+import os
+
+import yaml
+
+from core.providers.memory.mem_local_short.memory_store import MemoryStore
+
+
+def write_yaml(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(data, f, allow_unicode=True)
+
+
+def test_migrates_yaml_once_and_renames_it(tmp_path):
+    yaml_path = str(tmp_path / ".memory.yaml")
+    db_path = str(tmp_path / "memory.db")
+    write_yaml(yaml_path, {"aa:bb": "喜欢猫", "cc:dd": "住在北京", "ee:ff": None})
+
+    store = MemoryStore(db_path, yaml_path)
+
+    assert store.get("aa:bb") == "喜欢猫"
+    assert store.get("cc:dd") == "住在北京"
+    assert store.get("ee:ff") == ""
+    assert not os.path.exists(yaml_path)
+    assert os.path.exists(yaml_path + ".migrated")
+
+
+def test_save_and_load_per_role(tmp_path):
+    store = MemoryStore(str(tmp_path / "memory.db"))
+    store.put("aa:bb", "第一版")
+    store.put("cc:dd", "另一台设备")
+    store.put("aa:bb", "第二版")
+
+    assert store.get("aa:bb") == "第二版"
+    assert store.get("cc:dd") == "另一台设备"
+    assert store.get("unknown") is None
+    assert store.get(None) is None
+
+
+def test_second_startup_does_not_migrate_again(tmp_path):
+    yaml_path = str(tmp_path / ".memory.yaml")
+    db_path = str(tmp_path / "memory.db")
+    write_yaml(yaml_path, {"aa:bb": "旧记忆"})
+    MemoryStore(db_path, yaml_path).put("aa:bb", "新记忆")
+    with open(yaml_path + ".migrated", "rb") as f:
+        backup = f.read()
+
+    restarted = MemoryStore(db_path, yaml_path)
+
+    assert restarted.get("aa:bb") == "新记忆"
+    assert not os.path.exists(yaml_path)
+    with open(yaml_path + ".migrated", "rb") as f:
+        assert f.read() == backup
+
+
+def test_reappearing_yaml_does_not_overwrite_newer_memory(tmp_path):
+    yaml_path = str(tmp_path / ".memory.yaml")
+    db_path = str(tmp_path / "memory.db")
+    store = MemoryStore(db_path)
+    store.put("aa:bb", "新记忆")
+    write_yaml(yaml_path, {"aa:bb": "旧记忆", "cc:dd": "只在YAML中"})
+
+    restarted = MemoryStore(db_path, yaml_path)
+
+    assert restarted.get("aa:bb") == "新记忆"
+    assert restarted.get("cc:dd") == "只在YAML中"
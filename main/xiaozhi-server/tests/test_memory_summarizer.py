@@ -0,0 +1,94 @@
+"""记忆总结队列：退出时保存排队中和执行中的任务"""
+
+import os
+import json
+import time
+import threading
+
+import pytest
+
+from core.utils import memory_summarizer
+from core.utils.dialogue import Message
+from core.utils.memory_summarizer import MemorySummarizer
+
+
+class SlowMemory:
+    """save_memory阻塞到release被设置"""
+
+    def __init__(self, release, started):
+        self.release = release
+        self.started = started
+        self.short_memory = "旧记忆"
+        self.save_to_file = True
+        self.saved = []
+
+    async def save_memory(self, messages):
+        self.started.set()
+        while not self.release.is_set():
+            time.sleep(0.01)
+        self.saved.append(messages)
+
+
+@pytest.fixture
+def make_summarizer(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory_summarizer, "get_project_dir", lambda: f"{tmp_path}/")
+
+    def make(**summary_config):
+        summary_config.setdefault("workers", 1)
+        return MemorySummarizer({"memory_summary": summary_config})
+
+    return make
+
+
+def load_pending(summarizer):
+    with open(summarizer.pending_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def messages(text):
+    return [Message(role="user", content=text)]
+
+
+def test_shutdown_persists_running_and_queued_jobs(make_summarizer):
+    summarizer = make_summarizer(shutdown_timeout=0.1)
+    release, started = threading.Event(), threading.Event()
+    summarizer.submit("aa:bb", SlowMemory(release, started), messages("执行中"))
+    assert started.wait(2)
+    summarizer.submit("cc:dd", SlowMemory(release, threading.Event()), messages("排队"))
+
+    summarizer.shutdown()
+    release.set()
+
+    records = load_pending(summarizer)
+    assert [record["role_id"] for record in records] == ["aa:bb", "cc:dd"]
+    assert records[0]["messages"] == [{"role": "user", "content": "执行中"}]
+    assert records[0]["short_memory"] == "旧记忆"
+
+
+def test_shutdown_waits_for_running_job(make_summarizer):
+    summarizer = make_summarizer(shutdown_timeout=2)
+    release, started = threading.Event(), threading.Event()
+    summarizer.submit("aa:bb", SlowMemory(release, started), messages("执行中"))
+    assert started.wait(2)
+    threading.Timer(0.1, release.set).start()
+
+    summarizer.shutdown()
+
+    assert summarizer.metrics()["completed"] == 1
+    assert summarizer.metrics()["running"] == 0
+    assert not os.path.exists(summarizer.pending_path)
+
+
+def test_newer_queued_job_replaces_running_one(make_summarizer):
+    summarizer = make_summarizer(shutdown_timeout=0.1)
+    release, started = threading.Event(), threading.Event()
+    memory = SlowMemory(release, started)
+    summarizer.submit("aa:bb", memory, messages("第一轮"))
+    assert started.wait(2)
+    summarizer.submit("aa:bb", memory, messages("第二轮"))
+
+    summarizer.shutdown()
+    release.set()
+
+    records = load_pending(summarizer)
+    assert [record["messages"][0]["content"] for record in records] == ["第二轮"]
@@ -0,0 +1,98 @@
+"""设备配置缓存：短期记忆写回后重连不读到旧值"""
+
+import asyncio
+
+import pytest
+
+from config import manage_api_client, private_config_cache
+from config.private_config_cache import PrivateConfigCache
+
+DEVICE = "aa:bb:cc:dd:ee:ff"
+
+
+class FakeApi:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.saved = []
+
+    def _execute_request(self, method, endpoint, **kwargs):
+        if self.fail:
+            raise Exception("智控台不可用")
+        self.saved.append(kwargs["json"]["summaryMemory"])
+
+
+class FakeServer:
+    """模拟智控台的agent-models接口，记录请求次数"""
+
+    def __init__(self, summary):
+        self.summary = summary
+        self.fetches = 0
+
+    async def fetch(self):
+        self.fetches += 1
+        return {"summaryMemory": self.summary}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PrivateConfigCache(ttl=60, stale_ttl=3600)
+    monkeypatch.setattr(private_config_cache, "_cache", cache)
+    return cache
+
+
+def use_api(monkeypatch, api):
+    monkeypatch.setattr(manage_api_client.ManageApiClient, "_instance", api)
+
+
+def test_reconnect_inside_ttl_sees_saved_summary(cache, monkeypatch):
+    api = FakeApi()
+    use_api(monkeypatch, api)
+    server = FakeServer("旧记忆")
+
+    async def main():
+        assert (await cache.get(DEVICE, server.fetch))["summaryMemory"] == "旧记忆"
+        manage_api_client.save_mem_local_short(DEVICE, "新记忆")
+        server.summary = "新记忆"
+        # 缓存未过期，重连不请求智控台，但读到的是刚写回的记忆
+        config = await cache.get(DEVICE, server.fetch)
+        assert config["summaryMemory"] == "新记忆"
+        assert server.fetches == 1
+
+    asyncio.run(main())
+    assert api.saved == ["新记忆"]
+
+
+def test_failed_save_invalidates_entry(cache, monkeypatch):
+    use_api(monkeypatch, FakeApi(fail=True))
+    server = FakeServer("旧记忆")
+
+    async def main():
+        await cache.get(DEVICE, server.fetch)
+        assert manage_api_client.save_mem_local_short(DEVICE, "新记忆") is None
+        await cache.get(DEVICE, server.fetch)
+        assert server.fetches == 2
+
+    asyncio.run(main())
+
+
+def test_refresh_started_before_save_is_not_stored(cache, monkeypatch):
+    use_api(monkeypatch, FakeApi())
+    release = None
+
+    async def slow_fetch():
+        await release.wait()
+        return {"summaryMemory": "旧记忆"}
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        cache._store(DEVICE, {"summaryMemory": "旧记忆"})
+        pending = asyncio.create_task(cache._refresh(DEVICE, slow_fetch))
+        await asyncio.sleep(0)
+        manage_api_client.save_mem_local_short(DEVICE, "新记忆")
+        release.set()
+        await pending
+        config = await cache.get(DEVICE, slow_fetch)
+        assert config["summaryMemory"] == "新记忆"
+
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""提示词管理器：位置查询的缓存"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("jinja2")
+pytest.importorskip("opuslib_next")
+
+from core.utils import util
+from core.utils import prompt_manager
+from core.utils.cache.manager import cache_manager, CacheType
+from core.utils.prompt_manager import PromptManager
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """记录IP查询次数，ip_info按IP返回预设结果"""
+    ip_info = {}
+    calls = []
+
+    def get_ip_info(ip, logger):
+        calls.append(ip)
+        return ip_info.get(ip, {})
+
+    monkeypatch.setattr(util, "get_ip_info", get_ip_info)
+    yield ip_info, calls
+    for ip in ("10.0.0.1", "10.0.0.2"):
+        cache_manager.delete(CacheType.LOCATION, ip)
+
+
+def test_unknown_location_is_cached(lookups):
+    _, calls = lookups
+    manager = PromptManager({})
+
+    async def main():
+        results = await asyncio.gather(
+            *(manager._get_location_info("10.0.0.1") for _ in range(3))
+        )
+        assert results == ["未知位置"] * 3
+        assert await manager._get_location_info("10.0.0.1") == "未知位置"
+
+    asyncio.run(main())
+    assert calls == ["10.0.0.1"]
+
+
+def test_unknown_location_expires_and_is_retried(lookups, monkeypatch):
+    ip_info, calls = lookups
+    monkeypatch.setattr(prompt_manager, "UNKNOWN_LOCATION_TTL", 0.01)
+    manager = PromptManager({})
+
+    async def main():
+        assert await manager._get_location_info("10.0.0.1") == "未知位置"
+        ip_info["10.0.0.1"] = {"city": "杭州"}
+        await asyncio.sleep(0.05)
+        assert await manager._get_location_info("10.0.0.1") == "杭州"
+
+    asyncio.run(main())
+    assert calls == ["10.0.0.1", "10.0.0.1"]
+
+
+def test_known_location_is_cached(lookups):
+    ip_info, calls = lookups
+    ip_info["10.0.0.2"] = {"city": "北京"}
+    manager = PromptManager({})
+
+    async def main():
+        assert await manager._get_location_info("10.0.0.2") == "北京"
+        assert await manager._get_location_info("10.0.0.2") == "北京"
+
+    asyncio.run(main())
+    assert calls == ["10.0.0.2"]